@@ -0,0 +1,86 @@
+"""Column statistics of a table computed in one aggregate query."""
+import re
+from typing import Dict, List, Optional, Sequence
+
+import duckdb
+
+DEFAULT_QUANTILES = (0.25, 0.5, 0.75)
+
+_NUMERIC_RE = re.compile(r"^(U?(TINY|SMALL|BIG|HUGE)?INT(EGER)?|FLOAT|DOUBLE|REAL|DECIMAL(\(.*\))?)$")
+_TEMPORAL_RE = re.compile(r"^(DATE|TIME|TIMESTAMP)")
+# Nested values have no useful minimum, maximum or quantiles
+_NESTED_RE = re.compile(r"(\[\d*\]$|^(STRUCT|MAP|UNION)\()")
+
+
+class TableNotFound(KeyError):
+    """Raised when analyzing a table or view that does not exist."""
+
+
+def column_types(cursor: duckdb.DuckDBPyConnection, table: str) -> Dict[str, str]:
+    """Column names and DuckDB types of a table or view, in column order."""
+    return dict(cursor.execute(
+        "SELECT column_name, data_type FROM duckdb_columns() WHERE table_name = ? ORDER BY column_index",
+        [table]
+    ).fetchall())
+
+
+def _aggregates(column: str, data_type: str, approximate: bool, quantiles: Sequence[float]) -> Dict[str, str]:
+    quoted = f'"{column}"'
+    aggregates = {
+        "non_null": f"count({quoted})",
+        "unique_count": f"approx_count_distinct({quoted})" if approximate else f"count(DISTINCT {quoted})",
+    }
+    if _NESTED_RE.search(data_type):
+        return aggregates
+    aggregates.update(min_value=f"min({quoted})", max_value=f"max({quoted})")
+    numeric = bool(_NUMERIC_RE.match(data_type))
+    if numeric:
+        aggregates.update(mean=f"avg({quoted})::DOUBLE", std=f"stddev_samp({quoted})")
+    if quantiles and (numeric or _TEMPORAL_RE.match(data_type)):
+        points = ", ".join(repr(float(q)) for q in quantiles)
+        if approximate:
+            function = "approx_quantile"
+        else:
+            # Interpolating between two TIME or DATE values is not defined for every type
+            function = "quantile_cont" if numeric else "quantile_disc"
+        aggregates["quantiles"] = f"{function}({quoted}, [{points}])"
+    return aggregates
+
+
+def table_statistics(cursor: duckdb.DuckDBPyConnection, table: str, columns: Optional[List[str]] = None,
+                     approximate: bool = False, sample_percent: Optional[float] = None,
+                     quantiles: Sequence[float] = DEFAULT_QUANTILES) -> Dict:
+    """Row, null and distinct counts, bounds and quantiles of every column in a single scan.
+
+    ``approximate`` swaps exact distinct counts and quantiles for HyperLogLog
+    and t-digest sketches, which need constant memory per column;
+    ``sample_percent`` reads only that share of the table's row groups.
+    ``table`` and ``columns`` must already be validated identifiers.
+    """
+    types = column_types(cursor, table)
+    if not types:
+        raise TableNotFound(f"Table '{table}' not found")
+    unknown = [column for column in columns or [] if column not in types]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    selected = {column: types[column] for column in columns} if columns else types
+
+    per_column = [(column, _aggregates(column, data_type, approximate, quantiles))
+                  for column, data_type in selected.items()]
+    select = ", ".join(["count(*)"] + [sql for _, aggregates in per_column for sql in aggregates.values()])
+    sample = f" USING SAMPLE {float(sample_percent)} PERCENT (system)" if sample_percent else ""
+    values = iter(cursor.execute(f'SELECT {select} FROM "{table}"{sample}').fetchone())
+
+    rows = next(values)
+    statistics = {}
+    for column, aggregates in per_column:
+        stats = {"type": selected[column], "count": rows}
+        stats.update(zip(aggregates, values))
+        non_null = stats.pop("non_null")
+        stats["null_count"] = rows - non_null
+        stats["null_percentage"] = round(100.0 * (rows - non_null) / rows, 2) if rows else 0.0
+        if "quantiles" in stats:
+            stats["quantiles"] = dict(zip((str(q) for q in quantiles), stats["quantiles"] or []))
+        statistics[column] = stats
+    return {"rows": rows, "approximate": approximate, "sample_percent": sample_percent,
+            "statistics": statistics}
@@ -0,0 +1,200 @@
+"""Result cache for read statements, invalidated by per-table write versions."""
+import asyncio
+import collections
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Iterable, Optional, Tuple
+
+import duckdb
+
+# Quoted strings and identifiers are kept; comments and whitespace runs become one space
+_NORMALIZE_RE = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|--[^\n]*|/\*.*?\*/|\s+", re.DOTALL)
+# Tables written by a statement; anything else invalidates every entry
+_WRITE_TARGET_RE = re.compile(
+    r"^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|COPY"
+    r"|CREATE\s+(?:OR\s+REPLACE\s+)?(?:TEMP\s+|TEMPORARY\s+)?TABLE(?:\s+IF\s+NOT\s+EXISTS)?"
+    r"|DROP\s+TABLE(?:\s+IF\s+EXISTS)?|ALTER\s+TABLE)\s+(?:\w+\.)?\"?(\w+)\"?",
+    re.IGNORECASE,
+)
+# Results of these change without any write, so they are never cached
+_VOLATILE_RE = re.compile(
+    r"\b(now|current_timestamp|current_date|current_time|get_current_time|random|uuid|gen_random_uuid"
+    r"|read_csv\w*|read_parquet|read_json\w*|nextval|setseed)\b",
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """Drop comments and collapse whitespace outside string literals and quoted identifiers."""
+    for _ in range(2):
+        # The second pass merges the spaces left by adjacent comments and whitespace
+        sql = _NORMALIZE_RE.sub(lambda m: m.group(1) or " ", sql)
+    return sql.strip().rstrip(";").strip()
+
+
+def write_targets(sql: str) -> Optional[FrozenSet[str]]:
+    """Table written by a statement, or None when it cannot be determined."""
+    match = _WRITE_TARGET_RE.match(sql)
+    return frozenset([match.group(1).lower()]) if match else None
+
+
+class TableVersions:
+    """Write counters per table, plus an epoch for writes whose target is unknown."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = collections.defaultdict(int)
+        self._epoch = 0
+
+    def bump(self, tables: Optional[Iterable[str]]) -> None:
+        with self._lock:
+            if tables is None:
+                self._epoch += 1
+                return
+            for table in tables:
+                self._versions[table.lower()] += 1
+
+    def snapshot(self, tables: FrozenSet[str]) -> Tuple[int, Tuple[Tuple[str, int], ...]]:
+        with self._lock:
+            return self._epoch, tuple(sorted((t, self._versions[t]) for t in tables))
+
+
+class _Entry:
+    __slots__ = ("value", "size", "versions", "tables", "expires")
+
+    def __init__(self, value: Any, size: int, versions, tables: FrozenSet[str], expires: float):
+        self.value = value
+        self.size = size
+        self.versions = versions
+        self.tables = tables
+        self.expires = expires
+
+
+class ResultCache:
+    """Memory-bounded LRU of serialized results with a TTL.
+
+    An entry records the versions of the tables it read, taken before the
+    statement ran; any write to one of them since makes the entry stale.
+    Concurrent misses for the same key share one execution.
+    Lookups and stores happen on the event loop, version bumps on pool threads.
+    """
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, max_bytes: int, max_entry_bytes: int,
+                 ttl: float):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self.versions = TableVersions()
+        # Parsing only; used from the event loop thread
+        self._parser = conn.cursor()
+        self._entries: "collections.OrderedDict[Hashable, _Entry]" = collections.OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.uncacheable = 0
+
+    def read_tables(self, sql: str) -> Optional[FrozenSet[str]]:
+        """Base tables a read statement depends on, or None if it must not be cached."""
+        if _VOLATILE_RE.search(sql):
+            return None
+        try:
+            # Views are expanded to the base tables they read, which is what writes bump
+            return frozenset(name.lower() for name in self._parser.get_table_names(sql))
+        except duckdb.Error:
+            return None
+
+    def _lookup(self, key: Hashable) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self.expirations += 1
+        elif entry.versions != self.versions.snapshot(entry.tables):
+            self.invalidations += 1
+        else:
+            self._entries.move_to_end(key)
+            return entry
+        self._remove(key)
+        return None
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _store(self, key: Hashable, value: Any, size: int, versions, tables: FrozenSet[str],
+               ttl: Optional[float] = None) -> None:
+        if size > self.max_entry_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, size, versions, tables, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def bypass(self) -> None:
+        """Count a read that skipped the cache."""
+        self.uncacheable += 1
+
+    async def get_or_compute(self, key: Hashable, tables: FrozenSet[str],
+                             compute: Callable[[], Awaitable[Tuple[Any, int]]],
+                             ttl: Optional[float] = None) -> Any:
+        """Return the cached value for ``key`` or run ``compute`` once for all concurrent callers.
+
+        ``compute`` returns ``(value, size_in_bytes)``; ``tables`` are the
+        tables whose writes invalidate the value, and ``ttl`` overrides the
+        cache's maximum age for this entry.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry.value
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        versions = self.versions.snapshot(tables)
+        try:
+            value, size = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved: without waiters asyncio would log it as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        self._store(key, value, size, versions, tables, ttl)
+        future.set_result(value)
+        return value
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "uncacheable": self.uncacheable,
+        }
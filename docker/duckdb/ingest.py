@@ -0,0 +1,165 @@
+"""Exactly-once appends: consumer offsets stored with the rows, and a window of recent event ids."""
+import collections
+import threading
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import duckdb
+
+from rollups import table_exists
+
+OFFSETS_TABLE = "ingest_offsets"
+
+# (topic, partition) -> (first offset in the batch, next offset to consume)
+OffsetRange = Dict[Tuple[str, int], Tuple[int, int]]
+
+
+class OffsetConflict(Exception):
+    """Raised when a batch starts below the offset already stored for its partition.
+
+    Either the batch was stored before and is being retried, or another
+    consumer took over the partition and wrote past it; ``stored`` tells the
+    sender where to resume.
+    """
+
+    def __init__(self, stored: List[Dict]):
+        super().__init__("Batch overlaps offsets that are already stored")
+        self.stored = stored
+
+
+def parse_offsets(values: Iterable[str]) -> OffsetRange:
+    """Parse ``topic:partition:start:end`` strings; topic names cannot contain ':'."""
+    offsets = {}
+    for value in values:
+        try:
+            topic, partition, start, end = value.rsplit(":", 3)
+            offsets[(topic, int(partition))] = (int(start), int(end))
+        except ValueError:
+            raise ValueError(f"Invalid offset range '{value}', expected topic:partition:start:end")
+    return offsets
+
+
+def stored_offsets(cursor: duckdb.DuckDBPyConnection, group: str,
+                   topic: Optional[str] = None) -> List[Dict]:
+    if not table_exists(cursor, OFFSETS_TABLE):
+        return []
+    sql = f"SELECT topic, partition, next_offset FROM {OFFSETS_TABLE} WHERE consumer_group = ?"
+    params = [group]
+    if topic is not None:
+        sql += " AND topic = ?"
+        params.append(topic)
+    return [{"topic": t, "partition": p, "offset": o}
+            for t, p, o in cursor.execute(sql + " ORDER BY topic, partition", params).fetchall()]
+
+
+def store_offsets(cursor: duckdb.DuckDBPyConnection, group: str, offsets: OffsetRange) -> None:
+    """Record the next offsets of a batch inside the caller's transaction.
+
+    Raises :class:`OffsetConflict` if any partition already has a stored
+    offset above the batch's first offset.
+    Gaps are allowed: transaction markers and compaction skip offsets.
+    """
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {OFFSETS_TABLE} (
+            consumer_group VARCHAR NOT NULL, topic VARCHAR NOT NULL, partition INTEGER NOT NULL,
+            next_offset BIGINT NOT NULL, updated_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (consumer_group, topic, partition)
+        )
+    """)
+    stored = {(t, p): o for t, p, o in cursor.execute(
+        f"SELECT topic, partition, next_offset FROM {OFFSETS_TABLE} WHERE consumer_group = ?", [group]
+    ).fetchall()}
+    if any(start < stored.get(key, -1) for key, (start, _) in offsets.items()):
+        raise OffsetConflict([{"topic": t, "partition": p, "offset": stored[(t, p)]}
+                              for t, p in sorted(offsets) if (t, p) in stored])
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO {OFFSETS_TABLE} VALUES (?, ?, ?, ?, now())",
+        [[group, topic, partition, end] for (topic, partition), (_, end) in sorted(offsets.items())]
+    )
+
+
+class RecentIds:
+    """Exact set of the last ``capacity`` ids written to one table, evicted oldest first.
+
+    A Bloom filter would take less memory, but its false positives would
+    silently drop real events; duplicates from producer retries and
+    redeliveries arrive close together, so a bounded window catches them.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ids: Set[str] = set()
+        self._order: Deque[str] = collections.deque()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self._ids
+
+    def add(self, ids: Iterable[str]) -> None:
+        for event_id in ids:
+            if event_id in self._ids:
+                continue
+            self._ids.add(event_id)
+            self._order.append(event_id)
+            if len(self._order) > self.capacity:
+                self._ids.discard(self._order.popleft())
+
+
+class DedupIndex:
+    """Recent ids per table, loaded from the newest rows the first time a table is seen.
+
+    Windows are keyed by the table's catalog oid, so a dropped, recreated or
+    compacted table starts again from its own rows.
+    Exact as long as appends to a table run one at a time (one write worker).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._windows: Dict[str, Tuple[int, str, RecentIds]] = {}
+        self.duplicates = 0
+
+    def window(self, cursor: duckdb.DuckDBPyConnection, table: str, column: str) -> Optional[RecentIds]:
+        """The window of ``table``, or None if the table does not exist."""
+        row = cursor.execute("SELECT table_oid FROM duckdb_tables() WHERE table_name = ?", [table]).fetchone()
+        if row is None:
+            return None
+        oid = row[0]
+        with self._lock:
+            cached = self._windows.get(table)
+            if cached is not None and cached[:2] == (oid, column):
+                return cached[2]
+        recent = RecentIds(self.capacity)
+        # Newest rows by rowid, reversed so the oldest is evicted first
+        recent.add(reversed([row[0] for row in cursor.execute(
+            f'SELECT "{column}" FROM "{table}" WHERE "{column}" IS NOT NULL ORDER BY rowid DESC LIMIT ?',
+            [self.capacity]
+        ).fetchall()]))
+        with self._lock:
+            self._windows[table] = (oid, column, recent)
+        return recent
+
+    @staticmethod
+    def keep_mask(recent: RecentIds, ids: List[Optional[str]]) -> List[bool]:
+        """True for rows whose id is new to the window and first in the batch; null ids are kept."""
+        seen = set()
+        mask = []
+        for event_id in ids:
+            keep = event_id is None or (event_id not in recent and event_id not in seen)
+            if keep and event_id is not None:
+                seen.add(event_id)
+            mask.append(keep)
+        return mask
+
+    def committed(self, recent: RecentIds, ids: List[Optional[str]], mask: List[bool]) -> None:
+        """Remember the ids of a batch once its transaction has committed."""
+        recent.add(event_id for event_id, keep in zip(ids, mask) if keep and event_id is not None)
+        with self._lock:
+            self.duplicates += mask.count(False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"tables": len(self._windows), "capacity": self.capacity,
+                    "ids": sum(len(window) for _, _, window in self._windows.values()),
+                    "duplicates": self.duplicates}
@@ -0,0 +1,181 @@
+"""Physical layout of large tables: rows clustered by time and optional ART indexes."""
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import duckdb
+
+from rollups import RollupManager
+
+_CREATE_TABLE_RE = re.compile(r"^\s*CREATE\s+TABLE\s+(?:\"[^\"]+\"|[^\s(]+)", re.IGNORECASE)
+
+
+def rewrite_table(cursor: duckdb.DuckDBPyConnection, name: str, where: str = "true",
+                  order_by: str = "rowid") -> None:
+    """Replace a table by a copy of the rows matching ``where``, written in ``order_by`` order.
+
+    Runs inside the caller's transaction; the copy keeps the DDL and indexes of the original.
+    """
+    copy = f"{name}__rewrite"
+    ddl = cursor.execute("SELECT sql FROM duckdb_tables() WHERE table_name = ?", [name]).fetchone()[0]
+    indexes = [row[0] for row in cursor.execute(
+        "SELECT sql FROM duckdb_indexes() WHERE table_name = ? AND sql IS NOT NULL", [name]
+    ).fetchall()]
+    cursor.execute(_CREATE_TABLE_RE.sub(f"CREATE TABLE {copy}", ddl, count=1))
+    cursor.execute(f"INSERT INTO {copy} SELECT * FROM {name} WHERE {where} ORDER BY {order_by}")
+    cursor.execute(f"DROP TABLE {name}")
+    cursor.execute(f"ALTER TABLE {copy} RENAME TO {name}")
+    for index in indexes:
+        cursor.execute(index)
+
+
+class TableLayout:
+    """How one table is laid out on disk.
+
+    Rows are kept in ``sort_column`` order so each row group covers a narrow
+    time range and its zone map lets scans skip it; ``index_columns`` get an
+    ART index each for point lookups.
+    """
+
+    def __init__(self, name: str, sort_column: Optional[str] = "timestamp",
+                 index_columns: Sequence[str] = ()):
+        self.name = name
+        self.sort_column = sort_column
+        self.index_columns = list(index_columns)
+
+    def index_name(self, column: str) -> str:
+        return f"{self.name}_{column}_idx"
+
+
+LAYOUT_TABLES = [TableLayout("vehicle_entries")]
+
+
+class LayoutManager:
+    """Keeps the configured tables clustered and indexed.
+
+    Appends arrive roughly in time order, so an optimize first checks the
+    rows added since the last one and only rewrites the table when some of
+    them are older than a row before them.
+    A rewrite is one transaction that folds pending rows into the rollups,
+    copies the table in sort order and moves the rollup watermarks to the
+    new last row, like a tiered compaction.
+    """
+
+    def __init__(self, layouts: List[TableLayout], rollups: RollupManager):
+        self.layouts = {layout.name: layout for layout in layouts}
+        self.rollups = rollups
+        self._lock = threading.Lock()
+        # (table oid, rows) at the start of a table known to be in order, by table and sort column
+        self._sorted_rows: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        # Table oids whose configured indexes exist
+        self._indexed: Dict[str, int] = {}
+        self.rewrites = 0
+        self.rows_rewritten = 0
+        self.checks = 0
+
+    def get(self, name: str) -> Optional[TableLayout]:
+        return self.layouts.get(name)
+
+    def _oid(self, cursor: duckdb.DuckDBPyConnection, name: str) -> Optional[int]:
+        row = cursor.execute("SELECT table_oid FROM duckdb_tables() WHERE table_name = ?", [name]).fetchone()
+        return None if row is None else row[0]
+
+    def _out_of_order(self, cursor: duckdb.DuckDBPyConnection, layout: TableLayout, start: int) -> int:
+        """Rows from ``start`` on that sort before the row preceding them."""
+        column = layout.sort_column
+        return cursor.execute(f"""
+            SELECT count(*) FROM (
+                SELECT {column} < lag({column}) OVER (ORDER BY rowid) AS out_of_order
+                FROM {layout.name} WHERE rowid >= ?
+            ) WHERE out_of_order
+        """, [max(start - 1, 0)]).fetchone()[0]
+
+    def _create_indexes(self, cursor: duckdb.DuckDBPyConnection, layout: TableLayout) -> List[str]:
+        existing = {name for (name,) in cursor.execute(
+            "SELECT index_name FROM duckdb_indexes() WHERE table_name = ?", [layout.name]).fetchall()}
+        created = []
+        for column in layout.index_columns:
+            if layout.index_name(column) not in existing:
+                cursor.execute(f"CREATE INDEX {layout.index_name(column)} ON {layout.name} ({column})")
+                created.append(layout.index_name(column))
+        return created
+
+    def ensure_indexes(self, cursor: duckdb.DuckDBPyConnection) -> List[str]:
+        """Create the missing indexes of every configured table that exists; returns their names.
+
+        Cheap enough to run after every write: a table is only looked at again
+        once it was recreated, which gives it a new oid.
+        """
+        created = []
+        for layout in self.layouts.values():
+            if not layout.index_columns:
+                continue
+            oid = self._oid(cursor, layout.name)
+            if oid is None or self._indexed.get(layout.name) == oid:
+                continue
+            created += self._create_indexes(cursor, layout)
+            with self._lock:
+                self._indexed[layout.name] = oid
+        return created
+
+    def optimize_table(self, cursor: duckdb.DuckDBPyConnection, layout: TableLayout,
+                       force: bool = False) -> Dict[str, Union[int, float, bool, List[str]]]:
+        """Cluster one table by its sort column if needed and create its indexes.
+
+        ``layout`` need not be configured, so a request can optimize any table once.
+        """
+        started = time.perf_counter()
+        result = {"rows": 0, "out_of_order": 0, "rewritten": False, "indexes_created": [], "seconds": 0.0}
+        oid = self._oid(cursor, layout.name)
+        if oid is None:
+            return result
+        rows = cursor.execute(f"SELECT count(*) FROM {layout.name}").fetchone()[0]
+        result["rows"] = rows
+        if layout.sort_column is not None:
+            key = (layout.name, layout.sort_column)
+            with self._lock:
+                sorted_oid, start = self._sorted_rows.get(key, (oid, 0))
+                self.checks += 1
+            if force or sorted_oid != oid or start > rows:
+                # Recreated by a compaction or another client, or rows were deleted
+                start = 0
+            out_of_order = self._out_of_order(cursor, layout, start)
+            result["out_of_order"] = out_of_order
+            if out_of_order or force:
+                self._rewrite(cursor, layout)
+                result["rewritten"] = True
+                with self._lock:
+                    self.rewrites += 1
+                    self.rows_rewritten += rows
+            with self._lock:
+                self._sorted_rows[key] = (self._oid(cursor, layout.name), rows)
+        result["indexes_created"] = self._create_indexes(cursor, layout)
+        with self._lock:
+            # A rewrite gave the table a new oid
+            self._indexed.pop(layout.name, None)
+        result["seconds"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def _rewrite(self, cursor: duckdb.DuckDBPyConnection, layout: TableLayout) -> None:
+        rolled_up = any(rollup.source == layout.name for rollup in self.rollups.rollups)
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            if rolled_up:
+                # Every row is counted before the rowids change
+                self.rollups.fold(cursor, layout.name)
+            rewrite_table(cursor, layout.name, order_by=f"{layout.sort_column} NULLS LAST, rowid")
+            if rolled_up:
+                self.rollups.rebase(cursor, layout.name)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+    def optimize(self, cursor: duckdb.DuckDBPyConnection) -> Dict[str, Dict]:
+        """Optimize every configured table."""
+        return {name: self.optimize_table(cursor, layout) for name, layout in self.layouts.items()}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"checks": self.checks, "rewrites": self.rewrites, "rows_rewritten": self.rows_rewritten}
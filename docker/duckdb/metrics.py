@@ -0,0 +1,132 @@
+"""Prometheus metrics for the REST API server: request, pool and ingest timings."""
+import datetime
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+# Seconds, from a cached dashboard read up to a statement hitting the query timeout
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds from a gate event to its commit, through Kafka, connector batching and retries
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0, 3600.0)
+
+# Pool counters exported as they appear in CursorPool.stats()
+_POOL_COUNTERS = ("completed", "rejected", "timed_out")
+_POOL_GAUGES = ("running", "queued")
+_CACHE_COUNTERS = ("hits", "misses", "coalesced", "evictions", "expirations", "invalidations", "uncacheable")
+_CACHE_GAUGES = ("entries", "bytes")
+
+
+def event_time_range(data: pa.Table, column: str) -> Optional[Tuple[float, float]]:
+    """Epoch seconds of the oldest and newest value of a timestamp column, None without one.
+
+    Naive timestamps are local time, as the connector writes them.
+    """
+    if column not in data.column_names or not pa.types.is_timestamp(data.schema.field(column).type):
+        return None
+    bounds = pc.min_max(data.column(column))
+    if not bounds["min"].is_valid:
+        return None
+    return tuple(value.as_py().timestamp() for value in (bounds["min"], bounds["max"]))
+
+
+class StatsCollector:
+    """Reads the pools and the result cache at scrape time instead of mirroring their counters."""
+
+    def __init__(self, pool_stats: Callable[[], Dict[str, Dict[str, int]]],
+                 cache_stats: Callable[[], Dict[str, int]]):
+        self._pool_stats = pool_stats
+        self._cache_stats = cache_stats
+
+    def collect(self) -> Iterator[Metric]:
+        pools = self._pool_stats()
+        for key in _POOL_COUNTERS:
+            family = CounterMetricFamily(f"duckdb_pool_{key}", f"Tasks {key.replace('_', ' ')} per pool",
+                                         labels=["pool"])
+            for name, stats in pools.items():
+                family.add_metric([name], stats[key])
+            yield family
+        for key in _POOL_GAUGES:
+            family = GaugeMetricFamily(f"duckdb_pool_{key}", f"Tasks {key} per pool", labels=["pool"])
+            for name, stats in pools.items():
+                family.add_metric([name], stats[key])
+            yield family
+        cache = self._cache_stats()
+        for key in _CACHE_COUNTERS:
+            yield CounterMetricFamily(f"duckdb_cache_{key}", f"Result cache {key}", value=cache[key])
+        for key in _CACHE_GAUGES:
+            yield GaugeMetricFamily(f"duckdb_cache_{key}", f"Result cache {key}", value=cache[key])
+
+
+class ServerMetrics:
+    """Histograms and freshness of one server process, on their own registry.
+
+    Requests are labelled with the route template, so ``/tables/{table_name}/append``
+    is one series however many tables there are.
+    """
+
+    def __init__(self, registry: Optional[CollectorRegistry] = None):
+        self.registry = registry or CollectorRegistry()
+        self.requests = Histogram(
+            "duckdb_http_request_duration_seconds", "Time to answer a request, by route",
+            ["method", "endpoint", "status"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.pool_wait = Histogram(
+            "duckdb_pool_wait_seconds", "Time a task waited for a pool worker",
+            ["pool"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.pool_run = Histogram(
+            "duckdb_pool_run_seconds", "Time a task ran on a pool worker, after-write hooks included",
+            ["pool"], buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.rollup_refresh = Histogram(
+            "duckdb_rollup_refresh_seconds", "Time to fold new rows into the dashboard rollups",
+            buckets=LATENCY_BUCKETS, registry=self.registry)
+        self.append_rows = Counter(
+            "duckdb_append_rows", "Rows committed through the append endpoint",
+            ["table"], registry=self.registry)
+        self.event_lag = Histogram(
+            "duckdb_append_event_lag_seconds", "Age of the oldest event in an append when it committed",
+            ["table"], buckets=LAG_BUCKETS, registry=self.registry)
+        self.last_commit = Gauge(
+            "duckdb_table_last_commit_timestamp_seconds", "Wall time of the last append to a table",
+            ["table"], registry=self.registry)
+        self.newest_event = Gauge(
+            "duckdb_table_newest_event_timestamp_seconds", "Event time of the newest row appended to a table",
+            ["table"], registry=self.registry)
+        self._lock = threading.Lock()
+        self._freshness: Dict[str, Dict[str, float]] = {}
+
+    def observe_request(self, method: str, endpoint: str, status: int, seconds: float) -> None:
+        self.requests.labels(method, endpoint, str(status)).observe(seconds)
+
+    def observe_pool(self, pool: str, wait: float, run: float) -> None:
+        self.pool_wait.labels(pool).observe(wait)
+        self.pool_run.labels(pool).observe(run)
+
+    def observe_append(self, table: str, rows: int, event_times: Optional[Tuple[float, float]],
+                       committed_at: Optional[float] = None) -> None:
+        """Record a committed append; ``event_times`` is the (oldest, newest) event of its rows."""
+        committed_at = time.time() if committed_at is None else committed_at
+        self.append_rows.labels(table).inc(rows)
+        self.last_commit.labels(table).set(committed_at)
+        with self._lock:
+            freshness = self._freshness.setdefault(table, {})
+            freshness["last_commit"] = committed_at
+            if event_times is not None:
+                oldest, newest = event_times
+                self.event_lag.labels(table).observe(max(committed_at - oldest, 0.0))
+                freshness["newest_event"] = max(newest, freshness.get("newest_event", newest))
+                self.newest_event.labels(table).set(freshness["newest_event"])
+
+    def freshness(self, table: str) -> Dict[str, Optional[float]]:
+        """Epoch seconds of the last commit and newest event seen for ``table`` since start."""
+        with self._lock:
+            freshness = dict(self._freshness.get(table, {}))
+        return {"last_commit": freshness.get("last_commit"), "newest_event": freshness.get("newest_event")}
+
+
+def isoformat(epoch: Optional[float]) -> Optional[str]:
+    """Naive local ISO timestamp, the form event timestamps are stored in."""
+    return None if epoch is None else datetime.datetime.fromtimestamp(epoch).isoformat()
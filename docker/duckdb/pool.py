@@ -0,0 +1,194 @@
+"""Bounded DuckDB execution pools for the REST API server."""
+import asyncio
+import functools
+import logging
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+# Statements starting with one of these keywords only read data
+READ_KEYWORDS = {"SELECT", "WITH", "SHOW", "DESCRIBE", "SUMMARIZE", "EXPLAIN", "FROM", "VALUES", "TABLE"}
+
+_LEADING_NOISE_RE = re.compile(r"^(\s+|--[^\n]*\n?|/\*.*?\*/|\()+", re.DOTALL)
+
+
+class PoolSaturated(Exception):
+    """Raised when a pool's queue is full or a task waited too long to start."""
+
+
+class QueryTimeout(Exception):
+    """Raised when a running statement exceeded its time budget and was interrupted."""
+
+
+def statement_kind(sql: str) -> str:
+    """Classify a SQL statement as "read" or "write" from its leading keyword."""
+    stripped = _LEADING_NOISE_RE.sub("", sql)
+    keyword = stripped.split(None, 1)[0].upper() if stripped else ""
+    return "read" if keyword in READ_KEYWORDS else "write"
+
+
+class _Task:
+    __slots__ = ("lock", "cursor", "submitted", "started", "abandoned")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cursor: Optional[duckdb.DuckDBPyConnection] = None
+        self.submitted = time.monotonic()
+        self.started: Optional[float] = None
+        self.abandoned = False
+
+
+class CursorPool:
+    """Thread pool whose workers each own a DuckDB cursor on a shared database.
+
+    At most ``workers`` statements run at once and at most ``queue_size`` more
+    wait for a worker; beyond that callers get :class:`PoolSaturated`.
+    ``after_call`` runs on the same cursor after every successful task.
+    ``observe(wait, run)`` receives the seconds every task queued and ran.
+    """
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, name: str, workers: int,
+                 queue_size: int, queue_timeout: float, query_timeout: float,
+                 after_call: Optional[Callable[[duckdb.DuckDBPyConnection], Any]] = None,
+                 observe: Optional[Callable[[float, float], None]] = None):
+        self.name = name
+        self.after_call = after_call
+        self.observe = observe
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.queue_timeout = queue_timeout
+        self.query_timeout = query_timeout
+        self._conn = conn
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"duckdb-{name}")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._conn.cursor()
+            self._local.cursor = cursor
+        return cursor
+
+    def _call(self, task: _Task, fn: Callable, args: tuple) -> Any:
+        with task.lock:
+            if task.abandoned:
+                return None
+            task.cursor = self._cursor()
+            task.started = time.monotonic()
+        with self._lock:
+            self._running += 1
+        try:
+            result = fn(task.cursor, *args)
+            if self.after_call is not None:
+                try:
+                    self.after_call(task.cursor)
+                except Exception:
+                    # The task itself succeeded; the hook catches up on its next run
+                    logger.exception(f"{self.name} pool after_call hook failed")
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+            if self.observe is not None:
+                self.observe(task.started - task.submitted, time.monotonic() - task.started)
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self.completed += 1
+        if not future.cancelled():
+            # Retrieve the exception so abandoned tasks do not log "never retrieved"
+            future.exception()
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Run ``fn(cursor, *args)`` on a pool worker without blocking the event loop.
+
+        ``timeout`` overrides the pool's query timeout for this task.
+        """
+        query_timeout = self.query_timeout if timeout is None else timeout
+        with self._lock:
+            if self._pending >= self.capacity:
+                self.rejected += 1
+                raise PoolSaturated(f"{self.name} pool is saturated ({self._pending} queued or running)")
+            self._pending += 1
+
+        task = _Task()
+        future = self._executor.submit(self._call, task, fn, args)
+        future.add_done_callback(self._release)
+        waiter = asyncio.wrap_future(future)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            with task.lock:
+                if task.started is None:
+                    task.abandoned = True
+                    self.rejected += 1
+                    raise PoolSaturated(
+                        f"{self.name} pool: request waited more than {self.queue_timeout}s for a worker"
+                    )
+                remaining = query_timeout - (time.monotonic() - task.started)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout=max(remaining, 0.0))
+        except asyncio.TimeoutError:
+            task.cursor.interrupt()
+            self.timed_out += 1
+            raise QueryTimeout(f"Query exceeded {query_timeout}s and was interrupted")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "capacity": self.capacity,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ExecutionPools:
+    """Separate read and write pools so dashboard reads are not starved by ingestion."""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, read_workers: int, write_workers: int,
+                 queue_size: int, queue_timeout: float, query_timeout: float,
+                 after_write: Optional[Callable[[duckdb.DuckDBPyConnection], Any]] = None,
+                 observe: Optional[Callable[[str, float, float], None]] = None):
+        self.read = CursorPool(conn, "read", read_workers, queue_size, queue_timeout, query_timeout,
+                               observe=functools.partial(observe, "read") if observe else None)
+        self.write = CursorPool(conn, "write", write_workers, queue_size, queue_timeout, query_timeout,
+                                after_call=after_write,
+                                observe=functools.partial(observe, "write") if observe else None)
+
+    def for_kind(self, kind: str) -> CursorPool:
+        return self.read if kind == "read" else self.write
+
+    async def run_read(self, fn: Callable, *args) -> Any:
+        return await self.read.run(fn, *args)
+
+    async def run_write(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        return await self.write.run(fn, *args, timeout=timeout)
+
+    async def run_sql(self, sql: str, fn: Callable, *args) -> Any:
+        """Route ``fn`` to the read or write pool based on the statement in ``sql``."""
+        return await self.for_kind(statement_kind(sql)).run(fn, *args)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"read": self.read.stats(), "write": self.write.stats()}
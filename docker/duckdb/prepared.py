@@ -0,0 +1,163 @@
+"""Named prepared statements with a per-cursor LRU cache for the REST API server."""
+import collections
+import math
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import duckdb
+
+
+class StatementNotFound(KeyError):
+    """Raised when executing a statement name that was never registered."""
+
+
+def sql_literal(value: Any) -> str:
+    """Render a JSON parameter value as a DuckDB SQL literal for EXECUTE."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and not math.isfinite(value):
+        # repr() gives nan and inf, which DuckDB reads as column names
+        return f"'{value}'::DOUBLE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    raise ValueError(f"Unsupported parameter type: {type(value).__name__}")
+
+
+class _Statement:
+    __slots__ = ("name", "sql", "version")
+
+    def __init__(self, name: str, sql: str, version: int):
+        self.name = name
+        self.sql = sql
+        self.version = version
+
+
+class PreparedStatementRegistry:
+    """Server-wide statement names, prepared lazily on each cursor that executes them.
+
+    DuckDB prepared statements belong to a connection, so every pool cursor
+    keeps its own LRU of ``PREPARE``d statements. Evicted entries are
+    ``DEALLOCATE``d; re-registering a name invalidates older preparations.
+    A removed statement is ``DEALLOCATE``d by each cursor the next time it
+    executes a prepared statement, on the thread that owns the cursor.
+    """
+
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        self._statements: Dict[str, _Statement] = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        # id(cursor) -> OrderedDict[name, version]; pool cursors live as long as the process
+        self._prepared: Dict[int, "collections.OrderedDict[str, int]"] = {}
+        # Removals so far, and how many each cursor has deallocated
+        self._removals = 0
+        self._swept: Dict[int, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.deallocations = 0
+
+    def register(self, name: str, sql: str) -> int:
+        with self._lock:
+            self._version += 1
+            self._statements[name] = _Statement(name, sql, self._version)
+            return self._version
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            if self._statements.pop(name, None) is None:
+                raise StatementNotFound(name)
+            self._removals += 1
+
+    def get(self, name: str) -> _Statement:
+        with self._lock:
+            statement = self._statements.get(name)
+        if statement is None:
+            raise StatementNotFound(name)
+        return statement
+
+    def list(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [{"name": s.name, "sql": s.sql} for s in self._statements.values()]
+
+    @staticmethod
+    def _handle(name: str) -> str:
+        return f"ps_{name}"
+
+    def _sweep(self, cursor: duckdb.DuckDBPyConnection, cache: "collections.OrderedDict[str, int]") -> None:
+        """DEALLOCATE the plans this cursor holds for statements removed since its last sweep."""
+        with self._lock:
+            removals = self._removals
+            if self._swept.get(id(cursor), 0) == removals:
+                return
+            removed = [name for name in cache if name not in self._statements]
+        for name in removed:
+            del cache[name]
+            cursor.execute(f"DEALLOCATE {self._handle(name)}")
+        with self._lock:
+            self.deallocations += len(removed)
+        self._swept[id(cursor)] = removals
+
+    def _ensure_prepared(self, cursor: duckdb.DuckDBPyConnection, statement: _Statement) -> str:
+        cache = self._prepared.setdefault(id(cursor), collections.OrderedDict())
+        self._sweep(cursor, cache)
+        handle = self._handle(statement.name)
+        if cache.get(statement.name) == statement.version:
+            cache.move_to_end(statement.name)
+            with self._lock:
+                self.hits += 1
+            return handle
+
+        with self._lock:
+            self.misses += 1
+        cursor.execute(f"PREPARE {handle} AS {statement.sql}")
+        cache[statement.name] = statement.version
+        cache.move_to_end(statement.name)
+        while len(cache) > self.cache_size:
+            evicted, _ = cache.popitem(last=False)
+            cursor.execute(f"DEALLOCATE {self._handle(evicted)}")
+            with self._lock:
+                self.evictions += 1
+        return handle
+
+    @staticmethod
+    def _execute_sql(handle: str, params: Optional[Sequence[Any]]) -> str:
+        if params:
+            return f"EXECUTE {handle}({', '.join(sql_literal(p) for p in params)})"
+        return f"EXECUTE {handle}"
+
+    def execute(self, cursor: duckdb.DuckDBPyConnection, name: str,
+                params: Optional[Sequence[Any]] = None) -> duckdb.DuckDBPyConnection:
+        """Execute a registered statement once, reusing the cursor's cached plan."""
+        handle = self._ensure_prepared(cursor, self.get(name))
+        return cursor.execute(self._execute_sql(handle, params))
+
+    def execute_batch(self, cursor: duckdb.DuckDBPyConnection, name: str,
+                      batch: Sequence[Sequence[Any]]) -> int:
+        """Execute a registered statement for every parameter row in one transaction, on the cached plan."""
+        handle = self._ensure_prepared(cursor, self.get(name))
+        # One script of EXECUTEs: a single call into DuckDB, and no row is planned again
+        script = ";\n".join(self._execute_sql(handle, row) for row in batch)
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            if script:
+                cursor.execute(script)
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        return len(batch)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "statements": len(self._statements),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "deallocations": self.deallocations,
+        }
@@ -0,0 +1,226 @@
+"""Per-minute rollup tables folded incrementally from the rows appended to their source."""
+import datetime
+import threading
+from typing import Dict, List, Tuple
+
+import duckdb
+
+STATE_TABLE = "rollup_state"
+# Fold versions come from a sequence: unlike rowids they never go backwards
+VERSION_SEQUENCE = "rollup_versions"
+CONFIDENCE_BINS = 20
+
+
+def table_exists(cursor: duckdb.DuckDBPyConnection, name: str) -> bool:
+    return cursor.execute(
+        "SELECT count(*) FROM duckdb_tables() WHERE table_name = ?", [name]
+    ).fetchone()[0] > 0
+
+
+class Rollup:
+    """Counts per minute and a set of dimensions over one source table.
+
+    Folding reads only the source rows whose ``rowid`` lies above the rollup's
+    watermark, so the cost of keeping a rollup current is proportional to the
+    rows appended since the last fold, not to the size of the source table.
+    """
+
+    def __init__(self, name: str, source: str, dimensions: List[Tuple[str, str, str]],
+                 time_column: str = "timestamp"):
+        self.name = name
+        self.source = source
+        # (column, type, expression over the source row)
+        self.dimensions = dimensions
+        self.time_column = time_column
+
+    @property
+    def key_columns(self) -> List[str]:
+        return ["minute"] + [column for column, _, _ in self.dimensions]
+
+    def create_sql(self) -> str:
+        columns = ", ".join(f"{column} {column_type} NOT NULL" for column, column_type, _ in self.dimensions)
+        return f"""
+            CREATE TABLE IF NOT EXISTS {self.name} (
+                minute TIMESTAMP NOT NULL,
+                {columns},
+                entries BIGINT NOT NULL,
+                version BIGINT NOT NULL,
+                PRIMARY KEY ({', '.join(self.key_columns)})
+            )
+        """
+
+    def fold_sql(self, low: int, high: int, version: int) -> str:
+        expressions = ", ".join(f"{expression} AS {column}" for column, _, expression in self.dimensions)
+        return f"""
+            INSERT INTO {self.name}
+            SELECT date_trunc('minute', {self.time_column}) AS minute, {expressions},
+                   count(*) AS entries, {version} AS version
+            FROM {self.source}
+            WHERE rowid > {low} AND rowid <= {high} AND {self.time_column} IS NOT NULL
+            GROUP BY ALL
+            ON CONFLICT ({', '.join(self.key_columns)})
+            DO UPDATE SET entries = entries + EXCLUDED.entries, version = EXCLUDED.version
+        """
+
+
+ENTRY_ROLLUPS = [
+    Rollup("entry_counts_minute", "vehicle_entries", [
+        ("gate_id", "VARCHAR", "coalesce(gate_id, '')"),
+        ("vehicle_type", "VARCHAR", "coalesce(vehicle_type, '')"),
+    ]),
+    Rollup("entry_confidence_minute", "vehicle_entries", [
+        ("confidence_bin", "INTEGER",
+         f"coalesce(least(floor(confidence * {CONFIDENCE_BINS}), {CONFIDENCE_BINS - 1})::INTEGER, -1)"),
+    ]),
+]
+
+
+class RollupManager:
+    """Keeps rollups current by folding new source rows after every write.
+
+    Watermarks live in ``rollup_state`` and move in the same transaction as
+    the rollup rows, so a crash between a write and its fold is caught up by
+    the next fold instead of double counting.
+    """
+
+    def __init__(self, rollups: List[Rollup]):
+        self.rollups = rollups
+        self._lock = threading.Lock()
+        self.folds = 0
+        self.rebuilds = 0
+
+    def get(self, name: str) -> Rollup:
+        for rollup in self.rollups:
+            if rollup.name == name:
+                return rollup
+        raise KeyError(name)
+
+    def _watermark(self, cursor: duckdb.DuckDBPyConnection, rollup: Rollup) -> int:
+        row = cursor.execute(f"SELECT last_rowid FROM {STATE_TABLE} WHERE rollup = ?",
+                             [rollup.name]).fetchone()
+        return row[0] if row else -1
+
+    def fold(self, cursor: duckdb.DuckDBPyConnection, source: str) -> Dict[str, int]:
+        """Fold the new rows of one source inside the caller's transaction."""
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} "
+                       f"(rollup VARCHAR PRIMARY KEY, last_rowid BIGINT NOT NULL)")
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {VERSION_SEQUENCE}")
+        high = cursor.execute(f"SELECT coalesce(max(rowid), -1) FROM {source}").fetchone()[0]
+        folded = {}
+        version = None
+        for rollup in self.rollups:
+            if rollup.source != source:
+                continue
+            cursor.execute(rollup.create_sql())
+            low = self._watermark(cursor, rollup)
+            if high < low:
+                # The source was recreated: rebuild from scratch
+                cursor.execute(f"DELETE FROM {rollup.name}")
+                low = -1
+                with self._lock:
+                    self.rebuilds += 1
+            if high == low:
+                continue
+            if version is None:
+                version = cursor.execute(f"SELECT nextval('{VERSION_SEQUENCE}')").fetchone()[0]
+            cursor.execute(rollup.fold_sql(low, high, version))
+            cursor.execute(f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?)", [rollup.name, high])
+            folded[rollup.name] = high
+            with self._lock:
+                self.folds += 1
+        return folded
+
+    def refresh(self, cursor: duckdb.DuckDBPyConnection) -> Dict[str, int]:
+        """Fold rows appended since the last refresh; returns the new watermark per rollup."""
+        folded = {}
+        for source in {rollup.source for rollup in self.rollups}:
+            if not table_exists(cursor, source):
+                continue
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                folded.update(self.fold(cursor, source))
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        return folded
+
+    def rebase(self, cursor: duckdb.DuckDBPyConnection, source: str) -> None:
+        """Point the watermarks at the last row of a source rewritten in the caller's transaction.
+
+        Only valid when every row of the new table has already been folded.
+        Its rows get dense rowids from 0 on commit, so the last is count - 1;
+        before the commit ``rowid`` reports transaction-local ids instead.
+        """
+        names = [rollup.name for rollup in self.rollups if rollup.source == source]
+        if not names or not table_exists(cursor, STATE_TABLE):
+            return
+        cursor.execute(f"""
+            UPDATE {STATE_TABLE} SET last_rowid = (SELECT count(*) - 1 FROM {source})
+            WHERE rollup IN ({', '.join('?' for _ in names)})
+        """, names)
+
+    def rebuild(self, cursor: duckdb.DuckDBPyConnection, name: str) -> Dict[str, int]:
+        """Recompute one rollup from its whole source table."""
+        rollup = self.get(name)
+        if table_exists(cursor, rollup.name):
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                cursor.execute(f"DELETE FROM {rollup.name}")
+                if table_exists(cursor, STATE_TABLE):
+                    cursor.execute(f"DELETE FROM {STATE_TABLE} WHERE rollup = ?", [rollup.name])
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        with self._lock:
+            self.rebuilds += 1
+        return self.refresh(cursor)
+
+    def stats(self) -> Dict[str, int]:
+        return {"rollups": len(self.rollups), "folds": self.folds, "rebuilds": self.rebuilds}
+
+
+def _columns(result: duckdb.DuckDBPyConnection) -> Dict[str, List]:
+    table = result.fetch_arrow_table()
+    return {name: table.column(name).to_pylist() for name in table.column_names}
+
+
+def entry_buckets(cursor: duckdb.DuckDBPyConnection, start: datetime.datetime, bucket_seconds: int,
+                  since_version: int) -> Dict:
+    """Entry counts per bucket from the entry rollups, for the buckets changed after ``since_version``.
+
+    Every touched bucket comes with its full totals, and the version is the
+    newest fold the counts include, read in one snapshot with them.
+    """
+    bucket = f"floor(epoch(minute) / {bucket_seconds})::BIGINT * {bucket_seconds}"
+    empty = {"bucket": [], "entries": []}
+    result = {"version": -1, "bucket_seconds": bucket_seconds, "confidence_bins": CONFIDENCE_BINS,
+              "counts": dict(empty, gate_id=[], vehicle_type=[]), "confidence": dict(empty, confidence_bin=[])}
+    if not table_exists(cursor, "entry_counts_minute"):
+        return result
+    cursor.execute("BEGIN TRANSACTION")
+    try:
+        version = cursor.execute("SELECT coalesce(max(version), -1) FROM entry_counts_minute").fetchone()[0]
+        touched = f"""
+            SELECT DISTINCT {bucket} FROM entry_counts_minute
+            WHERE version > $since AND minute >= $start
+        """
+        params = {"since": since_version, "start": start}
+        counts = _columns(cursor.execute(f"""
+            SELECT {bucket} AS bucket, gate_id, vehicle_type, sum(entries)::BIGINT AS entries
+            FROM entry_counts_minute
+            WHERE minute >= $start AND {bucket} IN ({touched})
+            GROUP BY ALL ORDER BY bucket
+        """, params))
+        confidence = _columns(cursor.execute(f"""
+            SELECT {bucket} AS bucket, confidence_bin, sum(entries)::BIGINT AS entries
+            FROM entry_confidence_minute
+            WHERE minute >= $start AND confidence_bin >= 0 AND {bucket} IN ({touched})
+            GROUP BY ALL ORDER BY bucket
+        """, params))
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    return dict(result, version=version, counts=counts, confidence=confidence)
@@ -1,127 +1,1045 @@
 """DuckDB REST API server."""
+import asyncio
+import contextlib
+import datetime
+import decimal
+import json
+import logging
 import os
-from typing import Dict, List, Optional, Union
-from fastapi import FastAPI, HTTPException, UploadFile, Query
-from fastapi.responses import JSONResponse
+import re
+import tempfile
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, FrozenSet, Hashable, List, Optional, Tuple, Union
+from fastapi import FastAPI, HTTPException, Query, Request, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
 from pydantic import BaseModel
 import duckdb
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.json
+import pyarrow.parquet
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-app = FastAPI(title="DuckDB Analytics API")
+from analyze import DEFAULT_QUANTILES, TableNotFound, table_statistics
+from cache import ResultCache, normalize_sql, write_targets
+from ingest import DedupIndex, OffsetConflict, parse_offsets, store_offsets, stored_offsets
+from layout import LAYOUT_TABLES, LayoutManager, TableLayout
+from metrics import ServerMetrics, StatsCollector, event_time_range, isoformat
+from pool import ExecutionPools, PoolSaturated, QueryTimeout, statement_kind
+from prepared import PreparedStatementRegistry, StatementNotFound
+from rollups import ENTRY_ROLLUPS, STATE_TABLE, RollupManager, entry_buckets, table_exists
+from tiering import TIERED_TABLES, TierManager, ensure_views
+from timeseries import AGGREGATES, MODES, downsample
+from upload import IF_EXISTS, Upload, UploadError, UploadTracker, detect_format, load_upload
+
+logger = logging.getLogger(__name__)
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    loops = []
+    if TIERED:
+        await pools.run_write(tiers.recover)
+        loops.append(asyncio.create_task(_compaction_loop()))
+    else:
+        await pools.run_write(_ensure_views)
+    if OPTIMIZE_INTERVAL_S > 0:
+        loops.append(asyncio.create_task(_optimize_loop()))
+    yield
+    for loop in loops:
+        loop.cancel()
+
+app = FastAPI(title="DuckDB Analytics API", lifespan=lifespan)
 
 # Initialize DuckDB connection
 DB_PATH = os.getenv("DUCKDB_DATABASE", ":memory:")
 conn = duckdb.connect(DB_PATH)
 
+# Dashboard rollups are folded from new rows after every write
+ROLLUPS_ENABLED = os.getenv("DUCKDB_ROLLUPS", "true").lower() == "true"
+rollups = RollupManager(ENTRY_ROLLUPS)
+
+# "tiered" keeps the last DUCKDB_HOT_HOURS of tiered tables in DuckDB and compacts older rows to Parquet
+STORAGE_MODE = os.getenv("DUCKDB_STORAGE_MODE", "single").lower()
+TIERED = STORAGE_MODE == "tiered"
+ARCHIVE_DIR = os.getenv("DUCKDB_ARCHIVE_DIR") or os.path.join(
+    "." if DB_PATH == ":memory:" else os.path.dirname(os.path.abspath(DB_PATH)), "archive")
+COMPACTION_INTERVAL_S = float(os.getenv("DUCKDB_COMPACTION_INTERVAL_S", "3600"))
+COMPACTION_TIMEOUT_S = float(os.getenv("DUCKDB_COMPACTION_TIMEOUT_S", "600"))
+tiers = TierManager(
+    TIERED_TABLES,
+    archive_dir=ARCHIVE_DIR,
+    hot_hours=float(os.getenv("DUCKDB_HOT_HOURS", "48")),
+    retention_days=int(os.getenv("DUCKDB_RETENTION_DAYS", "0")),
+    rollups=rollups,
+)
+
+# Large tables are kept clustered by time so zone maps skip row groups; ART indexes are opt-in
+INDEX_COLUMNS = [column.strip() for column in os.getenv("DUCKDB_INDEX_COLUMNS", "").split(",") if column.strip()]
+OPTIMIZE_INTERVAL_S = float(os.getenv("DUCKDB_OPTIMIZE_INTERVAL_S", "3600"))
+OPTIMIZE_TIMEOUT_S = float(os.getenv("DUCKDB_OPTIMIZE_TIMEOUT_S", "600"))
+layouts = LayoutManager(
+    [TableLayout(layout.name, layout.sort_column, INDEX_COLUMNS or layout.index_columns)
+     for layout in LAYOUT_TABLES],
+    rollups=rollups,
+)
+
+# Results of read statements, invalidated when a write bumps a table they read
+CACHE_ENABLED = os.getenv("DUCKDB_CACHE", "true").lower() == "true"
+result_cache = ResultCache(
+    conn,
+    max_bytes=int(float(os.getenv("DUCKDB_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    max_entry_bytes=int(float(os.getenv("DUCKDB_CACHE_MAX_ENTRY_MB", "8")) * 1024 * 1024),
+    ttl=float(os.getenv("DUCKDB_CACHE_TTL_S", "10")),
+)
+# Table statistics only change with the table, so they outlive other cached results
+ANALYZE_CACHE_TTL_S = float(os.getenv("DUCKDB_ANALYZE_CACHE_TTL_S", "3600"))
+
+# Request, pool and append timings served at /metrics
+server_metrics = ServerMetrics()
+# Timestamp column whose newest value tells how fresh a table is
+EVENT_TIME_COLUMN = os.getenv("DUCKDB_EVENT_TIME_COLUMN", "timestamp")
+# Upper bound on the points per series /timeseries returns
+TIMESERIES_MAX_POINTS = int(os.getenv("DUCKDB_TIMESERIES_MAX_POINTS", "10000"))
+
+def _ensure_views(cursor: duckdb.DuckDBPyConnection) -> None:
+    # Outside tiered mode they read the hot table alone, so clients query them in either mode
+    if TIERED:
+        tiers.ensure_views(cursor)
+    else:
+        ensure_views(cursor, TIERED_TABLES)
+
+def _after_write(cursor: duckdb.DuckDBPyConnection) -> None:
+    """Runs on the write cursor after every write task."""
+    if ROLLUPS_ENABLED:
+        with server_metrics.rollup_refresh.time():
+            result_cache.versions.bump(rollups.refresh(cursor))
+    # A tiered table created by a write gets its union view and range macro right away
+    _ensure_views(cursor)
+    # A configured table created by a write gets its indexes before it grows
+    layouts.ensure_indexes(cursor)
+
+# Every statement runs on a worker-owned cursor so the event loop never blocks on DuckDB
+pools = ExecutionPools(
+    conn,
+    read_workers=int(os.getenv("DUCKDB_READ_WORKERS", "4")),
+    write_workers=int(os.getenv("DUCKDB_WRITE_WORKERS", "1")),
+    queue_size=int(os.getenv("DUCKDB_QUEUE_SIZE", "64")),
+    queue_timeout=float(os.getenv("DUCKDB_QUEUE_TIMEOUT_S", "5")),
+    query_timeout=float(os.getenv("DUCKDB_QUERY_TIMEOUT_S", "30")),
+    after_write=_after_write,
+    observe=server_metrics.observe_pool,
+)
+server_metrics.registry.register(StatsCollector(pools.stats, result_cache.stats))
+
+# Appends with dedup_on drop ids seen among the last DUCKDB_DEDUP_WINDOW rows of their table
+dedup = DedupIndex(capacity=int(os.getenv("DUCKDB_DEDUP_WINDOW", "100000")))
+
+# Named statements registered through /prepared, cached per worker cursor
+prepared_statements = PreparedStatementRegistry(
+    cache_size=int(os.getenv("DUCKDB_PREPARED_CACHE_SIZE", "128"))
+)
+
+# /upload spools files here before loading them; loads may run far longer than a query
+UPLOAD_DIR = os.getenv("DUCKDB_UPLOAD_DIR") or tempfile.gettempdir()
+UPLOAD_TIMEOUT_S = float(os.getenv("DUCKDB_UPLOAD_TIMEOUT_S", "3600"))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+uploads = UploadTracker()
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPES = ("application/vnd.apache.parquet", "application/x-parquet")
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# Result formats for /query: "columns" is the compact default, "records" the legacy form
+QUERY_FORMATS = ("columns", "records", "arrow")
+ARROW_BATCH_ROWS = int(os.getenv("DUCKDB_ARROW_BATCH_ROWS", "100000"))
+# Streaming results from /query/stream: memory is bounded by one batch of this many rows
+STREAM_FORMATS = ("ndjson", "arrow")
+STREAM_BATCH_ROWS = int(os.getenv("DUCKDB_STREAM_BATCH_ROWS", "10000"))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
 class QueryRequest(BaseModel):
     query: str
 
+class PrepareRequest(BaseModel):
+    name: str
+    sql: str
+
+class ExecuteRequest(BaseModel):
+    params: Optional[List[Optional[Union[bool, int, float, str]]]] = None
+    batch: Optional[List[List[Optional[Union[bool, int, float, str]]]]] = None
+
+def quote_identifier(name: str) -> str:
+    """Validate a table or column name and return it double-quoted."""
+    if not _IDENTIFIER_RE.match(name):
+        raise HTTPException(status_code=400, detail=f"Invalid identifier: {name}")
+    return f'"{name}"'
+
+def _json_default(value):
+    """Encode values the stdlib JSON encoder does not know about."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    """Pick the /query result format from the format parameter or the Accept header."""
+    if requested:
+        if requested not in QUERY_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported format '{requested}', expected one of {list(QUERY_FORMATS)}"
+            )
+        return requested
+    if accept and ARROW_STREAM_MEDIA_TYPE in accept:
+        return "arrow"
+    return "columns"
+
+def _format_result(result: duckdb.DuckDBPyConnection, result_format: str) -> Union[Dict, Response]:
+    """Serialize an executed result in the negotiated /query format."""
+    if result_format == "arrow":
+        return _arrow_response(result)
+    if result_format == "columns":
+        return _columns_response(result)
+    return {
+        "status": "success",
+        "data": result.fetchdf().to_dict(orient="records")
+    }
+
+def _columns_response(result: duckdb.DuckDBPyConnection) -> Response:
+    """Serialize a result as {"columns": [...], "data": {column: [values]}}."""
+    table = result.fetch_arrow_table()
+    payload = {
+        "status": "success",
+        "columns": table.column_names,
+        "data": {name: table.column(name).to_pylist() for name in table.column_names},
+    }
+    return Response(content=json.dumps(payload, default=_json_default),
+                    media_type="application/json")
+
+def _arrow_response(result: duckdb.DuckDBPyConnection) -> Response:
+    """Serialize a result as an Arrow IPC stream, one record batch at a time."""
+    reader = result.fetch_record_batch(ARROW_BATCH_ROWS)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+class _ChunkSink:
+    """File-like sink that hands each written IPC chunk back to the caller."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _next_batch(reader: pa.RecordBatchReader) -> Optional[pa.RecordBatch]:
+    # StopIteration cannot cross the thread pool boundary, so signal the end with None
+    try:
+        return reader.read_next_batch()
+    except StopIteration:
+        return None
+
+async def _on_read_worker(cursor: duckdb.DuckDBPyConnection, fn: Callable[[], Any]) -> Any:
+    """Run ``fn`` on a streaming cursor while holding a read worker, within the pool's queue and query timeout."""
+    try:
+        return await pools.run_read(lambda _: fn())
+    except QueryTimeout:
+        # The pool interrupts its worker's own cursor; the statement runs on this one
+        cursor.interrupt()
+        raise
+
+async def _stream_batches(cursor: duckdb.DuckDBPyConnection, reader: pa.RecordBatchReader,
+                          result_format: str):
+    """Yield a query result batch by batch, interrupting DuckDB if the client goes away."""
+    finished = False
+    try:
+        writer = None
+        sink = _ChunkSink()
+        if result_format == "arrow":
+            writer = pa.ipc.new_stream(sink, reader.schema)
+        while True:
+            batch = await _on_read_worker(cursor, lambda: _next_batch(reader))
+            if batch is None:
+                break
+            if writer is not None:
+                writer.write_batch(batch)
+                yield sink.drain()
+            else:
+                yield "".join(
+                    json.dumps(row, default=_json_default) + "\n" for row in batch.to_pylist()
+                ).encode()
+        if writer is not None:
+            writer.close()
+            yield sink.drain()
+        finished = True
+    finally:
+        # A disconnect cancels this generator mid-stream: stop the running query too
+        if not finished:
+            cursor.interrupt()
+        cursor.close()
+
+def _read_arrow_body(body: bytes, content_type: str) -> pa.Table:
+    """Decode a request body into an Arrow table without per-row parsing."""
+    media_type = content_type.split(";")[0].strip().lower()
+    buffer = pa.py_buffer(body)
+    if media_type == ARROW_STREAM_MEDIA_TYPE:
+        return pa.ipc.open_stream(buffer).read_all()
+    if media_type in PARQUET_MEDIA_TYPES:
+        return pa.parquet.read_table(pa.BufferReader(buffer))
+    if media_type in NDJSON_MEDIA_TYPES:
+        return pa.json.read_json(pa.BufferReader(buffer))
+    raise HTTPException(
+        status_code=415,
+        detail=f"Unsupported content type '{media_type}', expected one of "
+               f"{[ARROW_STREAM_MEDIA_TYPE, *PARQUET_MEDIA_TYPES, *NDJSON_MEDIA_TYPES]}"
+    )
+
+def _cacheable_tables(sql: str, cache_control: Optional[str]) -> Optional[FrozenSet[str]]:
+    """Tables a read depends on, or None when its result must not be cached."""
+    if not CACHE_ENABLED or statement_kind(sql) != "read" or "no-cache" in (cache_control or ""):
+        return None
+    return result_cache.read_tables(sql)
+
+def _serialize(result: Union[Dict, Response]) -> Tuple[bytes, str]:
+    if isinstance(result, Response):
+        return bytes(result.body), result.media_type
+    return json.dumps(result, default=_json_default).encode(), "application/json"
+
+async def _cached(key: Hashable, tables: Optional[FrozenSet[str]],
+                  run: Callable[[], Awaitable[Union[Dict, Response]]],
+                  ttl: Optional[float] = None) -> Union[Dict, Response]:
+    """Serve ``run()`` from the result cache, sharing one execution between concurrent callers."""
+    if tables is None:
+        result_cache.bypass()
+        return await run()
+
+    async def compute():
+        body, media_type = _serialize(await run())
+        return (body, media_type), len(body)
+
+    body, media_type = await result_cache.get_or_compute(key, tables, compute, ttl)
+    return Response(content=body, media_type=media_type)
+
+async def _compact() -> Dict[str, Dict[str, int]]:
+    result = await pools.run_write(tiers.compact, timeout=COMPACTION_TIMEOUT_S)
+    # Archive files changed under views and read_parquet calls the cache cannot track
+    result_cache.versions.bump(None)
+    return result
+
+async def _compaction_loop() -> None:
+    while True:
+        await asyncio.sleep(COMPACTION_INTERVAL_S)
+        try:
+            logger.info("Compaction finished: %s", await _compact())
+        except Exception:
+            # A busy write pool or a conflicting writer: try again next interval
+            logger.exception("Compaction failed")
+
+async def _optimize() -> Dict[str, Dict]:
+    result = await pools.run_write(layouts.optimize, timeout=OPTIMIZE_TIMEOUT_S)
+    # Same rows in a new order: only results that depend on scan order change
+    result_cache.versions.bump([name for name, table in result.items() if table["rewritten"]])
+    return result
+
+async def _optimize_loop() -> None:
+    while True:
+        await asyncio.sleep(OPTIMIZE_INTERVAL_S)
+        try:
+            logger.info("Layout optimization finished: %s", await _optimize())
+        except Exception:
+            logger.exception("Layout optimization failed")
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next: Callable) -> Response:
+    """Observe every request under its route template; streamed bodies count until the headers."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        server_metrics.observe_request(request.method, route.path if route else "unmatched", status,
+                                       time.perf_counter() - started)
+
+@app.exception_handler(PoolSaturated)
+async def pool_saturated_handler(request: Request, exc: PoolSaturated) -> JSONResponse:
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(QueryTimeout)
+async def query_timeout_handler(request: Request, exc: QueryTimeout) -> JSONResponse:
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+def _ping() -> None:
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    finally:
+        cursor.close()
+
 @app.get("/health")
 async def health_check() -> Dict[str, str]:
     """Health check endpoint."""
+    # Bypasses the pools so a saturated server still reports itself alive
     try:
-        conn.execute("SELECT 1")
+        await run_in_threadpool(_ping)
         return {"status": "healthy"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/query")
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus exposition of request, pool, cache and ingest metrics."""
+    return Response(content=generate_latest(server_metrics.registry), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/pool/stats")
+async def pool_stats() -> Dict[str, Union[str, Dict]]:
+    """Report read and write pool utilisation."""
+    return {"status": "success", "pools": pools.stats()}
+
+@app.post("/query", response_model=None)
 async def execute_query(
     query: str = Query(None, description="SQL query to execute"),
-    request: Optional[QueryRequest] = None
-) -> Dict[str, Union[str, List[Dict]]]:
-    """Execute a SQL query."""
-    try:
-        # Use query from either query parameter or request body
-        sql_query = query or (request.query if request else None)
-        if not sql_query:
-            raise HTTPException(
-                status_code=400,
-                detail="Query must be provided either as a query parameter or in the request body"
-            )
-        
-        result = conn.execute(sql_query).fetchdf()
-        return {
-            "status": "success",
-            "data": result.to_dict(orient="records")
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    request: Optional[QueryRequest] = None,
+    format: Optional[str] = Query(None, description="Result format: columns, records or arrow"),
+    accept: Optional[str] = Header(None),
+    cache_control: Optional[str] = Header(None)
+) -> Union[Dict[str, Union[str, List[Dict]]], Response]:
+    """Execute a SQL query; results of reads are cached until a referenced table changes."""
+    # Use query from either query parameter or request body
+    sql_query = query or (request.query if request else None)
+    if not sql_query:
+        raise HTTPException(
+            status_code=400,
+            detail="Query must be provided either as a query parameter or in the request body"
+        )
+    result_format = negotiate_format(format, accept)
 
-@app.post("/upload")
-async def upload_csv(
-    file: UploadFile,
-    table_name: str,
-    if_exists: str = "fail"
-) -> Dict[str, str]:
-    """Upload a CSV file to DuckDB."""
-    if not file.filename.endswith('.csv'):
+    def run(cursor):
+        try:
+            return _format_result(cursor.execute(sql_query), result_format)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if statement_kind(sql_query) == "write":
+        result = await pools.run_write(run)
+        result_cache.versions.bump(write_targets(sql_query))
+        return result
+    return await _cached(("query", normalize_sql(sql_query), result_format),
+                         _cacheable_tables(sql_query, cache_control),
+                         lambda: pools.run_read(run))
+
+@app.post("/query/stream")
+async def stream_query(
+    query: str = Query(None, description="SQL query to execute"),
+    request: Optional[QueryRequest] = None,
+    format: Optional[str] = Query(None, description="Stream format: ndjson or arrow"),
+    batch_rows: int = Query(STREAM_BATCH_ROWS, gt=0, description="Rows per streamed batch"),
+    accept: Optional[str] = Header(None)
+) -> StreamingResponse:
+    """Execute a read-only SQL query and stream the result as NDJSON or an Arrow IPC stream.
+
+    Every batch is computed on a read worker, so streams count against the
+    read pool and each batch is interrupted after the query timeout.
+    """
+    sql_query = query or (request.query if request else None)
+    if not sql_query:
         raise HTTPException(
             status_code=400,
-            detail="Only CSV files are supported"
+            detail="Query must be provided either as a query parameter or in the request body"
         )
-    
+    if statement_kind(sql_query) != "read":
+        # Writes belong to the write pool and its after-write hook; use /query
+        raise HTTPException(status_code=400, detail="Only read statements can be streamed; use /query")
+    if format and format not in STREAM_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{format}', expected one of {list(STREAM_FORMATS)}"
+        )
+    result_format = format or ("arrow" if accept and ARROW_STREAM_MEDIA_TYPE in accept else "ndjson")
+
+    # A dedicated cursor keeps the open result isolated from other requests
+    cursor = conn.cursor()
     try:
-        # Create a temporary table from the CSV
-        conn.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} AS 
-            SELECT * FROM read_csv_auto('{file.filename}')
-        """)
-        return {"status": "success", "message": f"Table {table_name} created successfully"}
+        reader = await _on_read_worker(cursor, lambda: cursor.execute(sql_query).fetch_record_batch(batch_rows))
+    except (PoolSaturated, QueryTimeout):
+        cursor.close()
+        raise
     except Exception as e:
+        cursor.close()
         raise HTTPException(status_code=400, detail=str(e))
 
+    media_type = ARROW_STREAM_MEDIA_TYPE if result_format == "arrow" else NDJSON_MEDIA_TYPE
+    return StreamingResponse(_stream_batches(cursor, reader, result_format),
+                             media_type=media_type)
+
+async def _spool(chunks: AsyncIterator[bytes], path: str, upload: Upload) -> None:
+    """Write an upload to disk as it arrives, a buffer of UPLOAD_CHUNK_BYTES at a time."""
+    started = time.perf_counter()
+    with open(path, "wb") as spool:
+        buffer = bytearray()
+        async for chunk in chunks:
+            buffer += chunk
+            upload.received_bytes += len(chunk)
+            if len(buffer) >= UPLOAD_CHUNK_BYTES:
+                await run_in_threadpool(spool.write, bytes(buffer))
+                buffer.clear()
+        await run_in_threadpool(spool.write, bytes(buffer))
+    upload.receive_seconds = round(time.perf_counter() - started, 3)
+
+async def _read_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+@app.post("/upload")
+async def upload_file(
+    request: Request,
+    table_name: str = Query(..., description="Table to load the file into"),
+    if_exists: str = Query("fail", description="fail, replace or append when the table exists"),
+    format: Optional[str] = Query(None, description="csv or parquet, from the file name by default"),
+    filename: Optional[str] = Query(None, description="Name of a raw body, used to tell its format"),
+    upload_id: Optional[str] = Query(None, description="Id to follow the upload at /uploads/{upload_id}")
+) -> Dict[str, Union[str, int, float, None]]:
+    """Bulk-load a CSV, gzip CSV or Parquet file into a table.
+
+    The file is either the ``file`` part of a multipart form or the raw
+    request body. It is spooled to disk as it arrives and loaded with
+    DuckDB's parallel readers in one transaction.
+    """
+    table = quote_identifier(table_name)
+    if if_exists not in IF_EXISTS:
+        raise HTTPException(status_code=400, detail=f"if_exists must be one of {list(IF_EXISTS)}")
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=400, detail="Multipart uploads need a 'file' part")
+        filename, chunks, total_bytes = file.filename, _read_chunks(file), file.size
+    else:
+        chunks = request.stream()
+        total_bytes = int(request.headers["content-length"]) if "content-length" in request.headers else None
+    try:
+        detected = detect_format(filename, content_type, format)
+        upload = uploads.start(table_name, filename, detected["format"], if_exists, total_bytes, upload_id)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+
+    error = None
+    descriptor, path = tempfile.mkstemp(prefix="upload-", suffix=detected["suffix"], dir=UPLOAD_DIR)
+    os.close(descriptor)
+    try:
+        if if_exists == "fail" and await pools.run_read(lambda cursor: table_exists(cursor, table_name)):
+            # Refused before a large body is received
+            raise UploadError(f"Table '{table_name}' already exists", status=409)
+        await _spool(chunks, path, upload)
+        if upload.received_bytes == 0:
+            raise UploadError("Uploaded file is empty")
+        await pools.run_write(load_upload, upload, path, table, timeout=UPLOAD_TIMEOUT_S)
+    except UploadError as e:
+        error = str(e)
+        raise HTTPException(status_code=e.status, detail=error)
+    except duckdb.Error as e:
+        error = str(e)
+        raise HTTPException(status_code=400, detail=error)
+    except BaseException as e:
+        error = str(e) or type(e).__name__
+        raise
+    finally:
+        uploads.finish(upload, error)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        result_cache.versions.bump([table_name])
+    return {"status": "success", **upload.status()}
+
+@app.get("/uploads")
+async def list_uploads() -> Dict[str, Union[str, List[Dict]]]:
+    """Uploads in progress and the most recent finished ones."""
+    return {"status": "success", "uploads": [upload.status() for upload in uploads.list()]}
+
+@app.get("/uploads/{upload_id}")
+async def upload_status(upload_id: str) -> Dict[str, Union[str, int, float, None]]:
+    """Bytes received and load progress of an upload, then its rows and timings."""
+    upload = uploads.get(upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail=f"Upload '{upload_id}' not found")
+    return {"status": "success", **upload.status()}
+
 @app.get("/tables")
 async def list_tables() -> Dict[str, List[str]]:
     """List all tables in the database."""
-    try:
-        tables = conn.execute("SHOW TABLES").fetchdf()
-        return {
-            "status": "success",
-            "tables": tables["name"].tolist()
-        }
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    def run(cursor):
+        try:
+            tables = cursor.execute("SHOW TABLES").fetchdf()
+            return {
+                "status": "success",
+                "tables": tables["name"].tolist()
+            }
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return await pools.run_read(run)
 
 @app.get("/schema/{table_name}")
 async def get_schema(table_name: str) -> Dict[str, Union[str, List[Dict]]]:
     """Get schema for a specific table."""
+    def run(cursor):
+        try:
+            schema = cursor.execute(f"DESCRIBE {table_name}").fetchdf()
+            return {
+                "status": "success",
+                "schema": schema.to_dict(orient="records")
+            }
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return await pools.run_read(run)
+
+@app.get("/analyze/{table_name}", response_model=None)
+async def analyze_table(
+    table_name: str,
+    columns: Optional[List[str]] = Query(None, description="Columns to profile, all by default"),
+    approximate: bool = Query(False, description="Approximate distinct counts and quantiles with sketches"),
+    sample: Optional[float] = Query(None, gt=0, le=100, description="Percent of row groups to read"),
+    quantiles: List[float] = Query(list(DEFAULT_QUANTILES), description="Quantiles of numeric and time columns"),
+    cache_control: Optional[str] = Header(None)
+) -> Union[Dict, Response]:
+    """Row, null and distinct counts, bounds and quantiles per column, from one scan.
+
+    Results are cached until the table changes.
+    """
+    for name in [table_name, *(columns or [])]:
+        quote_identifier(name)
+    if any(not 0 <= q <= 1 for q in quantiles):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+
+    def run(cursor):
+        try:
+            result = table_statistics(cursor, table_name, columns, approximate=approximate,
+                                      sample_percent=sample, quantiles=quantiles)
+        except TableNotFound as e:
+            raise HTTPException(status_code=404, detail=e.args[0])
+        except (ValueError, duckdb.Error) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"status": "success", "table": table_name, **result}
+
+    tables = _cacheable_tables(f"SELECT * FROM {quote_identifier(table_name)}", cache_control)
+    key = ("analyze", table_name, tuple(columns or ()), approximate, sample, tuple(quantiles))
+    return await _cached(key, tables, lambda: pools.run_read(run), ttl=ANALYZE_CACHE_TTL_S)
+
+@app.get("/timeseries", response_model=None)
+async def timeseries(
+    table: str,
+    time_column: str = Query(EVENT_TIME_COLUMN, description="Timestamp column the series runs along"),
+    start: Optional[datetime.datetime] = Query(None, description="First time included, the oldest row by default"),
+    end: Optional[datetime.datetime] = Query(None, description="First time excluded, past the newest row by default"),
+    points: int = Query(1000, ge=3, description="Most points returned per series"),
+    group_by: Optional[List[str]] = Query(None, description="Columns splitting the rows into series"),
+    value: Optional[str] = Query(None, description="Column aggregated, or drawn by mode=lttb"),
+    aggregates: List[str] = Query(["count"], description=f"Per bucket, any of {list(AGGREGATES)}"),
+    mode: str = Query("buckets", description=f"One of {list(MODES)}"),
+    cache_control: Optional[str] = Header(None)
+) -> Union[Dict, Response]:
+    """A time range downsampled to at most ``points`` points per series.
+
+    ``buckets`` aggregates equal-width buckets, for counts and rates;
+    ``lttb`` keeps the rows that shape a line or scatter (MinMaxLTTB).
+    Results are cached until the table changes.
+    """
+    for name in [table, time_column, *(group_by or []), *([value] if value else [])]:
+        quote_identifier(name)
+    if points > TIMESERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {TIMESERIES_MAX_POINTS} points per series")
+
+    def run(cursor):
+        try:
+            result = downsample(cursor, table, time_column, start, end, points, group_by or (), value,
+                                aggregates, mode)
+        except TableNotFound as e:
+            raise HTTPException(status_code=404, detail=e.args[0])
+        except (ValueError, duckdb.Error) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"status": "success", "table": table, **result}
+
+    tables = _cacheable_tables(f"SELECT * FROM {quote_identifier(table)}", cache_control)
+    key = ("timeseries", table, time_column, start, end, points, tuple(group_by or ()), value,
+           tuple(aggregates), mode)
+    return await _cached(key, tables, lambda: pools.run_read(run))
+
+@app.post("/tables/{table_name}/append")
+async def append_to_table(
+    table_name: str,
+    request: Request,
+    create: bool = Query(False, description="Create the table from the payload schema if missing"),
+    dedup_on: Optional[str] = Query(None, description="Skip rows whose value in this column was appended recently"),
+    replace: bool = Query(False, description="Replace stored rows with the same primary key instead of failing"),
+    consumer_group: Optional[str] = Query(None, description="Consumer group the offsets belong to"),
+    offsets: Optional[List[str]] = Query(
+        None, description="topic:partition:start:end of the consumed messages, stored with the rows")
+) -> Dict[str, Union[str, int]]:
+    """Append an Arrow IPC stream, Parquet file or NDJSON body to a table.
+
+    With ``offsets`` the rows and the consumer's next offsets commit in one
+    transaction, and a batch starting below an offset already stored is
+    rejected with ``409`` and the stored offsets.
+    With ``replace`` the rows are upserted on the table's primary key.
+    """
+    table = quote_identifier(table_name)
+    if dedup_on is not None:
+        quote_identifier(dedup_on)
     try:
-        schema = conn.execute(f"DESCRIBE {table_name}").fetchdf()
-        return {
-            "status": "success",
-            "schema": schema.to_dict(orient="records")
-        }
-    except Exception as e:
+        offset_ranges = parse_offsets(offsets or [])
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if offset_ranges and not consumer_group:
+        raise HTTPException(status_code=400, detail="offsets need a consumer_group")
+    body = await request.body()
+    if not body:
+        raise HTTPException(status_code=400, detail="Request body is empty")
+    content_type = request.headers.get("content-type", ARROW_STREAM_MEDIA_TYPE)
 
-@app.get("/analyze/{table_name}")
-async def analyze_table(
+    def run(cursor):
+        try:
+            data = _read_arrow_body(body, content_type)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to decode payload: {e}")
+
+        recent = None
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            # Arrow tables are scanned in place by DuckDB, so the append is one columnar INSERT
+            view_name = f"__append_{uuid.uuid4().hex}"
+            if create:
+                cursor.register(view_name, data)
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM {view_name} LIMIT 0")
+                cursor.unregister(view_name)
+            if dedup_on is not None and dedup_on in data.column_names:
+                recent = dedup.window(cursor, table_name, dedup_on)
+            if recent is not None:
+                ids = data.column(dedup_on).to_pylist()
+                mask = dedup.keep_mask(recent, ids)
+                data = data.filter(pa.array(mask, type=pa.bool_()))
+            cursor.register(view_name, data)
+            try:
+                insert = "INSERT OR REPLACE" if replace else "INSERT"
+                cursor.execute(f"{insert} INTO {table} BY NAME SELECT * FROM {view_name}")
+            finally:
+                cursor.unregister(view_name)
+            if offset_ranges:
+                store_offsets(cursor, consumer_group, offset_ranges)
+            cursor.execute("COMMIT")
+        except OffsetConflict as e:
+            cursor.execute("ROLLBACK")
+            raise HTTPException(status_code=409, detail={"message": str(e), "offsets": e.stored})
+        except duckdb.TransactionException as e:
+            # A failed COMMIT has already rolled back
+            with contextlib.suppress(duckdb.TransactionException):
+                cursor.execute("ROLLBACK")
+            # Conflicting with a concurrent writer such as compaction: the same batch succeeds later
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        except Exception as e:
+            cursor.execute("ROLLBACK")
+            raise HTTPException(status_code=400, detail=str(e))
+        server_metrics.observe_append(table_name, data.num_rows, event_time_range(data, EVENT_TIME_COLUMN))
+        result = {"status": "success", "table": table_name, "rows": data.num_rows}
+        if recent is not None:
+            dedup.committed(recent, ids, mask)
+            result["duplicates"] = mask.count(False)
+        return result
+
+    result = await pools.run_write(run)
+    result_cache.versions.bump([table_name])
+    return result
+
+@app.get("/tables/{table_name}/freshness")
+async def table_freshness(table_name: str) -> Dict[str, Union[str, float, None]]:
+    """Newest event time and last append of a table, and how far the events lag behind now.
+
+    Appends since the server started are tracked in memory; before the first
+    one the newest event is read from the table.
+    """
+    table = quote_identifier(table_name)
+    freshness = server_metrics.freshness(table_name)
+    if freshness["newest_event"] is None:
+        def run(cursor):
+            try:
+                newest = cursor.execute(f"SELECT max({quote_identifier(EVENT_TIME_COLUMN)}) FROM {table}").fetchone()[0]
+            except duckdb.Error as e:
+                raise HTTPException(status_code=404, detail=str(e))
+            return newest.timestamp() if isinstance(newest, datetime.datetime) else None
+
+        freshness["newest_event"] = await pools.run_read(run)
+    now = time.time()
+    newest_event = freshness["newest_event"]
+    return {
+        "status": "success",
+        "table": table_name,
+        "newest_event": isoformat(newest_event),
+        "last_commit": isoformat(freshness["last_commit"]),
+        "now": isoformat(now),
+        "lag_seconds": None if newest_event is None else max(now - newest_event, 0.0),
+    }
+
+@app.post("/tables/{table_name}/optimize")
+async def optimize_table_layout(
     table_name: str,
-    columns: Optional[List[str]] = None
-) -> Dict[str, Union[str, Dict]]:
-    """Get basic statistics for a table or specific columns."""
+    sort_by: Optional[str] = Query(None, description="Column to cluster the rows by, the configured one by default"),
+    index: Optional[List[str]] = Query(None, description="Columns to give an ART index, the configured ones by default"),
+    force: bool = Query(False, description="Rewrite the table even if its rows are already in order")
+) -> Dict[str, Union[str, int, float, bool, List[str]]]:
+    """Rewrite a table in sort order when rows arrived out of order, and create its indexes.
+
+    Clustered rows give each row group a narrow range of the sort column,
+    so filters and top-N queries on it skip most of the table.
+    """
+    for name in [table_name, sort_by, *(index or [])]:
+        if name is not None:
+            quote_identifier(name)
+    configured = layouts.get(table_name)
+    layout = TableLayout(
+        table_name,
+        sort_by or (configured.sort_column if configured else None),
+        index if index is not None else (configured.index_columns if configured else []),
+    )
+    if layout.sort_column is None and not layout.index_columns:
+        raise HTTPException(status_code=400, detail=f"Table '{table_name}' has no layout: pass sort_by or index")
+
+    def run(cursor):
+        if not table_exists(cursor, table_name):
+            raise HTTPException(status_code=404, detail=f"Table '{table_name}' not found")
+        columns = {row[0] for row in cursor.execute(
+            "SELECT column_name FROM duckdb_columns() WHERE table_name = ?", [table_name]).fetchall()}
+        missing = [column for column in [layout.sort_column] + layout.index_columns
+                   if column is not None and column not in columns]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(missing)}")
+        try:
+            return layouts.optimize_table(cursor, layout, force=force)
+        except duckdb.Error as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    result = await pools.run_write(run, timeout=OPTIMIZE_TIMEOUT_S)
+    if result["rewritten"]:
+        result_cache.versions.bump([table_name])
+    return {"status": "success", "table": table_name, "sort_by": layout.sort_column,
+            "indexes": [layout.index_name(column) for column in layout.index_columns], **result}
+
+@app.get("/ingest/offsets")
+async def ingest_offsets(
+    consumer_group: str = Query(..., description="Consumer group whose offsets to list"),
+    topic: Optional[str] = Query(None)
+) -> Dict[str, Union[str, List, Dict]]:
+    """Offsets stored by exactly-once appends, where consumers resume after a rebalance."""
+    return {
+        "status": "success",
+        "offsets": await pools.run_read(stored_offsets, consumer_group, topic),
+        "dedup": dedup.stats(),
+    }
+
+@app.get("/prepared")
+async def list_prepared() -> Dict[str, Union[str, List, Dict]]:
+    """List registered prepared statements and plan-cache statistics."""
+    return {
+        "status": "success",
+        "statements": prepared_statements.list(),
+        "cache": prepared_statements.stats()
+    }
+
+@app.post("/prepared")
+async def register_prepared(request: PrepareRequest) -> Dict[str, str]:
+    """Register a named statement with positional (? or $n) parameters."""
+    quote_identifier(request.name)
+
+    def run(cursor):
+        # Preparing once up front rejects invalid SQL at registration time
+        try:
+            cursor.execute(f"PREPARE __validate_{request.name} AS {request.sql}")
+            cursor.execute(f"DEALLOCATE __validate_{request.name}")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    await pools.run_sql(request.sql, run)
+    prepared_statements.register(request.name, request.sql)
+    return {"status": "success", "name": request.name}
+
+@app.delete("/prepared/{name}")
+async def remove_prepared(name: str) -> Dict[str, str]:
+    """Forget a prepared statement; each worker cursor deallocates its plan before its next execution."""
     try:
-        if columns:
-            col_list = ", ".join(columns)
-        else:
-            schema = conn.execute(f"DESCRIBE {table_name}").fetchdf()
-            col_list = ", ".join(schema["column_name"].tolist())
-
-        stats = {}
-        for col in col_list.split(", "):
-            result = conn.execute(f"""
-                SELECT 
-                    COUNT(*) as count,
-                    COUNT(DISTINCT {col}) as unique_count,
-                    MIN({col}) as min_value,
-                    MAX({col}) as max_value
-                FROM {table_name}
-            """).fetchdf()
-            stats[col] = result.to_dict(orient="records")[0]
+        prepared_statements.remove(name)
+    except StatementNotFound:
+        raise HTTPException(status_code=404, detail=f"Prepared statement '{name}' not found")
+    return {"status": "success", "name": name}
 
+@app.post("/prepared/{name}/execute", response_model=None)
+async def execute_prepared(
+    name: str,
+    request: ExecuteRequest,
+    format: Optional[str] = Query(None, description="Result format: columns, records or arrow"),
+    accept: Optional[str] = Header(None),
+    cache_control: Optional[str] = Header(None)
+) -> Union[Dict, Response]:
+    """Execute a prepared statement with one parameter row or a batch of rows."""
+    try:
+        statement = prepared_statements.get(name)
+    except StatementNotFound:
+        raise HTTPException(status_code=404, detail=f"Prepared statement '{name}' not found")
+    if request.params is not None and request.batch is not None:
+        raise HTTPException(status_code=400, detail="Provide either params or batch, not both")
+    result_format = negotiate_format(format, accept)
+
+    def run(cursor):
+        try:
+            if request.batch is not None:
+                rows = prepared_statements.execute_batch(cursor, name, request.batch)
+                return {"status": "success", "rows": rows}
+            return _format_result(prepared_statements.execute(cursor, name, request.params),
+                                  result_format)
+        except StatementNotFound:
+            raise HTTPException(status_code=404, detail=f"Prepared statement '{name}' not found")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if statement_kind(statement.sql) == "write":
+        result = await pools.run_write(run)
+        result_cache.versions.bump(write_targets(statement.sql))
+        return result
+    if request.batch is not None:
+        # A batch replies with a row count, never a result worth caching
+        return await pools.run_read(run)
+    # The statement version keys the entry, so re-registering a name never serves old results
+    key = ("prepared", name, statement.version, json.dumps(request.params), result_format)
+    return await _cached(key, _cacheable_tables(statement.sql, cache_control),
+                         lambda: pools.run_read(run))
+
+@app.get("/rollups")
+async def list_rollups() -> Dict[str, Union[str, List, Dict]]:
+    """List the rollup tables and their watermarks."""
+    def run(cursor):
+        watermarks = {}
+        if table_exists(cursor, STATE_TABLE):
+            watermarks = dict(cursor.execute(f"SELECT rollup, last_rowid FROM {STATE_TABLE}").fetchall())
         return {
             "status": "success",
-            "statistics": stats
+            "rollups": [
+                {"name": r.name, "source": r.source, "keys": r.key_columns,
+                 "watermark": watermarks.get(r.name, -1)}
+                for r in rollups.rollups
+            ],
+            "stats": rollups.stats(),
         }
-    except Exception as e:
+
+    return await pools.run_read(run)
+
+@app.post("/rollups/{name}/rebuild")
+async def rebuild_rollup(name: str) -> Dict[str, Union[str, Dict]]:
+    """Recompute a rollup from its whole source table."""
+    try:
+        rollups.get(name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Rollup '{name}' not found")
+
+    def run(cursor):
+        try:
+            return {"status": "success", "watermarks": rollups.rebuild(cursor, name)}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    result = await pools.run_write(run)
+    result_cache.versions.bump([name])
+    return result
+
+@app.get("/dashboard/entries", response_model=None)
+async def dashboard_entries(
+    start: datetime.datetime = Query(..., description="Oldest minute to include"),
+    bucket_seconds: int = Query(60, ge=60, description="Width of the timeline buckets"),
+    since_version: int = Query(-1, description="Only return buckets changed after this rollup version"),
+    cache_control: Optional[str] = Header(None)
+) -> Union[Dict, Response]:
+    """Entry counts per bucket from the rollups, independent of the size of vehicle_entries.
+
+    Every bucket touched since ``since_version`` is returned with its full
+    totals, so clients replace buckets instead of adding to them.
+    """
+    def run(cursor):
+        try:
+            return {"status": "success", **entry_buckets(cursor, start, bucket_seconds, since_version)}
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # Every open dashboard asks for the same window each tick
+    tables = None
+    if CACHE_ENABLED and "no-cache" not in (cache_control or ""):
+        tables = frozenset(rollup.name for rollup in rollups.rollups)
+    return await _cached(("dashboard_entries", start.isoformat(), bucket_seconds, since_version),
+                         tables, lambda: pools.run_read(run))
+
+@app.get("/tiers")
+async def tier_stats() -> Dict[str, Union[str, bool, float, int, List, Dict]]:
+    """Report the hot and archive tiers of every tiered table."""
+    def run(cursor):
+        return [tiers.table_stats(cursor, table) for table in tiers.tables]
+
+    return {
+        "status": "success",
+        "mode": STORAGE_MODE,
+        "archive_dir": ARCHIVE_DIR,
+        "hot_hours": tiers.hot_hours,
+        "retention_days": tiers.retention_days,
+        "tables": await pools.run_read(run),
+        "stats": tiers.stats(),
+    }
+
+@app.post("/tiers/compact")
+async def compact_tiers() -> Dict[str, Union[str, Dict]]:
+    """Archive rows older than the hot window and drop partitions past retention now."""
+    if not TIERED:
+        raise HTTPException(status_code=409, detail="Compaction needs DUCKDB_STORAGE_MODE=tiered")
+    try:
+        return {"status": "success", "tables": await _compact()}
+    except duckdb.Error as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/cache/stats")
+async def cache_stats() -> Dict[str, Union[str, bool, Dict]]:
+    """Report result cache hits, misses, coalesced requests and evictions."""
+    return {"status": "success", "enabled": CACHE_ENABLED, "cache": result_cache.stats()}
+
+@app.delete("/cache")
+async def clear_cache() -> Dict[str, str]:
+    """Drop every cached result."""
+    result_cache.clear()
+    return {"status": "success"}
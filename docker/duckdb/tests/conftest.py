@@ -0,0 +1,30 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault("DUCKDB_DATABASE", ":memory:")
+os.environ.setdefault("DUCKDB_STORAGE_MODE", "tiered")
+os.environ.setdefault("DUCKDB_ARCHIVE_DIR", tempfile.mkdtemp(prefix="duckdb-archive-"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def server():
+    import server as server_module
+    yield server_module
+    for view in server_module.conn.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal").fetchall():
+        server_module.conn.execute(f'DROP VIEW IF EXISTS "{view[0]}"')
+    for table in server_module.conn.execute("SHOW TABLES").fetchall():
+        server_module.conn.execute(f'DROP TABLE IF EXISTS "{table[0]}"')
+    server_module.result_cache.clear()
+    shutil.rmtree(server_module.ARCHIVE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(server):
+    from fastapi.testclient import TestClient
+    with TestClient(server.app) as test_client:
+        yield test_client
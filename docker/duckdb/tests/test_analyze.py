@@ -0,0 +1,60 @@
+import datetime
+
+import duckdb
+import pytest
+
+from analyze import TableNotFound, table_statistics
+
+
+@pytest.fixture
+def cursor():
+    conn = duckdb.connect()
+    conn.execute("""
+        CREATE TABLE entries AS
+        SELECT
+            range::INTEGER AS id,
+            TIMESTAMP '2024-01-01' + INTERVAL (range) MINUTE AS timestamp,
+            CASE WHEN range % 4 = 0 THEN NULL ELSE 'GATE_' || (range % 3) END AS gate_id,
+            [range] AS tags
+        FROM range(1000)
+    """)
+    yield conn
+    conn.close()
+
+
+def test_statistics_of_every_column_in_one_query(cursor):
+    result = table_statistics(cursor, "entries")
+
+    assert result["rows"] == 1000
+    stats = result["statistics"]
+    assert list(stats) == ["id", "timestamp", "gate_id", "tags"]
+    assert stats["id"]["unique_count"] == 1000
+    assert (stats["id"]["min_value"], stats["id"]["max_value"]) == (0, 999)
+    assert stats["id"]["mean"] == 499.5
+    assert stats["id"]["quantiles"] == {"0.25": 249.75, "0.5": 499.5, "0.75": 749.25}
+    assert stats["timestamp"]["quantiles"]["0.5"] == datetime.datetime(2024, 1, 1, 8, 19)
+    assert stats["gate_id"]["null_count"] == 250
+    assert stats["gate_id"]["null_percentage"] == 25.0
+    assert stats["gate_id"]["unique_count"] == 3
+    assert "quantiles" not in stats["gate_id"]
+    assert "min_value" not in stats["tags"]
+
+
+def test_approximate_sampled_statistics_of_some_columns(cursor):
+    cursor.execute("INSERT INTO entries SELECT * FROM entries")
+
+    result = table_statistics(cursor, "entries", ["id"], approximate=True, sample_percent=100,
+                              quantiles=[0.5])
+
+    assert list(result["statistics"]) == ["id"]
+    assert result["approximate"] is True
+    # HyperLogLog is least accurate at small cardinalities
+    assert 700 < result["statistics"]["id"]["unique_count"] < 1300
+    assert abs(result["statistics"]["id"]["quantiles"]["0.5"] - 500) < 25
+
+
+def test_unknown_tables_and_columns_are_rejected(cursor):
+    with pytest.raises(TableNotFound):
+        table_statistics(cursor, "missing")
+    with pytest.raises(ValueError, match="Unknown columns: nope"):
+        table_statistics(cursor, "entries", ["id", "nope"])
@@ -0,0 +1,73 @@
+import asyncio
+
+import duckdb
+import pyarrow as pa
+
+from cache import ResultCache, normalize_sql, write_targets
+
+
+def _cache(**kwargs):
+    options = dict(max_bytes=1000, max_entry_bytes=500, ttl=60)
+    options.update(kwargs)
+    return ResultCache(duckdb.connect(), **options)
+
+
+def test_normalize_sql_keeps_literals():
+    sql = "SELECT  gate_id, -- gate\n 'A  B' AS label /* note */ FROM entries ;"
+    assert normalize_sql(sql) == "SELECT gate_id, 'A  B' AS label FROM entries"
+
+
+def test_write_targets():
+    assert write_targets("INSERT INTO Vehicle_Entries VALUES (1)") == {"vehicle_entries"}
+    assert write_targets("CREATE OR REPLACE TABLE main.x AS SELECT 1") == {"x"}
+    assert write_targets("CHECKPOINT") is None
+
+
+def test_read_tables_resolves_views_and_skips_volatile():
+    cache = _cache()
+    cache._parser.execute("CREATE TABLE base (id INTEGER)")
+    cache._parser.execute("CREATE VIEW recent AS SELECT * FROM base")
+
+    assert cache.read_tables("SELECT * FROM recent") == {"base"}
+    assert cache.read_tables("SELECT now()") is None
+
+
+def test_concurrent_misses_share_one_execution():
+    cache = _cache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result", 10
+
+    async def main():
+        return await asyncio.gather(*[cache.get_or_compute("k", frozenset({"t"}), compute)
+                                      for _ in range(5)])
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced) == (1, 4)
+
+
+def test_writes_invalidate_and_bytes_bound_evicts():
+    cache = _cache()
+
+    async def fill(key, value, size=400):
+        async def compute():
+            return value, size
+        return await cache.get_or_compute(key, frozenset({key}), compute)
+
+    async def main():
+        await fill("a", 1)
+        assert await fill("a", 2) == 1
+        cache.versions.bump(["a"])
+        assert await fill("a", 3) == 3
+        await fill("b", 4)
+        await fill("c", 5)
+        await fill("big", 6, size=600)
+
+    asyncio.run(main())
+    stats = cache.stats()
+    assert (stats["hits"], stats["invalidations"], stats["evictions"]) == (1, 1, 1)
+    assert stats["entries"] == 2 and stats["bytes"] == 800
@@ -0,0 +1,78 @@
+import pyarrow as pa
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+TOPIC = "parking.entry.events"
+
+
+def _arrow_stream(ids):
+    table = pa.table({"event_id": ids, "gate_id": ["GATE_A"] * len(ids)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _append(client, ids, **params):
+    return client.post("/tables/entries/append", params=dict({"create": "true"}, **params),
+                       content=_arrow_stream(ids), headers={"Content-Type": ARROW_STREAM})
+
+
+def _count(client):
+    response = client.post("/query", params={"format": "records"},
+                           json={"query": "SELECT count(*) AS n FROM entries"})
+    return response.json()["data"][0]["n"]
+
+
+def test_dedup_drops_ids_seen_in_the_batch_and_recently(client):
+    response = _append(client, ["e-1", "e-2", "e-1"], dedup_on="event_id")
+    assert response.json()["rows"] == 2 and response.json()["duplicates"] == 1
+
+    # A redelivered batch overlapping the first one only adds the new id
+    response = _append(client, ["e-2", "e-3"], dedup_on="event_id")
+    assert (response.json()["rows"], response.json()["duplicates"]) == (1, 1)
+    assert _count(client) == 3
+
+    # Without dedup_on rows are appended as sent
+    assert _append(client, ["e-3"]).json() == {"status": "success", "table": "entries", "rows": 1}
+
+
+def test_dedup_window_is_loaded_from_existing_rows(server, client):
+    _append(client, ["e-1", "e-2"])
+    server.dedup._windows.clear()
+
+    assert _append(client, ["e-1", "e-4"], dedup_on="event_id").json()["duplicates"] == 1
+
+
+def test_offsets_commit_with_the_rows_and_fence_stale_batches(client):
+    group = {"consumer_group": "connector"}
+    first = _append(client, ["e-1", "e-2"], offsets=[f"{TOPIC}:0:0:2", f"{TOPIC}:1:5:6"], **group)
+    assert first.status_code == 200, first.text
+
+    stored = client.get("/ingest/offsets", params=group).json()["offsets"]
+    assert stored == [{"topic": TOPIC, "partition": 0, "offset": 2}, {"topic": TOPIC, "partition": 1, "offset": 6}]
+
+    # A retry of the same batch, or a consumer that lost the partition, is rejected as a whole
+    stale = _append(client, ["e-2", "e-3"], offsets=[f"{TOPIC}:0:1:3"], **group)
+    assert stale.status_code == 409
+    assert stale.json()["detail"]["offsets"] == [{"topic": TOPIC, "partition": 0, "offset": 2}]
+    assert _count(client) == 2
+
+    # Offsets may skip ahead, e.g. over transaction markers
+    assert _append(client, ["e-3"], offsets=[f"{TOPIC}:0:4:5"], **group).status_code == 200
+    assert _append(client, ["e-9"], offsets=["no-partition"], **group).status_code == 400
+    assert _append(client, ["e-9"], offsets=[f"{TOPIC}:0:5:6"]).status_code == 400
+
+
+def test_append_conflicting_with_another_transaction_is_retryable(server, client):
+    _append(client, ["e-1"])
+    other = server.conn.cursor()
+    other.execute("BEGIN TRANSACTION")
+    other.execute("ALTER TABLE entries ADD COLUMN lane_id VARCHAR")
+    try:
+        response = _append(client, ["e-2"])
+    finally:
+        other.execute("ROLLBACK")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert _append(client, ["e-2"]).status_code == 200
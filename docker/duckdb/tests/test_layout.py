@@ -0,0 +1,101 @@
+import datetime
+
+import pyarrow as pa
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ENTRIES_DDL = """
+    CREATE TABLE vehicle_entries (
+        event_id VARCHAR, timestamp TIMESTAMP, gate_id VARCHAR,
+        vehicle_type VARCHAR, confidence DOUBLE
+    )
+"""
+START = datetime.datetime(2024, 1, 1, 12, 0)
+
+
+def _append(client, minutes):
+    """Append one row per minute after START, in the given order."""
+    table = pa.table({
+        "event_id": [f"e-{minute}" for minute in minutes],
+        "timestamp": [START + datetime.timedelta(minutes=minute) for minute in minutes],
+        "gate_id": ["GATE_A"] * len(minutes),
+        "vehicle_type": ["CAR"] * len(minutes),
+        "confidence": [0.9] * len(minutes),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post("/tables/vehicle_entries/append", content=sink.getvalue().to_pybytes(),
+                           headers={"Content-Type": ARROW_STREAM})
+    assert response.status_code == 200, response.text
+
+
+def _column(client, sql):
+    response = client.post("/query", params={"format": "records"}, json={"query": sql})
+    assert response.status_code == 200, response.text
+    return [list(row.values())[0] for row in response.json()["data"]]
+
+
+def _stored_order(client):
+    return _column(client, "SELECT event_id FROM vehicle_entries ORDER BY rowid")
+
+
+def _entries(client):
+    response = client.get("/dashboard/entries", params={"start": START.isoformat()})
+    assert response.status_code == 200, response.text
+    return sum(response.json()["counts"]["entries"])
+
+
+def test_optimize_clusters_late_rows_and_keeps_rollup_counts(client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [0, 2, 4])
+    _append(client, [3, 1])
+
+    response = client.post("/tables/vehicle_entries/optimize")
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["sort_by"] == "timestamp"
+    assert result["rewritten"] is True
+    assert result["out_of_order"] == 2
+    assert result["rows"] == 5
+    assert _stored_order(client) == ["e-0", "e-1", "e-2", "e-3", "e-4"]
+    # The watermark moved with the rewrite, so nothing is counted twice
+    _append(client, [5])
+    assert _entries(client) == 6
+
+    # Rows arriving in order leave the table alone
+    assert client.post("/tables/vehicle_entries/optimize").json()["rewritten"] is False
+    _append(client, [0])
+    assert client.post("/tables/vehicle_entries/optimize").json()["out_of_order"] == 1
+    assert _stored_order(client)[:2] == ["e-0", "e-0"]
+    assert _entries(client) == 7
+
+
+def test_optimize_creates_indexes_that_survive_rewrites(client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [2, 1, 0])
+
+    response = client.post("/tables/vehicle_entries/optimize", params={"index": ["event_id", "gate_id"]})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["indexes_created"] == ["vehicle_entries_event_id_idx", "vehicle_entries_gate_id_idx"]
+    forced = client.post("/tables/vehicle_entries/optimize",
+                         params={"index": "event_id", "force": "true"}).json()
+    assert forced["rewritten"] is True
+    assert forced["indexes_created"] == []
+    assert _column(client, "SELECT index_name FROM duckdb_indexes() WHERE table_name = 'vehicle_entries' "
+                           "ORDER BY index_name") == ["vehicle_entries_event_id_idx", "vehicle_entries_gate_id_idx"]
+    assert _column(client, "SELECT timestamp FROM vehicle_entries WHERE event_id = 'e-1'") == [
+        (START + datetime.timedelta(minutes=1)).isoformat()]
+
+
+def test_optimize_rejects_bad_input(client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    client.post("/query", json={"query": "CREATE TABLE plain (id INTEGER)"})
+
+    assert client.post("/tables/missing/optimize", params={"sort_by": "id"}).status_code == 404
+    assert client.post("/tables/vehicle_entries/optimize", params={"sort_by": "nope"}).status_code == 400
+    assert client.post("/tables/vehicle_entries/optimize", params={"index": "x; DROP"}).status_code == 400
+    # Tables without a configured layout need to be told what to do
+    assert client.post("/tables/plain/optimize").status_code == 400
+    assert client.post("/tables/plain/optimize", params={"sort_by": "id"}).json()["rewritten"] is False
@@ -0,0 +1,26 @@
+import datetime
+
+import pyarrow as pa
+
+from metrics import ServerMetrics, event_time_range
+
+
+def test_event_time_range_reads_naive_timestamps_as_local_time():
+    first, last = datetime.datetime(2024, 5, 1, 8, 0), datetime.datetime(2024, 5, 1, 8, 5)
+    data = pa.table({"timestamp": pa.array([last, None, first], type=pa.timestamp("us")), "id": [1, 2, 3]})
+
+    assert event_time_range(data, "timestamp") == (first.timestamp(), last.timestamp())
+    assert event_time_range(data, "id") is None
+    assert event_time_range(data.slice(1, 1), "timestamp") is None
+
+
+def test_append_lag_is_measured_from_the_oldest_event():
+    metrics = ServerMetrics()
+    metrics.observe_append("entries", 2, (100.0, 110.0), committed_at=112.0)
+    # An older batch arriving late does not move freshness backwards
+    metrics.observe_append("entries", 1, (50.0, 60.0), committed_at=115.0)
+
+    assert metrics.freshness("entries") == {"last_commit": 115.0, "newest_event": 110.0}
+    assert metrics.registry.get_sample_value("duckdb_append_event_lag_seconds_sum", {"table": "entries"}) == 77.0
+    assert metrics.registry.get_sample_value("duckdb_append_rows_total", {"table": "entries"}) == 3.0
+    assert metrics.freshness("other") == {"last_commit": None, "newest_event": None}
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import duckdb
+import pytest
+
+from pool import CursorPool, PoolSaturated, QueryTimeout, statement_kind
+
+
+def _pool(**kwargs):
+    settings = dict(workers=1, queue_size=0, queue_timeout=1.0, query_timeout=5.0)
+    settings.update(kwargs)
+    return CursorPool(duckdb.connect(), "test", **settings)
+
+
+def test_statement_kind():
+    assert statement_kind("SELECT 1") == "read"
+    assert statement_kind("  -- recent entries\n  with x AS (SELECT 1) SELECT * FROM x") == "read"
+    assert statement_kind("/* hint */ (SELECT 1)") == "read"
+    assert statement_kind("INSERT INTO t VALUES (1)") == "write"
+    assert statement_kind("CREATE TABLE t (a INT)") == "write"
+
+
+def test_runs_on_worker_cursor():
+    pool = _pool()
+    result = asyncio.run(pool.run(lambda cursor: cursor.execute("SELECT 42").fetchone()[0]))
+    assert result == 42
+    assert pool.stats()["completed"] == 1
+
+
+def test_reports_wait_and_run_time():
+    timings = []
+    pool = _pool(observe=lambda wait, run: timings.append((wait, run)))
+    asyncio.run(pool.run(lambda cursor: cursor.execute("SELECT 42").fetchone()))
+    assert len(timings) == 1 and all(seconds >= 0 for seconds in timings[0])
+
+
+def test_rejects_when_saturated():
+    pool = _pool()
+    release = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(pool.run(lambda cursor: release.wait(5)))
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturated):
+            await pool.run(lambda cursor: None)
+        release.set()
+        await blocker
+
+    asyncio.run(scenario())
+    assert pool.stats()["rejected"] == 1
+
+
+def test_interrupts_long_running_query():
+    pool = _pool(queue_timeout=0.1, query_timeout=0.3)
+
+    async def scenario():
+        with pytest.raises(QueryTimeout):
+            await pool.run(lambda cursor: cursor.execute(
+                "SELECT COUNT(*) FROM range(100000000000) t(x) WHERE x % 7 = 3").fetchall())
+
+    asyncio.run(scenario())
+    assert pool.stats()["timed_out"] == 1
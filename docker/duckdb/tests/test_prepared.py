@@ -0,0 +1,73 @@
+import duckdb
+import pytest
+
+from prepared import PreparedStatementRegistry, sql_literal
+
+
+def test_sql_literal():
+    assert sql_literal("O'Brien") == "'O''Brien'"
+    assert sql_literal(None) == "NULL"
+    assert sql_literal(True) == "TRUE"
+    assert sql_literal(1.5) == "1.5"
+    assert sql_literal(float("nan")) == "'nan'::DOUBLE"
+    assert sql_literal(float("-inf")) == "'-inf'::DOUBLE"
+
+
+def test_non_finite_parameters_reach_duckdb():
+    registry = PreparedStatementRegistry(cache_size=4)
+    registry.register("isnan", "SELECT isnan(?::DOUBLE), ?::DOUBLE")
+
+    assert registry.execute(duckdb.connect(), "isnan", [float("nan"), float("inf")]).fetchone() == (True, float("inf"))
+
+
+def test_lru_evicts_and_reprepares_changed_statements():
+    cursor = duckdb.connect()
+    registry = PreparedStatementRegistry(cache_size=1)
+    registry.register("one", "SELECT ?::INTEGER + 1")
+    registry.register("two", "SELECT ?::INTEGER + 2")
+
+    assert registry.execute(cursor, "one", [1]).fetchone() == (2,)
+    assert registry.execute(cursor, "two", [1]).fetchone() == (3,)
+    assert registry.stats()["evictions"] == 1
+
+    registry.register("two", "SELECT ?::INTEGER * 10")
+    assert registry.execute(cursor, "two", [2]).fetchone() == (20,)
+    assert registry.stats()["misses"] == 3
+
+
+def test_batches_run_on_the_cached_plan():
+    cursor = duckdb.connect()
+    cursor.execute("CREATE TABLE readings (gate VARCHAR, value DOUBLE)")
+    registry = PreparedStatementRegistry(cache_size=4)
+    registry.register("insert", "INSERT INTO readings VALUES (?, ?)")
+
+    assert registry.execute_batch(cursor, "insert", [["A", 1.0], ["B", float("nan")]]) == 2
+    assert registry.execute_batch(cursor, "insert", [["C", 3.0]]) == 1
+    assert registry.execute_batch(cursor, "insert", []) == 0
+    assert cursor.execute("SELECT count(*) FROM readings").fetchone() == (3,)
+    assert (registry.stats()["misses"], registry.stats()["hits"]) == (1, 2)
+
+
+def test_a_failed_batch_is_rolled_back():
+    cursor = duckdb.connect()
+    cursor.execute("CREATE TABLE readings (gate VARCHAR NOT NULL)")
+    registry = PreparedStatementRegistry(cache_size=4)
+    registry.register("insert", "INSERT INTO readings VALUES (?)")
+
+    with pytest.raises(duckdb.Error):
+        registry.execute_batch(cursor, "insert", [["A"], [None]])
+    assert cursor.execute("SELECT count(*) FROM readings").fetchone() == (0,)
+
+
+def test_removed_statements_are_deallocated():
+    cursor = duckdb.connect()
+    registry = PreparedStatementRegistry(cache_size=4)
+    registry.register("one", "SELECT 1")
+    registry.register("two", "SELECT 2")
+    registry.execute(cursor, "one")
+
+    registry.remove("one")
+    assert registry.execute(cursor, "two").fetchone() == (2,)
+    assert registry.stats()["deallocations"] == 1
+    with pytest.raises(duckdb.Error):
+        cursor.execute("EXECUTE ps_one")
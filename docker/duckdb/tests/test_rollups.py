@@ -0,0 +1,81 @@
+import datetime
+
+import pyarrow as pa
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ENTRIES_DDL = """
+    CREATE TABLE vehicle_entries (
+        event_id VARCHAR, timestamp TIMESTAMP, gate_id VARCHAR,
+        vehicle_type VARCHAR, confidence DOUBLE
+    )
+"""
+START = datetime.datetime(2024, 1, 1, 12, 0)
+
+
+def _append(client, rows):
+    table = pa.table({
+        "event_id": [f"e-{i}" for i in range(len(rows))],
+        "timestamp": [START + datetime.timedelta(minutes=m) for m, _, _ in rows],
+        "gate_id": [gate for _, gate, _ in rows],
+        "vehicle_type": ["CAR"] * len(rows),
+        "confidence": [confidence for _, _, confidence in rows],
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post("/tables/vehicle_entries/append", content=sink.getvalue().to_pybytes(),
+                           headers={"Content-Type": ARROW_STREAM})
+    assert response.status_code == 200, response.text
+
+
+def _dashboard(client, **params):
+    response = client.get("/dashboard/entries", params=dict({"start": START.isoformat()}, **params))
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _rows(columns):
+    return sorted(zip(*columns.values()))
+
+
+def test_appends_are_folded_into_minute_rollups(client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(0, "GATE_A", 0.91), (0, "GATE_A", 0.97), (1, "GATE_B", 0.42)])
+    _append(client, [(0, "GATE_A", 0.99)])
+
+    result = _dashboard(client)
+
+    minute = int(START.replace(tzinfo=datetime.timezone.utc).timestamp())
+    assert _rows(result["counts"]) == [(minute, "GATE_A", "CAR", 3), (minute + 60, "GATE_B", "CAR", 1)]
+    assert _rows(result["confidence"]) == [(minute, 18, 1), (minute, 19, 2), (minute + 60, 8, 1)]
+    assert result["version"] > 0
+
+
+def test_since_version_returns_only_touched_buckets_with_full_totals(client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(0, "GATE_A", 0.9), (5, "GATE_B", 0.9)])
+    version = _dashboard(client)["version"]
+
+    # A plain SQL insert goes through the write pool and is folded as well
+    client.post("/query", json={"query": "INSERT INTO vehicle_entries VALUES "
+                                         "('e-9', TIMESTAMP '2024-01-01 12:05:30', 'GATE_B', 'CAR', 0.5)"})
+    result = _dashboard(client, since_version=version, bucket_seconds=300)
+
+    bucket = int(START.replace(tzinfo=datetime.timezone.utc).timestamp()) + 300
+    assert _rows(result["counts"]) == [(bucket, "GATE_B", "CAR", 2)]
+    assert _dashboard(client, since_version=result["version"])["counts"]["bucket"] == []
+
+
+def test_recreated_source_rebuilds_rollups(client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(0, "GATE_A", 0.9)] * 3)
+    client.post("/query", json={"query": "DROP TABLE vehicle_entries"})
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(0, "GATE_C", 0.9)])
+
+    assert _rows(_dashboard(client)["counts"])[0][1:] == ("GATE_C", "CAR", 1)
+
+    response = client.post("/rollups/entry_counts_minute/rebuild")
+    assert response.status_code == 200
+    assert _rows(_dashboard(client)["counts"])[0][1:] == ("GATE_C", "CAR", 1)
+    assert client.post("/rollups/missing/rebuild").status_code == 404
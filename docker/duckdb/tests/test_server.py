@@ -0,0 +1,270 @@
+import datetime
+import io
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def _arrow_stream(table: pa.Table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _query(client, sql):
+    response = client.post("/query", params={"format": "records"}, json={"query": sql})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_health(client):
+    assert client.get("/health").json() == {"status": "healthy"}
+
+
+def test_append_arrow_stream_by_name(client):
+    _query(client, "CREATE TABLE readings (gate_id VARCHAR, value DOUBLE)")
+    # Column order differs from the table: the append matches by name
+    table = pa.table({"value": [1.5, 2.5], "gate_id": ["GATE_A", "GATE_B"]})
+
+    response = client.post("/tables/readings/append", content=_arrow_stream(table),
+                           headers={"Content-Type": ARROW_STREAM})
+
+    assert response.json() == {"status": "success", "table": "readings", "rows": 2}
+    data = _query(client, "SELECT gate_id, value FROM readings ORDER BY value")["data"]
+    assert data == [{"gate_id": "GATE_A", "value": 1.5}, {"gate_id": "GATE_B", "value": 2.5}]
+
+
+def test_append_with_replace_upserts_on_the_primary_key(client):
+    _query(client, "CREATE TABLE windows (gate_id VARCHAR PRIMARY KEY, entries BIGINT)")
+    body = _arrow_stream(pa.table({"gate_id": ["GATE_A", "GATE_B"], "entries": [1, 2]}))
+    client.post("/tables/windows/append", content=body, headers={"Content-Type": ARROW_STREAM})
+
+    body = _arrow_stream(pa.table({"gate_id": ["GATE_A"], "entries": [5]}))
+    assert client.post("/tables/windows/append", content=body,
+                       headers={"Content-Type": ARROW_STREAM}).status_code == 400
+    response = client.post("/tables/windows/append?replace=true", content=body,
+                           headers={"Content-Type": ARROW_STREAM})
+
+    assert response.json()["rows"] == 1
+    data = _query(client, "SELECT gate_id, entries FROM windows ORDER BY gate_id")["data"]
+    assert data == [{"gate_id": "GATE_A", "entries": 5}, {"gate_id": "GATE_B", "entries": 2}]
+
+
+def test_append_parquet_and_ndjson_with_create(client):
+    buffer = io.BytesIO()
+    pq.write_table(pa.table({"id": [1, 2, 3]}), buffer)
+    response = client.post("/tables/ids/append?create=true", content=buffer.getvalue(),
+                           headers={"Content-Type": "application/vnd.apache.parquet"})
+    assert response.json()["rows"] == 3
+
+    ndjson = "\n".join(json.dumps({"id": i}) for i in (4, 5))
+    response = client.post("/tables/ids/append", content=ndjson,
+                           headers={"Content-Type": "application/x-ndjson"})
+    assert response.json()["rows"] == 2
+    assert _query(client, "SELECT COUNT(*) AS n FROM ids")["data"] == [{"n": 5}]
+
+
+def test_append_rejects_bad_input(client):
+    body = _arrow_stream(pa.table({"id": [1]}))
+    assert client.post("/tables/bad;name/append", content=body,
+                       headers={"Content-Type": ARROW_STREAM}).status_code == 400
+    assert client.post("/tables/ids/append", content=body,
+                       headers={"Content-Type": "text/csv"}).status_code == 415
+
+
+def test_query_formats(client):
+    _query(client, "CREATE TABLE entries AS SELECT range AS id, TIMESTAMP '2024-01-01 08:00:00' "
+                   "+ INTERVAL (range) MINUTE AS ts FROM range(3)")
+    sql = {"query": "SELECT id, ts FROM entries ORDER BY id"}
+
+    columns = client.post("/query", json=sql).json()
+    assert columns["columns"] == ["id", "ts"]
+    assert columns["data"] == {
+        "id": [0, 1, 2],
+        "ts": ["2024-01-01T08:00:00", "2024-01-01T08:01:00", "2024-01-01T08:02:00"],
+    }
+
+    response = client.post("/query", json=sql, headers={"Accept": ARROW_STREAM})
+    assert response.headers["content-type"] == ARROW_STREAM
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("id").to_pylist() == [0, 1, 2]
+
+    records = client.post("/query", params={"format": "records"}, json=sql).json()
+    assert records["data"][0] == {"id": 0, "ts": "2024-01-01T08:00:00"}
+
+    assert client.post("/query", params={"format": "xml"}, json=sql).status_code == 400
+
+
+def test_query_stream_ndjson_and_arrow(client):
+    sql = {"query": "SELECT range AS id FROM range(25)"}
+
+    response = client.post("/query/stream", params={"batch_rows": 10}, json=sql)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [{"id": i} for i in range(25)]
+
+    response = client.post("/query/stream", params={"batch_rows": 10}, json=sql,
+                           headers={"Accept": ARROW_STREAM})
+    batches = list(pa.ipc.open_stream(response.content))
+    assert [batch.num_rows for batch in batches] == [10, 10, 5]
+
+
+def test_query_stream_reports_errors_before_streaming(client):
+    response = client.post("/query/stream", json={"query": "SELECT * FROM missing_table"})
+    assert response.status_code == 400
+
+
+def test_query_stream_runs_reads_on_the_read_pool(server, client, monkeypatch):
+    response = client.post("/query/stream", json={"query": "CREATE TABLE streamed AS SELECT 1 AS id"})
+    assert response.status_code == 400
+    tables = _query(client, "SELECT count(*) AS n FROM duckdb_tables() WHERE table_name = 'streamed'")
+    assert tables["data"] == [{"n": 0}]
+
+    monkeypatch.setattr(server.pools.read, "capacity", 0)
+    assert client.post("/query/stream", json={"query": "SELECT 1"}).status_code == 503
+    monkeypatch.undo()
+
+    monkeypatch.setattr(server.pools.read, "queue_timeout", 0.1)
+    monkeypatch.setattr(server.pools.read, "query_timeout", 0.3)
+    slow = {"query": "SELECT count(*) FROM range(100000) a, range(100000) b WHERE a.range + b.range = 7"}
+    assert client.post("/query/stream", json=slow).status_code == 504
+
+
+def test_prepared_statement_lifecycle(server, client):
+    _query(client, "CREATE TABLE plates (plate VARCHAR, seen TIMESTAMP)")
+    assert client.post("/prepared", json={
+        "name": "insert_plate", "sql": "INSERT INTO plates VALUES (?, ?)"
+    }).status_code == 200
+    assert client.post("/prepared", json={
+        "name": "by_plate", "sql": "SELECT plate, seen FROM plates WHERE plate = ?"
+    }).status_code == 200
+
+    response = client.post("/prepared/insert_plate/execute", json={
+        "batch": [["O'NEIL", "2024-01-01T08:00:00"], ["XYZ 123", "2024-01-01T09:00:00"]]
+    })
+    assert response.json() == {"status": "success", "rows": 2}
+
+    # Each read worker caches its own plan: one more run than workers guarantees a hit
+    for _ in range(server.pools.read.workers + 1):
+        result = client.post("/prepared/by_plate/execute", json={"params": ["O'NEIL"]}).json()
+        assert result["data"] == {"plate": ["O'NEIL"], "seen": ["2024-01-01T08:00:00"]}
+
+    cache = client.get("/prepared").json()["cache"]
+    assert cache["hits"] >= 1 and cache["statements"] == 2
+
+    assert client.delete("/prepared/by_plate").status_code == 200
+    assert client.post("/prepared/by_plate/execute", json={"params": ["x"]}).status_code == 404
+    assert client.post("/prepared", json={"name": "broken", "sql": "SELEC 1"}).status_code == 400
+
+
+def test_batched_reads_do_not_share_the_cache_with_plain_executions(client):
+    _query(client, "CREATE TABLE batch_reads AS SELECT 1 AS id")
+    assert client.post("/prepared", json={"name": "all_ids", "sql": "SELECT id FROM batch_reads"}).status_code == 200
+
+    assert client.post("/prepared/all_ids/execute", json={"batch": [[]]}).json() == {"status": "success", "rows": 1}
+    assert client.post("/prepared/all_ids/execute", json={}).json()["data"] == {"id": [1]}
+    assert client.post("/prepared/all_ids/execute", json={"batch": [[]]}).json() == {"status": "success", "rows": 1}
+
+
+def test_query_results_are_cached_until_a_referenced_table_changes(client):
+    def stats():
+        return client.get("/cache/stats").json()["cache"]
+
+    _query(client, "CREATE TABLE cached_ids (id INTEGER)")
+    client.post("/tables/cached_ids/append", content=_arrow_stream(pa.table({"id": pa.array([1], pa.int32())})),
+                headers={"Content-Type": ARROW_STREAM})
+    sql = {"query": "SELECT count(*) AS n FROM cached_ids"}
+    before = stats()
+
+    assert client.post("/query", json=sql).json()["data"] == {"n": [1]}
+    # Whitespace, comments and the trailing semicolon do not change the key
+    assert client.post("/query", json={"query": "SELECT  count(*) AS n\nFROM cached_ids; -- again"}).json()["data"] == {"n": [1]}
+    assert stats()["hits"] == before["hits"] + 1
+
+    client.post("/tables/cached_ids/append", content=_arrow_stream(pa.table({"id": pa.array([2], pa.int32())})),
+                headers={"Content-Type": ARROW_STREAM})
+    assert client.post("/query", json=sql).json()["data"] == {"n": [2]}
+
+    _query(client, "INSERT INTO cached_ids VALUES (3)")
+    assert client.post("/query", json=sql).json()["data"] == {"n": [3]}
+    assert stats()["invalidations"] == before["invalidations"] + 2
+
+    assert client.post("/query", json=sql, headers={"Cache-Control": "no-cache"}).status_code == 200
+    assert stats()["uncacheable"] == before["uncacheable"] + 1
+
+
+def test_analyze_is_cached_until_the_table_changes(client):
+    _query(client, "CREATE TABLE analyzed (id INTEGER, gate_id VARCHAR)")
+    _query(client, "INSERT INTO analyzed VALUES (1, 'GATE_A'), (2, NULL), (3, 'GATE_A')")
+    hits = client.get("/cache/stats").json()["cache"]["hits"]
+
+    first = client.get("/analyze/analyzed", params={"quantiles": [0.5]}).json()
+    assert client.get("/analyze/analyzed", params={"quantiles": [0.5]}).json() == first
+    assert client.get("/cache/stats").json()["cache"]["hits"] == hits + 1
+    assert first["rows"] == 3
+    assert first["statistics"]["id"]["quantiles"] == {"0.5": 2.0}
+    assert first["statistics"]["gate_id"]["null_count"] == 1
+    assert first["statistics"]["gate_id"]["unique_count"] == 1
+
+    _query(client, "INSERT INTO analyzed VALUES (4, 'GATE_B')")
+    analyzed = client.get("/analyze/analyzed", params={"columns": "gate_id", "quantiles": [0.5]}).json()
+    assert list(analyzed["statistics"]) == ["gate_id"]
+    assert analyzed["statistics"]["gate_id"]["unique_count"] == 2
+
+    assert client.get("/analyze/missing").status_code == 404
+    assert client.get("/analyze/analyzed", params={"columns": "nope"}).status_code == 400
+    assert client.get("/analyze/analyzed", params={"columns": "id) FROM x; --"}).status_code == 400
+    assert client.get("/analyze/analyzed", params={"sample": 0}).status_code == 422
+
+
+def test_metrics_time_requests_by_route_and_track_freshness(server, client):
+    appends = {"method": "POST", "endpoint": "/tables/{table_name}/append", "status": "200"}
+    before = server.server_metrics.registry.get_sample_value(
+        "duckdb_http_request_duration_seconds_count", appends) or 0
+    client.post("/tables/entries/append?create=true", headers={"Content-Type": ARROW_STREAM},
+                content=_arrow_stream(pa.table({"timestamp": pa.array([datetime.datetime.now()],
+                                                                      type=pa.timestamp("us"))})))
+
+    freshness = client.get("/tables/entries/freshness").json()
+    assert 0 <= freshness["lag_seconds"] < 60
+    assert freshness["last_commit"] is not None
+    assert client.get("/tables/missing/freshness").status_code == 404
+
+    body = client.get("/metrics").text
+    assert 'duckdb_append_rows_total{table="entries"}' in body
+    assert 'duckdb_pool_completed_total{pool="write"}' in body
+    assert server.server_metrics.registry.get_sample_value(
+        "duckdb_http_request_duration_seconds_count", appends) == before + 1
+
+
+def test_timeseries_is_downsampled_and_cached_until_the_table_changes(client):
+    _query(client, "CREATE TABLE readings AS SELECT TIMESTAMP '2024-01-01' + INTERVAL (range) SECOND AS timestamp, "
+                   "'GATE_' || (range % 2) AS gate_id, range / 1000 AS confidence FROM range(3600)")
+    params = {"table": "readings", "start": "2024-01-01T00:00:00", "end": "2024-01-01T01:00:00",
+              "points": 6, "aggregates": ["count", "max"], "value": "confidence"}
+    hits = client.get("/cache/stats").json()["cache"]["hits"]
+
+    first = client.get("/timeseries", params=params).json()
+    assert client.get("/timeseries", params=params).json() == first
+    assert client.get("/cache/stats").json()["cache"]["hits"] == hits + 1
+    assert first["columns"]["time"][:2] == ["2024-01-01T00:00:00", "2024-01-01T00:10:00"]
+    assert first["columns"]["count"] == [600] * 6
+    assert first["columns"]["max"][-1] == 3.599
+
+    lttb = client.get("/timeseries", params={"table": "readings", "points": 50, "group_by": "gate_id",
+                                             "value": "confidence", "mode": "lttb"}).json()
+    assert len(lttb["columns"]["time"]) == 100
+
+    _query(client, "INSERT INTO readings VALUES (TIMESTAMP '2024-01-01 00:00:30', 'GATE_A', 1)")
+    assert client.get("/timeseries", params=params).json()["columns"]["count"][0] == 601
+
+    assert client.get("/timeseries", params={"table": "missing"}).status_code == 404
+    assert client.get("/timeseries", params={"table": "readings", "value": "nope"}).status_code == 400
+    assert client.get("/timeseries", params={"table": "readings", "group_by": "a; --"}).status_code == 400
+    assert client.get("/timeseries", params={"table": "readings", "mode": "lttb"}).status_code == 400
+    assert client.get("/timeseries", params={"table": "readings", "points": 100_000}).status_code == 400
+    assert client.get("/timeseries", params={"table": "readings", "points": 2}).status_code == 422
@@ -0,0 +1,136 @@
+import datetime
+import glob
+import os
+
+import pyarrow as pa
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+ENTRIES_DDL = """
+    CREATE TABLE vehicle_entries (
+        event_id VARCHAR, timestamp TIMESTAMP, gate_id VARCHAR,
+        vehicle_type VARCHAR, confidence DOUBLE
+    )
+"""
+START = datetime.datetime(2024, 1, 1, 12, 0)
+
+
+def _append(client, rows):
+    """Append (hours after START, gate) rows to vehicle_entries."""
+    table = pa.table({
+        "event_id": [f"e-{hours}-{gate}-{i}" for i, (hours, gate) in enumerate(rows)],
+        "timestamp": [START + datetime.timedelta(hours=hours) for hours, _ in rows],
+        "gate_id": [gate for _, gate in rows],
+        "vehicle_type": ["CAR"] * len(rows),
+        "confidence": [0.9] * len(rows),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post("/tables/vehicle_entries/append", content=sink.getvalue().to_pybytes(),
+                           headers={"Content-Type": ARROW_STREAM})
+    assert response.status_code == 200, response.text
+
+
+def _scalar(client, sql):
+    response = client.post("/query", params={"format": "records"}, json={"query": sql})
+    assert response.status_code == 200, response.text
+    return list(response.json()["data"][0].values())[0]
+
+
+def _total_entries(client):
+    response = client.get("/dashboard/entries", params={"start": "2023-12-01T00:00:00"})
+    return sum(response.json()["counts"]["entries"]), response.json()["version"]
+
+
+def test_compaction_moves_old_rows_to_partitioned_parquet(server, client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    # Two days back, one day back and now: the default 48 hour window keeps the last two
+    _append(client, [(-72, "GATE_A"), (-72, "GATE_B"), (-24, "GATE_A"), (0, "GATE_A"), (0, "GATE_B")])
+
+    response = client.post("/tiers/compact")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["tables"]["vehicle_entries"]["rows_archived"] == 2
+    archive = os.path.join(server.ARCHIVE_DIR, "vehicle_entries")
+    assert sorted(os.path.relpath(os.path.dirname(path), archive) for path in glob.glob(
+        os.path.join(archive, "**", "*.parquet"), recursive=True)) == [
+        os.path.join("date=2023-12-29", "gate_id=GATE_A"), os.path.join("date=2023-12-29", "gate_id=GATE_B")]
+    assert _scalar(client, "SELECT count(*) FROM vehicle_entries") == 3
+    assert _scalar(client, "SELECT count(*) FROM vehicle_entries_all") == 5
+
+    stats = client.get("/tiers").json()["tables"][0]
+    assert (stats["hot_rows"], stats["archive_files"]) == (3, 2)
+    assert stats["last_compaction"]["rows"] == 2
+
+
+def test_rollups_survive_compaction_without_recounting(client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(-72, "GATE_A")] * 3 + [(0, "GATE_B")] * 2)
+    total, version = _total_entries(client)
+    assert total == 5
+
+    client.post("/tiers/compact")
+    _append(client, [(1, "GATE_C")])
+
+    # Archived rows keep their counts and the rewritten hot table is not folded again
+    total, after = _total_entries(client)
+    assert total == 6
+    assert after > version
+
+
+def test_range_macro_only_reads_partitions_in_range(server, client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(-96, "GATE_A"), (-72, "GATE_A"), (-72, "GATE_B"), (0, "GATE_A")])
+    client.post("/tiers/compact")
+
+    # A corrupt file outside the range is never opened
+    newer = glob.glob(os.path.join(server.ARCHIVE_DIR, "vehicle_entries", "date=2023-12-29", "**", "*.parquet"),
+                      recursive=True)
+    for path in newer:
+        with open(path, "wb") as f:
+            f.write(b"not parquet")
+
+    assert _scalar(client, "SELECT count(*) FROM vehicle_entries_between("
+                           "TIMESTAMP '2023-12-28 00:00:00', TIMESTAMP '2023-12-29 00:00:00')") == 1
+
+
+def test_retention_drops_old_date_partitions_and_recovery_clears_staging(server, client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(-24 * 10, "GATE_A"), (-24 * 3, "GATE_A"), (0, "GATE_A")])
+    stray = os.path.join(server.ARCHIVE_DIR, "_staging", "vehicle_entries", "unlogged-batch")
+    os.makedirs(stray)
+
+    server.tiers.retention_days = 5
+    try:
+        result = client.post("/tiers/compact").json()["tables"]["vehicle_entries"]
+    finally:
+        server.tiers.retention_days = 0
+
+    assert result == {"rows_archived": 2, "partitions_dropped": 1}
+    assert _scalar(client, "SELECT count(*) FROM vehicle_entries_all") == 2
+
+    server.tiers.recover(server.conn.cursor())
+    assert not os.path.exists(stray)
+
+
+def test_timeseries_reads_ranges_from_both_tiers(client):
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(-72, "GATE_A"), (-72, "GATE_B"), (0, "GATE_A")])
+    client.post("/tiers/compact")
+
+    response = client.get("/timeseries", params={"table": "vehicle_entries", "points": 4,
+                                                 "start": "2023-12-29T00:00:00", "end": "2024-01-02T00:00:00"})
+    assert response.status_code == 200, response.text
+    assert sum(response.json()["columns"]["count"]) == 3
+    # Without bounds the range runs from the oldest archived row
+    response = client.get("/timeseries", params={"table": "vehicle_entries", "points": 4})
+    assert response.json()["start"] == "2023-12-29T12:00:00"
+
+
+def test_range_macro_reads_the_hot_table_outside_tiered_mode(server, client, monkeypatch):
+    monkeypatch.setattr(server, "TIERED", False)
+    client.post("/query", json={"query": ENTRIES_DDL})
+    _append(client, [(0, "GATE_A"), (1, "GATE_A")])
+
+    assert _scalar(client, "SELECT count(*) FROM vehicle_entries_between("
+                           "TIMESTAMP '2024-01-01 12:30:00', TIMESTAMP '2024-01-02 00:00:00')") == 1
@@ -0,0 +1,94 @@
+import datetime
+
+import duckdb
+import numpy as np
+import pytest
+
+from analyze import TableNotFound
+from timeseries import MINMAX_RATIO, downsample, lttb
+
+START = datetime.datetime(2024, 1, 1)
+
+
+@pytest.fixture
+def cursor():
+    conn = duckdb.connect()
+    # A reading a second for a day on two gates, with one dip on GATE_1
+    conn.execute("""
+        CREATE TABLE entries AS
+        SELECT
+            TIMESTAMP '2024-01-01' + INTERVAL (range) SECOND AS timestamp,
+            'GATE_' || (range % 2) AS gate_id,
+            CASE WHEN range = 40001 THEN 0.05 ELSE 0.9 + (range % 7) / 100 END AS confidence
+        FROM range(86400)
+    """)
+    yield conn
+    conn.close()
+
+
+def test_lttb_keeps_the_ends_and_the_outliers():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.sin(x / 50)
+    y[500] = 10
+
+    kept = lttb(x, y, 50)
+
+    assert len(kept) == 50
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 500 in kept
+    assert np.all(np.diff(kept) > 0)
+    assert list(lttb(x[:10], y[:10], 50)) == list(range(10))
+
+
+def test_buckets_aggregate_equal_widths_over_the_range(cursor):
+    result = downsample(cursor, "entries", "timestamp", START, START + datetime.timedelta(hours=1), 60,
+                        group_by=["gate_id"], value="confidence", aggregates=["count", "min"])
+
+    assert result["bucket_us"] == 60_000_000
+    columns = result["columns"]
+    assert len(columns["time"]) == 120
+    assert columns["time"][:2] == ["2024-01-01T00:00:00"] * 2
+    assert columns["gate_id"][:2] == ["GATE_0", "GATE_1"]
+    assert sum(columns["count"]) == 3600
+    assert set(columns["count"]) == {30}
+    assert min(columns["min"]) == 0.9
+
+
+def test_buckets_default_to_the_whole_table(cursor):
+    result = downsample(cursor, "entries", "timestamp", None, None, 24)
+
+    assert result["start"] == "2024-01-01T00:00:00"
+    assert len(result["columns"]["time"]) == 24
+    assert result["columns"]["count"] == [3600] * 24
+
+
+def test_lttb_returns_at_most_points_rows_per_series_and_keeps_the_dip(cursor):
+    result = downsample(cursor, "entries", "timestamp", None, None, 200, group_by=["gate_id"],
+                        value="confidence", mode="lttb")
+
+    columns = result["columns"]
+    assert result["bucket_us"] * 200 * MINMAX_RATIO >= 86399 * 1_000_000
+    for gate in ("GATE_0", "GATE_1"):
+        assert columns["gate_id"].count(gate) == 200
+    dip = columns["confidence"].index(0.05)
+    assert (columns["time"][dip], columns["gate_id"][dip]) == ("2024-01-01T11:06:41", "GATE_1")
+    gate_times = [time for time, gate in zip(columns["time"], columns["gate_id"]) if gate == "GATE_0"]
+    assert gate_times == sorted(gate_times)
+
+
+def test_empty_ranges_and_bad_arguments(cursor):
+    empty = downsample(cursor, "entries", "timestamp", datetime.datetime(2030, 1, 1),
+                       datetime.datetime(2030, 1, 2), 10, value="confidence", mode="lttb")
+    assert empty["columns"] == {"time": [], "confidence": []}
+    assert downsample(cursor, "entries", "timestamp", START, START, 10)["columns"] == {"time": []}
+
+    with pytest.raises(TableNotFound):
+        downsample(cursor, "missing", "timestamp", None, None, 10)
+    with pytest.raises(ValueError, match="Unknown columns"):
+        downsample(cursor, "entries", "nope", None, None, 10)
+    with pytest.raises(ValueError, match="needs a value column"):
+        downsample(cursor, "entries", "timestamp", None, None, 10, mode="lttb")
+    with pytest.raises(ValueError, match="Unknown aggregates"):
+        downsample(cursor, "entries", "timestamp", None, None, 10, value="confidence", aggregates=["median"])
+    with pytest.raises(ValueError, match="Unknown mode"):
+        downsample(cursor, "entries", "timestamp", None, None, 10, mode="sample")
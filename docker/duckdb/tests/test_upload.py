@@ -0,0 +1,75 @@
+import gzip
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from upload import UploadError, detect_format
+
+GATE_LOG = b"timestamp,gate_id,plate\n2024-01-01 08:00:00,GATE_A,ABC123\n2024-01-01 08:01:30,GATE_B,XYZ789\n"
+
+
+def _rows(client, table):
+    response = client.post("/query", params={"format": "records"},
+                           json={"query": f"SELECT * FROM {table} ORDER BY timestamp"})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def test_multipart_csv_upload_creates_the_table(client):
+    response = client.post("/upload", params={"table_name": "gate_log", "upload_id": "backfill-1"},
+                           files={"file": ("gates.csv", GATE_LOG, "text/csv")})
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["rows"], result["format"], result["state"]) == (2, "csv", "done")
+    assert result["received_bytes"] == len(GATE_LOG)
+    assert result["load_seconds"] >= 0
+    assert _rows(client, "gate_log")[1]["plate"] == "XYZ789"
+    # Sniffed types, not strings
+    assert _rows(client, "gate_log")[0]["timestamp"] == "2024-01-01T08:00:00"
+
+    status = client.get("/uploads/backfill-1").json()
+    assert (status["state"], status["rows"], status["table"]) == ("done", 2, "gate_log")
+    assert "backfill-1" in [upload["upload_id"] for upload in client.get("/uploads").json()["uploads"]]
+
+
+def test_raw_body_uploads_follow_if_exists(client):
+    compressed = gzip.compress(GATE_LOG)
+    params = {"table_name": "gate_log", "filename": "gates.csv.gz"}
+
+    assert client.post("/upload", params=params, content=compressed).json()["rows"] == 2
+    conflict = client.post("/upload", params=params, content=compressed)
+    assert conflict.status_code == 409
+    appended = client.post("/upload", params=dict(params, if_exists="append"), content=compressed,
+                           headers={"Content-Type": "application/gzip"})
+    assert appended.json()["rows"] == 2
+    assert len(_rows(client, "gate_log")) == 4
+
+    sink = io.BytesIO()
+    pq.write_table(pa.table({"timestamp": ["2024-01-02 09:00:00"], "gate_id": ["GATE_C"]}), sink)
+    replaced = client.post("/upload", params={"table_name": "gate_log", "if_exists": "replace"},
+                           content=sink.getvalue(), headers={"Content-Type": "application/vnd.apache.parquet"})
+    assert replaced.status_code == 200, replaced.text
+    assert _rows(client, "gate_log") == [{"timestamp": "2024-01-02 09:00:00", "gate_id": "GATE_C"}]
+
+
+def test_upload_rejects_bad_input(client):
+    assert client.post("/upload", params={"table_name": "t", "filename": "x.json"}, content=b"{}").status_code == 415
+    assert client.post("/upload", params={"table_name": "t", "if_exists": "merge"},
+                       files={"file": ("x.csv", GATE_LOG)}).status_code == 400
+    assert client.post("/upload", params={"table_name": "t;drop"}, files={"file": ("x.csv", GATE_LOG)}).status_code == 400
+    failed = client.post("/upload", params={"table_name": "t", "upload_id": "broken"},
+                         files={"file": ("x.parquet", b"not parquet")})
+    assert failed.status_code == 400
+    assert client.get("/uploads/broken").json()["state"] == "failed"
+    assert client.get("/uploads/missing").status_code == 404
+
+
+def test_detect_format():
+    assert detect_format("gates.CSV.GZ", None) == {"format": "csv", "suffix": ".csv.gz"}
+    assert detect_format(None, "application/x-parquet") == {"format": "parquet", "suffix": ".parquet"}
+    assert detect_format("dump.bin", "application/gzip", requested="csv") == {"format": "csv", "suffix": ".csv.gz"}
+    with pytest.raises(UploadError):
+        detect_format("gates.xlsx", "application/octet-stream")
@@ -0,0 +1,292 @@
+"""Hot and archive storage tiers: recent rows in DuckDB, older rows in hive-partitioned Parquet."""
+import datetime
+import glob
+import os
+import re
+import shutil
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import duckdb
+
+from layout import rewrite_table
+from rollups import RollupManager, table_exists
+
+LOG_TABLE = "tier_compactions"
+STAGING_DIR = "_staging"
+# Partition column added to the archived rows, derived from the time column
+DATE_COLUMN = "date"
+
+_DATE_DIR_RE = re.compile(rf"^{DATE_COLUMN}=(\d{{4}}-\d{{2}}-\d{{2}})$")
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class TieredTable:
+    """A table whose rows move from DuckDB to Parquet once they fall out of the hot window.
+
+    Archived rows are partitioned by the date of ``time_column`` and by
+    ``partition_column``. ``<name>_all`` reads both tiers;
+    ``<name>_between(start, end)`` reads a time range and only opens the
+    date partitions the range covers.
+    """
+
+    def __init__(self, name: str, time_column: str = "timestamp", partition_column: str = "gate_id"):
+        self.name = name
+        self.time_column = time_column
+        self.partition_column = partition_column
+
+    @property
+    def view(self) -> str:
+        return f"{self.name}_all"
+
+    @property
+    def range_macro(self) -> str:
+        return f"{self.name}_between"
+
+
+TIERED_TABLES = [TieredTable("vehicle_entries")]
+
+
+def ensure_views(cursor: duckdb.DuckDBPyConnection, tables: List[TieredTable],
+                 archived: Callable[[TieredTable], Optional[str]] = lambda table: None,
+                 force: bool = False) -> None:
+    """Create the union view and range macro of every table whose hot tier exists.
+
+    ``archived`` gives the query over a table's archive tier, or None while
+    it has none; by default the view and macro read the hot tier alone, so
+    clients can read through them whether or not the table is tiered.
+    Without ``force`` only missing views are created.
+    """
+    existing = {row[0] for row in cursor.execute(
+        "SELECT view_name FROM duckdb_views() WHERE NOT internal").fetchall()}
+    for table in tables:
+        if (table.view in existing and not force) or not table_exists(cursor, table.name):
+            continue
+        time_column = table.time_column
+        in_range = f"{time_column} >= start_ts AND {time_column} < end_ts"
+        view = f"SELECT * FROM {table.name}"
+        macro = f"SELECT * FROM {table.name} WHERE {in_range}"
+        archive = archived(table)
+        if archive is not None:
+            view += f" UNION ALL BY NAME {archive}"
+            # The date predicate is what lets DuckDB skip whole partitions
+            macro += f"""
+                UNION ALL BY NAME {archive}
+                WHERE {DATE_COLUMN} >= CAST(start_ts AS DATE)
+                  AND {DATE_COLUMN} <= CAST(end_ts - INTERVAL 1 MICROSECOND AS DATE)
+                  AND {in_range}
+            """
+        cursor.execute(f"CREATE OR REPLACE VIEW {table.view} AS {view}")
+        cursor.execute(f"CREATE OR REPLACE MACRO {table.range_macro}(start_ts, end_ts) AS TABLE {macro}")
+
+
+class TierManager:
+    """Moves rows older than the hot window to Parquet and prunes old partitions.
+
+    A compaction is one DuckDB transaction: pending rows are folded into the
+    rollups, the old rows are written to a staging directory, the hot table
+    is rewritten with the remaining rows and the batch is logged.
+    Rewriting instead of deleting keeps rowids dense, so the rollup
+    watermarks can be moved to the new last row and nothing is counted twice.
+    Staged files are moved into the archive after the commit; batches left
+    in staging by a crash are published if logged and discarded otherwise.
+    """
+
+    def __init__(self, tables: List[TieredTable], archive_dir: str, hot_hours: float,
+                 retention_days: int, rollups: RollupManager):
+        self.tables = tables
+        self.archive_dir = archive_dir
+        self.hot_hours = hot_hours
+        self.retention_days = retention_days
+        self.rollups = rollups
+        self._lock = threading.Lock()
+        self.compactions = 0
+        self.rows_archived = 0
+        self.partitions_dropped = 0
+
+    def directory(self, table: TieredTable) -> str:
+        return os.path.join(self.archive_dir, table.name)
+
+    def _staging(self, table: TieredTable, batch: Optional[str] = None) -> str:
+        path = os.path.join(self.archive_dir, STAGING_DIR, table.name)
+        return os.path.join(path, batch) if batch else path
+
+    def _files(self, table: TieredTable) -> List[str]:
+        return glob.glob(os.path.join(self.directory(table), "**", "*.parquet"), recursive=True)
+
+    def _archive_sql(self, cursor: duckdb.DuckDBPyConnection, table: TieredTable) -> str:
+        partition_type = cursor.execute(
+            "SELECT data_type FROM duckdb_columns() WHERE table_name = ? AND column_name = ?",
+            [table.name, table.partition_column]
+        ).fetchone()
+        hive_types = f"{{'{DATE_COLUMN}': 'DATE', '{table.partition_column}': " \
+                     f"'{partition_type[0] if partition_type else 'VARCHAR'}'}}"
+        pattern = os.path.join(self.directory(table), "**", "*.parquet")
+        # No union_by_name: it reads every file's schema up front, which defeats partition pruning
+        return f"""
+            SELECT * EXCLUDE ({DATE_COLUMN})
+            FROM read_parquet({_literal(pattern)}, hive_partitioning = true,
+                              hive_types = {hive_types})
+        """
+
+    def ensure_views(self, cursor: duckdb.DuckDBPyConnection, force: bool = False) -> None:
+        """Create the views and range macros over both tiers; see :func:`ensure_views`.
+
+        The archive side is only part of them once it holds files, since an
+        empty glob fails to read.
+        """
+        ensure_views(cursor, self.tables,
+                     lambda table: self._archive_sql(cursor, table) if self._files(table) else None, force)
+
+    def _log(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {LOG_TABLE} (
+                batch VARCHAR PRIMARY KEY, table_name VARCHAR NOT NULL, cutoff TIMESTAMP NOT NULL,
+                rows BIGINT NOT NULL, compacted_at TIMESTAMP NOT NULL
+            )
+        """)
+
+    def _logged(self, cursor: duckdb.DuckDBPyConnection, batch: str) -> bool:
+        if not table_exists(cursor, LOG_TABLE):
+            return False
+        return cursor.execute(f"SELECT count(*) FROM {LOG_TABLE} WHERE batch = ?", [batch]).fetchone()[0] > 0
+
+    def _publish(self, table: TieredTable, batch: str) -> None:
+        staging = self._staging(table, batch)
+        for path in glob.glob(os.path.join(staging, "**", "*.parquet"), recursive=True):
+            target = os.path.join(self.directory(table), os.path.relpath(path, staging))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+        shutil.rmtree(staging, ignore_errors=True)
+
+    def _rewrite(self, cursor: duckdb.DuckDBPyConnection, table: TieredTable, keep: str) -> None:
+        """Replace the hot table by a copy holding only the rows matching ``keep``, clustered by time."""
+        rewrite_table(cursor, table.name, where=keep, order_by=f"{table.time_column} NULLS LAST, rowid")
+
+    def compact_table(self, cursor: duckdb.DuckDBPyConnection, table: TieredTable) -> int:
+        """Archive the rows older than the hot window; returns how many moved.
+
+        The window ends at the newest row rather than the wall clock, so
+        replayed or late data and the producers' time zone do not matter.
+        """
+        if not table_exists(cursor, table.name):
+            return 0
+        time_column = table.time_column
+        cutoff = cursor.execute(
+            f"SELECT max({time_column}) - to_microseconds(?) FROM {table.name}",
+            [int(self.hot_hours * 3600 * 1_000_000)]
+        ).fetchone()[0]
+        if cutoff is None:
+            return 0
+        old = f"{time_column} < TIMESTAMP '{cutoff.isoformat(sep=' ')}'"
+        batch = f"{datetime.datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        staging = self._staging(table, batch)
+        os.makedirs(os.path.dirname(staging), exist_ok=True)
+
+        cursor.execute("BEGIN TRANSACTION")
+        try:
+            # Every row is counted before it moves, so the rollups never read the archive
+            self.rollups.fold(cursor, table.name)
+            rows = cursor.execute(f"SELECT count(*) FROM {table.name} WHERE {old}").fetchone()[0]
+            if rows == 0:
+                cursor.execute("ROLLBACK")
+                return 0
+            cursor.execute(f"""
+                COPY (SELECT *, CAST({time_column} AS DATE) AS {DATE_COLUMN} FROM {table.name} WHERE {old})
+                TO {_literal(staging)}
+                (FORMAT parquet, PARTITION_BY ({DATE_COLUMN}, {table.partition_column}),
+                 FILENAME_PATTERN 'part-{batch}-{{i}}')
+            """)
+            self._rewrite(cursor, table, f"NOT coalesce({old}, false)")
+            self.rollups.rebase(cursor, table.name)
+            self._log(cursor)
+            cursor.execute(f"INSERT INTO {LOG_TABLE} VALUES (?, ?, ?, ?, now())",
+                           [batch, table.name, cutoff, rows])
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        self._publish(table, batch)
+        with self._lock:
+            self.compactions += 1
+            self.rows_archived += rows
+        return rows
+
+    def apply_retention(self, cursor: duckdb.DuckDBPyConnection, table: TieredTable) -> int:
+        """Delete archived date partitions older than the retention period; returns how many."""
+        if self.retention_days <= 0 or not os.path.isdir(self.directory(table)):
+            return 0
+        dates = {}
+        for name in os.listdir(self.directory(table)):
+            match = _DATE_DIR_RE.match(name)
+            if match:
+                dates[name] = datetime.date.fromisoformat(match.group(1))
+        if not dates:
+            return 0
+        newest = max(dates.values())
+        if table_exists(cursor, table.name):
+            hot_newest = cursor.execute(f"SELECT max({table.time_column}) FROM {table.name}").fetchone()[0]
+            if hot_newest is not None:
+                newest = max(newest, hot_newest.date())
+        oldest_kept = newest - datetime.timedelta(days=self.retention_days)
+        dropped = [name for name, date in dates.items() if date < oldest_kept]
+        for name in dropped:
+            shutil.rmtree(os.path.join(self.directory(table), name))
+        with self._lock:
+            self.partitions_dropped += len(dropped)
+        return len(dropped)
+
+    def compact(self, cursor: duckdb.DuckDBPyConnection) -> Dict[str, Dict[str, int]]:
+        """Compact every tiered table, apply retention and refresh the views."""
+        result = {}
+        for table in self.tables:
+            result[table.name] = {
+                "rows_archived": self.compact_table(cursor, table),
+                "partitions_dropped": self.apply_retention(cursor, table),
+            }
+        self.ensure_views(cursor, force=True)
+        return result
+
+    def recover(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        """Finish or discard the batches a crash left in staging, then create the views."""
+        for table in self.tables:
+            staging = self._staging(table)
+            if not os.path.isdir(staging):
+                continue
+            for batch in os.listdir(staging):
+                if self._logged(cursor, batch):
+                    self._publish(table, batch)
+                else:
+                    shutil.rmtree(os.path.join(staging, batch), ignore_errors=True)
+        self.ensure_views(cursor, force=True)
+
+    def table_stats(self, cursor: duckdb.DuckDBPyConnection, table: TieredTable) -> Dict:
+        files = self._files(table)
+        dates = sorted({m.group(1) for m in (_DATE_DIR_RE.match(name) for name in (
+            os.listdir(self.directory(table)) if os.path.isdir(self.directory(table)) else [])) if m})
+        last = None
+        if table_exists(cursor, LOG_TABLE):
+            last = cursor.execute(
+                f"SELECT batch, cutoff, rows, compacted_at FROM {LOG_TABLE} "
+                f"WHERE table_name = ? ORDER BY compacted_at DESC LIMIT 1", [table.name]
+            ).fetchone()
+        return {
+            "table": table.name,
+            "view": table.view,
+            "range_macro": table.range_macro,
+            "hot_rows": cursor.execute(f"SELECT count(*) FROM {table.name}").fetchone()[0]
+            if table_exists(cursor, table.name) else 0,
+            "archive_files": len(files),
+            "archive_bytes": sum(os.path.getsize(path) for path in files),
+            "archive_dates": [dates[0], dates[-1]] if dates else [],
+            "last_compaction": dict(zip(("batch", "cutoff", "rows", "compacted_at"), last)) if last else None,
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {"compactions": self.compactions, "rows_archived": self.rows_archived,
+                "partitions_dropped": self.partitions_dropped}
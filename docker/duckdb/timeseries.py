@@ -0,0 +1,173 @@
+"""Time series downsampled to a point budget: bucket aggregates, or MinMaxLTTB for scatter series."""
+import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import duckdb
+import numpy as np
+
+from analyze import TableNotFound, column_types
+from tiering import TIERED_TABLES
+
+AGGREGATES = {
+    "count": "count(*)",
+    "mean": 'avg("{value}")::DOUBLE',
+    "min": 'min("{value}")',
+    "max": 'max("{value}")',
+    "sum": 'sum("{value}")',
+}
+MODES = ("buckets", "lttb")
+# MinMaxLTTB preselects the extremes of this many buckets per output point before running LTTB
+MINMAX_RATIO = 4
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def _epoch_us(value: datetime.datetime) -> int:
+    # DuckDB's epoch_us reads naive timestamps as UTC; so does this
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _timestamp(epoch_us: int) -> str:
+    return (_EPOCH + datetime.timedelta(microseconds=int(epoch_us))).isoformat()
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the ``threshold`` points Largest-Triangle-Three-Buckets keeps, first and last included.
+
+    ``x`` must be sorted. Each bucket keeps the point forming the largest
+    triangle with the point kept before it and the mean of the next bucket,
+    which preserves peaks and dips that averaging would flatten.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    every = (n - 2) / (threshold - 2)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        mean_x, mean_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - mean_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def _check(cursor: duckdb.DuckDBPyConnection, table: str, columns: Sequence[str]) -> None:
+    types = column_types(cursor, table)
+    if not types:
+        raise TableNotFound(f"Table '{table}' not found")
+    unknown = [column for column in columns if column not in types]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+
+def relations(cursor: duckdb.DuckDBPyConnection, table: str, time_column: str) -> Tuple[str, str]:
+    """What to read all rows of ``table`` from, and its rows between ``$start`` and ``$end``.
+
+    A tiered table along its time column is read through its union view and
+    range macro, so ranges reach into the archive tier; anything else is
+    read from the table directly.
+    """
+    for tiered in TIERED_TABLES:
+        if (tiered.name, tiered.time_column) == (table, time_column) and cursor.execute(
+                "SELECT count(*) FROM duckdb_functions() WHERE function_name = ? AND function_type = 'table_macro'",
+                [tiered.range_macro]).fetchone()[0]:
+            return tiered.view, f"{tiered.range_macro}($start, $end)"
+    return f'"{table}"', f'"{table}"'
+
+
+def time_range(cursor: duckdb.DuckDBPyConnection, relation: str, time_column: str):
+    """Oldest and newest value of the time column; the newest is moved past the last row."""
+    oldest, newest = cursor.execute(f'SELECT min("{time_column}"), max("{time_column}") FROM {relation}').fetchone()
+    return oldest, newest + _MICROSECOND if newest is not None else None
+
+
+def downsample(cursor: duckdb.DuckDBPyConnection, table: str, time_column: str,
+               start: Optional[datetime.datetime], end: Optional[datetime.datetime], points: int,
+               group_by: Sequence[str] = (), value: Optional[str] = None,
+               aggregates: Sequence[str] = ("count",), mode: str = "buckets") -> Dict:
+    """At most ``points`` points per group between ``start`` and ``end``, however many rows the range holds.
+
+    ``buckets`` splits the range into ``points`` equal buckets and returns
+    ``aggregates`` of ``value`` per bucket and group, labelled with the
+    bucket start. ``lttb`` returns actual rows of ``value``: the minimum and
+    maximum of ``MINMAX_RATIO`` times as many buckets are selected in DuckDB,
+    then LTTB picks ``points`` of them in order. Tiered tables are read
+    from both tiers. Identifiers must already be validated.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {list(MODES)}")
+    if mode == "lttb" or set(aggregates) - {"count"}:
+        if value is None:
+            raise ValueError(f"mode={mode} with {', '.join(aggregates)} needs a value column")
+    unknown = [name for name in aggregates if name not in AGGREGATES]
+    if unknown:
+        raise ValueError(f"Unknown aggregates: {', '.join(unknown)}")
+    _check(cursor, table, [time_column, *group_by, *([value] if value else [])])
+    everything, between = relations(cursor, table, time_column)
+    if start is None or end is None:
+        oldest, newest = time_range(cursor, everything, time_column)
+        start, end = start or oldest, end or newest
+    result = {"mode": mode, "start": None, "end": None, "bucket_us": None, "points": points,
+              "columns": {"time": [], **{column: [] for column in group_by}}}
+    if start is None or end is None or end <= start:
+        return result
+    start_us, end_us = _epoch_us(start), _epoch_us(end)
+    result.update(start=start.isoformat(), end=end.isoformat())
+    groups = "".join(f'"{column}", ' for column in group_by)
+    where = f'"{time_column}" >= $start AND "{time_column}" < $end'
+    params = {"start": start, "end": end, "start_us": start_us}
+
+    if mode == "buckets":
+        width = max(-(-(end_us - start_us) // points), 1)
+        selects = ", ".join(f"{AGGREGATES[name].format(value=value)} AS {name}" for name in aggregates)
+        data = cursor.execute(f"""
+            SELECT {groups}$start_us + (epoch_us("{time_column}") - $start_us) // $width * $width AS bucket_us,
+                   {selects}
+            FROM {between} WHERE {where}
+            GROUP BY ALL ORDER BY bucket_us{"".join(f', "{column}"' for column in group_by)}
+        """, dict(params, width=width)).fetch_arrow_table()
+        columns = {"time": [_timestamp(us) for us in data.column("bucket_us").to_pylist()]}
+        columns.update((name, data.column(name).to_pylist()) for name in [*group_by, *aggregates])
+        result.update(bucket_us=width, columns=columns)
+        return result
+
+    # Extremes per narrow bucket bound the rows LTTB sees, whatever the size of the range
+    width = max(-(-(end_us - start_us) // (points * MINMAX_RATIO)), 1)
+    data = cursor.execute(f"""
+        WITH extremes AS (
+            SELECT {groups}arg_min(epoch_us("{time_column}"), "{value}") AS low_us, min("{value}") AS low,
+                   arg_max(epoch_us("{time_column}"), "{value}") AS high_us, max("{value}") AS high
+            FROM {between} WHERE {where} AND "{value}" IS NOT NULL
+            GROUP BY {groups}(epoch_us("{time_column}") - $start_us) // $width
+        )
+        SELECT {groups}low_us AS time_us, low::DOUBLE AS value FROM extremes
+        UNION
+        SELECT {groups}high_us, high::DOUBLE FROM extremes
+        ORDER BY ALL
+    """, dict(params, width=width)).fetch_arrow_table()
+    times = data.column("time_us").to_numpy()
+    values = data.column("value").to_numpy()
+    keys = list(zip(*(data.column(column).to_pylist() for column in group_by))) if group_by \
+        else [()] * data.num_rows
+    columns: Dict[str, List] = {"time": [], **{column: [] for column in group_by}, value: []}
+    begin = 0
+    for index in range(1, data.num_rows + 1):
+        if index < data.num_rows and keys[index] == keys[begin]:
+            continue
+        kept = begin + lttb(times[begin:index].astype(np.float64), values[begin:index], points)
+        columns["time"].extend(_timestamp(us) for us in times[kept])
+        for position, column in enumerate(group_by):
+            columns[column].extend([keys[begin][position]] * len(kept))
+        columns[value].extend(values[kept].tolist())
+        begin = index
+    result.update(bucket_us=width, columns=columns)
+    return result
@@ -0,0 +1,187 @@
+"""Bulk imports of CSV and Parquet files: format detection, loading and progress of running uploads."""
+import collections
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import duckdb
+
+from rollups import table_exists
+
+FORMATS = ("csv", "parquet")
+IF_EXISTS = ("fail", "replace", "append")
+# Suffix the spooled file gets, so DuckDB picks the reader and the compression from it
+_SUFFIXES = {
+    ".csv": ("csv", ".csv"),
+    ".tsv": ("csv", ".csv"),
+    ".csv.gz": ("csv", ".csv.gz"),
+    ".tsv.gz": ("csv", ".csv.gz"),
+    ".gz": ("csv", ".csv.gz"),
+    ".parquet": ("parquet", ".parquet"),
+    ".pq": ("parquet", ".parquet"),
+}
+_MEDIA_TYPES = {
+    "text/csv": ("csv", ".csv"),
+    "application/csv": ("csv", ".csv"),
+    "application/gzip": ("csv", ".csv.gz"),
+    "application/x-gzip": ("csv", ".csv.gz"),
+    "application/vnd.apache.parquet": ("parquet", ".parquet"),
+    "application/x-parquet": ("parquet", ".parquet"),
+}
+
+
+class UploadError(ValueError):
+    """Raised for an upload that cannot be loaded as requested; ``status`` is the HTTP status to answer."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def detect_format(filename: Optional[str], media_type: Optional[str],
+                  requested: Optional[str] = None) -> Dict[str, str]:
+    """Reader and spool-file suffix of an upload, from ``requested``, its file name or its media type."""
+    name = (filename or "").lower()
+    if requested is not None:
+        if requested not in FORMATS:
+            raise UploadError(f"Unknown format '{requested}', expected one of {list(FORMATS)}")
+        compressed = requested == "csv" and (name.endswith(".gz") or "gzip" in (media_type or ""))
+        return {"format": requested, "suffix": ".csv.gz" if compressed else f".{requested}"}
+    for suffix in sorted(_SUFFIXES, key=len, reverse=True):
+        if name.endswith(suffix):
+            file_format, spool_suffix = _SUFFIXES[suffix]
+            return {"format": file_format, "suffix": spool_suffix}
+    media_type = (media_type or "").split(";")[0].strip().lower()
+    if media_type in _MEDIA_TYPES:
+        file_format, spool_suffix = _MEDIA_TYPES[media_type]
+        return {"format": file_format, "suffix": spool_suffix}
+    raise UploadError(f"Cannot tell the format of '{filename or media_type}': "
+                      f"expected .csv, .csv.gz or .parquet", status=415)
+
+
+def _literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def reader_sql(path: str, file_format: str) -> str:
+    """Table function reading a spooled upload; CSV dialect and types are sniffed."""
+    if file_format == "parquet":
+        return f"read_parquet({_literal(path)})"
+    return f"read_csv({_literal(path)})"
+
+
+class Upload:
+    """State of one upload, from receiving its bytes to the committed load."""
+
+    def __init__(self, upload_id: str, table: str, filename: Optional[str], file_format: str,
+                 if_exists: str, total_bytes: Optional[int]):
+        self.id = upload_id
+        self.table = table
+        self.filename = filename
+        self.format = file_format
+        self.if_exists = if_exists
+        self.state = "receiving"
+        self.received_bytes = 0
+        self.total_bytes = total_bytes
+        self.rows: Optional[int] = None
+        self.error: Optional[str] = None
+        self.started = time.time()
+        self.receive_seconds: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Write cursor running the load, polled for DuckDB's own progress
+        self.cursor: Optional[duckdb.DuckDBPyConnection] = None
+
+    def status(self) -> Dict:
+        load_progress = None
+        cursor = self.cursor
+        if cursor is not None:
+            progress = cursor.query_progress()
+            load_progress = round(progress, 1) if progress >= 0 else None
+        return {
+            "upload_id": self.id,
+            "table": self.table,
+            "filename": self.filename,
+            "format": self.format,
+            "if_exists": self.if_exists,
+            "state": self.state,
+            "received_bytes": self.received_bytes,
+            "total_bytes": self.total_bytes,
+            "load_progress": load_progress,
+            "rows": self.rows,
+            "receive_seconds": self.receive_seconds,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+class UploadTracker:
+    """Uploads in progress and the most recent finished ones, for the status endpoint."""
+
+    def __init__(self, history: int = 100):
+        self._lock = threading.Lock()
+        self._uploads: "collections.OrderedDict[str, Upload]" = collections.OrderedDict()
+        self.history = history
+
+    def start(self, table: str, filename: Optional[str], file_format: str, if_exists: str,
+              total_bytes: Optional[int], upload_id: Optional[str] = None) -> Upload:
+        upload = Upload(upload_id or uuid.uuid4().hex, table, filename, file_format, if_exists, total_bytes)
+        with self._lock:
+            running = self._uploads.get(upload.id)
+            if running is not None and running.finished is None:
+                raise UploadError(f"Upload '{upload.id}' is still running", status=409)
+            self._uploads.pop(upload.id, None)
+            self._uploads[upload.id] = upload
+            finished = [key for key, value in self._uploads.items() if value.finished is not None]
+            for key in finished[:max(len(finished) - self.history, 0)]:
+                del self._uploads[key]
+        return upload
+
+    def finish(self, upload: Upload, error: Optional[str] = None) -> None:
+        upload.cursor = None
+        upload.error = error
+        upload.state = "failed" if error else "done"
+        upload.finished = time.time()
+
+    def get(self, upload_id: str) -> Optional[Upload]:
+        with self._lock:
+            return self._uploads.get(upload_id)
+
+    def list(self) -> List[Upload]:
+        with self._lock:
+            return list(self._uploads.values())
+
+
+def load_upload(cursor: duckdb.DuckDBPyConnection, upload: Upload, path: str, table: str) -> int:
+    """Load a spooled file into ``table`` in one transaction; returns the rows loaded.
+
+    ``table`` is the quoted name. DuckDB's readers split the file across
+    threads, except for gzip CSV which decompresses serially.
+    """
+    upload.state = "loading"
+    upload.cursor = cursor
+    source = reader_sql(path, upload.format)
+    started = time.perf_counter()
+    # Lets query_progress() report the load while it runs; nothing is printed
+    cursor.execute("SET enable_progress_bar = true")
+    cursor.execute("SET enable_progress_bar_print = false")
+    cursor.execute("BEGIN TRANSACTION")
+    try:
+        exists = table_exists(cursor, upload.table)
+        if exists and upload.if_exists == "fail":
+            raise UploadError(f"Table '{upload.table}' already exists", status=409)
+        if exists and upload.if_exists == "append":
+            rows = cursor.execute(f"INSERT INTO {table} BY NAME SELECT * FROM {source}").fetchone()[0]
+        else:
+            rows = cursor.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {source}").fetchone()[0]
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        upload.cursor = None
+    upload.rows = rows
+    upload.load_seconds = round(time.perf_counter() - started, 3)
+    return rows
+
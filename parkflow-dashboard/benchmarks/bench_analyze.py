@@ -0,0 +1,68 @@
+"""Profiling vehicle_entries: one query per column vs /analyze's single pass, exact, approximate and sampled.
+
+The per-column baseline is what /analyze used to run: a count, distinct
+count, min and max query per column, each scanning the whole table.
+The single pass computes null counts, means and quantiles on top of those.
+
+    python benchmarks/bench_analyze.py --rows 10000000
+"""
+import argparse
+import os
+import time
+
+from support import load_server_module, populate_entries
+
+PER_COLUMN = """
+SELECT count(*), count(DISTINCT "{column}"), min("{column}"), max("{column}") FROM vehicle_entries
+"""
+
+
+def _timed(iterations, fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--sample", type=float, default=10)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    os.environ.update(DUCKDB_QUERY_TIMEOUT_S="600")
+    server = load_server_module()
+    populate_entries(server.conn, args.rows)
+    columns = [row[0] for row in server.conn.execute("DESCRIBE vehicle_entries").fetchall()]
+
+    with TestClient(server.app) as client:
+        def analyze(**params):
+            response = client.get("/analyze/vehicle_entries", params=params,
+                                  headers={"Cache-Control": "no-cache"})
+            response.raise_for_status()
+
+        def per_column():
+            cursor = server.conn.cursor()
+            for column in columns:
+                cursor.execute(PER_COLUMN.format(column=column)).fetchall()
+
+        results = {
+            f"per column ({len(columns)} scans)": _timed(args.iterations, per_column),
+            "single pass": _timed(args.iterations, analyze),
+            "approximate": _timed(args.iterations, lambda: analyze(approximate="true")),
+            f"approximate, {args.sample:g}% sample": _timed(
+                args.iterations, lambda: analyze(approximate="true", sample=args.sample)),
+        }
+        results["cached"] = _timed(args.iterations, lambda: client.get("/analyze/vehicle_entries").raise_for_status())
+
+    print(f"{args.rows} rows, {len(columns)} columns")
+    for name, ms in results.items():
+        print(f"{name:<28} {ms:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Result cache: many dashboard tabs polling the same query.
+
+Starts the DuckDB server with and without the result cache and has
+``--tabs`` threads fire the dashboard's recent-entries query in bursts,
+as open tabs do on each refresh tick. Optionally a writer appends rows
+every ``--write-interval`` seconds, which invalidates the cached result.
+
+    python benchmarks/bench_cache.py --rows 2000000 --tabs 32 --ticks 20
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+from support import spawn_duckdb_server
+
+DASHBOARD_QUERY = """
+SELECT timestamp, license_plate, gate_id, vehicle_type, confidence
+FROM vehicle_entries ORDER BY timestamp DESC LIMIT 100
+"""
+SEED = """
+CREATE TABLE vehicle_entries AS
+SELECT
+    'evt-' || range AS event_id,
+    TIMESTAMP '2024-01-01' + INTERVAL (range) SECOND AS timestamp,
+    'ABC' || (range % 10000) AS license_plate,
+    'GATE_' || chr(65 + (range % 4)::INTEGER) AS gate_id,
+    'LANE_1' AS lane_id,
+    0.8 + (range % 20) / 100.0 AS confidence,
+    NULL::VARCHAR AS image_url,
+    'CAR' AS vehicle_type
+FROM range({rows})
+"""
+
+
+def run(cache_enabled: bool, rows: int, tabs: int, ticks: int, write_interval: float):
+    env = {"DUCKDB_CACHE": "true" if cache_enabled else "false", "DUCKDB_QUEUE_SIZE": str(tabs * 2)}
+    with spawn_duckdb_server(env=env) as url:
+        requests.post(f"{url}/query", json={"query": SEED.format(rows=rows)}).raise_for_status()
+        latencies = []
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def tab():
+            session = requests.Session()
+            for _ in range(ticks):
+                start = time.perf_counter()
+                session.post(f"{url}/query", json={"query": DASHBOARD_QUERY}).raise_for_status()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        def writer():
+            session = requests.Session()
+            while not stop.wait(write_interval):
+                session.post(f"{url}/query", json={
+                    "query": "INSERT INTO vehicle_entries SELECT * FROM vehicle_entries LIMIT 10"
+                }).raise_for_status()
+
+        threads = [threading.Thread(target=tab) for _ in range(tabs)]
+        writer_thread = threading.Thread(target=writer, daemon=True) if write_interval else None
+        start = time.perf_counter()
+        if writer_thread:
+            writer_thread.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+
+        latencies.sort()
+        label = "cache on" if cache_enabled else "cache off"
+        print(f"{label:<10} {len(latencies) / elapsed:>8.0f} req/s  "
+              f"p50 {statistics.median(latencies) * 1000:>7.1f} ms  "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:>7.1f} ms")
+        if cache_enabled:
+            print(f"           {requests.get(f'{url}/cache/stats').json()['cache']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--tabs", type=int, default=32)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--write-interval", type=float, default=0.5,
+                        help="seconds between invalidating writes (0 disables the writer)")
+    args = parser.parse_args()
+    for cache_enabled in (False, True):
+        run(cache_enabled, args.rows, args.tabs, args.ticks, args.write_interval)
+
+
+if __name__ == "__main__":
+    main()
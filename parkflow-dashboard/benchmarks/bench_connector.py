@@ -0,0 +1,109 @@
+"""Connector throughput: per-row INSERTs vs micro-batched SQL and Arrow writes.
+
+The pipelined row runs the whole consume loop, with batches written by the
+writer thread while the consumer thread builds the next one.
+The exactly-once row is batched Arrow plus offsets stored in DuckDB and
+event_id deduplication; it runs first, before other runs store the same ids.
+
+Runs the DuckDB REST server in-process and feeds pre-decoded events through
+``KafkaToDuckDBConnector`` without Kafka or the Schema Registry.
+
+    python benchmarks/bench_connector.py --events 20000 --batch-size 5000
+"""
+import argparse
+import time
+
+from support import CommitOnlyConsumer, FakeMessage, ListConsumer, make_entry_events, run_duckdb_server
+
+
+def _make_connector(url, batch_mode, batch_size, write_method="sql", exactly_once=False, consumer=None):
+    from parkflow_dashboard import kafka_duckdb_connector as connector_module
+
+    connector_module.DUCKDB_API_URL = url
+    return connector_module.KafkaToDuckDBConnector(
+        consumer=consumer or CommitOnlyConsumer(),
+        avro_deserializer=lambda value, ctx: value,
+        batch_mode=batch_mode,
+        batch_size=batch_size,
+        write_method=write_method,
+        exactly_once=exactly_once,
+    )
+
+
+def bench_per_row(url, messages):
+    connector = _make_connector(url, batch_mode=False, batch_size=1)
+    start = time.perf_counter()
+    for msg in messages:
+        connector._handle_message(msg)
+    return time.perf_counter() - start
+
+
+def bench_batched(url, messages, batch_size, write_method):
+    connector = _make_connector(url, batch_mode=False, batch_size=batch_size,
+                                write_method=write_method)
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        rows = connector._decode_batch(messages[i:i + batch_size])
+        assert connector._flush(rows)
+    return time.perf_counter() - start
+
+
+def bench_exactly_once(url, messages, batch_size):
+    connector = _make_connector(url, batch_mode=True, batch_size=batch_size,
+                                write_method="arrow", exactly_once=True)
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        rows = connector._decode_batch(messages[i:i + batch_size])
+        assert connector._flush(rows, connector._offsets, connector._starts)
+        connector._reset_batch()
+    return time.perf_counter() - start
+
+
+def bench_pipelined(url, messages, batch_size):
+    consumer = ListConsumer(messages)
+    connector = _make_connector(url, batch_mode=True, batch_size=batch_size,
+                                write_method="arrow", consumer=consumer)
+    consumer.connector = connector
+    start = time.perf_counter()
+    connector.start()
+    elapsed = time.perf_counter() - start
+    assert connector.rows_written == len(messages)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--per-row-events", type=int, default=2000,
+                        help="events for the (slow) per-row path")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    events = make_entry_events(args.events)
+    messages = [FakeMessage(e, offset=i) for i, e in enumerate(events)]
+
+    with run_duckdb_server() as (url, _):
+        elapsed = bench_exactly_once(url, messages, args.batch_size)
+        print(f"exactly-once : {len(messages):>8} events in {elapsed:7.2f}s "
+              f"-> {len(messages) / elapsed:10.0f} events/s (batch={args.batch_size})")
+
+        per_row = messages[:args.per_row_events]
+        elapsed = bench_per_row(url, per_row)
+        print(f"per-row      : {len(per_row):>8} events in {elapsed:7.2f}s "
+              f"-> {len(per_row) / elapsed:10.0f} events/s")
+
+        for write_method in ("sql", "arrow"):
+            elapsed = bench_batched(url, messages, args.batch_size, write_method)
+            print(f"batched {write_method:<5}: {len(messages):>8} events in {elapsed:7.2f}s "
+                  f"-> {len(messages) / elapsed:10.0f} events/s (batch={args.batch_size})")
+
+        elapsed = bench_pipelined(url, messages, args.batch_size)
+        print(f"pipelined    : {len(messages):>8} events in {elapsed:7.2f}s "
+              f"-> {len(messages) / elapsed:10.0f} events/s (batch={args.batch_size})")
+
+
+if __name__ == "__main__":
+    main()
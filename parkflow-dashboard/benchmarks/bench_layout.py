@@ -0,0 +1,80 @@
+"""Point lookups and recent-entry queries on shuffled, clustered and indexed vehicle_entries.
+
+Generates ``--rows`` entries in random order, as late and replayed events
+leave them, then times the same queries:
+- shuffled: every row group spans the whole time range
+- clustered: after /tables/vehicle_entries/optimize sorted the rows by timestamp
+- indexed: clustered, plus ART indexes on event_id and license_plate
+
+    python benchmarks/bench_layout.py --rows 10000000
+"""
+import argparse
+import os
+import time
+
+from support import load_server_module, populate_entries
+
+QUERIES = {
+    "top-100 recent": "SELECT * FROM vehicle_entries ORDER BY timestamp DESC LIMIT 100",
+    "last hour count": """
+        SELECT gate_id, count(*) FROM vehicle_entries
+        WHERE timestamp >= (SELECT max(timestamp) FROM vehicle_entries) - INTERVAL 1 HOUR
+        GROUP BY ALL
+    """,
+    "event_id lookup": "SELECT * FROM vehicle_entries WHERE event_id = 'evt-{probe}'",
+    "plate lookup": "SELECT count(*) FROM vehicle_entries WHERE license_plate = 'ABC{plate}'",
+}
+
+
+def _timed(iterations, fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    os.environ.update(DUCKDB_CACHE="false", DUCKDB_ROLLUPS="false", DUCKDB_QUERY_TIMEOUT_S="600",
+                      DUCKDB_OPTIMIZE_TIMEOUT_S="3600")
+    server = load_server_module()
+    populate_entries(server.conn, args.rows)
+    server.conn.execute("CREATE OR REPLACE TABLE vehicle_entries AS SELECT * FROM vehicle_entries ORDER BY hash(event_id)")
+
+    def query(sql):
+        response = client.post("/query", json={"query": sql})
+        response.raise_for_status()
+
+    def run_queries():
+        probe = args.rows // 2
+        return {name: _timed(args.iterations, lambda sql=sql: query(sql.format(probe=probe, plate=probe % 10000)))
+                for name, sql in QUERIES.items()}
+
+    def optimize(**params):
+        start = time.perf_counter()
+        response = client.post("/tables/vehicle_entries/optimize", params=params)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    with TestClient(server.app) as client:
+        results = {"shuffled": run_queries()}
+        sort_seconds = optimize()
+        results["clustered"] = run_queries()
+        index_seconds = optimize(index=["event_id", "license_plate"])
+        results["indexed"] = run_queries()
+
+    print(f"{args.rows} rows: sorted in {sort_seconds:.1f}s, indexed in {index_seconds:.1f}s")
+    print(f"{'query':<16} " + " ".join(f"{layout + ' ms':>13}" for layout in results))
+    for name in QUERIES:
+        print(f"{name:<16} " + " ".join(f"{results[layout][name]:>13.2f}" for layout in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Parse/plan savings of prepared statements for the dashboard query.
+
+Measures the same parameterized query three ways, both directly against
+DuckDB and through the REST server:
+- fresh SQL text per call (re-parsed and re-planned every time)
+- DuckDB parameter binding per call (still prepared on every call)
+- a cached ``PREPARE`` executed by name
+
+    python benchmarks/bench_prepared.py --rows 100000 --iterations 2000
+"""
+import argparse
+import time
+
+import duckdb
+import requests
+
+from support import run_duckdb_server
+
+QUERY = """
+SELECT timestamp, license_plate, gate_id, vehicle_type, confidence
+FROM vehicle_entries
+WHERE gate_id = ? AND confidence >= ?
+ORDER BY timestamp DESC
+LIMIT 100
+"""
+POPULATE = """
+CREATE OR REPLACE TABLE vehicle_entries AS
+SELECT
+    'evt-' || range AS event_id,
+    TIMESTAMP '2024-01-01' + INTERVAL (range) SECOND AS timestamp,
+    'ABC' || (range % 10000) AS license_plate,
+    'GATE_' || chr(65 + (range % 4)::INTEGER) AS gate_id,
+    'LANE_1' AS lane_id,
+    0.8 + (range % 20) / 100.0 AS confidence,
+    NULL::VARCHAR AS image_url,
+    'CAR' AS vehicle_type
+FROM range({rows})
+"""
+PARAMS = [("GATE_A", 0.85), ("GATE_B", 0.9), ("GATE_C", 0.8), ("GATE_D", 0.95)]
+
+
+def _literal_sql(gate, confidence):
+    return QUERY.replace("?", f"'{gate}'", 1).replace("?", repr(confidence), 1)
+
+
+def _timed(label, iterations, fn):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(*PARAMS[i % len(PARAMS)])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / iterations * 1e6:>9.0f} us/query")
+
+
+def bench_direct(rows, iterations):
+    conn = duckdb.connect()
+    conn.execute(POPULATE.format(rows=rows))
+    conn.execute(f"PREPARE recent AS {QUERY}")
+    print("-- direct DuckDB")
+    _timed("fresh SQL text", iterations, lambda g, c: conn.execute(_literal_sql(g, c)).fetchall())
+    _timed("execute(sql, params)", iterations, lambda g, c: conn.execute(QUERY, [g, c]).fetchall())
+    _timed("EXECUTE cached plan", iterations,
+           lambda g, c: conn.execute(f"EXECUTE recent('{g}', {c!r})").fetchall())
+
+
+def bench_http(rows, iterations):
+    with run_duckdb_server() as (url, _):
+        session = requests.Session()
+        session.post(f"{url}/query", json={"query": POPULATE.format(rows=rows)}).raise_for_status()
+        session.post(f"{url}/prepared", json={"name": "recent", "sql": QUERY}).raise_for_status()
+        print("-- REST server")
+        _timed("/query fresh SQL text", iterations,
+               lambda g, c: session.post(f"{url}/query",
+                                         json={"query": _literal_sql(g, c)}).raise_for_status())
+        _timed("/prepared/recent/execute", iterations,
+               lambda g, c: session.post(f"{url}/prepared/recent/execute",
+                                         json={"params": [g, c]}).raise_for_status())
+        print(f"plan cache: {session.get(f'{url}/prepared').json()['cache']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    bench_direct(args.rows, args.iterations)
+    bench_http(args.rows, args.iterations // 2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""/query result latency and peak RSS per response format.
+
+Each format runs in a fresh subprocess so peak RSS is not shared between
+runs. The server app is driven in-process through FastAPI's TestClient and
+the client-side decode into a DataFrame is included in the latency.
+
+    python benchmarks/bench_query_formats.py --rows 1000000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+FORMATS = ("records", "columns", "arrow")
+QUERY = "SELECT timestamp, license_plate, gate_id, vehicle_type, confidence FROM vehicle_entries"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_child(result_format: str, rows: int):
+    import pandas as pd
+    import pyarrow as pa
+    from fastapi.testclient import TestClient
+
+    from support import load_server_module, populate_entries
+
+    server = load_server_module()
+    populate_entries(server.conn, rows)
+    baseline = _peak_rss_mb()
+
+    with TestClient(server.app) as client:
+        start = time.perf_counter()
+        response = client.post("/query", params={"format": result_format}, json={"query": QUERY})
+        response.raise_for_status()
+        if result_format == "arrow":
+            df = pa.ipc.open_stream(response.content).read_all().to_pandas()
+        else:
+            df = pd.DataFrame(response.json()["data"])
+        elapsed = time.perf_counter() - start
+
+    assert len(df) == rows
+    print(json.dumps({
+        "format": result_format,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "payload_mb": round(len(response.content) / 1e6, 1),
+        "peak_rss_delta_mb": round(_peak_rss_mb() - baseline, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--child", choices=FORMATS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.rows)
+        return
+
+    print(f"{'format':<8} {'rows':>9} {'latency s':>10} {'payload MB':>11} {'peak RSS +MB':>13}")
+    for result_format in args.formats:
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", result_format, "--rows", str(args.rows)],
+            check=True, capture_output=True, text=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        print(f"{result['format']:<8} {result['rows']:>9} {result['seconds']:>10.3f} "
+              f"{result['payload_mb']:>11.1f} {result['peak_rss_delta_mb']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Dashboard aggregates from raw vehicle_entries vs the ingest-time rollups.
+
+Grows vehicle_entries in steps, with every step's events spread over the
+same week, and times the dashboard's gate / vehicle type / confidence
+aggregates for that week both ways:
+- a GROUP BY over the raw rows (what the dashboard did in pandas)
+- GET /dashboard/entries, which reads the per-minute rollups
+
+    python benchmarks/bench_rollups.py --steps 1000000 5000000 20000000
+"""
+import argparse
+import datetime
+import time
+
+import requests
+
+from support import run_duckdb_server
+
+WEEK_SECONDS = 7 * 24 * 3600
+START = datetime.datetime(2024, 1, 1)
+CREATE = """
+CREATE TABLE vehicle_entries (
+    event_id VARCHAR, timestamp TIMESTAMP, license_plate VARCHAR, gate_id VARCHAR,
+    lane_id VARCHAR, confidence DOUBLE, image_url VARCHAR, vehicle_type VARCHAR
+)
+"""
+APPEND = """
+INSERT INTO vehicle_entries
+SELECT
+    'evt-' || range,
+    TIMESTAMP '2024-01-01' + to_seconds((range * 7919) % {week}),
+    'ABC' || (range % 10000),
+    'GATE_' || chr(65 + (range % 4)::INTEGER),
+    'LANE_1',
+    0.5 + (range % 50) / 100.0,
+    NULL,
+    CASE range % 3 WHEN 0 THEN 'CAR' WHEN 1 THEN 'TRUCK' ELSE 'MOTORCYCLE' END
+FROM range({low}, {high})
+"""
+RAW_AGGREGATES = """
+SELECT floor(epoch(timestamp) / 3600)::BIGINT * 3600 AS bucket, gate_id, vehicle_type,
+       least(floor(confidence * 20), 19)::INTEGER AS confidence_bin, count(*) AS entries
+FROM vehicle_entries
+WHERE timestamp >= TIMESTAMP '2024-01-01'
+GROUP BY ALL
+"""
+
+
+def _timed(iterations, fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=[1_000_000, 5_000_000, 20_000_000])
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    with run_duckdb_server() as (url, _):
+        session = requests.Session()
+        session.post(f"{url}/query", json={"query": CREATE}).raise_for_status()
+        rows = 0
+        print(f"{'rows':>12} {'append+fold s':>14} {'raw GROUP BY ms':>16} {'/dashboard/entries ms':>22}")
+        for target in args.steps:
+            start = time.perf_counter()
+            session.post(f"{url}/query", json={
+                "query": APPEND.format(week=WEEK_SECONDS, low=rows, high=target)
+            }).raise_for_status()
+            append_s = time.perf_counter() - start
+            rows = target
+
+            raw_ms = _timed(args.iterations, lambda: session.post(
+                f"{url}/query", json={"query": RAW_AGGREGATES}).raise_for_status())
+            rollup_ms = _timed(args.iterations, lambda: session.get(
+                f"{url}/dashboard/entries",
+                params={"start": START.isoformat(), "bucket_seconds": 3600}).raise_for_status())
+            print(f"{rows:>12,} {append_s:>14.2f} {raw_ms:>16.1f} {rollup_ms:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
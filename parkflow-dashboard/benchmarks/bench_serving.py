@@ -0,0 +1,123 @@
+"""Dashboard serving: figures/s and DuckDB requests/s against concurrent sessions, per-session reads vs a shared snapshot.
+
+Each session is a thread running the dashboard's callbacks back to back,
+as many open tabs ticking at once: the incremental entries figure, the
+throughput and confidence charts and the freshness line. With per-session
+reads every tick sends its own requests to the DuckDB server; with the
+snapshot one refresh every ``--refresh`` seconds reads for all of them and
+the callbacks render from the memory-mapped Arrow files. Sessions share one
+process here, so figures/s is one worker's; gunicorn workers multiply it
+while the snapshot is still read once per refresh.
+
+    python benchmarks/bench_serving.py --rows 200000 --sessions 1 8 32 --duration 10
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import plotly.graph_objects as go
+from dash import no_update
+
+from support import spawn_duckdb_server
+
+SEED = """
+CREATE TABLE vehicle_entries AS
+SELECT
+    'evt-' || range AS event_id,
+    date_trunc('second', now()::TIMESTAMP) - to_seconds(range * 3600 // {rows}) AS timestamp,
+    'ABC' || (range % 10000) AS license_plate,
+    'GATE_' || chr(65 + (range % 4)::INTEGER) AS gate_id,
+    'LANE_1' AS lane_id,
+    0.5 + (range % 50) / 100.0 AS confidence,
+    NULL::VARCHAR AS image_url,
+    ['CAR', 'MOTORCYCLE', 'TRUCK'][range % 3 + 1] AS vehicle_type
+FROM range({rows})
+"""
+
+
+def sessions_run(count, duration):
+    from parkflow_dashboard import app as dashboard
+
+    figures = [0] * count
+    stop = threading.Event()
+
+    def session(index):
+        state, n = None, 0
+        while not stop.is_set():
+            fig, changed = dashboard.refresh_dashboard(n, state)
+            # Dash keeps the stored state when a callback returns no_update
+            state = state if changed is no_update else changed
+            for figure in (fig, dashboard.update_throughput(n, None), dashboard.update_confidence(n, None)):
+                if isinstance(figure, go.Figure):
+                    figure.to_json()
+                figures[index] += 1
+            dashboard.update_freshness(n)
+            n += 1
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return sum(figures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--refresh", type=float, default=5)
+    args = parser.parse_args()
+
+    from parkflow_dashboard import app as dashboard
+    from parkflow_dashboard.duckdb_client import DuckDBClient
+    from parkflow_dashboard.snapshot import ArrowFileCache, SnapshotStorage
+    from parkflow_dashboard.storage import RestStorage
+    from parkflow_dashboard.windows import CREATE_WINDOWS_SQL
+
+    class CountingClient(DuckDBClient):
+        requests = 0
+
+        def request(self, method, path, **kwargs):
+            CountingClient.requests += 1
+            return super().request(method, path, **kwargs)
+
+    logging.disable(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="bench-serving-")
+    # The server's result cache is off, so every request reaches DuckDB
+    with spawn_duckdb_server(env={"DUCKDB_CACHE": "false", "DUCKDB_QUEUE_SIZE": "256"}) as url:
+        seed = DuckDBClient(url)
+        for sql in (SEED.format(rows=args.rows), CREATE_WINDOWS_SQL):
+            seed.post("/query", json={"query": sql}).raise_for_status()
+
+        print(f"{args.rows} entries in the last hour, {args.duration:g}s per run, snapshot refresh {args.refresh:g}s")
+        print(f"{'reads':<12} {'sessions':>8} {'figures/s':>10} {'duckdb req/s':>13} {'req/figure':>11}")
+        for mode in ("per session", "snapshot"):
+            for count in args.sessions:
+                backing = RestStorage(CountingClient(url, pool_size=max(count, 4)))
+                storage = backing
+                if mode == "snapshot":
+                    storage = SnapshotStorage(ArrowFileCache(os.path.join(workdir, f"snapshot-{count}")), backing,
+                                              max_age_s=3 * args.refresh)
+                dashboard._storage = storage
+                if mode == "snapshot":
+                    storage.refresh(dashboard.prefetch)
+                    storage.start(dashboard.prefetch, args.refresh)
+                CountingClient.requests = 0
+                figures = sessions_run(count, args.duration)
+                requests = CountingClient.requests
+                storage.close()
+                print(f"{mode:<12} {count:>8} {figures / args.duration:>10.1f} "
+                      f"{requests / args.duration:>13.1f} {requests / max(figures, 1):>11.3f}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
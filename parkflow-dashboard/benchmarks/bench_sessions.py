@@ -0,0 +1,109 @@
+"""Session engine: event rate, memory per session, O(1) occupancy vs a self-join, and snapshot/restore time.
+
+Opens ``--sessions`` concurrent sessions, pays for most of them and lets a
+share exit, all in event-time order through ``SessionEngine``.
+The self-join row is the SQL it replaces: entries without a later exit,
+counted in DuckDB over the same events.
+
+    python benchmarks/bench_sessions.py --sessions 500000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import duckdb
+
+from parkflow_dashboard.sessions import SessionEngine
+
+OCCUPANCY_SQL = """
+SELECT count(*) FROM entries e
+WHERE NOT EXISTS (SELECT 1 FROM exits x WHERE x.plate = e.plate AND x.timestamp >= e.timestamp)
+"""
+
+
+def _events(sessions, exit_share, start_ms=1_700_000_000_000):
+    gates = ["ENTRY_NORTH", "ENTRY_SOUTH"]
+    entries = [{"eventId": f"in-{i}", "timestamp": start_ms + i, "licensePlate": f"P{i:07d}",
+                "gateId": gates[i % 2], "vehicleType": "CAR"} for i in range(sessions)]
+    payments = [{"eventId": f"pay-{i}", "timestamp": start_ms + sessions + i, "licensePlate": f"P{i:07d}",
+                 "amount": 5.0, "status": "COMPLETED"} for i in range(0, sessions, 10) if i % 7]
+    exits = [{"eventId": f"out-{i}", "timestamp": start_ms + 2 * sessions + i, "licensePlate": f"P{i:07d}"}
+             for i in range(int(sessions * exit_share))]
+    return entries, payments, exits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300_000)
+    parser.add_argument("--exit-share", type=float, default=0.3)
+    args = parser.parse_args()
+
+    entries, payments, exits = _events(args.sessions, args.exit_share)
+    # Memory is measured on a separate engine, tracemalloc slows every allocation down
+    tracemalloc.start()
+    sized = SessionEngine()
+    for event in entries:
+        sized.entry(event)
+    # Status dicts are built per event and dropped, so what remains is the session table
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sized
+
+    engine = SessionEngine()
+    start = time.perf_counter()
+    for event in entries:
+        engine.entry(event)
+    entry_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for event in payments:
+        engine.payment(event)
+    for event in exits:
+        engine.exit(event)
+    update_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(100_000):
+        engine.inside("ENTRY_NORTH")
+    lookup_us = (time.perf_counter() - start) / 100_000 * 1e6
+
+    conn = duckdb.connect()
+    conn.execute("CREATE TABLE entries (plate VARCHAR, timestamp BIGINT)")
+    conn.execute("CREATE TABLE exits (plate VARCHAR, timestamp BIGINT)")
+    conn.execute(f"INSERT INTO entries SELECT 'P' || lpad(range::VARCHAR, 7, '0'), 1700000000000 + range "
+                 f"FROM range({args.sessions})")
+    conn.execute(f"INSERT INTO exits SELECT 'P' || lpad(range::VARCHAR, 7, '0'), 1700000000000 + {2 * args.sessions} "
+                 f"+ range FROM range({len(exits)})")
+    start = time.perf_counter()
+    inside_sql = conn.execute(OCCUPANCY_SQL).fetchone()[0]
+    join_ms = (time.perf_counter() - start) * 1000
+    assert inside_sql == engine.inside()
+
+    workdir = tempfile.mkdtemp(prefix="bench-sessions-")
+    path = os.path.join(workdir, "sessions.arrow")
+    start = time.perf_counter()
+    engine.snapshot(path)
+    snapshot_s = time.perf_counter() - start
+    start = time.perf_counter()
+    restored = SessionEngine()
+    restored.restore(path)
+    restore_s = time.perf_counter() - start
+    size_mb = os.path.getsize(path) / 1e6
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    updates = len(payments) + len(exits)
+    print(f"{args.sessions} sessions opened, {len(payments)} payments, {len(exits)} exits, "
+          f"{engine.inside()} inside")
+    print(f"entries              {len(entries) / entry_s:>12.0f} events/s")
+    print(f"payments and exits   {updates / update_s:>12.0f} events/s")
+    print(f"memory per session   {memory / args.sessions:>12.0f} bytes")
+    print(f"occupancy lookup     {lookup_us:>12.3f} us")
+    print(f"self-join occupancy  {join_ms:>12.1f} ms")
+    print(f"snapshot             {snapshot_s:>12.2f} s ({size_mb:.1f} MB)")
+    print(f"restore              {restore_s:>12.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Storage backends: connector ingest rate and dashboard read latency, REST server vs embedded DuckDB file.
+
+Both backends write the same pre-decoded events through
+``KafkaToDuckDBConnector`` in exactly-once Arrow batches, each into its own
+database file, then time the dashboard's reads against the result.
+The REST server runs in-process under uvicorn, so the difference is the
+HTTP, JSON and dispatch cost. Both backends fold the rollups after every
+append and answer /dashboard/entries from them; the server also caches
+the result.
+
+    python benchmarks/bench_storage.py --events 200000 --batch-size 5000
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from support import CommitOnlyConsumer, FakeMessage, make_entry_events, run_duckdb_server
+
+
+def ingest(storage, messages, batch_size):
+    from parkflow_dashboard.kafka_duckdb_connector import KafkaToDuckDBConnector
+
+    connector = KafkaToDuckDBConnector(consumer=CommitOnlyConsumer(), avro_deserializer=lambda value, ctx: value,
+                                       storage=storage, batch_mode=True, batch_size=batch_size,
+                                       exactly_once=True)
+    connector.running = True
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        rows = connector._decode_batch(messages[i:i + batch_size])
+        assert connector._flush(rows, connector._offsets, connector._starts)
+        connector._reset_batch()
+    elapsed = time.perf_counter() - start
+    assert connector.rows_written == len(messages)
+    return elapsed
+
+
+def dashboard_reads(storage, iterations, start):
+    from parkflow_dashboard import app as dashboard
+
+    reads = {
+        "entries, full window": lambda: storage.dashboard_entries(start, 60, -1),
+        "entries, no change": lambda: storage.dashboard_entries(start, 60, version),
+        "recent 100 rows": lambda: storage.query_prepared(
+            dashboard.RECENT_ENTRIES_STATEMENT, dashboard.RECENT_ENTRIES_SQL, recent),
+        "freshness": lambda: storage.freshness("vehicle_entries"),
+    }
+    version = storage.dashboard_entries(start, 60, -1)["version"]
+    recent = dashboard.recent_entries_params(start + timedelta(minutes=dashboard.DASHBOARD_WINDOW_MINUTES))
+    results = {}
+    for name, read in reads.items():
+        read()
+        began = time.perf_counter()
+        for _ in range(iterations):
+            read()
+        results[name] = (time.perf_counter() - began) / iterations * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    from parkflow_dashboard.duckdb_client import DuckDBClient
+    from parkflow_dashboard.embedded import EmbeddedStorage
+    from parkflow_dashboard.storage import RestStorage
+
+    logging.disable(logging.INFO)
+    events = make_entry_events(args.events)
+    messages = [FakeMessage(e, offset=i) for i, e in enumerate(events)]
+    # The events are 250 ms apart from here on
+    start = datetime.fromtimestamp(events[0]["timestamp"] / 1000).replace(second=0)
+    workdir = tempfile.mkdtemp(prefix="bench-storage-")
+    results = {}
+
+    with run_duckdb_server(os.path.join(workdir, "rest.duckdb")) as (url, _):
+        storage = RestStorage(DuckDBClient(url))
+        results["rest"] = (ingest(storage, messages, args.batch_size),
+                           dashboard_reads(storage, args.iterations, start))
+        storage.close()
+
+    storage = EmbeddedStorage(os.path.join(workdir, "embedded.duckdb"))
+    elapsed = ingest(storage, messages, args.batch_size)
+    reader = EmbeddedStorage(storage.path, read_only=True)
+    results["embedded"] = (elapsed, dashboard_reads(reader, args.iterations, start))
+    reader.close()
+    storage.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{len(messages)} events, batch={args.batch_size}")
+    print(f"{'backend':<9} {'ingest s':>9} {'events/s':>10}")
+    for backend, (elapsed, _) in results.items():
+        print(f"{backend:<9} {elapsed:>9.2f} {len(messages) / elapsed:>10.0f}")
+    print(f"\n{'dashboard read':<22} " + " ".join(f"{backend + ' ms':>12}" for backend in results))
+    for name in results["rest"][1]:
+        print(f"{name:<22} " + " ".join(f"{reads[name]:>12.2f}" for _, reads in results.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""One-day queries and storage with every row in DuckDB vs the tiered hot + Parquet layout.
+
+Loads ``--days`` of vehicle_entries into a database file, compacts all but
+the last ``--hot-hours`` to Parquet, keeps a flat copy of every row, and
+compares:
+- the DuckDB file holding every row against the Parquet archive
+- a one-day aggregate over the flat table, over vehicle_entries_all
+  (every partition opened) and over vehicle_entries_between(...)
+
+    python benchmarks/bench_tiering.py --days 30 --rows-per-day 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import requests
+
+from support import run_duckdb_server
+
+CREATE = """
+CREATE TABLE vehicle_entries (
+    event_id VARCHAR, timestamp TIMESTAMP, license_plate VARCHAR, gate_id VARCHAR,
+    lane_id VARCHAR, confidence DOUBLE, image_url VARCHAR, vehicle_type VARCHAR
+)
+"""
+APPEND = """
+INSERT INTO vehicle_entries
+SELECT
+    'evt-' || range,
+    TIMESTAMP '2024-01-01' + to_microseconds((range * {step})::BIGINT),
+    'ABC' || (range % 10000),
+    'GATE_' || chr(65 + (range % 4)::INTEGER),
+    'LANE_1',
+    0.5 + (range % 50) / 100.0,
+    NULL,
+    CASE range % 3 WHEN 0 THEN 'CAR' WHEN 1 THEN 'TRUCK' ELSE 'MOTORCYCLE' END
+FROM range({rows})
+"""
+DAY_AGGREGATE = """
+SELECT gate_id, vehicle_type, count(*) AS entries, avg(confidence) AS confidence
+FROM {source}
+GROUP BY ALL
+"""
+DAY = "TIMESTAMP '2024-01-{day:02d}'"
+
+
+def _size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+
+def _timed(iterations, fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--rows-per-day", type=int, default=1_000_000)
+    parser.add_argument("--hot-hours", type=float, default=48)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-tiering-")
+    db_path = os.path.join(workdir, "analytics.db")
+    archive = os.path.join(workdir, "archive")
+    os.environ.update(DUCKDB_STORAGE_MODE="tiered", DUCKDB_ARCHIVE_DIR=archive,
+                      DUCKDB_HOT_HOURS=str(args.hot_hours), DUCKDB_QUERY_TIMEOUT_S="600",
+                      DUCKDB_CACHE="false")
+    rows = args.days * args.rows_per_day
+    step = 86_400_000_000 // args.rows_per_day
+
+    with run_duckdb_server(db_path) as (url, _):
+        session = requests.Session()
+
+        def query(sql):
+            session.post(f"{url}/query", json={"query": sql}).raise_for_status()
+
+        query(CREATE)
+        query(APPEND.format(step=step, rows=rows))
+        query("CHECKPOINT")
+        single_bytes = _size(db_path)
+
+        start = time.perf_counter()
+        session.post(f"{url}/tiers/compact").raise_for_status()
+        compact_s = time.perf_counter() - start
+        tiers = session.get(f"{url}/tiers").json()["tables"][0]
+        query("CREATE TABLE entries_flat AS SELECT * FROM vehicle_entries_all")
+
+        day = args.days // 2
+        low, high = DAY.format(day=day), DAY.format(day=day + 1)
+        in_day = f"WHERE timestamp >= {low} AND timestamp < {high}"
+        timings = [(name, _timed(args.iterations, lambda: query(DAY_AGGREGATE.format(source=source))))
+                   for name, source in [
+                       ("flat DuckDB table", f"entries_flat {in_day}"),
+                       ("vehicle_entries_all", f"vehicle_entries_all {in_day}"),
+                       ("vehicle_entries_between", f"vehicle_entries_between({low}, {high})"),
+                   ]]
+
+    print(f"rows: {rows:,}   hot rows: {tiers['hot_rows']:,}   compaction: {compact_s:.1f} s")
+    print(f"DuckDB file with every row: {single_bytes / 1e6:.1f} MB   "
+          f"Parquet archive: {_size(archive) / 1e6:.1f} MB in {tiers['archive_files']} files")
+    print(f"{'one-day aggregate over':<26} {'ms':>8}")
+    for name, ms in timings:
+        print(f"{name:<26} {ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Chart reads: every raw row of a range vs /timeseries downsampled to a point budget, by payload and latency.
+
+The raw rows are what a scatter of recognition confidence per gate would
+fetch through /query; /timeseries returns at most ``--points`` per gate,
+picked by MinMaxLTTB, or as many count buckets. Ranges run from ten
+minutes to thirty days over ``--rows`` entries one second apart.
+
+    python benchmarks/bench_timeseries.py --rows 2592000 --points 1000
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from support import load_server_module, populate_entries
+
+RAW_SQL = """
+    SELECT timestamp, gate_id, confidence FROM vehicle_entries
+    WHERE timestamp >= TIMESTAMP '{start}' AND timestamp < TIMESTAMP '{end}'
+    ORDER BY gate_id, timestamp
+"""
+
+
+def _timed(iterations, fn):
+    size = len(fn().content)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=30 * 86400)
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    from fastapi.testclient import TestClient
+
+    os.environ.update(DUCKDB_QUERY_TIMEOUT_S="600")
+    server = load_server_module()
+    populate_entries(server.conn, args.rows)
+    first = datetime(2024, 1, 1)
+    no_cache = {"Cache-Control": "no-cache"}
+
+    print(f"{args.rows} entries, {args.points} points per gate")
+    print(f"{'range':<8} {'read':<8} {'rows':>9} {'KiB':>10} {'ms':>9}")
+    with TestClient(server.app) as client:
+        for label, span in [("10 min", timedelta(minutes=10)), ("1 day", timedelta(days=1)),
+                            ("30 days", timedelta(days=30))]:
+            end = min(first + span, first + timedelta(seconds=args.rows))
+            sql = RAW_SQL.format(start=first.isoformat(), end=end.isoformat())
+            bounds = {"table": "vehicle_entries", "start": first.isoformat(), "end": end.isoformat(),
+                      "points": args.points, "group_by": "gate_id"}
+            reads = {
+                "raw": lambda: client.post("/query", json={"query": sql}, headers=no_cache),
+                "lttb": lambda: client.get("/timeseries", params=dict(bounds, value="confidence", mode="lttb"),
+                                           headers=no_cache),
+                "buckets": lambda: client.get("/timeseries", params=bounds, headers=no_cache),
+            }
+            for name, read in reads.items():
+                response = read()
+                response.raise_for_status()
+                body = response.json()
+                columns = body["data"] if name == "raw" else body["columns"]
+                ms, size = _timed(args.iterations, read)
+                print(f"{label:<8} {name:<8} {len(next(iter(columns.values()))):>9} {size / 1024:>10.1f} {ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
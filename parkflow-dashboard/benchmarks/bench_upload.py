@@ -0,0 +1,77 @@
+"""Bulk /upload throughput for CSV, gzip CSV and Parquet gate logs, streamed over HTTP.
+
+Writes ``--rows`` generated vehicle entries in each format, then uploads
+each file as a raw request body to a server running under uvicorn while a
+thread polls /uploads/{id} for progress.
+
+    python benchmarks/bench_upload.py --rows 10000000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+
+import duckdb
+import requests
+
+from support import populate_entries, run_duckdb_server
+
+FILES = {
+    "csv": ("entries.csv", "(FORMAT csv)"),
+    "gzip csv": ("entries.csv.gz", "(FORMAT csv, COMPRESSION gzip)"),
+    "parquet": ("entries.parquet", "(FORMAT parquet)"),
+}
+
+
+def _chunks(path, size=1024 * 1024):
+    with open(path, "rb") as file:
+        while chunk := file.read(size):
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-upload-")
+    source = duckdb.connect()
+    populate_entries(source, args.rows)
+    for filename, options in FILES.values():
+        source.execute(f"COPY vehicle_entries TO '{os.path.join(workdir, filename)}' {options}")
+    source.close()
+
+    os.environ.update(DUCKDB_UPLOAD_DIR=workdir, DUCKDB_ROLLUPS="false")
+    print(f"{'format':<9} {'file MB':>8} {'rows':>10} {'receive s':>10} {'load s':>8} {'rows/s':>11} "
+          f"{'progress polls':>15}")
+    with run_duckdb_server() as (url, _):
+        for name, (filename, _) in FILES.items():
+            path = os.path.join(workdir, filename)
+            upload_id = f"bench-{name.replace(' ', '-')}"
+            polls = []
+            done = threading.Event()
+
+            def poll():
+                while not done.wait(0.2):
+                    status = requests.get(f"{url}/uploads/{upload_id}").json()
+                    if status.get("state") in ("receiving", "loading"):
+                        polls.append(status["state"])
+
+            poller = threading.Thread(target=poll, daemon=True)
+            poller.start()
+            response = requests.post(f"{url}/upload", data=_chunks(path), params={
+                "table_name": "vehicle_entries", "if_exists": "replace", "filename": filename,
+                "upload_id": upload_id})
+            done.set()
+            poller.join()
+            response.raise_for_status()
+            result = response.json()
+            print(f"{name:<9} {os.path.getsize(path) / 1e6:>8.1f} {result['rows']:>10} "
+                  f"{result['receive_seconds']:>10.2f} {result['load_seconds']:>8.2f} "
+                  f"{result['rows'] / result['load_seconds']:>11.0f} {len(polls):>15}")
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
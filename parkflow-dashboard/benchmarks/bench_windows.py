@@ -0,0 +1,121 @@
+"""Event-time windows: engine and processor rate, and chart reads from windows vs re-grouping raw rows.
+
+The processor rows feed pre-decoded entry events through ``WindowProcessor``
+into the REST server and into an embedded database file, upserting the
+changed windows with their offsets after every batch.
+The read rows time the query behind the throughput chart at three zoom
+levels: entries per gate per window, from ``entry_windows`` or grouped
+from ``vehicle_entries``, over ``--rows`` raw entries one second apart.
+
+    python benchmarks/bench_windows.py --events 200000 --rows 5000000
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import duckdb
+
+from support import FakeMessage, ListConsumer, make_entry_events, populate_entries, run_duckdb_server
+
+RAW_SQL = """
+    SELECT time_bucket(to_seconds(?::BIGINT), timestamp) AS window_start, gate_id, count(*) AS entries
+    FROM vehicle_entries
+    WHERE timestamp >= ?::TIMESTAMP AND timestamp < ?::TIMESTAMP
+    GROUP BY ALL
+    ORDER BY window_start, gate_id
+"""
+# What the processor would have written for the populated rows, built in one pass
+WINDOWS_FROM_RAW_SQL = """
+    INSERT INTO entry_windows
+    SELECT {size}, {size}, time_bucket(INTERVAL {size} SECOND, timestamp) AS window_start,
+           window_start + INTERVAL {size} SECOND, gate_id, vehicle_type, count(*), 0, true, max(timestamp)
+    FROM vehicle_entries
+    GROUP BY ALL
+"""
+
+
+def process(storage, messages, batch_size):
+    from parkflow_dashboard.windows import WindowEngine, WindowProcessor
+
+    consumer = ListConsumer(messages)
+    processor = WindowProcessor(consumer=consumer, storage=storage, deserialize=lambda value: value,
+                                engine=WindowEngine(), flush_interval_s=0, batch_size=batch_size)
+    consumer.connector = processor
+    start = time.perf_counter()
+    processor.start()
+    return time.perf_counter() - start, processor.windows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    from parkflow_dashboard import app as dashboard
+    from parkflow_dashboard.duckdb_client import DuckDBClient
+    from parkflow_dashboard.embedded import EmbeddedStorage
+    from parkflow_dashboard.storage import RestStorage
+    from parkflow_dashboard.windows import CREATE_WINDOWS_SQL, WINDOW_SPECS, WindowEngine, parse_window_specs
+
+    logging.disable(logging.INFO)
+    events = make_entry_events(args.events)
+    engine = WindowEngine()
+    start = time.perf_counter()
+    for event in events:
+        engine.add(event["timestamp"], event["gateId"], event["vehicleType"])
+    engine_s = time.perf_counter() - start
+    print(f"{args.events} events, windows {WINDOW_SPECS}")
+    print(f"engine                 {args.events / engine_s:>10.0f} events/s")
+
+    messages = [FakeMessage(event, offset=i) for i, event in enumerate(events)]
+    workdir = tempfile.mkdtemp(prefix="bench-windows-")
+    with run_duckdb_server(os.path.join(workdir, "rest.duckdb")) as (url, _):
+        elapsed, written = process(RestStorage(DuckDBClient(url)), messages, args.batch_size)
+        print(f"processor, rest        {args.events / elapsed:>10.0f} events/s, {written} window rows upserted")
+    elapsed, written = process(EmbeddedStorage(os.path.join(workdir, "embedded.duckdb")), messages, args.batch_size)
+    print(f"processor, embedded    {args.events / elapsed:>10.0f} events/s, {written} window rows upserted")
+
+    path = os.path.join(workdir, "reads.duckdb")
+    conn = duckdb.connect(path)
+    populate_entries(conn, args.rows)
+    conn.execute(CREATE_WINDOWS_SQL)
+    specs = [spec for spec in parse_window_specs("60,300,3600") if spec.tumbling]
+    for spec in specs:
+        conn.execute(WINDOWS_FROM_RAW_SQL.format(size=spec.size_s))
+    conn.close()
+
+    storage = EmbeddedStorage(path, read_only=True)
+    dashboard._storage = storage
+    first = datetime(2024, 1, 1)
+    print(f"\n{args.rows} raw entries")
+    print(f"{'range':<8} {'window':>7} {'points':>7} {'raw ms':>9} {'windows ms':>11}")
+    for label, span in [("1 hour", timedelta(hours=1)), ("1 day", timedelta(days=1)),
+                        ("30 days", timedelta(days=30))]:
+        end = min(first + span, first + timedelta(seconds=args.rows))
+        spec = dashboard.timeline_window((end - first).total_seconds(), specs)
+        params = [spec.size_s, first.isoformat(), end.isoformat()]
+        window_params = [spec.size_s, spec.slide_s, first.isoformat(), end.isoformat()]
+        timings = {}
+        for name, read in [("raw", lambda: storage.query_prepared("raw", RAW_SQL, params)),
+                           ("windows", lambda: storage.query_prepared(
+                               dashboard.WINDOWS_STATEMENT, dashboard.WINDOWS_SQL, window_params))]:
+            read()
+            began = time.perf_counter()
+            for _ in range(args.iterations):
+                read()
+            timings[name] = (time.perf_counter() - began) / args.iterations * 1000
+        points = len(dashboard.fetch_windows(spec, first, end))
+        print(f"{label:<8} {spec.size_s:>6}s {points:>7} {timings['raw']:>9.1f} {timings['windows']:>11.1f}")
+    storage.close()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
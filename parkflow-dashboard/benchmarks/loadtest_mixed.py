@@ -0,0 +1,151 @@
+"""Mixed read/write load test for the DuckDB REST server.
+
+Dashboard readers, occasional slow analytical queries, Arrow appends from
+connector-like writers and a /health prober run concurrently against a
+uvicorn server process. Reports p50/p99 latency and status codes per class.
+
+    python benchmarks/loadtest_mixed.py --duration 20 --readers 16 --writers 2
+"""
+import argparse
+import collections
+import statistics
+import threading
+import time
+
+import pyarrow as pa
+import requests
+
+from support import make_entry_events, spawn_duckdb_server
+
+DASHBOARD_QUERY = """
+SELECT timestamp, license_plate, gate_id, vehicle_type, confidence
+FROM vehicle_entries ORDER BY timestamp DESC LIMIT 100
+"""
+SLOW_QUERY = """
+SELECT license_plate, gate_id, COUNT(*) AS visits, AVG(confidence) AS avg_confidence
+FROM vehicle_entries, range(20)
+GROUP BY ALL ORDER BY visits DESC LIMIT 10
+"""
+
+
+def _seed(url: str, rows: int):
+    response = requests.post(f"{url}/query", json={"query": f"""
+        CREATE TABLE vehicle_entries AS
+        SELECT
+            'evt-' || range AS event_id,
+            TIMESTAMP '2024-01-01' + INTERVAL (range) SECOND AS timestamp,
+            'ABC' || (range % 10000) AS license_plate,
+            'GATE_' || chr(65 + (range % 4)::INTEGER) AS gate_id,
+            'LANE_1' AS lane_id,
+            0.8 + (range % 20) / 100.0 AS confidence,
+            NULL::VARCHAR AS image_url,
+            'CAR' AS vehicle_type
+        FROM range({rows})
+    """})
+    response.raise_for_status()
+
+
+def _arrow_batch(size: int) -> bytes:
+    from datetime import datetime
+    events = make_entry_events(size, start_ms=int(time.time() * 1000))
+    table = pa.table({
+        "event_id": [e["eventId"] for e in events],
+        "timestamp": pa.array([datetime.fromtimestamp(e["timestamp"] / 1000) for e in events],
+                              pa.timestamp("us")),
+        "license_plate": [e["licensePlate"] for e in events],
+        "gate_id": [e["gateId"] for e in events],
+        "lane_id": [e["laneId"] for e in events],
+        "confidence": [e["confidence"] for e in events],
+        "image_url": pa.array([e["imageUrl"] for e in events], pa.string()),
+        "vehicle_type": [e["vehicleType"] for e in events],
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.statuses = collections.defaultdict(collections.Counter)
+
+    def record(self, kind: str, seconds: float, status: int):
+        with self._lock:
+            self.latencies[kind].append(seconds)
+            self.statuses[kind][status] += 1
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _worker(kind, stop, recorder, request_fn, pause=0.0):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            status = request_fn(session).status_code
+        except requests.RequestException:
+            status = 0
+        recorder.record(kind, time.perf_counter() - start, status)
+        if pause:
+            time.sleep(pause)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--slow-readers", type=int, default=2)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed-rows", type=int, default=1_000_000)
+    parser.add_argument("--read-workers", default="4")
+    parser.add_argument("--write-workers", default="1")
+    args = parser.parse_args()
+
+    env = {"DUCKDB_READ_WORKERS": args.read_workers, "DUCKDB_WRITE_WORKERS": args.write_workers}
+    with spawn_duckdb_server(env=env) as url:
+        _seed(url, args.seed_rows)
+        batch = _arrow_batch(args.batch_size)
+        headers = {"Content-Type": "application/vnd.apache.arrow.stream"}
+
+        workload = (
+            [("dashboard", lambda s: s.post(f"{url}/query", json={"query": DASHBOARD_QUERY}), 0.0)]
+            * args.readers
+            + [("analytical", lambda s: s.post(f"{url}/query", json={"query": SLOW_QUERY}), 0.0)]
+            * args.slow_readers
+            + [("append", lambda s: s.post(f"{url}/tables/vehicle_entries/append",
+                                           data=batch, headers=headers), 0.0)] * args.writers
+            + [("health", lambda s: s.get(f"{url}/health"), 0.2)]
+        )
+
+        stop = threading.Event()
+        recorder = Recorder()
+        threads = [threading.Thread(target=_worker, args=(kind, stop, recorder, fn, pause))
+                   for kind, fn, pause in workload]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        pool_stats = requests.get(f"{url}/pool/stats").json()["pools"]
+
+    print(f"{'class':<11} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  statuses")
+    for kind in ("dashboard", "analytical", "append", "health"):
+        values = recorder.latencies.get(kind)
+        if not values:
+            continue
+        print(f"{kind:<11} {len(values):>8} {statistics.median(values) * 1000:>8.1f} "
+              f"{_percentile(values, 99) * 1000:>8.1f} {max(values) * 1000:>8.1f}  "
+              f"{dict(recorder.statuses[kind])}")
+    print(f"pools: {pool_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Fixtures of the pytest-benchmark suite: one in-process DuckDB server for the whole session."""
+import logging
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from support import run_duckdb_server  # noqa: E402
+
+# vehicle_entries sizes the query benchmarks run against
+DEFAULT_SCALES = "10000,1000000,10000000"
+
+
+def pytest_addoption(parser):
+    parser.addoption("--scales", default=DEFAULT_SCALES,
+                     help="comma-separated vehicle_entries row counts for the query benchmarks")
+
+
+def pytest_generate_tests(metafunc):
+    if "table_rows" in metafunc.fixturenames:
+        scales = [int(rows) for rows in metafunc.config.getoption("scales").split(",")]
+        metafunc.parametrize("table_rows", scales, ids=[f"{rows}rows" for rows in scales], scope="module")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def quiet_logs():
+    # The per-row path logs every message; formatting them would dominate its timing
+    logging.disable(logging.INFO)
+    yield
+    logging.disable(logging.NOTSET)
+
+
+@pytest.fixture(scope="session")
+def duckdb_server():
+    """``(url, server module)`` of the REST server running on a local port."""
+    with run_duckdb_server() as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def http(duckdb_server):
+    """A keep-alive session, as the dashboard and connector use."""
+    with requests.Session() as session:
+        yield session
+
+
+def rows_per_second(benchmark, rows: int) -> None:
+    """Store the throughput next to the timings in the saved JSON."""
+    benchmark.extra_info["rows"] = rows
+    if benchmark.stats is not None:
+        benchmark.extra_info["rows_per_s"] = round(rows / benchmark.stats.stats.mean)
@@ -0,0 +1,64 @@
+"""Connector throughput into the DuckDB server: per-row, batched and the pipelined consume loop."""
+import pytest
+
+from conftest import rows_per_second
+from support import CommitOnlyConsumer, FakeMessage, ListConsumer, make_entry_events
+
+from parkflow_dashboard.duckdb_client import DuckDBClient
+from parkflow_dashboard.kafka_duckdb_connector import KafkaToDuckDBConnector
+
+PER_ROW_EVENTS = 200
+BATCH_EVENTS = 20_000
+BATCH_SIZE = 5_000
+
+
+def _connector(url, consumer=None, **kwargs):
+    return KafkaToDuckDBConnector(consumer=consumer or CommitOnlyConsumer(),
+                                  avro_deserializer=lambda value, ctx: value,
+                                  client=DuckDBClient(url), **kwargs)
+
+
+def _messages(count):
+    return [FakeMessage(event, offset=i) for i, event in enumerate(make_entry_events(count))]
+
+
+def test_per_row(benchmark, duckdb_server):
+    url, _ = duckdb_server
+    connector = _connector(url, batch_mode=False, write_method="sql")
+    messages = _messages(PER_ROW_EVENTS)
+
+    def run():
+        for msg in messages:
+            connector._handle_message(msg)
+
+    benchmark.pedantic(run, rounds=3, warmup_rounds=1)
+    rows_per_second(benchmark, PER_ROW_EVENTS)
+
+
+@pytest.mark.parametrize("write_method", ["sql", "arrow"])
+def test_batched(benchmark, duckdb_server, write_method):
+    url, _ = duckdb_server
+    connector = _connector(url, batch_mode=False, write_method=write_method, batch_size=BATCH_SIZE)
+    messages = _messages(BATCH_EVENTS)
+
+    def run():
+        for i in range(0, len(messages), BATCH_SIZE):
+            assert connector._flush(connector._decode_batch(messages[i:i + BATCH_SIZE]))
+
+    benchmark.pedantic(run, rounds=3, warmup_rounds=1)
+    rows_per_second(benchmark, BATCH_EVENTS)
+
+
+def test_pipelined(benchmark, duckdb_server):
+    """The whole batch-mode loop: consumer thread, writer queue and writer thread."""
+    url, _ = duckdb_server
+    messages = _messages(BATCH_EVENTS)
+
+    def setup():
+        consumer = ListConsumer(list(messages))
+        consumer.connector = _connector(url, consumer, batch_mode=True, write_method="arrow",
+                                        batch_size=BATCH_SIZE)
+        return (consumer.connector,), {}
+
+    benchmark.pedantic(lambda connector: connector.start(), setup=setup, rounds=3, warmup_rounds=1)
+    rows_per_second(benchmark, BATCH_EVENTS)
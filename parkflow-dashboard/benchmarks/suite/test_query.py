@@ -0,0 +1,36 @@
+"""/query latency of the dashboard's recent-entries query as vehicle_entries grows."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from support import populate_entries
+
+from parkflow_dashboard.app import RECENT_ENTRIES_LIMIT, RECENT_ENTRIES_SQL, recent_entries_params
+
+
+@pytest.fixture(scope="module")
+def entries(duckdb_server, table_rows):
+    _, server = duckdb_server
+    populate_entries(server.conn, table_rows)
+    # Written behind the server's back, so create the range macro its writes would have
+    server._ensure_views(server.conn)
+    server.result_cache.clear()
+    return table_rows
+
+
+@pytest.mark.parametrize("cache", ["no-cache", "cached"])
+def test_recent_entries(benchmark, duckdb_server, http, entries, cache):
+    url, _ = duckdb_server
+    # The dashboard binds the window and limit through a prepared statement; /query takes them inline
+    params = recent_entries_params(datetime(2024, 1, 1) + timedelta(seconds=entries))
+    sql = RECENT_ENTRIES_SQL.replace("?", "{}").format(*(repr(param) for param in params))
+    headers = {"Cache-Control": "no-cache"} if cache == "no-cache" else {}
+
+    def run():
+        response = http.post(f"{url}/query", params={"format": "columns"}, json={"query": sql},
+                             headers=headers)
+        response.raise_for_status()
+        return response
+
+    assert len(benchmark(run).json()["data"]["timestamp"]) == min(entries, RECENT_ENTRIES_LIMIT)
+    benchmark.extra_info["table_rows"] = entries
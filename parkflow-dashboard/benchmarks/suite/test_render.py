@@ -0,0 +1,66 @@
+"""Figure build time of the dashboard callbacks, with the DuckDB service answered from memory."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from support import make_entry_events
+
+from parkflow_dashboard import app as dashboard
+
+
+@pytest.fixture
+def recent_entries(monkeypatch):
+    """The columnar payload of the recent-entries query, as execute_prepared returns it."""
+    events = make_entry_events(dashboard.RECENT_ENTRIES_LIMIT)
+    data = {
+        'timestamp': [datetime.fromtimestamp(e['timestamp'] / 1000).isoformat() for e in events],
+        'license_plate': [e['licensePlate'] for e in events],
+        'gate_id': [e['gateId'] for e in events],
+        'vehicle_type': [e['vehicleType'] for e in events],
+        'confidence': [e['confidence'] for e in events],
+    }
+    monkeypatch.setattr(dashboard, 'execute_prepared', lambda name, sql, params: {'data': data})
+
+
+@pytest.fixture
+def full_window():
+    """Dashboard state with every bucket of the window filled."""
+    state = dashboard.new_dashboard_state()
+    now = datetime.now()
+    width = state['bucket_seconds']
+    first = int((now - timedelta(minutes=state['window_minutes'])).timestamp()) // width * width
+    buckets = [first + i * width for i in range(dashboard.DASHBOARD_MAX_BUCKETS)]
+    gates, types = ['GATE_A', 'GATE_B', 'GATE_C', 'GATE_D'], ['CAR', 'MOTORCYCLE', 'TRUCK']
+    dashboard.merge_entry_buckets(state, {
+        'version': 1,
+        'counts': {
+            'bucket': [b for b in buckets for _ in gates],
+            'gate_id': [gate for _ in buckets for gate in gates],
+            'vehicle_type': [types[i % len(types)] for i in range(len(buckets) * len(gates))],
+            'entries': [i % 7 + 1 for i in range(len(buckets) * len(gates))],
+        },
+        'confidence': {
+            'bucket': [b for b in buckets for _ in range(dashboard.CONFIDENCE_BINS)],
+            'confidence_bin': [c for _ in buckets for c in range(dashboard.CONFIDENCE_BINS)],
+            'entries': [1] * (len(buckets) * dashboard.CONFIDENCE_BINS),
+        },
+    }, now=now)
+    return state
+
+
+def test_update_graph(benchmark, recent_entries):
+    """The 'recent' mode callback: a new figure from the last 100 rows on every tick."""
+    figure = benchmark(dashboard.update_graph, 0)
+    assert len(figure.data) == 4
+
+
+def test_build_dashboard_figure(benchmark, full_window):
+    """First tick of the incremental mode."""
+    figure = benchmark(dashboard.build_dashboard_figure, full_window)
+    assert len(figure.data[2].x) == len(full_window['buckets'])
+
+
+def test_patch_dashboard_figure(benchmark, full_window):
+    """Later ticks of the incremental mode: the newest bucket changed."""
+    keys = sorted(full_window['buckets'], key=int)
+    benchmark(dashboard.patch_dashboard_figure, full_window, keys, {keys[-1]}, 0)
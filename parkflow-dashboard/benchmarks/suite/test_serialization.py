@@ -0,0 +1,29 @@
+"""Server-side cost of turning a query result into each /query response format."""
+import pytest
+
+from support import populate_entries
+
+SERIALIZE_ROWS = 100_000
+QUERY = "SELECT timestamp, license_plate, gate_id, vehicle_type, confidence FROM serialize_entries"
+
+
+@pytest.fixture(scope="module")
+def cursor(duckdb_server):
+    _, server = duckdb_server
+    populate_entries(server.conn, SERIALIZE_ROWS, table="serialize_entries")
+    cursor = server.conn.cursor()
+    yield cursor
+    cursor.close()
+
+
+@pytest.mark.parametrize("result_format", ["records", "columns", "arrow"])
+def test_serialize(benchmark, duckdb_server, cursor, result_format):
+    _, server = duckdb_server
+
+    def run():
+        # What the endpoint and the result cache do: execute, format, encode the body
+        body, _ = server._serialize(server._format_result(cursor.execute(QUERY), result_format))
+        return body
+
+    benchmark.extra_info["rows"] = SERIALIZE_ROWS
+    benchmark.extra_info["payload_bytes"] = len(benchmark(run))
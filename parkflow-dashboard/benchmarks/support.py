@@ -0,0 +1,178 @@
+"""Shared helpers for the local ParkFlow benchmarks."""
+import contextlib
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import uvicorn
+
+SERVER_PATH = Path(__file__).resolve().parents[2] / "docker" / "duckdb" / "server.py"
+
+
+def load_server_module(db_path: str = ":memory:"):
+    """Import docker/duckdb/server.py as a module backed by ``db_path``."""
+    os.environ["DUCKDB_DATABASE"] = db_path
+    sys.path.insert(0, str(SERVER_PATH.parent))
+    spec = importlib.util.spec_from_file_location("duckdb_server", SERVER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def run_duckdb_server(db_path: str = ":memory:"):
+    """Run the DuckDB REST server in a background thread and yield its URL."""
+    module = load_server_module(db_path)
+    port = _free_port()
+    config = uvicorn.Config(module.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}", module
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+@contextlib.contextmanager
+def spawn_duckdb_server(db_path: str = ":memory:", env: dict = None):
+    """Run the DuckDB REST server under uvicorn in a separate process and yield its URL."""
+    import requests
+
+    port = _free_port()
+    process_env = dict(os.environ, DUCKDB_DATABASE=db_path, **(env or {}))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=SERVER_PATH.parent, env=process_env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            try:
+                if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                    break
+            except requests.ConnectionError:
+                time.sleep(0.05)
+        else:
+            raise RuntimeError("DuckDB server did not become healthy")
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+class FakeMessage:
+    """Minimal stand-in for ``confluent_kafka.Message``."""
+
+    def __init__(self, value, topic="parking.entry.events", partition=0, offset=0, timestamp_ms=None):
+        self._value = value
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._timestamp_ms = int(time.time() * 1000) if timestamp_ms is None else timestamp_ms
+
+    def value(self):
+        return self._value
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def timestamp(self):
+        return 1, self._timestamp_ms
+
+    def error(self):
+        return None
+
+
+def make_entry_events(count: int, start_ms: int = 1_700_000_000_000):
+    """Generate already-decoded VehicleEntryEvent dicts."""
+    gates = ["GATE_A", "GATE_B", "GATE_C", "GATE_D"]
+    types = ["CAR", "MOTORCYCLE", "TRUCK"]
+    return [
+        {
+            "eventId": str(uuid.uuid4()),
+            "timestamp": start_ms + i * 250,
+            "licensePlate": f"ABC{i % 10000:04d}",
+            "gateId": gates[i % len(gates)],
+            "laneId": f"LANE_{i % 2 + 1}",
+            "confidence": 0.8 + (i % 20) / 100.0,
+            "imageUrl": None if i % 5 else f"https://images.example.com/{i}.jpg",
+            "vehicleType": types[i % len(types)],
+        }
+        for i in range(count)
+    ]
+
+
+def populate_entries(conn, rows: int, table: str = "vehicle_entries"):
+    """Replace ``table`` with ``rows`` generated vehicle entries, one second apart."""
+    conn.execute(f"""
+        CREATE OR REPLACE TABLE {table} AS
+        SELECT
+            'evt-' || range AS event_id,
+            TIMESTAMP '2024-01-01' + INTERVAL (range) SECOND AS timestamp,
+            'ABC' || (range % 10000) AS license_plate,
+            'GATE_' || chr(65 + (range % 4)::INTEGER) AS gate_id,
+            'LANE_' || (range % 2 + 1) AS lane_id,
+            0.8 + (range % 20) / 100.0 AS confidence,
+            NULL::VARCHAR AS image_url,
+            ['CAR', 'MOTORCYCLE', 'TRUCK'][range % 3 + 1] AS vehicle_type
+        FROM range({rows})
+    """)
+
+
+class CommitOnlyConsumer:
+    """Accepts commits for connectors driven without a consume loop."""
+
+    def commit(self, offsets=None, asynchronous=True):
+        pass
+
+
+class ListConsumer(CommitOnlyConsumer):
+    """Hands out the messages in slices, then stops the connector."""
+
+    def __init__(self, messages):
+        self.messages = messages
+        self.connector = None
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        pass
+
+    def consume(self, num_messages=1, timeout=-1):
+        batch, self.messages = self.messages[:num_messages], self.messages[num_messages:]
+        if not batch:
+            self.connector.stop()
+        return batch
+
+    def assignment(self):
+        return []
+
+    def pause(self, partitions):
+        pass
+
+    def resume(self, partitions):
+        pass
+
+    def close(self):
+        pass
@@ -1,17 +1,371 @@
 import os
 import logging
-import requests
+import threading
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import Dash, html, dcc, Input, Output
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from dash import Dash, html, dcc, Input, Output, State, Patch, no_update
 from plotly.subplots import make_subplots
 
+from parkflow_dashboard.duckdb_client import DuckDBClient
+from parkflow_dashboard.snapshot import ArrowFileCache, SnapshotStorage
+from parkflow_dashboard.storage import Storage, storage_from_spec
+from parkflow_dashboard.windows import WINDOW_SPECS, WINDOW_TABLE, WindowSpec, parse_window_specs
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
 # DuckDB service configuration
 DUCKDB_API_URL = os.getenv('DUCKDB_API_URL', 'http://localhost:3000')
+# 'rest' reads from the DuckDB service, 'embedded:<path>' reads the database file in this process
+DUCKDB_STORAGE = os.getenv('DUCKDB_STORAGE', 'rest')
+
+RECENT_ENTRIES_STATEMENT = 'dashboard_recent_entries'
+# The range macro reads both tiers when DuckDB keeps older entries in Parquet
+RECENT_ENTRIES_SQL = """
+    SELECT 
+        timestamp,
+        license_plate,
+        gate_id,
+        vehicle_type,
+        confidence
+    FROM vehicle_entries_between(?::TIMESTAMP, ?::TIMESTAMP)
+    ORDER BY timestamp DESC
+    LIMIT ?
+"""
+RECENT_ENTRIES_LIMIT = 100
+
+# 'incremental' patches running aggregates over a time window, 'recent' redraws the last 100 rows
+DASHBOARD_MODE = os.getenv('DASHBOARD_MODE', 'incremental').lower()
+DASHBOARD_WINDOW_MINUTES = int(os.getenv('DASHBOARD_WINDOW_MINUTES', '60'))
+# Upper bound on timeline points; wider windows get coarser buckets
+DASHBOARD_MAX_BUCKETS = int(os.getenv('DASHBOARD_MAX_BUCKETS', '240'))
+# Upper bound on scatter points per gate, downsampled by the storage backend
+DASHBOARD_MAX_POINTS = int(os.getenv('DASHBOARD_MAX_POINTS', '1000'))
+CONFIDENCE_BINS = 20
+# Lag beyond which the freshness line turns red
+FRESHNESS_WARN_SECONDS = float(os.getenv('DASHBOARD_FRESHNESS_WARN_S', '30'))
+DASHBOARD_REFRESH_S = float(os.getenv('DASHBOARD_REFRESH_S', '5'))
+# Directory of the snapshot all workers serve from, refreshed once per interval; empty reads DuckDB per session
+DASHBOARD_SNAPSHOT_DIR = os.getenv('DASHBOARD_SNAPSHOT_DIR', '')
+DASHBOARD_DEBUG = os.getenv('DASHBOARD_DEBUG', 'false').lower() == 'true'
+
+# Entry counts per event-time window, kept current by parkflow_dashboard.windows
+WINDOWS_STATEMENT = 'dashboard_entry_windows'
+WINDOWS_SQL = f"""
+    SELECT window_start, window_end, gate_id, sum(entries)::BIGINT AS entries
+    FROM {WINDOW_TABLE}
+    WHERE window_seconds = ? AND slide_seconds = ? AND window_start >= ?::TIMESTAMP AND window_start < ?::TIMESTAMP
+    GROUP BY ALL
+    ORDER BY window_start, gate_id
+"""
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def storage() -> Storage:
+    """The backend every callback reads from, opened on first use; embedded files are only read."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = storage_from_spec(DUCKDB_STORAGE, lambda: DuckDBClient(DUCKDB_API_URL), read_only=True)
+            if DASHBOARD_SNAPSHOT_DIR:
+                _storage = SnapshotStorage(ArrowFileCache(DASHBOARD_SNAPSHOT_DIR), _storage,
+                                           max_age_s=3 * DASHBOARD_REFRESH_S)
+        return _storage
+
+
+def data_now():
+    """The time the shown data was read at: the snapshot's, or the clock when reads are live."""
+    return storage().as_of or datetime.now()
+
+
+def execute_prepared(name, sql, params):
+    """Execute a prepared statement in the columnar form, registering it on first use."""
+    return storage().query_prepared(name, sql, params)
+
+
+def recent_entries_params(now=None):
+    """Parameters of RECENT_ENTRIES_SQL: the newest entries of the window ending at ``now``.
+
+    The bounds are whole minutes, so every open tab sends the same query
+    within a minute; the end is a day ahead so early clocks still show.
+    """
+    minute = (now or data_now()).replace(second=0, microsecond=0)
+    return [(minute - timedelta(minutes=DASHBOARD_WINDOW_MINUTES)).isoformat(),
+            (minute + timedelta(days=1)).isoformat(), RECENT_ENTRIES_LIMIT]
+
+
+def fetch_freshness(table='vehicle_entries'):
+    """Newest event time and last commit of a table, as the DuckDB backend saw them."""
+    return storage().freshness(table)
+
+
+def freshness_lag(freshness, now=None):
+    """Seconds from the newest stored event to now; None for an empty table.
+
+    Measured on the dashboard's clock when the figure is sent, so it covers
+    Kafka, the connector, the DuckDB commit and the refresh interval.
+    """
+    if not freshness.get('newest_event'):
+        return None
+    now = now or datetime.now()
+    return max((now - datetime.fromisoformat(freshness['newest_event'])).total_seconds(), 0.0)
+
+
+def _format_seconds(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    return f"{int(seconds // 60)}m {int(seconds % 60)}s"
+
+
+def update_freshness(n):
+    """Freshness line under the title: how far the newest entry on screen is behind now."""
+    try:
+        freshness = fetch_freshness()
+    except Exception as e:
+        logger.error(f"Error reading freshness: {e}")
+        return "Freshness unknown", {'color': 'red'}
+    lag = freshness_lag(freshness)
+    if lag is None:
+        return "No entries yet", {}
+    text = f"Newest entry {freshness['newest_event'][11:19]}, {_format_seconds(lag)} behind"
+    if freshness.get('last_commit'):
+        text += f" (last write {freshness['last_commit'][11:19]})"
+    return text, {'color': 'red'} if lag > FRESHNESS_WARN_SECONDS else {}
+
+
+def bucket_seconds(window_minutes=None):
+    window_minutes = window_minutes or DASHBOARD_WINDOW_MINUTES
+    return max(60, window_minutes * 60 // DASHBOARD_MAX_BUCKETS)
+
+
+def new_dashboard_state(window_minutes=None):
+    """Client-side state: the rollup version seen last and per-bucket aggregates within the window."""
+    window_minutes = window_minutes or DASHBOARD_WINDOW_MINUTES
+    return {
+        'window_minutes': window_minutes,
+        'bucket_seconds': bucket_seconds(window_minutes),
+        'watermark': -1,
+        'buckets': {},
+    }
+
+
+def fetch_entry_buckets(state, now=None):
+    """Read the buckets changed since the last seen version from the DuckDB backend."""
+    now = now or data_now()
+    cutoff = now - timedelta(minutes=state['window_minutes'])
+    return storage().dashboard_entries(cutoff, state['bucket_seconds'], state['watermark'])
+
+
+def merge_entry_buckets(state, data, now=None):
+    """Replace the returned buckets in the state and drop buckets that left the window.
+
+    Returns the keys of the buckets that changed and the number that expired.
+    """
+    now = now or data_now()
+    buckets = state['buckets']
+    counts_data, confidence_data = data['counts'], data['confidence']
+    # The rollups return complete totals for every touched bucket
+    changed = {str(bucket) for bucket in counts_data['bucket']}
+    for key in changed:
+        # Sparse dicts keep the store small; it travels to the browser and back every tick
+        buckets[key] = {'entries': 0, 'gates': {}, 'types': {}, 'confidence': {}}
+    for bucket, gate, vehicle_type, entries in zip(
+            counts_data['bucket'], counts_data['gate_id'], counts_data['vehicle_type'],
+            counts_data['entries']):
+        counts = buckets[str(bucket)]
+        counts['entries'] += entries
+        counts['gates'][gate] = counts['gates'].get(gate, 0) + entries
+        counts['types'][vehicle_type] = counts['types'].get(vehicle_type, 0) + entries
+    for bucket, confidence_bin, entries in zip(
+            confidence_data['bucket'], confidence_data['confidence_bin'], confidence_data['entries']):
+        if str(bucket) in buckets:
+            buckets[str(bucket)]['confidence'][str(confidence_bin)] = entries
+    state['watermark'] = max(state['watermark'], data['version'])
+
+    # Timestamps are naive local time; epoch() reads them as UTC
+    local_now = now.replace(tzinfo=timezone.utc).timestamp()
+    oldest = local_now - state['window_minutes'] * 60 - state['bucket_seconds']
+    expired = [key for key in buckets if int(key) < oldest]
+    for key in expired:
+        del buckets[key]
+    return changed - set(expired), len(expired)
+
+
+def _bucket_label(key):
+    return datetime.fromtimestamp(int(key), timezone.utc).replace(tzinfo=None).isoformat()
+
+
+def dashboard_totals(state):
+    """Totals over the window, summed from at most DASHBOARD_MAX_BUCKETS buckets."""
+    gates, types = Counter(), Counter()
+    confidence = [0] * CONFIDENCE_BINS
+    for counts in state['buckets'].values():
+        gates.update(counts['gates'])
+        types.update(counts['types'])
+        for confidence_bin, entries in counts['confidence'].items():
+            confidence[int(confidence_bin)] += entries
+    keys = sorted(state['buckets'], key=int)
+    return {
+        'gates': dict(sorted(gates.items())),
+        'types': dict(sorted(types.items())),
+        'confidence': confidence,
+        'timeline_x': [_bucket_label(key) for key in keys],
+        'timeline_y': [state['buckets'][key]['entries'] for key in keys],
+    }
+
+
+def timeline_window(range_seconds, specs=None):
+    """Finest tumbling window that keeps a range within DASHBOARD_MAX_BUCKETS points, or the coarsest one."""
+    specs = parse_window_specs(WINDOW_SPECS) if specs is None else specs
+    tumbling = sorted((spec for spec in specs if spec.tumbling), key=lambda spec: spec.size_s)
+    for spec in tumbling:
+        if range_seconds / spec.size_s <= DASHBOARD_MAX_BUCKETS:
+            return spec
+    return tumbling[-1] if tumbling else None
+
+
+def throughput_window(specs=None):
+    """Sliding window with the finest slide, for a smoothed entries-per-minute line."""
+    specs = parse_window_specs(WINDOW_SPECS) if specs is None else specs
+    sliding = [spec for spec in specs if not spec.tumbling]
+    return min(sliding, key=lambda spec: (spec.slide_s, spec.size_s)) if sliding else None
+
+
+def fetch_windows(spec: WindowSpec, start, end):
+    """Entries per gate in the windows of ``spec`` starting within [start, end)."""
+    data = execute_prepared(WINDOWS_STATEMENT, WINDOWS_SQL,
+                            [spec.size_s, spec.slide_s, start.isoformat(), end.isoformat()])
+    frame = pd.DataFrame(data['data'], columns=['window_start', 'window_end', 'gate_id', 'entries'])
+    # isoformat() drops the fraction on whole seconds, so one result can mix both forms
+    for column in ('window_start', 'window_end'):
+        frame[column] = pd.to_datetime(frame[column], format='ISO8601')
+    return frame
+
+
+def zoom_range(relayout, now=None):
+    """Range of a zoomable chart: the zoomed or panned x range, or the last DASHBOARD_WINDOW_MINUTES."""
+    relayout = relayout or {}
+    for axis in ('xaxis', 'xaxis2'):
+        if relayout.get(f'{axis}.autorange'):
+            break
+        if f'{axis}.range[0]' in relayout:
+            return (pd.Timestamp(relayout[f'{axis}.range[0]']).to_pydatetime(),
+                    pd.Timestamp(relayout[f'{axis}.range[1]']).to_pydatetime())
+    now = now or data_now()
+    return now - timedelta(minutes=DASHBOARD_WINDOW_MINUTES), now
+
+
+def _window_label(seconds):
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600} h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60} min"
+    return f"{seconds} s"
+
+
+def build_throughput_figure(start, end, specs=None):
+    """Entries per gate in the finest window that fits the range, and a sliding entries-per-minute line."""
+    spec = timeline_window((end - start).total_seconds(), specs)
+    if spec is None:
+        return _message_figure("No tumbling windows configured")
+    sliding = throughput_window(specs)
+    fig = make_subplots(
+        rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.12,
+        subplot_titles=(f"Entries per {_window_label(spec.size_s)} window",
+                        f"Entries per minute, {_window_label(sliding.size_s)} sliding window" if sliding
+                        else "Entries per minute")
+    )
+    counts = fetch_windows(spec, start, end)
+    for gate, rows in counts.groupby('gate_id', sort=True):
+        fig.add_trace(go.Bar(x=rows['window_start'], y=rows['entries'], name=gate or 'unknown'), row=1, col=1)
+    rate, rate_spec = counts, spec
+    if sliding is not None:
+        # Windows that end inside the range, so the line reaches its left edge
+        rate = fetch_windows(sliding, start - timedelta(seconds=sliding.size_s), end)
+        rate = rate[rate['window_end'] > start]
+        rate_spec = sliding
+    per_minute = rate.groupby('window_end')['entries'].sum() * 60 / rate_spec.size_s
+    fig.add_trace(go.Scatter(x=per_minute.index, y=per_minute.values, mode='lines', name='Entries per minute',
+                             showlegend=False), row=2, col=1)
+    fig.update_layout(height=600, barmode='stack', uirevision='throughput')
+    return fig
+
+
+def build_confidence_figure(start, end):
+    """Recognition confidence per gate, MinMaxLTTB-downsampled to DASHBOARD_MAX_POINTS per gate.
+
+    Zooming in asks for the same number of points over the narrower range,
+    so the detail comes back without sending every row of a wide range.
+    The backend reads the range through vehicle_entries_between, so it
+    reaches into the archive tier of a tiered server.
+    """
+    series = storage().timeseries('vehicle_entries', 'timestamp', start, end, DASHBOARD_MAX_POINTS,
+                                  group_by=['gate_id'], value='confidence', mode='lttb')
+    frame = pd.DataFrame(series['columns'], columns=['time', 'gate_id', 'confidence'])
+    frame['time'] = pd.to_datetime(frame['time'], format='ISO8601')
+    fig = go.Figure()
+    for gate, rows in frame.groupby('gate_id', sort=True):
+        fig.add_trace(go.Scattergl(x=rows['time'], y=rows['confidence'], mode='markers', name=gate or 'unknown',
+                                   marker=dict(size=4)))
+    fig.update_layout(title=f"Recognition confidence, up to {DASHBOARD_MAX_POINTS} points per gate",
+                      xaxis_range=[start, end], yaxis_range=[0, 1.05], height=400, uirevision='confidence')
+    return fig
+
+
+CONFIDENCE_BIN_LABELS = [round((i + 0.5) / CONFIDENCE_BINS, 3) for i in range(CONFIDENCE_BINS)]
+
+
+def build_dashboard_figure(state):
+    """Full figure for the first tick; later ticks only send a Patch."""
+    totals = dashboard_totals(state)
+    fig = make_subplots(
+        rows=2, cols=2,
+        subplot_titles=('Entries by Gate', 'Vehicle Types', 'Entry Timeline', 'Recognition Confidence'),
+        specs=[[{"type": "bar"}, {"type": "pie"}],
+              [{"type": "scatter"}, {"type": "bar"}]]
+    )
+    fig.add_trace(go.Bar(x=list(totals['gates']), y=list(totals['gates'].values()),
+                         name='Entries by Gate'), row=1, col=1)
+    fig.add_trace(go.Pie(labels=list(totals['types']), values=list(totals['types'].values()),
+                         name='Vehicle Types'), row=1, col=2)
+    fig.add_trace(go.Scatter(x=totals['timeline_x'], y=totals['timeline_y'],
+                             mode='lines+markers', name='Entries'), row=2, col=1)
+    fig.add_trace(go.Bar(x=CONFIDENCE_BIN_LABELS, y=totals['confidence'],
+                         name='Recognition Confidence'), row=2, col=2)
+    fig.update_layout(height=800, showlegend=False, uirevision='dashboard')
+    return fig
+
+
+def patch_dashboard_figure(state, previous_keys, changed, expired):
+    """Partial update: replace the small aggregates, update or extend the timeline in place."""
+    totals = dashboard_totals(state)
+    patched = Patch()
+    patched['data'][0]['x'] = list(totals['gates'])
+    patched['data'][0]['y'] = list(totals['gates'].values())
+    patched['data'][1]['labels'] = list(totals['types'])
+    patched['data'][1]['values'] = list(totals['types'].values())
+    patched['data'][3]['y'] = totals['confidence']
+
+    index = {key: i for i, key in enumerate(previous_keys)}
+    appended = sorted((key for key in changed if key not in index), key=int)
+    if expired or (appended and previous_keys and int(appended[0]) < int(previous_keys[-1])):
+        # Buckets left the window or a late row opened an earlier bucket: resend the timeline
+        patched['data'][2]['x'] = totals['timeline_x']
+        patched['data'][2]['y'] = totals['timeline_y']
+        return patched
+    for key in changed:
+        if key in index:
+            patched['data'][2]['y'][index[key]] = state['buckets'][key]['entries']
+    if appended:
+        patched['data'][2]['x'].extend([_bucket_label(key) for key in appended])
+        patched['data'][2]['y'].extend([state['buckets'][key]['entries'] for key in appended])
+    return patched
 
 # Initialize Dash app
 app = Dash(__name__)
@@ -19,13 +373,21 @@ app = Dash(__name__)
 # Layout
 app.layout = html.Div([
     html.H1('ParkFlow Entry Dashboard', className='header'),
+    html.Div(id='freshness', className='freshness'),
     html.Div([
         dcc.Graph(id='vehicle-entries-graph'),
         dcc.Interval(
             id='interval-component',
-            interval=5*1000,  # in milliseconds
+            interval=DASHBOARD_REFRESH_S * 1000,  # in milliseconds
             n_intervals=0
-        )
+        ),
+        dcc.Store(id='dashboard-state', storage_type='memory')
+    ], className='graph-container'),
+    html.Div([
+        dcc.Graph(id='throughput-graph')
+    ], className='graph-container'),
+    html.Div([
+        dcc.Graph(id='confidence-graph')
     ], className='graph-container')
 ], className='app-container')
 
@@ -49,9 +411,15 @@ app.index_string = '''
                 color: #2c3e50;
                 margin-bottom: 30px;
             }
+            .freshness {
+                text-align: center;
+                color: #7f8c8d;
+                margin: -20px 0 20px;
+            }
             .graph-container {
                 flex: 1;
                 min-width: 500px;
+                margin-bottom: 20px;
                 box-shadow: 0 2px 4px rgba(0,0,0,0.1);
                 padding: 15px;
                 border-radius: 8px;
@@ -70,32 +438,86 @@ app.index_string = '''
 </html>
 '''
 
+def _message_figure(text, color=None):
+    fig = go.Figure()
+    fig.add_annotation(
+        text=text,
+        xref="paper",
+        yref="paper",
+        x=0.5,
+        y=0.5,
+        showarrow=False,
+        font=dict(size=20, color=color)
+    )
+    return fig
+
+
+def refresh_dashboard(n, state):
+    """Incremental tick: fetch buckets changed since the watermark and patch the figure."""
+    try:
+        first_tick = not state or state.get('window_minutes') != DASHBOARD_WINDOW_MINUTES
+        if first_tick:
+            state = new_dashboard_state()
+        previous_keys = sorted(state['buckets'], key=int)
+        changed, expired = merge_entry_buckets(state, fetch_entry_buckets(state))
+
+        if first_tick:
+            if not state['buckets']:
+                # Keep the watermark unset so the next tick draws the full figure
+                return _message_figure("No data available"), None
+            return build_dashboard_figure(state), state
+        if not changed and not expired:
+            return no_update, no_update
+        return patch_dashboard_figure(state, previous_keys, changed, expired), state
+
+    except Exception as e:
+        logger.error(f"Error updating graph: {e}")
+        return _message_figure(f"Error loading data: {str(e)}", color='red'), None
+
+
+def update_throughput(n, relayout):
+    """Throughput chart from the precomputed windows; zooming in switches to finer windows."""
+    try:
+        return build_throughput_figure(*zoom_range(relayout))
+    except Exception as e:
+        logger.error(f"Error updating throughput: {e}")
+        return _message_figure(f"Error loading windows: {str(e)}", color='red')
+
+
+def update_confidence(n, relayout):
+    """Confidence scatter over the zoomed range, downsampled by the storage backend."""
+    try:
+        return build_confidence_figure(*zoom_range(relayout))
+    except Exception as e:
+        logger.error(f"Error updating confidence: {e}")
+        return _message_figure(f"Error loading confidence: {str(e)}", color='red')
+
+
+def entry_timeline(df):
+    """Entries per finest tumbling window over the span of the shown rows.
+
+    Read from the windows table; without it, the shown rows are counted per
+    window instead, which undercounts windows cut off by the row limit.
+    """
+    spec = timeline_window(0)
+    size = f"{spec.size_s if spec else 60}s"
+    if df.empty:
+        return pd.Series(dtype='int64')
+    start = df['timestamp'].min().floor(size).to_pydatetime()
+    end = df['timestamp'].max().to_pydatetime() + timedelta(microseconds=1)
+    if spec is not None:
+        try:
+            return fetch_windows(spec, start, end).groupby('window_start')['entries'].sum()
+        except Exception as e:
+            logger.warning(f"Entry windows unavailable, counting the shown rows: {e}")
+    return df.groupby(df['timestamp'].dt.floor(size)).size()
+
+
 # Callback to update the vehicle entries graph
-@app.callback(
-    Output('vehicle-entries-graph', 'figure'),
-    Input('interval-component', 'n_intervals')
-)
 def update_graph(n):
-    # Query DuckDB for latest data
-    query = """
-    SELECT 
-        timestamp,
-        license_plate,
-        gate_id,
-        vehicle_type,
-        confidence
-    FROM vehicle_entries
-    ORDER BY timestamp DESC
-    LIMIT 100
-    """
-    
     try:
-        response = requests.post(
-            f"{DUCKDB_API_URL}/query",
-            params={"query": query}
-        )
-        response.raise_for_status()
-        data = response.json()
+        # Query DuckDB for latest data through the cached prepared plan
+        data = execute_prepared(RECENT_ENTRIES_STATEMENT, RECENT_ENTRIES_SQL, recent_entries_params())
         
         if not data or 'data' not in data:
             fig = go.Figure()
@@ -135,10 +557,11 @@ def update_graph(n):
         )
         
         # Timeline of entries
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        entries_timeline = df.groupby('timestamp').size().reset_index(name='count')
+        # isoformat() drops the fraction on whole seconds, so one batch can mix both forms
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+        entries_timeline = entry_timeline(df)
         fig.add_trace(
-            go.Scatter(x=entries_timeline['timestamp'], y=entries_timeline['count'], 
+            go.Scatter(x=entries_timeline.index, y=entries_timeline.values,
                       mode='lines+markers', name='Entries'),
             row=2, col=1
         )
@@ -167,5 +590,59 @@ def update_graph(n):
         )
         return fig
 
+if DASHBOARD_MODE == 'incremental':
+    app.callback(
+        Output('vehicle-entries-graph', 'figure'),
+        Output('dashboard-state', 'data'),
+        Input('interval-component', 'n_intervals'),
+        State('dashboard-state', 'data')
+    )(refresh_dashboard)
+else:
+    app.callback(
+        Output('vehicle-entries-graph', 'figure'),
+        Input('interval-component', 'n_intervals')
+    )(update_graph)
+
+app.callback(
+    Output('throughput-graph', 'figure'),
+    Input('interval-component', 'n_intervals'),
+    Input('throughput-graph', 'relayoutData')
+)(update_throughput)
+
+app.callback(
+    Output('confidence-graph', 'figure'),
+    Input('interval-component', 'n_intervals'),
+    Input('confidence-graph', 'relayoutData')
+)(update_confidence)
+
+app.callback(
+    Output('freshness', 'children'),
+    Output('freshness', 'style'),
+    Input('interval-component', 'n_intervals')
+)(update_freshness)
+
+
+def prefetch():
+    """Every callback's default view, run once per interval by the snapshot refresh to record the reads they make."""
+    update_freshness(0)
+    if DASHBOARD_MODE == 'incremental':
+        refresh_dashboard(0, None)
+    else:
+        update_graph(0)
+    update_throughput(0, None)
+    update_confidence(0, None)
+
+
+def start_snapshot_refresh():
+    """Start this process's snapshot refresh; only the process holding the fetcher lock reads DuckDB."""
+    snapshot = storage()
+    if isinstance(snapshot, SnapshotStorage):
+        snapshot.start(prefetch, DASHBOARD_REFRESH_S)
+
+
+# WSGI entry point for gunicorn; see parkflow_dashboard.serve
+server = app.server
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8050, debug=True)
+    start_snapshot_refresh()
+    app.run(host='0.0.0.0', port=8050, debug=DASHBOARD_DEBUG)
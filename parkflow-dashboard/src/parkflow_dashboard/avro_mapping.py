@@ -0,0 +1,168 @@
+"""Derive DuckDB tables and Arrow schemas from Avro event schemas."""
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Avro schemas shipped in parkflow-common, used when the Schema Registry has no subject yet
+AVRO_SCHEMA_DIR = Path(os.getenv(
+    'AVRO_SCHEMA_DIR',
+    Path(__file__).resolve().parents[3] / 'parkflow-common' / 'src' / 'main' / 'avro'
+))
+TOPICS_CONFIG = os.getenv('CONNECTOR_TOPICS_CONFIG')
+
+# topic -> (table, schema file); override with a JSON file in CONNECTOR_TOPICS_CONFIG
+DEFAULT_TOPIC_TABLES = [
+    {'topic': 'parking.entry.events', 'table': 'vehicle_entries', 'schema': 'VehicleEntryEvent.avsc'},
+    {'topic': 'parking.exit.events', 'table': 'vehicle_exits', 'schema': 'VehicleExitEvent.avsc'},
+    {'topic': 'parking.payment.events', 'table': 'payments', 'schema': 'PaymentEvent.avsc'},
+    {'topic': 'parking.status.events', 'table': 'parking_status', 'schema': 'ParkingStatusEvent.avsc'},
+    {'topic': 'parking.gate.commands', 'table': 'gate_commands', 'schema': 'GateCommandEvent.avsc'},
+]
+
+_PRIMITIVE_TYPES = {
+    'string': ('VARCHAR', pa.string()),
+    'long': ('BIGINT', pa.int64()),
+    'int': ('INTEGER', pa.int32()),
+    'double': ('DOUBLE', pa.float64()),
+    'float': ('FLOAT', pa.float32()),
+    'boolean': ('BOOLEAN', pa.bool_()),
+    'bytes': ('BLOB', pa.binary()),
+}
+_TIMESTAMP_TYPE = ('TIMESTAMP', pa.timestamp('us'))
+_CAMEL_RE = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+def snake_case(name: str) -> str:
+    return _CAMEL_RE.sub('_', name).lower()
+
+
+def _is_epoch_millis(field: Dict, avro_type: Any) -> bool:
+    """Event timestamps are longs in epoch millis: by logical type or by naming convention."""
+    if isinstance(avro_type, dict) and avro_type.get('logicalType') == 'timestamp-millis':
+        return True
+    name = field['name']
+    return avro_type in ('long', {'type': 'long'}) and (name == 'timestamp' or name.endswith('Timestamp'))
+
+
+def _millis_to_datetime(value):
+    return None if value is None else datetime.fromtimestamp(value / 1000.0)
+
+
+def _enum_value(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def _to_json(value):
+    return None if value is None else json.dumps(value, default=str)
+
+
+class Column:
+    __slots__ = ('field', 'name', 'duckdb_type', 'arrow_type', 'convert')
+
+    def __init__(self, field: str, name: str, duckdb_type: str, arrow_type: pa.DataType,
+                 convert: Optional[Callable[[Any], Any]]):
+        self.field = field
+        self.name = name
+        self.duckdb_type = duckdb_type
+        self.arrow_type = arrow_type
+        self.convert = convert
+
+
+def _column_for_field(field: Dict) -> Column:
+    avro_type = field['type']
+    # ["null", X] unions are nullable X; DuckDB columns are nullable anyway
+    if isinstance(avro_type, list):
+        non_null = [t for t in avro_type if t != 'null']
+        avro_type = non_null[0] if len(non_null) == 1 else 'string'
+    name = snake_case(field['name'])
+
+    if _is_epoch_millis(field, avro_type):
+        return Column(field['name'], name, *_TIMESTAMP_TYPE, _millis_to_datetime)
+    if isinstance(avro_type, dict):
+        kind = avro_type.get('type')
+        if kind == 'enum':
+            return Column(field['name'], name, 'VARCHAR', pa.string(), _enum_value)
+        if kind in _PRIMITIVE_TYPES:
+            return Column(field['name'], name, *_PRIMITIVE_TYPES[kind], None)
+        # Nested records, arrays and maps are kept as JSON text
+        return Column(field['name'], name, 'VARCHAR', pa.string(), _to_json)
+    if avro_type in _PRIMITIVE_TYPES:
+        return Column(field['name'], name, *_PRIMITIVE_TYPES[avro_type], None)
+    # A named type reference (e.g. a previously defined enum)
+    return Column(field['name'], name, 'VARCHAR', pa.string(), _enum_value)
+
+
+class TableMapping:
+    """How one Kafka topic's Avro records land in one DuckDB table."""
+
+    def __init__(self, topic: str, table: str, schema_str: str):
+        self.topic = topic
+        self.table = table
+        self.schema_str = schema_str
+        schema = json.loads(schema_str)
+        self.record_name = schema.get('name', table)
+        self.columns: List[Column] = [_column_for_field(f) for f in schema['fields']]
+        self.column_names = [c.name for c in self.columns]
+        self.arrow_schema = pa.schema([(c.name, c.arrow_type) for c in self.columns])
+
+    def create_table_sql(self) -> str:
+        columns = ',\n            '.join(f"{c.name} {c.duckdb_type}" for c in self.columns)
+        return f"""
+        CREATE TABLE IF NOT EXISTS {self.table} (
+            {columns}
+        )
+        """
+
+    def insert_sql(self) -> str:
+        return (
+            f"INSERT INTO {self.table} ({', '.join(self.column_names)}) "
+            f"VALUES ({', '.join('?' for _ in self.columns)})"
+        )
+
+    def to_row(self, record: Dict) -> Dict:
+        """Convert a deserialized Avro record into a row keyed by column name."""
+        row = {}
+        for column in self.columns:
+            value = record.get(column.field)
+            row[column.name] = column.convert(value) if column.convert else value
+        return row
+
+    def to_arrow(self, rows: List[Dict]) -> pa.Table:
+        return pa.table({name: [row[name] for row in rows] for name in self.column_names},
+                        schema=self.arrow_schema)
+
+
+def load_topic_config(path: Optional[str] = TOPICS_CONFIG) -> List[Dict[str, str]]:
+    """Read the topic -> table mapping from a JSON file, or fall back to the defaults."""
+    if not path:
+        return DEFAULT_TOPIC_TABLES
+    with open(path) as config_file:
+        config = json.load(config_file)
+    return config['topics'] if isinstance(config, dict) else config
+
+
+def resolve_schema(topic: str, schema_file: Optional[str], registry_client=None,
+                   fallback: Optional[str] = None) -> Tuple[str, str]:
+    """Return (schema_str, source), preferring the Schema Registry subject for the topic."""
+    if registry_client is not None:
+        try:
+            return registry_client.get_latest_version(f'{topic}-value').schema.schema_str, 'registry'
+        except Exception as e:
+            logger.warning(f"Failed to get schema for {topic} from registry: {e}")
+    if schema_file:
+        path = AVRO_SCHEMA_DIR / schema_file
+        if path.exists():
+            return path.read_text(), str(path)
+        logger.error(f"Avro schema {path} for topic {topic} not found; set AVRO_SCHEMA_DIR to the .avsc directory")
+    if fallback:
+        return fallback, 'default'
+    raise FileNotFoundError(f"No Avro schema available for topic {topic}")
@@ -0,0 +1,92 @@
+"""Destinations for messages the connector cannot decode or DuckDB refuses to store."""
+import base64
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from confluent_kafka import Producer
+
+logger = logging.getLogger(__name__)
+
+
+def _record(topic: str, partition: Optional[int], offset: Optional[int], error: str,
+            value: Optional[bytes] = None, row: Optional[Dict] = None) -> Dict:
+    return {
+        'topic': topic,
+        'partition': partition,
+        'offset': offset,
+        'error': error,
+        'value': base64.b64encode(value).decode() if value is not None else None,
+        'row': row,
+        'failed_at': datetime.now().isoformat(),
+    }
+
+
+class DeadLetters:
+    """Base class; ``send`` records one message that will not be retried."""
+
+    def __init__(self):
+        self.sent = 0
+
+    def send(self, topic: str, partition: Optional[int], offset: Optional[int], error: str,
+             value: Optional[bytes] = None, row: Optional[Dict] = None) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class FileDeadLetters(DeadLetters):
+    """Appends one JSON line per message; raw values are base64 encoded."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def send(self, topic, partition, offset, error, value=None, row=None):
+        line = json.dumps(_record(topic, partition, offset, error, value, row), default=str)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+            self.sent += 1
+
+
+class TopicDeadLetters(DeadLetters):
+    """Produces to a Kafka topic: the raw value when there is one, the JSON record otherwise.
+
+    Source topic, partition, offset and error travel as headers.
+    """
+
+    def __init__(self, topic: str, producer: Producer):
+        super().__init__()
+        self.topic = topic
+        self.producer = producer
+
+    def send(self, topic, partition, offset, error, value=None, row=None):
+        payload = value if value is not None else json.dumps(row, default=str).encode()
+        self.producer.produce(self.topic, value=payload, headers={
+            'source.topic': topic,
+            'source.partition': str(partition),
+            'source.offset': str(offset),
+            'error': error[:1000],
+        })
+        self.producer.poll(0)
+        self.sent += 1
+
+    def close(self):
+        self.producer.flush(10)
+
+
+def dead_letters_from_spec(spec: str, bootstrap_servers: str) -> Optional[DeadLetters]:
+    """``file:<path>`` writes JSON lines, any other value names a Kafka topic, empty only logs."""
+    if not spec:
+        return None
+    if spec.startswith('file:'):
+        return FileDeadLetters(spec[len('file:'):])
+    return TopicDeadLetters(spec, Producer({'bootstrap.servers': bootstrap_servers}))
@@ -0,0 +1,150 @@
+"""HTTP client for the DuckDB REST server with pooled connections, backoff and a circuit breaker."""
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying: the server is overloaded, restarting or briefly conflicting
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"DuckDB circuit breaker is open, next attempt in {retry_in:.1f}s")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and fails fast for ``reset_timeout`` seconds.
+
+    After the timeout one trial request is let through (half-open): success
+    closes the breaker, failure opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self._clock() - self._opened_at >= self.reset_timeout else "open"
+
+    def before_request(self) -> None:
+        """Raise :class:`CircuitOpen` unless a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            remaining = self.reset_timeout - (self._clock() - self._opened_at)
+            if remaining > 0 or self._trial:
+                raise CircuitOpen(max(remaining, 0.0))
+            self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures, self._opened_at, self._trial = 0, None, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial:
+                    self.opened += 1
+                self._opened_at, self._trial = self._clock(), False
+
+
+class DuckDBClient:
+    """Sends requests to the DuckDB REST server over one pooled session.
+
+    ``request`` makes a single attempt; ``request_with_retry`` retries
+    connection errors, timeouts and retryable statuses with exponential
+    backoff and full jitter, honouring ``Retry-After`` and the breaker.
+    """
+
+    def __init__(self, base_url: str, connect_timeout: float = 3.05, read_timeout: float = 30.0,
+                 pool_size: int = 4, backoff_s: float = 1.0, max_backoff_s: float = 30.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.retries = 0
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """One attempt through the circuit breaker; raises on connection errors and timeouts."""
+        self.breaker.before_request()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}",
+                                            timeout=kwargs.pop('timeout', self.timeout), **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code in RETRYABLE_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def _delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2 ** attempt))
+
+    def request_with_retry(self, method: str, path: str, stop: Callable[[], bool] = lambda: False,
+                           **kwargs) -> Optional[requests.Response]:
+        """Retry until a non-retryable response arrives; None once ``stop()`` is true after a failure."""
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.request(method, path, **kwargs)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return response
+                reason = f"HTTP {response.status_code}"
+                delay = self._delay(attempt, response)
+            except CircuitOpen as e:
+                # Another thread may hold the half-open trial: do not spin while it runs
+                reason, delay = str(e), max(e.retry_in, 0.1)
+            except requests.RequestException as e:
+                reason, delay = str(e), self._delay(attempt, None)
+            if stop():
+                return None
+            self.retries += 1
+            attempt += 1
+            logger.warning(f"{method} {path} failed ({reason}), retrying in {delay:.1f}s")
+            # Sleep in short steps so a stop request is noticed promptly
+            deadline = time.monotonic() + delay
+            while time.monotonic() < deadline and not stop():
+                time.sleep(min(0.1, max(deadline - time.monotonic(), 0)))
+
+    def close(self) -> None:
+        self.session.close()
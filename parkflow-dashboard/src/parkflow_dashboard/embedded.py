@@ -0,0 +1,234 @@
+"""The embedded storage backend: a DuckDB database file opened in this process.
+
+It runs the DuckDB server's own ``ingest``, ``rollups``, ``tiering`` and
+``timeseries`` modules, so both backends write and read alike. They are
+found in ``DUCKDB_SERVER_DIR``, ``docker/duckdb`` in a checkout; this
+module is only imported for ``DUCKDB_STORAGE=embedded:<path>``, so the
+REST backend works without them.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import duckdb
+import pyarrow as pa
+
+from parkflow_dashboard.storage import BatchRejected, OffsetConflict, Storage
+
+DUCKDB_SERVER_DIR = os.getenv('DUCKDB_SERVER_DIR', str(Path(__file__).resolve().parents[3] / 'docker' / 'duckdb'))
+if not os.path.isfile(os.path.join(DUCKDB_SERVER_DIR, 'ingest.py')):
+    raise ImportError(f"The embedded storage needs the DuckDB server's modules, not found in {DUCKDB_SERVER_DIR}; "
+                      f"set DUCKDB_SERVER_DIR to a copy of docker/duckdb")
+if DUCKDB_SERVER_DIR not in sys.path:
+    sys.path.append(DUCKDB_SERVER_DIR)
+
+from ingest import DedupIndex, OffsetConflict as StoredOffsetConflict, store_offsets, stored_offsets
+from rollups import ENTRY_ROLLUPS, RollupManager, entry_buckets
+from tiering import TIERED_TABLES, ensure_views
+from timeseries import downsample
+
+# Same window and name as the server's, so switching backends keeps the dedup guarantee
+DEDUP_WINDOW = int(os.getenv('DUCKDB_DEDUP_WINDOW', '100000'))
+
+
+class _Database:
+    """One DuckDB instance per file and process, shared by every EmbeddedStorage opened on it."""
+
+    def __init__(self, path: str, read_only: bool, dedup_window: int):
+        self.path = path
+        self.read_only = read_only
+        self.conn = duckdb.connect(path, read_only=read_only)
+        # Single writer: appends and offset updates of the whole process run one at a time
+        self.write_lock = threading.Lock()
+        self.dedup = DedupIndex(dedup_window)
+        self.rollups = RollupManager(ENTRY_ROLLUPS)
+        # Epoch seconds of the last commit per table, for the freshness line
+        self.commits: Dict[str, float] = {}
+        self.users = 0
+        if not read_only:
+            self.after_write(self.conn)
+
+    def after_write(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        """What the server's write workers run after every write: fold the rollups, create the range views.
+
+        On open it also catches up on rows written by the REST server or an
+        older version. The views read the table alone, as the server's do
+        outside tiered mode.
+        """
+        self.rollups.refresh(cursor)
+        ensure_views(cursor, TIERED_TABLES)
+
+
+_databases: Dict[str, _Database] = {}
+_databases_lock = threading.Lock()
+
+
+def _open_database(path: str, read_only: bool, dedup_window: int) -> _Database:
+    path = os.path.abspath(path)
+    with _databases_lock:
+        database = _databases.get(path)
+        if database is None:
+            database = _databases[path] = _Database(path, read_only, dedup_window)
+        elif database.read_only and not read_only:
+            raise ValueError(f"{path} is already open read-only in this process; open the writer first")
+        database.users += 1
+        return database
+
+
+def _close_database(database: _Database) -> None:
+    with _databases_lock:
+        database.users -= 1
+        if database.users == 0:
+            _databases.pop(database.path, None)
+            database.conn.close()
+
+
+def _columns(table: pa.Table) -> Dict[str, List]:
+    return {name: table.column(name).to_pylist() for name in table.column_names}
+
+
+def _isoformat(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value)
+    return value.isoformat()
+
+
+class EmbeddedStorage(Storage):
+    """A DuckDB database file opened in this process, without HTTP, JSON or a server in between.
+
+    DuckDB lets one process open a file for writing, and no other process
+    can open it meanwhile, not even read-only. Storages on the same file
+    in one process share a single instance: the connector opens it for
+    writing, and a dashboard served from the same process reads through it.
+    ``read_only`` storages never write, and open the file read-only when
+    they are the first in the process.
+    Arrow batches are scanned in place by DuckDB, so an append is one
+    columnar INSERT. Offsets, the dedup window and the entry rollups are
+    kept by the server's own code, so a file can be moved between the two
+    backends.
+    """
+
+    def __init__(self, path: str, read_only: bool = False, dedup_window: int = DEDUP_WINDOW):
+        self.path = path
+        self.read_only = read_only
+        self.dedup_window = dedup_window
+        self._database = _open_database(path, read_only, dedup_window)
+        self._local = threading.local()
+        self._closed = False
+
+    @property
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        # DuckDB connections are not thread-safe; each thread gets a cursor on the shared instance
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self._database.conn.cursor()
+        return cursor
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise BatchRejected(f"{self.path} is opened read-only")
+
+    def execute(self, sql):
+        self._check_writable()
+        with self._database.write_lock:
+            try:
+                self._cursor.execute(sql)
+            except duckdb.Error as e:
+                raise BatchRejected(str(e))
+            self._database.after_write(self._cursor)
+
+    def prepare(self, name, sql):
+        # Statements are planned per execution; there is no registry to fill
+        self._check_writable()
+
+    def _write(self, table: str, write: Callable[[duckdb.DuckDBPyConnection], Dict]) -> Dict:
+        """Run ``write`` in one transaction under the process's write lock."""
+        self._check_writable()
+        cursor = self._cursor
+        with self._database.write_lock:
+            cursor.execute("BEGIN TRANSACTION")
+            try:
+                result = write(cursor)
+                cursor.execute("COMMIT")
+            except duckdb.TransactionException as e:
+                # A failed COMMIT has already rolled back
+                raise BatchRejected(str(e))
+            except duckdb.Error as e:
+                cursor.execute("ROLLBACK")
+                raise BatchRejected(str(e))
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            self._database.commits[table] = time.time()
+            self._database.after_write(cursor)
+        return result
+
+    def insert_prepared(self, table, name, sql, rows, stop):
+        self._write(table, lambda cursor: cursor.executemany(sql, rows))
+        return True
+
+    def append(self, table, data, stop, dedup_on=None, consumer_group=None, offsets=None, replace=False):
+        pending = {}
+        insert = 'INSERT OR REPLACE' if replace else 'INSERT'
+
+        dedup = self._database.dedup
+
+        def write(cursor):
+            rows, duplicates = data, 0
+            recent = dedup.window(cursor, table, dedup_on) if dedup_on in data.column_names else None
+            if recent is not None:
+                ids = data.column(dedup_on).to_pylist()
+                mask = dedup.keep_mask(recent, ids)
+                rows = data.filter(pa.array(mask, type=pa.bool_()))
+                duplicates = mask.count(False)
+                pending['ids'] = (recent, ids, mask)
+            view_name = f"__append_{uuid.uuid4().hex}"
+            cursor.register(view_name, rows)
+            try:
+                cursor.execute(f'{insert} INTO "{table}" BY NAME SELECT * FROM {view_name}')
+            finally:
+                cursor.unregister(view_name)
+            if offsets:
+                try:
+                    store_offsets(cursor, consumer_group, offsets)
+                except StoredOffsetConflict as e:
+                    raise OffsetConflict({(o['topic'], o['partition']): o['offset'] for o in e.stored})
+            return {'rows': rows.num_rows, 'duplicates': duplicates}
+
+        result = self._write(table, write)
+        if 'ids' in pending:
+            # Only ids that committed join the window
+            dedup.committed(*pending['ids'])
+        return result
+
+    def stored_offsets(self, group, topic):
+        return {(o['topic'], o['partition']): o['offset'] for o in stored_offsets(self._cursor, group, topic)}
+
+    def query_prepared(self, name, sql, params):
+        table = self._cursor.execute(sql, params).fetch_arrow_table()
+        return {'status': 'success', 'columns': table.column_names, 'data': _columns(table)}
+
+    def dashboard_entries(self, start, bucket_seconds, since_version):
+        return {'status': 'success', **entry_buckets(self._cursor, start, bucket_seconds, since_version)}
+
+    def timeseries(self, table, time_column, start, end, points, group_by=(), value=None,
+                   aggregates=('count',), mode='buckets'):
+        result = downsample(self._cursor, table, time_column, start, end, points, group_by, value, aggregates, mode)
+        return {'status': 'success', 'table': table, **result}
+
+    def freshness(self, table):
+        newest = self._cursor.execute(f'SELECT max(timestamp) FROM "{table}"').fetchone()[0]
+        return {'status': 'success', 'table': table, 'newest_event': _isoformat(newest),
+                'last_commit': _isoformat(self._database.commits.get(table))}
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            _close_database(self._database)
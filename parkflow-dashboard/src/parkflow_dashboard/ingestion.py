@@ -0,0 +1,173 @@
+"""Schema-driven ingestion of every mapped ParkFlow topic into DuckDB."""
+import argparse
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from confluent_kafka import Consumer
+
+from confluent_kafka.schema_registry import SchemaRegistryClient
+
+from parkflow_dashboard.avro_mapping import TableMapping, load_topic_config, resolve_schema
+from parkflow_dashboard.dead_letters import dead_letters_from_spec
+from parkflow_dashboard.metrics import serve_metrics
+from parkflow_dashboard.kafka_duckdb_connector import (
+    DEAD_LETTERS,
+    DECODE_PROCESSES,
+    DEFAULT_ENTRY_SCHEMA,
+    EXACTLY_ONCE,
+    ENTRY_TOPIC,
+    KAFKA_BOOTSTRAP_SERVERS,
+    LAG_STATS_INTERVAL_MS,
+    METRICS_PORT,
+    SCHEMA_REGISTRY_URL,
+    WORKERS,
+    KafkaToDuckDBConnector,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def build_mappings(topic_config: List[Dict[str, str]],
+                   registry_client: Optional[SchemaRegistryClient] = None) -> List[TableMapping]:
+    """Resolve the Avro schema for every configured topic and derive its table mapping."""
+    mappings = []
+    for entry in topic_config:
+        fallback = DEFAULT_ENTRY_SCHEMA if entry['topic'] == ENTRY_TOPIC else None
+        try:
+            schema_str, source = resolve_schema(entry['topic'], entry.get('schema'),
+                                                registry_client, fallback=fallback)
+        except FileNotFoundError as e:
+            logger.error(f"Skipping topic {entry['topic']}: {e}")
+            continue
+        logger.info(f"Topic {entry['topic']} -> table {entry['table']} (schema from {source})")
+        mappings.append(TableMapping(entry['topic'], entry['table'], schema_str))
+    return mappings
+
+
+class MultiTopicIngestion:
+    """Runs ``workers`` batched KafkaToDuckDBConnectors per mapped topic, each in its own thread.
+
+    The connectors of a topic share the consumer group, so Kafka spreads the
+    topic's partitions across them and each commits only its own partitions.
+    """
+
+    def __init__(self, mappings: List[TableMapping],
+                 schema_registry_client: Optional[SchemaRegistryClient] = None,
+                 consumer_factory: Optional[Callable[[TableMapping], Consumer]] = None,
+                 workers: int = WORKERS,
+                 **connector_options):
+        self.workers = workers
+        self.connectors = [
+            KafkaToDuckDBConnector(mapping=mapping,
+                                   schema_registry_client=schema_registry_client,
+                                   consumer=consumer_factory(mapping) if consumer_factory else None,
+                                   **connector_options)
+            for mapping in mappings
+            for _ in range(workers)
+        ]
+        self.threads: List[threading.Thread] = []
+
+    def start(self):
+        for index, connector in enumerate(self.connectors):
+            thread = threading.Thread(target=connector.start,
+                                      name=f"ingest-{connector.mapping.table}-{index % self.workers}",
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def metrics(self) -> List[Dict]:
+        """Rows written and per-partition consumer lag of every worker."""
+        return [dict(connector.metrics(), worker=index % self.workers)
+                for index, connector in enumerate(self.connectors)]
+
+    def log_metrics(self):
+        for worker in self.metrics():
+            if worker['partition_lag']:
+                lag = ', '.join(f"{partition}={lag}" for partition, lag in worker['partition_lag'].items())
+                logger.info(f"{worker['table']} worker {worker['worker']}: "
+                            f"{worker['rows_written']} rows written, lag {lag}, "
+                            f"{worker['queued_batches']} batches queued{' (paused)' if worker['paused'] else ''}, "
+                            f"{worker['dead_letters']} dead letters, circuit {worker['circuit']}"
+                            f"{self._event_lag(worker)}")
+
+    @staticmethod
+    def _event_lag(worker: Dict) -> str:
+        return '' if worker['event_lag_s'] is None else f", event lag {worker['event_lag_s']:.1f}s"
+
+    def stop(self):
+        for connector in self.connectors:
+            connector.stop()
+
+    def join(self, timeout: Optional[float] = None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def run(self, metrics_interval_s: float = LAG_STATS_INTERVAL_MS / 1000.0):
+        """Start every topic consumer and block until interrupted, logging lag periodically."""
+        self.start()
+        next_report = time.monotonic() + metrics_interval_s
+        try:
+            while any(thread.is_alive() for thread in self.threads):
+                self.join(timeout=1.0)
+                if time.monotonic() >= next_report:
+                    self.log_metrics()
+                    next_report = time.monotonic() + metrics_interval_s
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            self.join()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Ingest ParkFlow Kafka topics into DuckDB")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="consumers per topic in the same group; useful up to the partition count")
+    parser.add_argument("--decode-processes", type=int, default=DECODE_PROCESSES,
+                        help="processes per consumer for Avro decoding (0 decodes in the consumer thread)")
+    parser.add_argument("--exactly-once", action="store_true", default=EXACTLY_ONCE,
+                        help="store offsets in DuckDB with each batch and skip duplicate event ids")
+    parser.add_argument("--dlq", default=DEAD_LETTERS,
+                        help="dead-letter topic, or file:<path> for JSON lines; empty only logs")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="port of the Prometheus /metrics endpoint; 0 disables it")
+    parser.add_argument("--windows", action="store_true",
+                        help="also keep the event-time entry windows current, see parkflow_dashboard.windows")
+    parser.add_argument("--dashboard-port", type=int, default=0,
+                        help="also serve the dashboard from this process, for DUCKDB_STORAGE=embedded:<path>; "
+                             "0 does not")
+    args = parser.parse_args(argv)
+
+    registry_client = SchemaRegistryClient({'url': SCHEMA_REGISTRY_URL})
+    mappings = build_mappings(load_topic_config(), registry_client)
+    # One destination shared by every worker
+    ingestion = MultiTopicIngestion(mappings, schema_registry_client=registry_client,
+                                    workers=args.workers, decode_processes=args.decode_processes,
+                                    exactly_once=args.exactly_once,
+                                    dead_letters=dead_letters_from_spec(args.dlq, KAFKA_BOOTSTRAP_SERVERS))
+    if args.metrics_port:
+        serve_metrics(args.metrics_port, ingestion.metrics)
+        logger.info(f"Serving metrics on port {args.metrics_port}")
+    windows = None
+    if args.windows:
+        # Opened after the connectors, so an embedded database file is shared with them
+        from parkflow_dashboard.windows import WindowProcessor
+        windows = WindowProcessor()
+        threading.Thread(target=windows.start, name="entry-windows", daemon=True).start()
+    if args.dashboard_port:
+        # Imported after the connectors opened the database, so the dashboard reads their instance
+        from parkflow_dashboard import app as dashboard
+        threading.Thread(target=dashboard.app.run, name="dashboard", daemon=True,
+                         kwargs={'host': '0.0.0.0', 'port': args.dashboard_port}).start()
+        logger.info(f"Serving the dashboard on port {args.dashboard_port}")
+    try:
+        ingestion.run()
+    finally:
+        if windows is not None:
+            windows.stop()
+
+
+if __name__ == '__main__':
+    main()
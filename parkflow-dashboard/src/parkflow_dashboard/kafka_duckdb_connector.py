@@ -1,144 +1,681 @@
 import logging
 import os
 import json
-import requests
-from confluent_kafka import Consumer
+import queue
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from confluent_kafka import TIMESTAMP_NOT_AVAILABLE, Consumer, KafkaException, TopicPartition
 from confluent_kafka.serialization import SerializationContext, MessageField
 from confluent_kafka.schema_registry import SchemaRegistryClient
 from confluent_kafka.schema_registry.avro import AvroDeserializer
-from typing import Optional
-from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from parkflow_dashboard.avro_mapping import TableMapping, resolve_schema
+from parkflow_dashboard.dead_letters import DeadLetters, dead_letters_from_spec
+from parkflow_dashboard.duckdb_client import CircuitBreaker, DuckDBClient
+from parkflow_dashboard.metrics import BatchTimer
+from parkflow_dashboard.storage import BatchRejected, OffsetConflict, RestStorage, Storage, storage_from_spec
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DUCKDB_API_URL = os.getenv('DUCKDB_API_URL', 'http://localhost:3000')
+# 'rest' writes through the DuckDB server at DUCKDB_API_URL, 'embedded:<path>' opens the database file in-process
+DUCKDB_STORAGE = os.getenv('DUCKDB_STORAGE', 'rest')
 KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092')
 SCHEMA_REGISTRY_URL = os.getenv('SCHEMA_REGISTRY_URL', 'http://localhost:8081')
 
+# Micro-batching configuration
+BATCH_MODE = os.getenv('CONNECTOR_BATCH_MODE', 'true').lower() == 'true'
+BATCH_SIZE = int(os.getenv('CONNECTOR_BATCH_SIZE', '5000'))
+BATCH_LINGER_MS = int(os.getenv('CONNECTOR_BATCH_LINGER_MS', '200'))
+BATCH_RETRY_BACKOFF_S = float(os.getenv('CONNECTOR_BATCH_RETRY_BACKOFF_S', '1.0'))
+# 'arrow' appends columnar batches, 'sql' runs a prepared INSERT
+WRITE_METHOD = os.getenv('CONNECTOR_WRITE_METHOD', 'arrow').lower()
+
+# Scaling: consumers per topic in one group, and processes for Avro decoding (0 = decode inline)
+WORKERS = int(os.getenv('CONNECTOR_WORKERS', '1'))
+DECODE_PROCESSES = int(os.getenv('CONNECTOR_DECODE_PROCESSES', '0'))
+# How often librdkafka reports per-partition consumer lag
+LAG_STATS_INTERVAL_MS = int(os.getenv('CONNECTOR_LAG_STATS_INTERVAL_MS', '5000'))
+
+# Writer pipeline: batches waiting for the writer thread before the consumer pauses its partitions
+QUEUE_BATCHES = int(os.getenv('CONNECTOR_QUEUE_BATCHES', '4'))
+# Maximum wait for queued batches to be written when partitions are revoked
+REBALANCE_DRAIN_TIMEOUT_S = float(os.getenv('CONNECTOR_REBALANCE_DRAIN_TIMEOUT_S', '30'))
+# HTTP to DuckDB: read timeout, retry backoff cap, and the circuit breaker
+HTTP_TIMEOUT_S = float(os.getenv('CONNECTOR_HTTP_TIMEOUT_S', '30'))
+MAX_BACKOFF_S = float(os.getenv('CONNECTOR_MAX_BACKOFF_S', '30'))
+BREAKER_FAILURES = int(os.getenv('CONNECTOR_BREAKER_FAILURES', '5'))
+BREAKER_RESET_S = float(os.getenv('CONNECTOR_BREAKER_RESET_S', '30'))
+# Undecodable and rejected messages: a Kafka topic, file:<path>, or empty to only log them
+DEAD_LETTERS = os.getenv('CONNECTOR_DLQ', '')
+# Port of the Prometheus /metrics endpoint served by ingestion; 0 disables it
+METRICS_PORT = int(os.getenv('CONNECTOR_METRICS_PORT', '9108'))
+# Poll interval while paused; polling keeps the group membership and rebalance callbacks alive
+PAUSED_POLL_S = 0.1
+
+# Exactly-once: offsets are stored in DuckDB with each batch and rows are deduplicated on event_id
+EXACTLY_ONCE = os.getenv('CONNECTOR_EXACTLY_ONCE', 'false').lower() == 'true'
+DEDUP_COLUMN = 'event_id'
+GROUP_ID = 'parkflow-duckdb-connector'
+
+ENTRY_TOPIC = 'parking.entry.events'
+ENTRY_TABLE = 'vehicle_entries'
+ENTRY_SCHEMA_FILE = 'VehicleEntryEvent.avsc'
+DEFAULT_ENTRY_SCHEMA = """{
+    "type": "record",
+    "name": "VehicleEntryEvent",
+    "fields": [
+        {"name": "eventId", "type": "string"},
+        {"name": "timestamp", "type": "long"},
+        {"name": "licensePlate", "type": "string"},
+        {"name": "gateId", "type": "string"},
+        {"name": "laneId", "type": "string"},
+        {"name": "confidence", "type": "double"},
+        {"name": "imageUrl", "type": ["string", "null"]},
+        {"name": "vehicleType", "type": "string"}
+    ]
+}"""
+
+
+def entry_mapping(registry_client: Optional[SchemaRegistryClient] = None) -> TableMapping:
+    """Mapping for parking.entry.events -> vehicle_entries."""
+    schema_str, _ = resolve_schema(ENTRY_TOPIC, ENTRY_SCHEMA_FILE, registry_client,
+                                   fallback=DEFAULT_ENTRY_SCHEMA)
+    return TableMapping(ENTRY_TOPIC, ENTRY_TABLE, schema_str)
+
+
+# Per-process state of the optional decode pool, set by _init_decode_worker
+_worker_decoder = None
+
+
+def _init_decode_worker(topic: str, table: str, schema_str: str, registry_url: str):
+    global _worker_decoder
+    mapping = TableMapping(topic, table, schema_str)
+    deserializer = AvroDeserializer(SchemaRegistryClient({'url': registry_url}), schema_str)
+    _worker_decoder = (mapping, deserializer)
+
+
+def _decode_values(values: List[bytes]) -> Tuple[List[Dict], List[Tuple[int, str]]]:
+    """Decode raw message values into table rows inside a decode pool process.
+
+    Returns the rows and the (index, error) of every value that failed.
+    """
+    mapping, deserializer = _worker_decoder
+    ctx = SerializationContext(mapping.topic, MessageField.VALUE)
+    rows, failures = [], []
+    for index, value in enumerate(values):
+        try:
+            rows.append(mapping.to_row(deserializer(value, ctx)))
+        except Exception as e:
+            failures.append((index, str(e)))
+    return rows, failures
+
+
+def _event_time(msg) -> Optional[float]:
+    """Epoch seconds of the message's Kafka timestamp, set by the producer or the broker."""
+    timestamp_type, timestamp = msg.timestamp()
+    return None if timestamp_type == TIMESTAMP_NOT_AVAILABLE else timestamp / 1000.0
+
+
+class Batch(NamedTuple):
+    """Rows handed from the consumer thread to the writer thread."""
+    rows: List[Dict]
+    # First and next offset per (topic, partition)
+    starts: Dict[Tuple[str, int], int]
+    offsets: Dict[Tuple[str, int], int]
+    # Monotonic time the first message was consumed and the batch was queued
+    consumed_at: Optional[float] = None
+    queued_at: Optional[float] = None
+    # Epoch seconds of the oldest Kafka message timestamp, None if the broker gave none
+    oldest_event: Optional[float] = None
+
+
 class KafkaToDuckDBConnector:
-    def __init__(self):
-        self.consumer = self._init_kafka_consumer()
-        self.avro_deserializer = self._init_avro_deserializer()
+    """Consumes one topic and writes its Avro records into the mapped DuckDB table.
+
+    In batch mode the consumer thread polls and decodes, and hands full
+    batches to a writer thread through a bounded queue.
+    The writer retries with backoff behind a circuit breaker; while the queue
+    is full the consumer pauses its partitions instead of buffering more.
+    Messages that cannot be decoded or that DuckDB rejects go to the
+    dead-letter destination and their offsets are committed.
+    """
+
+    def __init__(self, consumer: Optional[Consumer] = None,
+                 avro_deserializer: Optional[AvroDeserializer] = None,
+                 batch_mode: bool = BATCH_MODE,
+                 batch_size: int = BATCH_SIZE,
+                 batch_linger_ms: int = BATCH_LINGER_MS,
+                 write_method: str = WRITE_METHOD,
+                 mapping: Optional[TableMapping] = None,
+                 schema_registry_client: Optional[SchemaRegistryClient] = None,
+                 decode_processes: int = DECODE_PROCESSES,
+                 exactly_once: bool = EXACTLY_ONCE,
+                 client: Optional[DuckDBClient] = None,
+                 storage: Optional[Storage] = None,
+                 queue_batches: int = QUEUE_BATCHES,
+                 dead_letters: Optional[DeadLetters] = None):
+        if exactly_once and not (batch_mode and write_method == 'arrow'):
+            raise ValueError("exactly_once needs batch_mode with the 'arrow' write method")
+        self.batch_mode = batch_mode
+        self.exactly_once = exactly_once
+        self.write_method = write_method
+        self.batch_size = batch_size
+        self.batch_linger_ms = batch_linger_ms
+        self.decode_processes = decode_processes
+        self.running = False
+        self.partition_lag: Dict[Tuple[str, int], int] = {}
+        self.rows_written = 0
+        self.duplicates_skipped = 0
+        self.dead_lettered = 0
+        self.paused = False
+        self.last_event_lag: Optional[float] = None
+        if storage is None:
+            storage = RestStorage(client) if client is not None else storage_from_spec(
+                DUCKDB_STORAGE, lambda: DuckDBClient(
+                    DUCKDB_API_URL, read_timeout=HTTP_TIMEOUT_S,
+                    backoff_s=BATCH_RETRY_BACKOFF_S, max_backoff_s=MAX_BACKOFF_S,
+                    breaker=CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET_S)
+                ))
+        self.storage = storage
+        if dead_letters is None:
+            dead_letters = dead_letters_from_spec(DEAD_LETTERS, KAFKA_BOOTSTRAP_SERVERS)
+        self.dead_letters = dead_letters
+        self._queue: "queue.Queue[Optional[Batch]]" = queue.Queue(maxsize=max(1, queue_batches))
+        self._writer: Optional[threading.Thread] = None
+        # Exactly-once: next offset to read per partition should queued batches be dropped
+        self._lock = threading.Lock()
+        self._resume_from: Dict[Tuple[str, int], int] = {}
+        self._conflict = threading.Event()
+        self._decode_pool: Optional[ProcessPoolExecutor] = None
+        # Current batch: rows, first and next offset per (topic, partition) and linger deadline
+        self._rows: List[Dict] = []
+        self._starts: Dict[Tuple[str, int], int] = {}
+        self._offsets: Dict[Tuple[str, int], int] = {}
+        self._deadline: Optional[float] = None
+        self._consumed_at: Optional[float] = None
+        self._oldest_event: Optional[float] = None
+        if avro_deserializer is None and schema_registry_client is None:
+            schema_registry_client = SchemaRegistryClient({'url': SCHEMA_REGISTRY_URL})
+        self.schema_registry_client = schema_registry_client
+        self.mapping = mapping or entry_mapping(schema_registry_client)
+        self.insert_statement = f"insert_{self.mapping.table}"
+        self.timer = BatchTimer(self.mapping.table)
+        self.consumer = consumer or self._init_kafka_consumer()
+        self.avro_deserializer = avro_deserializer or self._init_avro_deserializer()
         self._init_duckdb_table()
-        
+
     def _init_kafka_consumer(self) -> Consumer:
         consumer_conf = {
             'bootstrap.servers': KAFKA_BOOTSTRAP_SERVERS,
-            'group.id': 'parkflow-duckdb-connector',
-            'auto.offset.reset': 'earliest'
+            'group.id': GROUP_ID,
+            'auto.offset.reset': 'earliest',
+            # In batch mode offsets are committed only after the batch is written
+            'enable.auto.commit': not self.batch_mode,
+            'statistics.interval.ms': LAG_STATS_INTERVAL_MS,
+            'stats_cb': self._on_stats
         }
         return Consumer(consumer_conf)
-    
+
     def _init_avro_deserializer(self) -> AvroDeserializer:
-        schema_registry_conf = {'url': SCHEMA_REGISTRY_URL}
-        schema_registry_client = SchemaRegistryClient(schema_registry_conf)
-        
-        # Get the latest schema for the topic
+        # Records come back as plain dicts; the table mapping converts them to rows
+        return AvroDeserializer(self.schema_registry_client, self.mapping.schema_str)
+
+    def _init_duckdb_table(self):
+        # DDL derived from the Avro schema of the topic
+        try:
+            self.storage.execute(self.mapping.create_table_sql())
+        except BatchRejected as e:
+            raise Exception(f"Failed to create table: {e}")
+        logger.info(f"DuckDB table {self.mapping.table} initialized")
+        if self.write_method == 'sql':
+            self._register_insert_statement()
+
+    def _register_insert_statement(self):
         try:
-            schema_str = schema_registry_client.get_latest_version('parking.entry.events-value').schema.schema_str
+            self.storage.prepare(self.insert_statement, self.mapping.insert_sql())
+        except BatchRejected as e:
+            raise Exception(f"Failed to prepare insert statement: {e}")
+
+    def _on_stats(self, stats_json: str) -> None:
+        """Keep the consumer lag of the partitions assigned to this consumer."""
+        stats = json.loads(stats_json)
+        lag = {}
+        for topic, topic_stats in stats.get('topics', {}).items():
+            for partition, partition_stats in topic_stats.get('partitions', {}).items():
+                # -1 is the internal unassigned partition; lag is -1 when unknown
+                if partition == '-1' or partition_stats.get('consumer_lag', -1) < 0:
+                    continue
+                lag[(topic, int(partition))] = partition_stats['consumer_lag']
+        self.partition_lag = lag
+
+    def metrics(self) -> Dict:
+        return {
+            'table': self.mapping.table,
+            'rows_written': self.rows_written,
+            'duplicates_skipped': self.duplicates_skipped,
+            'dead_letters': self.dead_lettered,
+            'queued_batches': self._queue.qsize(),
+            'paused': self.paused,
+            'http_retries': self.storage.retries,
+            'circuit': self.storage.circuit,
+            'event_lag_s': self.last_event_lag,
+            'partition_lag': {f"{topic}[{partition}]": lag
+                              for (topic, partition), lag in sorted(self.partition_lag.items())},
+        }
+
+    def _decode(self, msg) -> Dict:
+        """Deserialize a Kafka message into a row of the mapped table."""
+        event = self.avro_deserializer(msg.value(), SerializationContext(msg.topic(), MessageField.VALUE))
+        return self.mapping.to_row(event)
+
+    def _stopped(self) -> bool:
+        return not self.running
+
+    def _insert_rows(self, rows: List[Dict], dedup_on: Optional[str] = None) -> bool:
+        """Insert rows into DuckDB with a single write.
+
+        Returns False if the connector stopped before the write succeeded and
+        raises :class:`BatchRejected` if DuckDB refused it.
+        """
+        if self.write_method == 'arrow':
+            return self._append_arrow(rows, dedup_on)
+        return self._insert_sql(rows)
+
+    def _append_arrow(self, rows: List[Dict], dedup_on: Optional[str] = None) -> bool:
+        """Append rows as one Arrow table, retried until stored or the connector stops."""
+        return self.storage.append(self.mapping.table, self.mapping.to_arrow(rows), self._stopped,
+                                   dedup_on=dedup_on) is not None
+
+    def _insert_sql(self, rows: List[Dict]) -> bool:
+        """Insert rows as one parameter batch of the prepared INSERT statement."""
+        return self.storage.insert_prepared(
+            self.mapping.table, self.insert_statement, self.mapping.insert_sql(),
+            [[row[col] for col in self.mapping.column_names] for row in rows], self._stopped)
+
+    def _dead_letter(self, topic: str, partition: Optional[int], offset: Optional[int], error: str,
+                     value=None, row: Optional[Dict] = None) -> None:
+        self.dead_lettered += 1
+        if self.dead_letters is None:
+            logger.error(f"Dropping message {topic}[{partition}]@{offset}: {error}")
+            return
+        self.dead_letters.send(topic, partition, offset, error,
+                               value=value if isinstance(value, bytes) else None, row=row)
+
+    def _dead_letter_message(self, msg, error: str) -> None:
+        self._dead_letter(msg.topic(), msg.partition(), msg.offset(), error, value=msg.value())
+
+    def _handle_message(self, msg) -> None:
+        """Per-row path: decode one message and insert it immediately."""
+        if msg.error():
+            logger.error(f"Consumer error: {msg.error()}")
+            return
+        try:
+            row = self._decode(msg)
         except Exception as e:
-            logger.warning(f"Failed to get schema from registry: {e}. Using default schema.")
-            schema_str = """{
-                "type": "record",
-                "name": "VehicleEntryEvent",
-                "fields": [
-                    {"name": "eventId", "type": "string"},
-                    {"name": "timestamp", "type": "long"},
-                    {"name": "licensePlate", "type": "string"},
-                    {"name": "gateId", "type": "string"},
-                    {"name": "laneId", "type": "string"},
-                    {"name": "confidence", "type": "double"},
-                    {"name": "imageUrl", "type": ["string", "null"]},
-                    {"name": "vehicleType", "type": "string"}
-                ]
-            }"""
-        
-        return AvroDeserializer(schema_registry_client,
-                               schema_str,
-                               lambda x, ctx: {
-                                   'eventId': str(x['eventId']),
-                                   'timestamp': x['timestamp'],
-                                   'licensePlate': str(x['licensePlate']),
-                                   'gateId': str(x['gateId']),
-                                   'laneId': str(x['laneId']),
-                                   'confidence': x['confidence'],
-                                   'imageUrl': x['imageUrl'],
-                                   'vehicleType': str(x['vehicleType']) if isinstance(x['vehicleType'], str) else x['vehicleType'].value
-                               })
-    
-    def _init_duckdb_table(self):
-        query = """
-        CREATE TABLE IF NOT EXISTS vehicle_entries (
-            event_id VARCHAR,
-            timestamp TIMESTAMP,
-            license_plate VARCHAR,
-            gate_id VARCHAR,
-            lane_id VARCHAR,
-            confidence DOUBLE,
-            image_url VARCHAR,
-            vehicle_type VARCHAR
-        )
+            self._dead_letter_message(msg, f"Undecodable: {e}")
+            return
+        try:
+            started = time.monotonic()
+            if self._insert_rows([row]):
+                self.last_event_lag = self.timer.written(started, started, _event_time(msg))
+                logger.info(f"Processed {self.mapping.record_name} from {msg.topic()}")
+        except BatchRejected as e:
+            self._dead_letter_message(msg, str(e))
+        except Exception as e:
+            logger.error(f"Error processing message: {e}")
+
+    def _decode_batch(self, msgs) -> List[Dict]:
+        with self.timer.decode.time():
+            return self._decode_messages(msgs)
+
+    def _decode_messages(self, msgs) -> List[Dict]:
+        if self._consumed_at is None:
+            self._consumed_at = time.monotonic()
+        valid = []
+        for msg in msgs:
+            if msg.error():
+                logger.error(f"Consumer error: {msg.error()}")
+                continue
+            # Offsets advance past undecodable messages too, they would fail again
+            key = (msg.topic(), msg.partition())
+            self._starts.setdefault(key, msg.offset())
+            self._offsets[key] = msg.offset() + 1
+            event_time = _event_time(msg)
+            if event_time is not None and (self._oldest_event is None or event_time < self._oldest_event):
+                self._oldest_event = event_time
+            valid.append(msg)
+        if self.exactly_once:
+            with self._lock:
+                for key, start in self._starts.items():
+                    self._resume_from.setdefault(key, start)
+
+        if self._decode_pool is not None:
+            values = [msg.value() for msg in valid]
+            chunk = -(-len(values) // self.decode_processes) or 1
+            rows = []
+            # map() keeps chunk order, so rows stay in partition order
+            for index, (chunk_rows, failures) in enumerate(self._decode_pool.map(
+                    _decode_values, [values[i:i + chunk] for i in range(0, len(values), chunk)])):
+                rows.extend(chunk_rows)
+                for position, error in failures:
+                    self._dead_letter_message(valid[index * chunk + position], f"Undecodable: {error}")
+            return rows
+
+        rows = []
+        for msg in valid:
+            try:
+                rows.append(self._decode(msg))
+            except Exception as e:
+                self._dead_letter_message(msg, f"Undecodable: {e}")
+        return rows
+
+    def _isolate(self, rows: List[Dict], error: str, dedup_on: Optional[str] = None) -> bool:
+        """Bisect a rejected batch: write what DuckDB accepts and dead-letter rows it refuses alone."""
+        if len(rows) == 1:
+            self._dead_letter(self.mapping.topic, None, None, error, row=rows[0])
+            return True
+        middle = len(rows) // 2
+        for half in (rows[:middle], rows[middle:]):
+            try:
+                if not self._insert_rows(half, dedup_on):
+                    return False
+                self.rows_written += len(half)
+            except BatchRejected as e:
+                if not self._isolate(half, str(e), dedup_on):
+                    return False
+        return True
+
+    def _flush(self, rows: List[Dict], offsets: Optional[Dict[Tuple[str, int], int]] = None,
+               starts: Optional[Dict[Tuple[str, int], int]] = None) -> bool:
+        """Write a batch and commit the consumed offsets once it is stored.
+
+        Retries until DuckDB answers, so False means the connector stopped
+        first and the batch will be redelivered.
+        Rows of a rejected batch are isolated and dead-lettered; its offsets
+        are still committed.
         """
-        response = requests.post(
-            f"{DUCKDB_API_URL}/query",
-            headers={'Content-Type': 'application/json'},
-            params={'query': query}
+        if self.exactly_once and offsets:
+            return self._flush_exactly_once(rows, offsets, starts or {})
+        try:
+            if rows and not self._insert_rows(rows):
+                return False
+            self.rows_written += len(rows)
+        except BatchRejected as e:
+            logger.warning(f"DuckDB rejected a batch of {len(rows)} rows ({e}); isolating the bad rows")
+            if not self._isolate(rows, str(e)):
+                return False
+        if not self.batch_mode:
+            return True
+        if offsets:
+            # Commit exactly the partitions and offsets this batch covered
+            self.consumer.commit(
+                offsets=[TopicPartition(topic, partition, offset)
+                         for (topic, partition), offset in offsets.items()],
+                asynchronous=False
+            )
+        if rows:
+            logger.info(f"Processed batch of {len(rows)} {self.mapping.record_name} events")
+        return True
+
+    def _flush_exactly_once(self, rows: List[Dict], offsets: Dict[Tuple[str, int], int],
+                            starts: Dict[Tuple[str, int], int]) -> bool:
+        """Append a batch and its offsets in one DuckDB transaction, skipping recent event ids.
+
+        DuckDB's offsets are authoritative; the Kafka commit afterwards only
+        keeps lag monitoring accurate. A conflict means the batch overlaps
+        rows already stored, by this consumer's retry or by a new owner of
+        the partition: the batch and every batch queued after it are dropped
+        and the consumer thread resumes from the stored offsets.
+        A rejected batch is isolated without offsets, relying on the event_id
+        window, and its offsets are then stored with an empty batch.
+        """
+        dedup_on = DEDUP_COLUMN if DEDUP_COLUMN in self.mapping.column_names else None
+        ranges = {key: (starts.get(key, offset), offset) for key, offset in offsets.items()}
+        try:
+            result = self.storage.append(self.mapping.table, self.mapping.to_arrow(rows), self._stopped,
+                                         dedup_on=dedup_on, consumer_group=GROUP_ID, offsets=ranges)
+        except OffsetConflict as e:
+            stored = e.stored
+            logger.warning(f"Batch of {len(rows)} rows overlaps stored offsets {stored}; resuming from them")
+            with self._lock:
+                for key, start in starts.items():
+                    self._resume_from[key] = max(start, stored.get(key, start))
+            self._conflict.set()
+            return True
+        except BatchRejected as e:
+            if not rows:
+                raise BatchRejected(f"Could not store offsets: {e}")
+            logger.warning(f"DuckDB rejected a batch of {len(rows)} rows ({e}); isolating the bad rows")
+            if not self._isolate(rows, str(e), dedup_on):
+                return False
+            return self._flush_exactly_once([], offsets, starts)
+        if result is None:
+            return False
+        self.rows_written += result['rows']
+        self.duplicates_skipped += result.get('duplicates', 0)
+        with self._lock:
+            self._resume_from.update(offsets)
+        self.consumer.commit(
+            offsets=[TopicPartition(topic, partition, offset) for (topic, partition), offset in offsets.items()],
+            asynchronous=True
         )
-        if response.status_code != 200:
-            raise Exception(f"Failed to create table: {response.text}")
-        logger.info("DuckDB table initialized")
+        if rows:
+            logger.info(f"Processed batch of {len(rows)} {self.mapping.record_name} events")
+        return True
 
-    def start(self):
-        self.consumer.subscribe(['parking.entry.events'])
-        
+    def _seek(self, positions: Dict[Tuple[str, int], int]) -> None:
+        for (topic, partition), offset in positions.items():
+            try:
+                self.consumer.seek(TopicPartition(topic, partition, offset))
+            except KafkaException as e:
+                # No longer assigned: the new owner resumes from DuckDB's offsets
+                logger.info(f"Not seeking {topic}[{partition}]: {e}")
+
+    def _stored_offsets(self) -> Dict[Tuple[str, int], int]:
+        return self.storage.stored_offsets(GROUP_ID, self.mapping.topic)
+
+    def _on_assign(self, consumer, partitions):
+        """Start newly assigned partitions from the offsets stored in DuckDB."""
         try:
-            while True:
-                msg = self.consumer.poll(1.0)
-                if msg is None:
-                    continue
-                if msg.error():
-                    logger.error(f"Consumer error: {msg.error()}")
-                    continue
-                
+            stored = self._stored_offsets()
+        except Exception as e:
+            # The event_id window still catches what the Kafka offsets replay
+            logger.warning(f"Could not read stored offsets, using Kafka's: {e}")
+            return
+        for tp in partitions:
+            if (tp.topic, tp.partition) in stored:
+                tp.offset = stored[(tp.topic, tp.partition)]
+        consumer.assign(partitions)
+
+    def _reset_batch(self):
+        self._rows, self._starts, self._offsets, self._deadline = [], {}, {}, None
+        self._consumed_at = self._oldest_event = None
+
+    def _current_batch(self) -> Batch:
+        return Batch(self._rows, self._starts, self._offsets, self._consumed_at, time.monotonic(),
+                     self._oldest_event)
+
+    def _take_batch(self) -> Batch:
+        batch = self._current_batch()
+        self._reset_batch()
+        return batch
+
+    def _write_batch(self, batch: Batch) -> bool:
+        """Flush a batch and record how long it queued, wrote, and lived since it was consumed."""
+        started = time.monotonic()
+        if batch.queued_at is not None:
+            self.timer.queue.observe(started - batch.queued_at)
+        if not self._flush(batch.rows, batch.offsets, batch.starts):
+            return False
+        # Rows dropped for a conflict are read and timed again
+        if batch.rows and batch.consumed_at is not None and not self._conflict.is_set():
+            self.last_event_lag = self.timer.written(batch.consumed_at, started, batch.oldest_event)
+        return True
+
+    def _wait_for_writer(self, timeout: Optional[float] = None) -> bool:
+        """Block until the writer has finished every queued batch; False on timeout."""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def _on_revoke(self, consumer, partitions):
+        """Write the buffered and queued batches before another group member takes over their partitions."""
+        if self._offsets:
+            batch = self._take_batch()
+            if self._writer is None:
+                if not self._write_batch(batch):
+                    logger.warning(f"Dropped batch of {len(batch.rows)} rows on rebalance; it will be redelivered")
+            else:
                 try:
-                    # Deserialize the Avro message
-                    event = self.avro_deserializer(msg.value(), SerializationContext(msg.topic(), MessageField.VALUE))
-                    
-                    # Convert timestamp to ISO format
-                    timestamp = datetime.fromtimestamp(event['timestamp'] / 1000.0).isoformat()
-                    
-                    # Insert into DuckDB via REST API
-                    query = f"""
-                    INSERT INTO vehicle_entries 
-                    (event_id, timestamp, license_plate, gate_id, lane_id, confidence, image_url, vehicle_type)
-                    VALUES 
-                    ('{event['eventId']}', 
-                     '{timestamp}', 
-                     '{event['licensePlate']}',
-                     '{event['gateId']}',
-                     '{event['laneId']}',
-                     {event['confidence']},
-                     '{event['imageUrl'] if event['imageUrl'] else 'NULL'}',
-                     '{event['vehicleType']}')
-                    """
-                    response = requests.post(
-                        f"{DUCKDB_API_URL}/query",
-                        headers={'Content-Type': 'application/json'},
-                        params={'query': query}
-                    )
-                    if response.status_code != 200:
-                        logger.error(f"Failed to insert data: {response.text}")
-                    else:
-                        logger.info(f"Processed entry event for vehicle {event['licensePlate']}")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
-                    
+                    self._queue.put(batch, timeout=REBALANCE_DRAIN_TIMEOUT_S)
+                except queue.Full:
+                    logger.warning(f"Dropped batch of {len(batch.rows)} rows on rebalance; it will be redelivered")
+        if not self._wait_for_writer(REBALANCE_DRAIN_TIMEOUT_S):
+            # Their commits fail once the partitions are gone; the new owner reads them again
+            logger.warning(f"Queued batches were not written within {REBALANCE_DRAIN_TIMEOUT_S}s of the rebalance")
+        with self._lock:
+            for tp in partitions:
+                self._resume_from.pop((tp.topic, tp.partition), None)
+        # Partitions assigned next start unpaused
+        self.paused = False
+
+    def _pause(self):
+        if not self.paused:
+            logger.info(f"Writer for {self.mapping.table} is behind; pausing consumption")
+            self.consumer.pause(self.consumer.assignment())
+            self.paused = True
+
+    def _resume(self):
+        logger.info(f"Writer for {self.mapping.table} caught up; resuming consumption")
+        self.consumer.resume(self.consumer.assignment())
+        self.paused = False
+
+    def _submit(self):
+        """Queue the current batch for the writer, pausing the partitions while the queue is full."""
+        try:
+            self._queue.put_nowait(self._current_batch())
+        except queue.Full:
+            self._pause()
+            return
+        self._reset_batch()
+
+    def _resume_after_conflict(self):
+        """Exactly-once: re-read everything after the batch DuckDB refused with 409."""
+        # The writer discards queued batches until the conflict is cleared
+        self._wait_for_writer()
+        with self._lock:
+            positions = dict(self._resume_from)
+        self._seek(positions)
+        self._reset_batch()
+        self._conflict.clear()
+
+    def _write_loop(self):
+        """Writer thread: store queued batches in order until the ``None`` sentinel."""
+        failed = False
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                if failed or self._conflict.is_set():
+                    # Never committed: read again after the conflict seek, or redelivered
+                    continue
+                if not self._write_batch(batch):
+                    # Stopped: later batches must not commit past this one
+                    logger.warning(f"Batch of {len(batch.rows)} rows not written before stopping; "
+                                   f"it will be redelivered")
+                    failed = True
+            except Exception:
+                logger.exception(f"Writer for {self.mapping.table} failed; stopping the connector")
+                failed, self.running = True, False
+            finally:
+                self._queue.task_done()
+
+    def _run_per_row(self):
+        while self.running:
+            msg = self.consumer.poll(1.0)
+            if msg is None:
+                continue
+            self._handle_message(msg)
+
+    def _run_batched(self):
+        self._reset_batch()
+        while self.running:
+            if self._conflict.is_set():
+                self._resume_after_conflict()
+            if self.paused:
+                timeout = PAUSED_POLL_S
+            elif self._deadline is None:
+                timeout = 1.0
+            else:
+                timeout = max(0.0, self._deadline - time.monotonic())
+            msgs = self.consumer.consume(num_messages=max(1, self.batch_size - len(self._rows)),
+                                         timeout=timeout)
+            if msgs:
+                self._rows.extend(self._decode_batch(msgs))
+                if self._deadline is None:
+                    self._deadline = time.monotonic() + self.batch_linger_ms / 1000.0
+
+            if self._offsets and (len(self._rows) >= self.batch_size or time.monotonic() >= self._deadline):
+                self._submit()
+            if self.paused and self._queue.qsize() <= self._queue.maxsize // 2:
+                self._resume()
+
+        # Stopped: hand over what is buffered; the writer makes one attempt, then it is redelivered
+        if self._offsets:
+            self._queue.put(self._take_batch())
+
+    def _stop_writer(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def stop(self):
+        """Ask the consume loop to exit after the current iteration."""
+        self.running = False
+
+    def start(self):
+        if self.exactly_once:
+            self.consumer.subscribe([self.mapping.topic], on_assign=self._on_assign, on_revoke=self._on_revoke)
+        else:
+            self.consumer.subscribe([self.mapping.topic], on_revoke=self._on_revoke)
+        self.running = True
+        if self.decode_processes > 0:
+            # spawn: forking a process that runs consumer threads is unsafe
+            self._decode_pool = ProcessPoolExecutor(
+                self.decode_processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_decode_worker,
+                initargs=(self.mapping.topic, self.mapping.table, self.mapping.schema_str, SCHEMA_REGISTRY_URL)
+            )
+
+        if self.batch_mode:
+            self._writer = threading.Thread(target=self._write_loop, name=f"writer-{self.mapping.table}",
+                                            daemon=True)
+            self._writer.start()
+
+        try:
+            if self.batch_mode:
+                self._run_batched()
+            else:
+                self._run_per_row()
         except KeyboardInterrupt:
             pass
         finally:
+            self.running = False
+            if self._writer is not None:
+                self._stop_writer()
             self.consumer.close()
+            if self._decode_pool is not None:
+                self._decode_pool.shutdown()
+                self._decode_pool = None
+            if self.dead_letters is not None:
+                self.dead_letters.close()
+            self.storage.close()
 
 if __name__ == '__main__':
     connector = KafkaToDuckDBConnector()
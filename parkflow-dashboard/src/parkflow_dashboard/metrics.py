@@ -0,0 +1,136 @@
+"""Prometheus metrics of the Kafka to DuckDB connector and the session processor, served on their own port."""
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from prometheus_client import CollectorRegistry, Histogram, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+REGISTRY = CollectorRegistry()
+
+# Seconds spent in one stage of a batch: decoding, waiting for the writer, the DuckDB request
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds from a gate event to DuckDB storing it, through Kafka, batching and retries
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0, 3600.0)
+
+DECODE_SECONDS = Histogram(
+    "parkflow_connector_decode_seconds", "Time to decode the messages of one consume call",
+    ["table"], buckets=STAGE_BUCKETS, registry=REGISTRY)
+QUEUE_SECONDS = Histogram(
+    "parkflow_connector_queue_seconds", "Time a full batch waited for the writer thread",
+    ["table"], buckets=STAGE_BUCKETS, registry=REGISTRY)
+WRITE_SECONDS = Histogram(
+    "parkflow_connector_write_seconds", "Time to store one batch in DuckDB, retries included",
+    ["table"], buckets=STAGE_BUCKETS, registry=REGISTRY)
+BATCH_SECONDS = Histogram(
+    "parkflow_connector_batch_seconds", "Time from consuming the first message of a batch to DuckDB storing it",
+    ["table"], buckets=STAGE_BUCKETS, registry=REGISTRY)
+EVENT_LAG_SECONDS = Histogram(
+    "parkflow_connector_event_lag_seconds",
+    "Time from the Kafka timestamp of the oldest message in a batch to DuckDB storing it",
+    ["table"], buckets=LAG_BUCKETS, registry=REGISTRY)
+
+# Keys of KafkaToDuckDBConnector.metrics() exported as counters and gauges
+_COUNTERS = {
+    "rows_written": "Rows stored in DuckDB",
+    "duplicates_skipped": "Rows DuckDB skipped as recently seen event ids",
+    "dead_letters": "Messages sent to the dead-letter destination",
+    "http_retries": "Retried requests to DuckDB",
+}
+_GAUGES = {
+    "queued_batches": "Batches waiting for the writer thread",
+    "paused": "1 while consumption is paused for the writer to catch up",
+}
+CIRCUIT_STATES = ("closed", "half-open", "open")
+
+
+class BatchTimer:
+    """The stage histograms of one table, labelled once instead of per batch."""
+
+    def __init__(self, table: str):
+        self.decode = DECODE_SECONDS.labels(table)
+        self.queue = QUEUE_SECONDS.labels(table)
+        self.write = WRITE_SECONDS.labels(table)
+        self.batch = BATCH_SECONDS.labels(table)
+        self.event_lag = EVENT_LAG_SECONDS.labels(table)
+
+    def written(self, consumed_at: float, write_started: float, oldest_event: Optional[float]) -> Optional[float]:
+        """Record a stored batch from monotonic stage times; returns the event lag if known."""
+        now = time.monotonic()
+        self.write.observe(now - write_started)
+        self.batch.observe(now - consumed_at)
+        if oldest_event is None:
+            return None
+        # Kafka timestamps are set by the producer: clocks that disagree would make this negative
+        lag = max(time.time() - oldest_event, 0.0)
+        self.event_lag.observe(lag)
+        return lag
+
+
+class ConnectorCollector:
+    """Exports the counters every connector already keeps, read at scrape time."""
+
+    def __init__(self, source: Callable[[], List[Dict]]):
+        self._source = source
+
+    def collect(self) -> Iterator[Metric]:
+        workers = self._source()
+        labels = ["table", "worker"]
+
+        def family(kind, key, documentation):
+            metric = kind(f"parkflow_connector_{key}", documentation, labels=labels)
+            for worker in workers:
+                metric.add_metric([worker["table"], str(worker["worker"])], float(worker[key]))
+            return metric
+
+        for key, documentation in _COUNTERS.items():
+            yield family(CounterMetricFamily, key, documentation)
+        for key, documentation in _GAUGES.items():
+            yield family(GaugeMetricFamily, key, documentation)
+        circuit = GaugeMetricFamily("parkflow_connector_circuit", "1 for the current state of the DuckDB circuit "
+                                    "breaker", labels=labels + ["state"])
+        lag = GaugeMetricFamily("parkflow_connector_partition_lag", "Messages behind the partition's high watermark",
+                                labels=labels + ["partition"])
+        last_lag = GaugeMetricFamily("parkflow_connector_last_event_lag_seconds",
+                                     "Event lag of the last stored batch", labels=labels)
+        for worker in workers:
+            worker_labels = [worker["table"], str(worker["worker"])]
+            for state in CIRCUIT_STATES:
+                circuit.add_metric(worker_labels + [state], float(worker["circuit"] == state))
+            for partition, messages in worker["partition_lag"].items():
+                lag.add_metric(worker_labels + [partition], messages)
+            if worker["event_lag_s"] is not None:
+                last_lag.add_metric(worker_labels, worker["event_lag_s"])
+        yield circuit
+        yield lag
+        yield last_lag
+
+
+class SessionCollector:
+    """Exports the session processor's counters and the vehicles inside per entry gate."""
+
+    def __init__(self, source: Callable[[], Dict]):
+        self._source = source
+
+    def collect(self) -> Iterator[Metric]:
+        metrics = self._source()
+        for key in ("entries", "exits", "payments", "duplicates", "expired", "unmatched", "undecodable",
+                    "statuses_sent"):
+            yield CounterMetricFamily(f"parkflow_sessions_{key}", f"Session events counted as {key}",
+                                      value=float(metrics[key]))
+        yield GaugeMetricFamily("parkflow_sessions_waiting_for_entry",
+                                "Exits and payments received before the entry of their session",
+                                value=float(metrics["waiting_for_entry"]))
+        yield GaugeMetricFamily("parkflow_occupancy_inside", "Vehicles inside the facility",
+                                value=float(metrics["inside"]))
+        occupancy = GaugeMetricFamily("parkflow_occupancy_gate", "Vehicles inside by the gate they entered through",
+                                      labels=["gate"])
+        for gate, vehicles in sorted(metrics["occupancy"].items()):
+            occupancy.add_metric([gate], float(vehicles))
+        yield occupancy
+
+
+def serve_metrics(port: int, source: Callable, addr: str = "0.0.0.0",
+                  collector: Callable = ConnectorCollector) -> None:
+    """Serve ``/metrics`` from a daemon thread, with the workers listed by ``source``."""
+    REGISTRY.register(collector(source))
+    start_http_server(port, addr=addr, registry=REGISTRY)
@@ -0,0 +1,53 @@
+"""Serve the dashboard under gunicorn: several worker processes, debug off, all rendering one shared snapshot."""
+import argparse
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_BIND = os.getenv('DASHBOARD_BIND', '0.0.0.0:8050')
+DASHBOARD_WORKERS = int(os.getenv('DASHBOARD_WORKERS', '4'))
+DASHBOARD_THREADS = int(os.getenv('DASHBOARD_THREADS', '4'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bind', default=DASHBOARD_BIND)
+    parser.add_argument('--workers', type=int, default=DASHBOARD_WORKERS)
+    parser.add_argument('--threads', type=int, default=DASHBOARD_THREADS,
+                        help='Request threads per worker')
+    parser.add_argument('--snapshot-dir',
+                        default=os.getenv('DASHBOARD_SNAPSHOT_DIR') or
+                        os.path.join(tempfile.gettempdir(), 'parkflow-dashboard-snapshot'),
+                        help='Directory of the Arrow snapshot the workers share')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if os.getenv('DUCKDB_STORAGE', 'rest').startswith('embedded:') and args.workers > 1:
+        parser.error('an embedded database file can only be opened by one process; use --workers 1')
+    # Read by every worker when it imports the app
+    os.environ['DASHBOARD_SNAPSHOT_DIR'] = args.snapshot_dir
+
+    from gunicorn.app.base import BaseApplication
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', args.bind)
+            self.cfg.set('workers', args.workers)
+            self.cfg.set('threads', args.threads)
+            self.cfg.set('worker_class', 'gthread')
+
+        def load(self):
+            # Imported in each worker after the fork, so every worker gets its own connections
+            from parkflow_dashboard import app as dashboard
+            dashboard.start_snapshot_refresh()
+            return dashboard.server
+
+    logger.info(f"Serving the dashboard on {args.bind} with {args.workers} workers, "
+                f"snapshot in {args.snapshot_dir}")
+    DashboardApplication().run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,433 @@
+"""Live parking sessions and per-gate occupancy, kept in memory from the entry, exit and payment topics."""
+import argparse
+import heapq
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pyarrow as pa
+from confluent_kafka import Consumer, KafkaException, Producer
+from confluent_kafka.schema_registry import SchemaRegistryClient
+from confluent_kafka.schema_registry.avro import AvroDeserializer, AvroSerializer
+from confluent_kafka.serialization import MessageField, SerializationContext
+
+from parkflow_dashboard.avro_mapping import resolve_schema
+from parkflow_dashboard.metrics import SessionCollector, serve_metrics
+
+logger = logging.getLogger(__name__)
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092')
+SCHEMA_REGISTRY_URL = os.getenv('SCHEMA_REGISTRY_URL', 'http://localhost:8081')
+
+ENTRY_TOPIC = 'parking.entry.events'
+EXIT_TOPIC = 'parking.exit.events'
+PAYMENT_TOPIC = 'parking.payment.events'
+STATUS_TOPIC = 'parking.status.events'
+# topic -> schema file used when the Schema Registry has no subject
+SCHEMA_FILES = {
+    ENTRY_TOPIC: 'VehicleEntryEvent.avsc',
+    EXIT_TOPIC: 'VehicleExitEvent.avsc',
+    PAYMENT_TOPIC: 'PaymentEvent.avsc',
+    STATUS_TOPIC: 'ParkingStatusEvent.avsc',
+}
+GROUP_ID = 'parkflow-session-state'
+
+# Tariff of the ParkFlow generators: a base fee plus an hourly rate, capped per session
+BASE_FEE = float(os.getenv('SESSION_BASE_FEE', '2.0'))
+HOURLY_RATE = float(os.getenv('SESSION_HOURLY_RATE', '3.0'))
+MAX_FEE = float(os.getenv('SESSION_MAX_FEE', '25.0'))
+# Sessions without an exit for this long are closed as EXPIRED
+EXPIRE_HOURS = float(os.getenv('SESSION_EXPIRE_HOURS', '24'))
+SNAPSHOT_PATH = os.getenv('SESSION_SNAPSHOT_PATH', 'sessions.arrow')
+SNAPSHOT_INTERVAL_S = float(os.getenv('SESSION_SNAPSHOT_INTERVAL_S', '60'))
+METRICS_PORT = int(os.getenv('SESSION_METRICS_PORT', '9109'))
+BATCH_SIZE = int(os.getenv('SESSION_BATCH_SIZE', '5000'))
+
+# Payment statuses of PaymentEvent that change what a session has paid, and by how much
+_PAYMENT_SIGN = {'COMPLETED': 1.0, 'REFUNDED': -1.0}
+
+
+def _symbol(value) -> str:
+    # fastavro returns enum symbols as strings; generated classes may hand over Enum members
+    return getattr(value, 'value', value)
+
+
+class Session:
+    """One vehicle inside the facility; slots keep a few hundred thousand of them small."""
+
+    __slots__ = ('plate', 'entry_event_id', 'entry_ms', 'gate', 'vehicle_type', 'paid', 'last_payment_id',
+                 'pending')
+
+    def __init__(self, plate: str, entry_event_id: str, entry_ms: int, gate: str, vehicle_type: str,
+                 paid: float = 0.0, last_payment_id: Optional[str] = None, pending: bool = False):
+        self.plate = plate
+        self.entry_event_id = entry_event_id
+        self.entry_ms = entry_ms
+        self.gate = gate
+        self.vehicle_type = vehicle_type
+        self.paid = paid
+        self.last_payment_id = last_payment_id
+        # A PENDING payment has not completed or failed yet
+        self.pending = pending
+
+
+def session_fee(minutes: float) -> float:
+    return min(max(BASE_FEE + minutes / 60 * HOURLY_RATE, BASE_FEE), MAX_FEE)
+
+
+class SessionEngine:
+    """Sessions keyed by plate, with the number of vehicles inside per entry gate.
+
+    Every event returns the ParkingStatusEvents it causes. Occupancy is a
+    counter moved by entries and exits, so reading it does not depend on
+    the number of sessions. Exits and payments that arrive before their
+    entry, from another topic's partition, wait per plate until it does.
+    ``offsets`` are the next offsets to consume per (topic, partition); a
+    snapshot stores them with the sessions so that a restart resumes there.
+    """
+
+    def __init__(self, expire_after_s: float = EXPIRE_HOURS * 3600):
+        self.expire_after_ms = int(expire_after_s * 1000)
+        self.sessions: Dict[str, Session] = {}
+        # (entry_ms, plate, entry_event_id) per session; entries of closed sessions are skipped when popped
+        self._by_entry: List[Tuple[int, str, str]] = []
+        self.occupancy: Dict[str, int] = {}
+        self.offsets: Dict[Tuple[str, int], int] = {}
+        self._early: Dict[str, List[Tuple[str, Dict]]] = {}
+        # Newest event time seen: expiry follows the stream, so replaying old events expires nothing early
+        self.stream_ms = 0
+        self.counts = {'entries': 0, 'exits': 0, 'payments': 0, 'duplicates': 0, 'expired': 0, 'unmatched': 0}
+
+    def inside(self, gate: Optional[str] = None) -> int:
+        """Vehicles inside, in total or entered through ``gate``."""
+        if gate is None:
+            return len(self.sessions)
+        return self.occupancy.get(gate, 0)
+
+    def apply(self, topic: str, event: Dict) -> List[Dict]:
+        self.stream_ms = max(self.stream_ms, event['timestamp'])
+        if topic == ENTRY_TOPIC:
+            return self.entry(event)
+        if topic == EXIT_TOPIC:
+            return self.exit(event)
+        if topic == PAYMENT_TOPIC:
+            return self.payment(event)
+        raise ValueError(f"No session events on topic {topic}")
+
+    def status(self, session: Session, at_ms: int, status: str = 'ACTIVE') -> Dict:
+        """The ParkingStatusEvent of a session as of ``at_ms``."""
+        minutes = max(at_ms - session.entry_ms, 0) // 60000
+        due = max(session_fee(minutes) - session.paid, 0.0)
+        if session.pending:
+            payment_status = 'IN_PROCESS'
+        elif session.paid <= 0:
+            payment_status = 'UNPAID'
+        else:
+            # Paid up front, then stayed longer than paid for
+            payment_status = 'OVERDUE' if due >= 0.005 else 'PAID'
+        return {
+            'eventId': str(uuid.uuid4()),
+            'timestamp': at_ms,
+            'licensePlate': session.plate,
+            'entryTimestamp': session.entry_ms,
+            'parkingDuration': minutes,
+            'amountDue': round(due, 2),
+            'paymentStatus': payment_status,
+            'lastPaymentId': session.last_payment_id,
+            'entryGateId': session.gate,
+            'vehicleType': session.vehicle_type,
+            'status': status,
+        }
+
+    def _open(self, session: Session) -> None:
+        self.sessions[session.plate] = session
+        heapq.heappush(self._by_entry, (session.entry_ms, session.plate, session.entry_event_id))
+        self.occupancy[session.gate] = self.occupancy.get(session.gate, 0) + 1
+
+    def _close(self, session: Session) -> None:
+        del self.sessions[session.plate]
+        remaining = self.occupancy[session.gate] - 1
+        if remaining:
+            self.occupancy[session.gate] = remaining
+        else:
+            del self.occupancy[session.gate]
+
+    def entry(self, event: Dict) -> List[Dict]:
+        plate, at_ms = event['licensePlate'], event['timestamp']
+        statuses = []
+        current = self.sessions.get(plate)
+        if current is not None:
+            if current.entry_event_id == event['eventId'] or at_ms < current.entry_ms:
+                # Redelivered, or an older entry arriving after a newer one
+                self.counts['duplicates'] += 1
+                return statuses
+            # The previous session never saw its exit
+            self._close(current)
+            self.counts['expired'] += 1
+            statuses.append(self.status(current, at_ms, 'EXPIRED'))
+        session = Session(plate, event['eventId'], at_ms, event['gateId'], event['vehicleType'])
+        self._open(session)
+        self.counts['entries'] += 1
+        statuses.append(self.status(session, at_ms))
+        for topic, early in sorted(self._early.pop(plate, []), key=lambda item: item[1]['timestamp']):
+            if early['timestamp'] >= at_ms:
+                statuses.extend(self.apply(topic, early))
+            else:
+                self.counts['unmatched'] += 1
+        return statuses
+
+    def _session_for(self, topic: str, event: Dict) -> Optional[Session]:
+        session = self.sessions.get(event['licensePlate'])
+        if session is None:
+            self._early.setdefault(event['licensePlate'], []).append((topic, event))
+            return None
+        if event['timestamp'] < session.entry_ms:
+            # Belongs to an earlier session of the same plate
+            self.counts['unmatched'] += 1
+            return None
+        return session
+
+    def exit(self, event: Dict) -> List[Dict]:
+        session = self._session_for(EXIT_TOPIC, event)
+        if session is None:
+            return []
+        self._close(session)
+        self.counts['exits'] += 1
+        return [self.status(session, event['timestamp'], 'COMPLETED')]
+
+    def payment(self, event: Dict) -> List[Dict]:
+        session = self._session_for(PAYMENT_TOPIC, event)
+        if session is None:
+            return []
+        payment_status = _symbol(event['status'])
+        session.pending = payment_status == 'PENDING'
+        session.paid += _PAYMENT_SIGN.get(payment_status, 0.0) * event['amount']
+        session.last_payment_id = event['eventId']
+        self.counts['payments'] += 1
+        return [self.status(session, event['timestamp'])]
+
+    def expire(self, now_ms: Optional[int] = None) -> List[Dict]:
+        """Close sessions and drop early events older than the expiry age, by default as of the stream time.
+
+        Sessions are popped from a heap by entry time, since entries from
+        several partitions and late entries arrive out of timestamp order.
+        """
+        now_ms = self.stream_ms if now_ms is None else now_ms
+        cutoff = now_ms - self.expire_after_ms
+        expired = []
+        while self._by_entry and self._by_entry[0][0] < cutoff:
+            _, plate, entry_event_id = heapq.heappop(self._by_entry)
+            session = self.sessions.get(plate)
+            if session is not None and session.entry_event_id == entry_event_id:
+                expired.append(session)
+        statuses = []
+        for session in expired:
+            self._close(session)
+            statuses.append(self.status(session, now_ms, 'EXPIRED'))
+        self.counts['expired'] += len(expired)
+        for plate in [plate for plate, events in self._early.items()
+                      if all(event['timestamp'] < cutoff for _, event in events)]:
+            self.counts['unmatched'] += len(self._early.pop(plate))
+        return statuses
+
+    def metrics(self) -> Dict:
+        return dict(self.counts, inside=len(self.sessions), occupancy=dict(self.occupancy),
+                    waiting_for_entry=sum(len(events) for events in self._early.values()))
+
+    def snapshot(self, path: str) -> None:
+        """Write the sessions and offsets to an Arrow IPC file, replacing ``path`` atomically."""
+        sessions = list(self.sessions.values())
+        table = pa.table({
+            slot: [getattr(session, slot) for session in sessions] for slot in Session.__slots__
+        }, schema=_SNAPSHOT_SCHEMA).replace_schema_metadata({
+            'offsets': json.dumps([[topic, partition, offset]
+                                   for (topic, partition), offset in sorted(self.offsets.items())]),
+            'early': json.dumps(self._early, default=_symbol),
+            'counts': json.dumps(self.counts),
+            'stream_ms': str(self.stream_ms),
+        })
+        temporary = f"{path}.tmp"
+        with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(temporary, path)
+
+    def restore(self, path: str) -> bool:
+        """Load a snapshot written by :meth:`snapshot`; False if there is none."""
+        if not os.path.exists(path):
+            return False
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        metadata = table.schema.metadata
+        self.sessions, self._by_entry, self.occupancy = {}, [], {}
+        columns = [table.column(slot).to_pylist() for slot in Session.__slots__]
+        for values in zip(*columns):
+            self._open(Session(*values))
+        self.offsets = {(topic, partition): offset
+                        for topic, partition, offset in json.loads(metadata[b'offsets'])}
+        self._early = {plate: [tuple(item) for item in events]
+                       for plate, events in json.loads(metadata[b'early']).items()}
+        self.counts.update(json.loads(metadata[b'counts']))
+        self.stream_ms = int(metadata[b'stream_ms'])
+        return True
+
+
+_SNAPSHOT_SCHEMA = pa.schema([
+    ('plate', pa.string()),
+    ('entry_event_id', pa.string()),
+    ('entry_ms', pa.int64()),
+    ('gate', pa.string()),
+    ('vehicle_type', pa.string()),
+    ('paid', pa.float64()),
+    ('last_payment_id', pa.string()),
+    ('pending', pa.bool_()),
+])
+
+
+class SessionProcessor:
+    """Consumes entries, exits and payments, keeps a SessionEngine current and produces its status events.
+
+    State lives in memory and in periodic snapshots, together with the
+    offsets it covers; Kafka offsets are never committed. On start the
+    processor restores the snapshot and resumes every partition from it,
+    replaying what arrived since. Without a snapshot it rebuilds the state
+    from the beginning of the topics.
+    Status events replayed after a restart are sent again; they carry the
+    full state of a session, so consumers keep the latest per plate.
+    """
+
+    def __init__(self, consumer: Optional[Consumer] = None, producer: Optional[Producer] = None,
+                 deserialize: Optional[Callable[[str, bytes], Dict]] = None,
+                 serialize: Optional[Callable[[Dict], bytes]] = None,
+                 engine: Optional[SessionEngine] = None,
+                 snapshot_path: Optional[str] = SNAPSHOT_PATH,
+                 snapshot_interval_s: float = SNAPSHOT_INTERVAL_S,
+                 batch_size: int = BATCH_SIZE):
+        self.engine = engine or SessionEngine()
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval_s = snapshot_interval_s
+        self.batch_size = batch_size
+        self.running = False
+        self.undecodable = 0
+        self.statuses_sent = 0
+        if deserialize is None or serialize is None:
+            registry = SchemaRegistryClient({'url': SCHEMA_REGISTRY_URL})
+            deserialize = deserialize or self._avro_deserializer(registry)
+            serialize = serialize or self._avro_serializer(registry)
+        self.deserialize = deserialize
+        self.serialize = serialize
+        self.consumer = consumer or Consumer({
+            'bootstrap.servers': KAFKA_BOOTSTRAP_SERVERS,
+            'group.id': GROUP_ID,
+            'auto.offset.reset': 'earliest',
+            # Offsets are kept in the snapshot with the state they produced
+            'enable.auto.commit': False,
+        })
+        self.producer = producer or Producer({'bootstrap.servers': KAFKA_BOOTSTRAP_SERVERS, 'linger.ms': 20})
+
+    @staticmethod
+    def _avro_deserializer(registry: SchemaRegistryClient) -> Callable[[str, bytes], Dict]:
+        deserializers = {topic: AvroDeserializer(registry, resolve_schema(topic, SCHEMA_FILES[topic], registry)[0])
+                         for topic in (ENTRY_TOPIC, EXIT_TOPIC, PAYMENT_TOPIC)}
+        return lambda topic, value: deserializers[topic](value, SerializationContext(topic, MessageField.VALUE))
+
+    @staticmethod
+    def _avro_serializer(registry: SchemaRegistryClient) -> Callable[[Dict], bytes]:
+        schema_str, _ = resolve_schema(STATUS_TOPIC, SCHEMA_FILES[STATUS_TOPIC], registry)
+        serializer = AvroSerializer(registry, schema_str)
+        return lambda status: serializer(status, SerializationContext(STATUS_TOPIC, MessageField.VALUE))
+
+    def _on_assign(self, consumer, partitions):
+        """Resume assigned partitions after the last snapshot's offsets."""
+        for tp in partitions:
+            offset = self.engine.offsets.get((tp.topic, tp.partition))
+            if offset is not None:
+                tp.offset = offset
+        consumer.assign(partitions)
+
+    def _send(self, statuses: Iterable[Dict]) -> None:
+        for status in statuses:
+            value = self.serialize(status)
+            while True:
+                try:
+                    self.producer.produce(STATUS_TOPIC, key=status['licensePlate'], value=value)
+                    break
+                except BufferError:
+                    self.producer.poll(0.05)
+            self.statuses_sent += 1
+        self.producer.poll(0)
+
+    def process(self, msgs) -> None:
+        """Apply one consumed batch in order and send the resulting status events."""
+        for msg in msgs:
+            if msg.error():
+                logger.error(f"Consumer error: {msg.error()}")
+                continue
+            self.engine.offsets[(msg.topic(), msg.partition())] = msg.offset() + 1
+            try:
+                event = self.deserialize(msg.topic(), msg.value())
+            except Exception as e:
+                self.undecodable += 1
+                logger.error(f"Skipping undecodable message {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+                continue
+            self._send(self.engine.apply(msg.topic(), event))
+
+    def checkpoint(self) -> None:
+        """Expire stale sessions, then snapshot once every status so far is delivered."""
+        self._send(self.engine.expire())
+        if self.snapshot_path:
+            # Statuses up to the snapshot's offsets must not be lost if it is the one restored
+            self.producer.flush()
+            self.engine.snapshot(self.snapshot_path)
+
+    def metrics(self) -> Dict:
+        return dict(self.engine.metrics(), undecodable=self.undecodable, statuses_sent=self.statuses_sent)
+
+    def stop(self):
+        self.running = False
+
+    def start(self):
+        if self.snapshot_path and self.engine.restore(self.snapshot_path):
+            logger.info(f"Restored {self.engine.inside()} sessions from {self.snapshot_path}")
+        self.consumer.subscribe([ENTRY_TOPIC, EXIT_TOPIC, PAYMENT_TOPIC], on_assign=self._on_assign)
+        self.running = True
+        next_checkpoint = time.monotonic() + self.snapshot_interval_s
+        try:
+            while self.running:
+                self.process(self.consumer.consume(num_messages=self.batch_size, timeout=1.0))
+                if time.monotonic() >= next_checkpoint:
+                    self.checkpoint()
+                    next_checkpoint = time.monotonic() + self.snapshot_interval_s
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            try:
+                self.checkpoint()
+            except (KafkaException, OSError) as e:
+                logger.error(f"Final snapshot failed: {e}")
+            self.consumer.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Track ParkFlow sessions and occupancy from Kafka")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH,
+                        help="Arrow file the state and offsets are snapshotted to and restored from")
+    parser.add_argument("--snapshot-interval", type=float, default=SNAPSHOT_INTERVAL_S,
+                        help="seconds between snapshots")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="port of the Prometheus /metrics endpoint; 0 disables it")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    processor = SessionProcessor(snapshot_path=args.snapshot, snapshot_interval_s=args.snapshot_interval)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port, processor.metrics, collector=SessionCollector)
+        logger.info(f"Serving metrics on port {args.metrics_port}")
+    processor.start()
+
+
+if __name__ == '__main__':
+    main()
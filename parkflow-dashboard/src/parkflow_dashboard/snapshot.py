@@ -0,0 +1,324 @@
+"""Dashboard reads fetched once per refresh into Arrow files that every worker process serves from."""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.ipc
+
+from parkflow_dashboard.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.arrow'
+LOCK_FILE = 'fetcher.lock'
+ENTRIES_COUNTS = 'entries-counts.arrow'
+ENTRIES_CONFIDENCE = 'entries-confidence.arrow'
+# Schema metadata key holding the fields of a read that are not columns
+_FIELDS = b'parkflow'
+
+
+def _encode(result: Dict, columns_key: Optional[str]) -> pa.Table:
+    columns = (result.get(columns_key) or {}) if columns_key else {}
+    fields = {key: value for key, value in result.items() if key != columns_key}
+    return pa.table(columns).replace_schema_metadata({_FIELDS: json.dumps(fields, default=str)})
+
+
+def _decode(table: pa.Table, columns_key: Optional[str]) -> Dict:
+    result = json.loads(table.schema.metadata[_FIELDS])
+    if columns_key:
+        result[columns_key] = {name: table.column(name).to_pylist() for name in table.column_names}
+    return result
+
+
+def _epoch(value: datetime) -> float:
+    # Timestamps are naive local time; DuckDB's epoch() reads them as UTC
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class ArrowFileCache:
+    """Arrow IPC files in one directory, replaced whole by one writer and memory-mapped by any number of readers."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._tables: Dict[str, Tuple[Tuple[int, int, int], pa.Table]] = {}
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def write(self, name: str, table: pa.Table) -> None:
+        path = self.path(name)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(temporary, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        # Readers open the old file or the new one, never a partial write
+        os.replace(temporary, path)
+
+    def read(self, name: str) -> Optional[pa.Table]:
+        """The table last written under ``name``, mapped again only when the file was replaced."""
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._tables.get(name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        try:
+            table = pa.ipc.open_file(pa.memory_map(self.path(name))).read_all()
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._tables[name] = (signature, table)
+        return table
+
+    def remove_except(self, names) -> None:
+        keep = {*names, LOCK_FILE}
+        for name in os.listdir(self.directory):
+            if name not in keep and not name.endswith('.tmp'):
+                with self._lock:
+                    self._tables.pop(name, None)
+                try:
+                    os.remove(self.path(name))
+                except FileNotFoundError:
+                    pass
+
+
+class _Recording:
+    def __init__(self, as_of: datetime):
+        self.as_of = as_of
+        self.tables: Dict[str, pa.Table] = {}
+
+
+class SnapshotStorage(Storage):
+    """Serves the dashboard's reads from the last shared snapshot, and reads through for anything it lacks.
+
+    One process at a time, chosen with a file lock, runs :meth:`refresh`
+    once per interval: the dashboard's own reads go to ``backing`` and
+    their results are written to ``cache``. The same reads from any session
+    in any worker are then answered from the memory-mapped files, so the load
+    on DuckDB does not grow with the number of viewers. Reads the snapshot
+    does not hold, such as a zoomed-in range, and every read once the
+    snapshot is older than ``max_age_s``, go to ``backing``.
+    Entry buckets are fetched incrementally by the refresh and served to
+    each session from the version it has seen, as ``/dashboard/entries`` does.
+    """
+
+    def __init__(self, cache: ArrowFileCache, backing: Storage, max_age_s: float = 15.0):
+        self.cache = cache
+        self.backing = backing
+        self.max_age_s = max_age_s
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._local = threading.local()
+        # The refreshing process's merged entry buckets, so each refresh only fetches what changed
+        self._entries: Optional[Dict] = None
+        # Files of the last refresh, still served to callbacks that started on that snapshot
+        self._published: List[str] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def retries(self) -> int:
+        return self.backing.retries
+
+    @property
+    def circuit(self) -> str:
+        return self.backing.circuit
+
+    def _recording(self) -> Optional[_Recording]:
+        return getattr(self._local, 'recording', None)
+
+    def _manifest(self) -> Optional[Dict]:
+        table = self.cache.read(MANIFEST)
+        if table is None:
+            return None
+        manifest = _decode(table, None)
+        as_of = datetime.fromisoformat(manifest['as_of'])
+        if (datetime.now() - as_of).total_seconds() > self.max_age_s:
+            return None
+        return dict(manifest, as_of=as_of)
+
+    @property
+    def as_of(self) -> Optional[datetime]:
+        """When the snapshot being served was read; None while reads go to the backing storage."""
+        recording = self._recording()
+        if recording is not None:
+            return recording.as_of
+        manifest = self._manifest()
+        return manifest['as_of'] if manifest else None
+
+    def _lookup(self, name: str) -> Optional[pa.Table]:
+        manifest = self._manifest()
+        if manifest is None or name not in manifest['entries']:
+            return None
+        return self.cache.read(name)
+
+    def _read(self, key: List, fetch: Callable[[], Dict], columns_key: Optional[str]) -> Dict:
+        name = hashlib.sha1(json.dumps(key, default=str).encode()).hexdigest() + '.arrow'
+        recording = self._recording()
+        if recording is not None:
+            result = fetch()
+            recording.tables[name] = _encode(result, columns_key)
+            return result
+        table = self._lookup(name)
+        if table is None:
+            self.misses += 1
+            return fetch()
+        self.hits += 1
+        return _decode(table, columns_key)
+
+    # Writes and offsets are never snapshotted
+    def execute(self, sql):
+        self.backing.execute(sql)
+
+    def prepare(self, name, sql):
+        self.backing.prepare(name, sql)
+
+    def insert_prepared(self, table, name, sql, rows, stop):
+        return self.backing.insert_prepared(table, name, sql, rows, stop)
+
+    def append(self, table, data, stop, dedup_on=None, consumer_group=None, offsets=None, replace=False):
+        return self.backing.append(table, data, stop, dedup_on, consumer_group, offsets, replace)
+
+    def stored_offsets(self, group, topic):
+        return self.backing.stored_offsets(group, topic)
+
+    def query_prepared(self, name, sql, params):
+        return self._read(['query_prepared', name, params],
+                          lambda: self.backing.query_prepared(name, sql, params), 'data')
+
+    def timeseries(self, table, time_column, start, end, points, group_by=(), value=None,
+                   aggregates=('count',), mode='buckets'):
+        return self._read(['timeseries', table, time_column, start, end, points, list(group_by), value,
+                           list(aggregates), mode],
+                          lambda: self.backing.timeseries(table, time_column, start, end, points, group_by, value,
+                                                          aggregates, mode), 'columns')
+
+    def freshness(self, table):
+        return self._read(['freshness', table], lambda: self.backing.freshness(table), None)
+
+    def _fetch_entries(self, start: datetime, bucket_seconds: int) -> Dict:
+        """Merge the buckets changed since the last refresh into the buckets within the window."""
+        previous = self._entries
+        if previous is not None and previous['bucket_seconds'] != bucket_seconds:
+            previous = None
+        data = self.backing.dashboard_entries(start, bucket_seconds, previous['version'] if previous else -1)
+        if previous is not None and data['version'] < previous['version']:
+            # The table was rewritten and the reply holds every bucket again
+            previous = None
+        touched = {*data['counts']['bucket'], *data['confidence']['bucket']}
+        oldest = _epoch(start) - bucket_seconds
+        merged = {'version': data['version'], 'bucket_seconds': bucket_seconds,
+                  'confidence_bins': data.get('confidence_bins'), 'start': start.isoformat()}
+        for part in ('counts', 'confidence'):
+            rows = data[part]
+            kept = {name: [] for name in [*rows, 'changed']}
+            if previous is not None:
+                old = previous[part]
+                for i, bucket in enumerate(old['bucket']):
+                    if bucket not in touched and bucket > oldest:
+                        for name in kept:
+                            kept[name].append(old[name][i])
+            for name in rows:
+                kept[name].extend(rows[name])
+            kept['changed'].extend([data['version']] * len(rows['bucket']))
+            merged[part] = kept
+        self._entries = merged
+        return merged
+
+    @staticmethod
+    def _entries_since(merged: Dict, start: datetime, since_version: int) -> Dict:
+        # A rewritten table numbers its versions again: start over, as the server does
+        since = since_version if since_version <= merged['version'] else -1
+        oldest = _epoch(start) - merged['bucket_seconds']
+        result = {'status': 'success', 'version': merged['version'], 'bucket_seconds': merged['bucket_seconds'],
+                  'confidence_bins': merged['confidence_bins']}
+        for part in ('counts', 'confidence'):
+            rows = merged[part]
+            picked = [i for i, (bucket, changed) in enumerate(zip(rows['bucket'], rows['changed']))
+                      if changed > since and bucket > oldest]
+            result[part] = {name: [values[i] for i in picked] for name, values in rows.items() if name != 'changed'}
+        return result
+
+    def dashboard_entries(self, start, bucket_seconds, since_version):
+        recording = self._recording()
+        if recording is not None:
+            merged = self._fetch_entries(start, bucket_seconds)
+            fields = {key: value for key, value in merged.items() if key not in ('counts', 'confidence')}
+            recording.tables[ENTRIES_COUNTS] = _encode(dict(fields, counts=merged['counts']), 'counts')
+            recording.tables[ENTRIES_CONFIDENCE] = _encode({'confidence': merged['confidence']}, 'confidence')
+            return self._entries_since(merged, start, since_version)
+        counts, confidence = self._lookup(ENTRIES_COUNTS), self._lookup(ENTRIES_CONFIDENCE)
+        merged = _decode(counts, 'counts') if counts is not None and confidence is not None else None
+        # Served for the window the refresh read, or any later start within it
+        if merged is None or merged['bucket_seconds'] != bucket_seconds \
+                or start < datetime.fromisoformat(merged['start']):
+            self.misses += 1
+            return self.backing.dashboard_entries(start, bucket_seconds, since_version)
+        self.hits += 1
+        merged['confidence'] = _decode(confidence, 'confidence')['confidence']
+        return self._entries_since(merged, start, since_version)
+
+    def refresh(self, prefetch: Callable[[], None]) -> int:
+        """Run ``prefetch`` with its reads going to the backing storage, then publish them; returns files written."""
+        recording = self._local.recording = _Recording(datetime.now())
+        try:
+            prefetch()
+        finally:
+            self._local.recording = None
+        for name, table in recording.tables.items():
+            self.cache.write(name, table)
+        entries = sorted({*recording.tables, *self._published})
+        # Written last: readers only look up what the manifest lists
+        self.cache.write(MANIFEST, _encode({'as_of': recording.as_of.isoformat(), 'entries': entries}, None))
+        self.cache.remove_except([MANIFEST, *entries])
+        self._published = list(recording.tables)
+        self.refreshes += 1
+        return len(recording.tables)
+
+    def _run(self, prefetch: Callable[[], None], interval_s: float) -> None:
+        with open(self.cache.path(LOCK_FILE), 'a') as lock:
+            # Every process tries; the one holding the lock refreshes until it exits, then another takes over
+            while True:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if self._stop.wait(interval_s):
+                        return
+            logger.info(f"Refreshing the dashboard snapshot in {self.cache.directory} every {interval_s:g}s")
+            while not self._stop.is_set():
+                began = time.monotonic()
+                try:
+                    self.refresh(prefetch)
+                except Exception as e:
+                    logger.error(f"Error refreshing the dashboard snapshot: {e}")
+                self._stop.wait(max(interval_s - (time.monotonic() - began), 0))
+
+    def start(self, prefetch: Callable[[], None], interval_s: float) -> None:
+        """Refresh every ``interval_s`` from a daemon thread whenever this process holds the fetcher lock."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(prefetch, interval_s),
+                                            name='dashboard-snapshot', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.backing.close()
@@ -0,0 +1,225 @@
+"""Where the connector writes and the dashboard reads: the DuckDB REST server or a database file in-process."""
+import abc
+import json
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+
+from parkflow_dashboard.duckdb_client import DuckDBClient
+
+logger = logging.getLogger(__name__)
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+
+# (topic, partition) -> (first offset in the batch, next offset to consume)
+OffsetRange = Dict[Tuple[str, int], Tuple[int, int]]
+
+
+class BatchRejected(Exception):
+    """DuckDB refused a write with a client error; sending it again would fail the same way."""
+
+
+class OffsetConflict(Exception):
+    """A batch starts below the offsets already stored for its partitions; ``stored`` is where to resume."""
+
+    def __init__(self, stored: Dict[Tuple[str, int], int]):
+        super().__init__(f"Batch overlaps stored offsets {stored}")
+        self.stored = stored
+
+
+class Storage(abc.ABC):
+    """Base class for the connector's writes and the dashboard's reads.
+
+    Write methods take a ``stop`` callable and return None (or False) if it
+    became true before the write succeeded; they raise
+    :class:`BatchRejected` for writes that would fail again.
+    """
+
+    retries = 0
+    circuit = 'closed'
+    # When the data served was read, for storages serving a snapshot; None for live reads
+    as_of: Optional[datetime] = None
+
+    @abc.abstractmethod
+    def execute(self, sql: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def prepare(self, name: str, sql: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def insert_prepared(self, table: str, name: str, sql: str, rows: List[List],
+                        stop: Callable[[], bool]) -> bool:
+        """Run the prepared INSERT ``name`` into ``table`` once per parameter row."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def append(self, table: str, data: pa.Table, stop: Callable[[], bool], dedup_on: Optional[str] = None,
+               consumer_group: Optional[str] = None, offsets: Optional[OffsetRange] = None,
+               replace: bool = False) -> Optional[Dict]:
+        """Append an Arrow table; with ``offsets`` they commit with the rows or :class:`OffsetConflict` is raised.
+
+        With ``replace`` a row whose primary key is already stored replaces
+        that row instead of failing the append.
+        Returns the rows written and the duplicates skipped on ``dedup_on``.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def stored_offsets(self, group: str, topic: str) -> Dict[Tuple[str, int], int]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query_prepared(self, name: str, sql: str, params: List) -> Dict:
+        """Result of a prepared query as ``{"columns": [...], "data": {column: [values]}}``."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def dashboard_entries(self, start: datetime, bucket_seconds: int, since_version: int) -> Dict:
+        """Entry counts per bucket in the ``/dashboard/entries`` form."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def timeseries(self, table: str, time_column: str, start: Optional[datetime], end: Optional[datetime],
+                   points: int, group_by: Sequence[str] = (), value: Optional[str] = None,
+                   aggregates: Sequence[str] = ('count',), mode: str = 'buckets') -> Dict:
+        """At most ``points`` points per series in the ``/timeseries`` form, times as naive ISO strings."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def freshness(self, table: str) -> Dict:
+        """Newest event time and last commit of a table as naive local ISO timestamps."""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class RestStorage(Storage):
+    """The DuckDB REST server, through one pooled :class:`DuckDBClient`."""
+
+    def __init__(self, client: DuckDBClient):
+        self.client = client
+
+    @property
+    def retries(self) -> int:
+        return self.client.retries
+
+    @property
+    def circuit(self) -> str:
+        return self.client.breaker.state
+
+    def execute(self, sql):
+        response = self.client.post('/query', headers={'Content-Type': 'application/json'},
+                                    params={'query': sql})
+        if response.status_code != 200:
+            raise BatchRejected(f"HTTP {response.status_code}: {response.text}")
+
+    def prepare(self, name, sql):
+        response = self.client.post('/prepared', json={'name': name, 'sql': sql})
+        if response.status_code != 200:
+            raise BatchRejected(f"HTTP {response.status_code}: {response.text}")
+
+    @staticmethod
+    def _accepted(response) -> bool:
+        if response is None:
+            return False
+        if response.status_code != 200:
+            raise BatchRejected(f"HTTP {response.status_code}: {response.text}")
+        return True
+
+    def insert_prepared(self, table, name, sql, rows, stop):
+        body = json.dumps({'batch': rows}, default=datetime.isoformat)
+        path = f"/prepared/{name}/execute"
+        headers = {'Content-Type': 'application/json'}
+        response = self.client.request_with_retry('POST', path, stop=stop, headers=headers, data=body)
+        if response is not None and response.status_code == 404:
+            # The server restarted and lost its statement registry
+            self.prepare(name, sql)
+            response = self.client.request_with_retry('POST', path, stop=stop, headers=headers, data=body)
+        return self._accepted(response)
+
+    def append(self, table, data, stop, dedup_on=None, consumer_group=None, offsets=None, replace=False):
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, data.schema) as writer:
+            writer.write_table(data)
+        params = {}
+        if dedup_on is not None:
+            params['dedup_on'] = dedup_on
+        if replace:
+            params['replace'] = 'true'
+        if offsets:
+            params['consumer_group'] = consumer_group
+            params['offsets'] = [f"{topic}:{partition}:{start}:{end}"
+                                 for (topic, partition), (start, end) in sorted(offsets.items())]
+        response = self.client.request_with_retry(
+            'POST', f"/tables/{table}/append", stop=stop,
+            headers={'Content-Type': ARROW_STREAM_MEDIA_TYPE},
+            params=params or None,
+            data=sink.getvalue().to_pybytes()
+        )
+        if response is not None and response.status_code == 409:
+            raise OffsetConflict({(o['topic'], o['partition']): o['offset']
+                                  for o in response.json()['detail']['offsets']})
+        if not self._accepted(response):
+            return None
+        result = response.json() or {}
+        return {'rows': result.get('rows', data.num_rows), 'duplicates': result.get('duplicates', 0)}
+
+    def stored_offsets(self, group, topic):
+        response = self.client.get('/ingest/offsets', params={'consumer_group': group, 'topic': topic})
+        response.raise_for_status()
+        return {(o['topic'], o['partition']): o['offset'] for o in response.json()['offsets']}
+
+    def query_prepared(self, name, sql, params):
+        path = f"/prepared/{name}/execute"
+        # The columnar form maps straight onto a DataFrame without per-row dicts
+        response = self.client.post(path, params={'format': 'columns'}, json={'params': params})
+        if response.status_code == 404:
+            self.client.post('/prepared', json={'name': name, 'sql': sql}).raise_for_status()
+            response = self.client.post(path, params={'format': 'columns'}, json={'params': params})
+        response.raise_for_status()
+        return response.json()
+
+    def dashboard_entries(self, start, bucket_seconds, since_version):
+        response = self.client.get('/dashboard/entries', params={
+            'start': start.isoformat(),
+            'bucket_seconds': bucket_seconds,
+            'since_version': since_version,
+        })
+        response.raise_for_status()
+        return response.json()
+
+    def timeseries(self, table, time_column, start, end, points, group_by=(), value=None,
+                   aggregates=('count',), mode='buckets'):
+        params = {'table': table, 'time_column': time_column, 'points': points, 'group_by': list(group_by),
+                  'aggregates': list(aggregates), 'mode': mode}
+        params.update((name, bound.isoformat()) for name, bound in [('start', start), ('end', end)] if bound)
+        if value is not None:
+            params['value'] = value
+        response = self.client.get('/timeseries', params=params)
+        response.raise_for_status()
+        return response.json()
+
+    def freshness(self, table):
+        response = self.client.get(f"/tables/{table}/freshness")
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.client.close()
+
+
+def storage_from_spec(spec: str, client_factory: Callable[[], DuckDBClient],
+                      read_only: bool = False) -> Storage:
+    """``embedded:<path>`` opens a DuckDB file in-process; ``rest`` or empty uses the REST server."""
+    if spec.startswith('embedded:'):
+        # Imported on demand: the embedded backend needs the DuckDB server's modules, the REST one does not
+        from parkflow_dashboard.embedded import EmbeddedStorage
+        return EmbeddedStorage(spec[len('embedded:'):], read_only=read_only)
+    if spec in ('', 'rest'):
+        return RestStorage(client_factory())
+    raise ValueError(f"Unknown DuckDB storage '{spec}', expected 'rest' or 'embedded:<path>'")
@@ -0,0 +1,406 @@
+"""Event-time windows of vehicle entries per gate and vehicle type, kept current in DuckDB."""
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import pyarrow as pa
+from confluent_kafka import Consumer, KafkaException, TopicPartition
+from confluent_kafka.schema_registry import SchemaRegistryClient
+from confluent_kafka.schema_registry.avro import AvroDeserializer
+from confluent_kafka.serialization import MessageField, SerializationContext
+
+from parkflow_dashboard.avro_mapping import resolve_schema
+from parkflow_dashboard.duckdb_client import DuckDBClient
+from parkflow_dashboard.kafka_duckdb_connector import (
+    DEFAULT_ENTRY_SCHEMA,
+    DUCKDB_API_URL,
+    DUCKDB_STORAGE,
+    ENTRY_SCHEMA_FILE,
+    ENTRY_TOPIC,
+    KAFKA_BOOTSTRAP_SERVERS,
+    SCHEMA_REGISTRY_URL,
+)
+from parkflow_dashboard.storage import OffsetConflict, Storage, storage_from_spec
+
+logger = logging.getLogger(__name__)
+
+WINDOW_TABLE = 'entry_windows'
+GROUP_ID = 'parkflow-entry-windows'
+
+# Comma-separated window sizes in seconds; 'size:slide' makes a sliding window, a bare size a tumbling one
+WINDOW_SPECS = os.getenv('WINDOW_SPECS', '60,300,3600,900:60')
+# How far behind the newest event the watermark trails, for events that arrive a little out of order
+WATERMARK_DELAY_S = float(os.getenv('WINDOW_WATERMARK_DELAY_S', '10'))
+# How long after the watermark passes its end a window still takes late events
+ALLOWED_LATENESS_S = float(os.getenv('WINDOW_ALLOWED_LATENESS_S', '300'))
+FLUSH_INTERVAL_S = float(os.getenv('WINDOW_FLUSH_INTERVAL_S', '5'))
+BATCH_SIZE = int(os.getenv('WINDOW_BATCH_SIZE', '5000'))
+
+CREATE_WINDOWS_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {WINDOW_TABLE} (
+        window_seconds INTEGER NOT NULL,
+        slide_seconds INTEGER NOT NULL,
+        window_start TIMESTAMP NOT NULL,
+        window_end TIMESTAMP NOT NULL,
+        gate_id VARCHAR NOT NULL,
+        vehicle_type VARCHAR NOT NULL,
+        entries BIGINT NOT NULL,
+        late_entries BIGINT NOT NULL,
+        final BOOLEAN NOT NULL,
+        watermark TIMESTAMP NOT NULL,
+        PRIMARY KEY (window_seconds, slide_seconds, window_start, gate_id, vehicle_type)
+    )
+"""
+WATERMARK_STATEMENT = 'windows_watermark'
+WATERMARK_SQL = f"SELECT max(watermark) AS watermark FROM {WINDOW_TABLE}"
+OPEN_WINDOWS_STATEMENT = 'windows_open'
+OPEN_WINDOWS_SQL = f"""
+    SELECT window_seconds, slide_seconds, window_start, gate_id, vehicle_type, entries, late_entries, final
+    FROM {WINDOW_TABLE}
+    WHERE window_end + to_seconds(?::BIGINT) > (SELECT max(watermark) FROM {WINDOW_TABLE})
+"""
+
+_WINDOW_SCHEMA = pa.schema([
+    ('window_seconds', pa.int32()),
+    ('slide_seconds', pa.int32()),
+    ('window_start', pa.timestamp('us')),
+    ('window_end', pa.timestamp('us')),
+    ('gate_id', pa.string()),
+    ('vehicle_type', pa.string()),
+    ('entries', pa.int64()),
+    ('late_entries', pa.int64()),
+    ('final', pa.bool_()),
+    ('watermark', pa.timestamp('us')),
+])
+
+# (window seconds, slide seconds, start in epoch millis, gate, vehicle type)
+WindowKey = Tuple[int, int, int, str, str]
+
+
+class WindowSpec(NamedTuple):
+    size_s: int
+    slide_s: int
+
+    @property
+    def tumbling(self) -> bool:
+        return self.size_s == self.slide_s
+
+    def starts(self, event_ms: int) -> range:
+        """Start, in epoch millis, of every window of this spec that holds ``event_ms``, newest first."""
+        slide_ms = self.slide_s * 1000
+        return range(event_ms - event_ms % slide_ms, event_ms - self.size_s * 1000, -slide_ms)
+
+
+def parse_window_specs(spec: str) -> List[WindowSpec]:
+    """``60,900:60`` -> a tumbling minute and a 15-minute window sliding every minute."""
+    specs = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        size, _, slide = item.partition(':')
+        window = WindowSpec(int(size), int(slide or size))
+        if window.slide_s <= 0 or window.size_s % window.slide_s:
+            raise ValueError(f"Window {item}: the size must be a positive multiple of the slide")
+        specs.append(window)
+    return specs
+
+
+def _local(ms: int) -> datetime:
+    # Same conversion as the connector's TIMESTAMP columns: naive local time
+    return datetime.fromtimestamp(ms / 1000.0)
+
+
+def _epoch_ms(value) -> int:
+    if isinstance(value, str):
+        # The REST backend returns timestamps as ISO strings
+        value = datetime.fromisoformat(value)
+    return round(value.timestamp() * 1000)
+
+
+class Window:
+    __slots__ = ('entries', 'late_entries', 'final')
+
+    def __init__(self, entries: int = 0, late_entries: int = 0, final: bool = False):
+        self.entries = entries
+        self.late_entries = late_entries
+        self.final = final
+
+
+class WindowEngine:
+    """Entry counts per window, gate and vehicle type, finalized by an event-time watermark.
+
+    The watermark trails the newest event by ``watermark_delay_s``. A
+    window is final once the watermark passes its end; events for it that
+    arrive within ``allowed_lateness_s`` after that still count, and are
+    also counted as ``late_entries``. Later events are dropped for that
+    window, and windows past their lateness are forgotten.
+    :meth:`drain` returns every window that changed since the last drain
+    with its complete counts, so storing a drain replaces rows. A caller
+    that may fail to store them takes :meth:`changes` and calls
+    :meth:`commit` once they are stored.
+    """
+
+    def __init__(self, specs: Optional[List[WindowSpec]] = None,
+                 watermark_delay_s: float = WATERMARK_DELAY_S,
+                 allowed_lateness_s: float = ALLOWED_LATENESS_S):
+        self.specs = specs if specs is not None else parse_window_specs(WINDOW_SPECS)
+        self.delay_ms = int(watermark_delay_s * 1000)
+        self.lateness_ms = int(allowed_lateness_s * 1000)
+        self.windows: Dict[WindowKey, Window] = {}
+        self.max_event_ms: Optional[int] = None
+        self._changed: Set[WindowKey] = set()
+        self.counts = {'events': 0, 'dropped': 0, 'late_updates': 0, 'finalized': 0}
+
+    @property
+    def watermark_ms(self) -> Optional[int]:
+        return None if self.max_event_ms is None else self.max_event_ms - self.delay_ms
+
+    def add(self, event_ms: int, gate_id: str, vehicle_type: str) -> bool:
+        """Count one entry in every window that holds it; False if it came too late for all of them."""
+        watermark = self.watermark_ms
+        accepted = False
+        for spec in self.specs:
+            for start in spec.starts(event_ms):
+                if watermark is not None and start + spec.size_s * 1000 + self.lateness_ms <= watermark:
+                    # Older starts of this spec closed even earlier
+                    break
+                key = (spec.size_s, spec.slide_s, start, gate_id, vehicle_type)
+                window = self.windows.get(key)
+                if window is None:
+                    window = self.windows[key] = Window()
+                window.entries += 1
+                if window.final:
+                    window.late_entries += 1
+                    self.counts['late_updates'] += 1
+                self._changed.add(key)
+                accepted = True
+        self.counts['events'] += 1
+        if not accepted:
+            self.counts['dropped'] += 1
+        if self.max_event_ms is None or event_ms > self.max_event_ms:
+            self.max_event_ms = event_ms
+        return accepted
+
+    def _closed(self, key: WindowKey, watermark: Optional[int]) -> bool:
+        return watermark is not None and key[2] + key[0] * 1000 <= watermark
+
+    def changes(self) -> Tuple[List[WindowKey], pa.Table]:
+        """Windows changed or finalized since the last commit, as rows of ``entry_windows``; changes no state."""
+        watermark = self.watermark_ms
+        finalized = {key for key, window in self.windows.items()
+                     if not window.final and self._closed(key, watermark)}
+        keys = sorted(self._changed | finalized)
+        windows = [self.windows[key] for key in keys]
+        table = pa.table({
+            'window_seconds': [key[0] for key in keys],
+            'slide_seconds': [key[1] for key in keys],
+            'window_start': [_local(key[2]) for key in keys],
+            'window_end': [_local(key[2] + key[0] * 1000) for key in keys],
+            'gate_id': [key[3] for key in keys],
+            'vehicle_type': [key[4] for key in keys],
+            'entries': [window.entries for window in windows],
+            'late_entries': [window.late_entries for window in windows],
+            'final': [window.final or key in finalized for key, window in zip(keys, windows)],
+            'watermark': [_local(watermark) for _ in keys],
+        }, schema=_WINDOW_SCHEMA)
+        return keys, table
+
+    def commit(self, keys: List[WindowKey]) -> None:
+        """Record that the rows :meth:`changes` returned for ``keys`` are stored, and forget closed windows."""
+        watermark = self.watermark_ms
+        for key in keys:
+            self._changed.discard(key)
+            window = self.windows[key]
+            if not window.final and self._closed(key, watermark):
+                window.final = True
+                self.counts['finalized'] += 1
+        if watermark is not None:
+            for key in [key for key in self.windows if key[2] + key[0] * 1000 + self.lateness_ms <= watermark]:
+                del self.windows[key]
+
+    def drain(self) -> pa.Table:
+        """Windows changed or finalized since the last drain, as rows of ``entry_windows``."""
+        keys, table = self.changes()
+        self.commit(keys)
+        return table
+
+    def restore(self, watermark, data: Dict[str, List]) -> int:
+        """Replace the state with stored windows that can still change, and the watermark they were written at."""
+        self.windows, self._changed = {}, set()
+        self.max_event_ms = None if watermark is None else _epoch_ms(watermark) + self.delay_ms
+        specs = {(spec.size_s, spec.slide_s) for spec in self.specs}
+        for size, slide, start, gate_id, vehicle_type, entries, late_entries, final in zip(
+                data['window_seconds'], data['slide_seconds'], data['window_start'], data['gate_id'],
+                data['vehicle_type'], data['entries'], data['late_entries'], data['final']):
+            # Windows of specs no longer configured stay in the table but are not kept current
+            if (size, slide) in specs:
+                self.windows[(size, slide, _epoch_ms(start), gate_id, vehicle_type)] = Window(
+                    entries, late_entries, final)
+        return len(self.windows)
+
+    def metrics(self) -> Dict:
+        return dict(self.counts, open_windows=len(self.windows), watermark_ms=self.watermark_ms)
+
+
+class WindowProcessor:
+    """Consumes entry events into a WindowEngine and upserts the changed windows into DuckDB.
+
+    Every flush writes the changed windows and the next offset of each
+    partition in one transaction, so the table is the engine's checkpoint:
+    on start the processor reloads the windows that can still change and
+    resumes from the stored offsets. Kafka offsets are committed after
+    each flush only so that lag monitoring stays accurate.
+    """
+
+    def __init__(self, consumer: Optional[Consumer] = None, storage: Optional[Storage] = None,
+                 deserialize: Optional[Callable[[bytes], Dict]] = None,
+                 engine: Optional[WindowEngine] = None,
+                 flush_interval_s: float = FLUSH_INTERVAL_S,
+                 batch_size: int = BATCH_SIZE):
+        self.engine = engine or WindowEngine()
+        self.flush_interval_s = flush_interval_s
+        self.batch_size = batch_size
+        self.running = False
+        self.undecodable = 0
+        self.windows_written = 0
+        self.deserialize = deserialize or self._avro_deserializer()
+        self.storage = storage or storage_from_spec(DUCKDB_STORAGE, lambda: DuckDBClient(DUCKDB_API_URL))
+        self.consumer = consumer or Consumer({
+            'bootstrap.servers': KAFKA_BOOTSTRAP_SERVERS,
+            'group.id': GROUP_ID,
+            'auto.offset.reset': 'earliest',
+            'enable.auto.commit': False,
+        })
+        # First and next offset per (topic, partition) since the last flush
+        self._starts: Dict[Tuple[str, int], int] = {}
+        self._offsets: Dict[Tuple[str, int], int] = {}
+
+    @staticmethod
+    def _avro_deserializer() -> Callable[[bytes], Dict]:
+        registry = SchemaRegistryClient({'url': SCHEMA_REGISTRY_URL})
+        schema_str, _ = resolve_schema(ENTRY_TOPIC, ENTRY_SCHEMA_FILE, registry, fallback=DEFAULT_ENTRY_SCHEMA)
+        deserializer = AvroDeserializer(registry, schema_str)
+        return lambda value: deserializer(value, SerializationContext(ENTRY_TOPIC, MessageField.VALUE))
+
+    def _stopped(self) -> bool:
+        return not self.running
+
+    def restore(self) -> int:
+        """Create the windows table if needed and reload the windows that can still change."""
+        self.storage.execute(CREATE_WINDOWS_SQL)
+        watermark = self.storage.query_prepared(WATERMARK_STATEMENT, WATERMARK_SQL, [])['data']['watermark'][0]
+        data = {'window_seconds': [], 'slide_seconds': [], 'window_start': [], 'gate_id': [],
+                'vehicle_type': [], 'entries': [], 'late_entries': [], 'final': []}
+        if watermark is not None:
+            data = self.storage.query_prepared(OPEN_WINDOWS_STATEMENT, OPEN_WINDOWS_SQL,
+                                               [self.engine.lateness_ms // 1000])['data']
+        return self.engine.restore(watermark, data)
+
+    def _on_assign(self, consumer, partitions):
+        """Resume assigned partitions from the offsets stored with the windows."""
+        stored = self.storage.stored_offsets(GROUP_ID, ENTRY_TOPIC)
+        for tp in partitions:
+            if (tp.topic, tp.partition) in stored:
+                tp.offset = stored[(tp.topic, tp.partition)]
+        consumer.assign(partitions)
+
+    def process(self, msgs) -> None:
+        """Add one consumed batch to the engine."""
+        for msg in msgs:
+            if msg.error():
+                logger.error(f"Consumer error: {msg.error()}")
+                continue
+            key = (msg.topic(), msg.partition())
+            self._starts.setdefault(key, msg.offset())
+            self._offsets[key] = msg.offset() + 1
+            try:
+                event = self.deserialize(msg.value())
+            except Exception as e:
+                self.undecodable += 1
+                logger.error(f"Skipping undecodable message {msg.topic()}[{msg.partition()}]@{msg.offset()}: {e}")
+                continue
+            self.engine.add(event['timestamp'], event.get('gateId') or '', event.get('vehicleType') or '')
+
+    def flush(self) -> bool:
+        """Upsert the changed windows with the offsets they cover; False if nothing was stored."""
+        if not self._offsets:
+            return True
+        # The engine keeps the changes until they are stored, so a failed append is retried by the next flush
+        keys, rows = self.engine.changes()
+        offsets = {key: (self._starts[key], offset) for key, offset in self._offsets.items()}
+        try:
+            result = self.storage.append(WINDOW_TABLE, rows, self._stopped, consumer_group=GROUP_ID,
+                                         offsets=offsets, replace=True)
+        except OffsetConflict as e:
+            # Another processor stored windows past these offsets: continue from its state
+            logger.warning(f"Windows overlap stored offsets {e.stored}; reloading")
+            self._reload(e.stored)
+            return False
+        if result is None:
+            return False
+        self.engine.commit(keys)
+        self.windows_written += rows.num_rows
+        self.consumer.commit(offsets=[TopicPartition(topic, partition, offset)
+                                      for (topic, partition), offset in self._offsets.items()],
+                             asynchronous=True)
+        self._starts, self._offsets = {}, {}
+        return True
+
+    def _reload(self, stored: Dict[Tuple[str, int], int]) -> None:
+        self.restore()
+        self._starts, self._offsets = {}, {}
+        for (topic, partition), offset in stored.items():
+            try:
+                self.consumer.seek(TopicPartition(topic, partition, offset))
+            except KafkaException as e:
+                logger.info(f"Not seeking {topic}[{partition}]: {e}")
+
+    def metrics(self) -> Dict:
+        return dict(self.engine.metrics(), undecodable=self.undecodable, windows_written=self.windows_written)
+
+    def stop(self):
+        self.running = False
+
+    def start(self):
+        restored = self.restore()
+        logger.info(f"Restored {restored} open windows from {WINDOW_TABLE}")
+        self.consumer.subscribe([ENTRY_TOPIC], on_assign=self._on_assign)
+        self.running = True
+        next_flush = time.monotonic() + self.flush_interval_s
+        try:
+            while self.running:
+                self.process(self.consumer.consume(num_messages=self.batch_size, timeout=1.0))
+                if time.monotonic() >= next_flush:
+                    self.flush()
+                    next_flush = time.monotonic() + self.flush_interval_s
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            try:
+                # One attempt: what is not stored is consumed again from the stored offsets
+                self.flush()
+            except Exception as e:
+                logger.error(f"Final window flush failed: {e}")
+            self.consumer.close()
+            self.storage.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Keep event-time entry windows current in DuckDB")
+    parser.add_argument("--windows", default=WINDOW_SPECS,
+                        help="window sizes in seconds, size:slide for sliding windows")
+    parser.add_argument("--allowed-lateness", type=float, default=ALLOWED_LATENESS_S,
+                        help="seconds a window takes late events after the watermark passed its end")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL_S,
+                        help="seconds between window upserts")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    engine = WindowEngine(parse_window_specs(args.windows), allowed_lateness_s=args.allowed_lateness)
+    WindowProcessor(engine=engine, flush_interval_s=args.flush_interval).start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Kafka and HTTP stand-ins shared by the connector tests."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeMessage:
+    def __init__(self, value, offset=0, topic='parking.entry.events', partition=0, timestamp_ms=None):
+        self._value = value
+        self._offset = offset
+        self._topic = topic
+        self._partition = partition
+        self._timestamp_ms = timestamp_ms
+
+    def value(self):
+        return self._value
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def timestamp(self):
+        # (TIMESTAMP_CREATE_TIME, ms), or TIMESTAMP_NOT_AVAILABLE
+        return (1, self._timestamp_ms) if self._timestamp_ms is not None else (0, -1)
+
+    def error(self):
+        return None
+
+
+class FakeConsumer:
+    """Hands out the queued batches, then stops the connector loop.
+
+    With ``until`` the consumer keeps returning empty polls once the
+    batches are used up until ``until()`` is true, for up to five seconds.
+    """
+
+    def __init__(self, batches, until=None):
+        self.batches = list(batches)
+        self.until = until
+        self._idle_deadline = None
+        self.commits = 0
+        self.committed = []
+        self.seeks = []
+        self.assigned = None
+        self.pauses = 0
+        self.resumes = 0
+        self.closed = False
+
+    def subscribe(self, topics, on_assign=None, on_revoke=None):
+        self.topics = topics
+        self.on_assign = on_assign
+        self.on_revoke = on_revoke
+
+    def assign(self, partitions):
+        self.assigned = sorted((tp.topic, tp.partition, tp.offset) for tp in partitions)
+
+    def seek(self, partition):
+        self.seeks.append((partition.topic, partition.partition, partition.offset))
+
+    def assignment(self):
+        return []
+
+    def pause(self, partitions):
+        self.pauses += 1
+
+    def resume(self, partitions):
+        self.resumes += 1
+
+    def consume(self, num_messages=1, timeout=-1):
+        if not self.batches:
+            if self.until is not None and not self.until():
+                self._idle_deadline = self._idle_deadline or time.monotonic() + 5
+                if time.monotonic() < self._idle_deadline:
+                    time.sleep(0.01)
+                    return []
+            raise KeyboardInterrupt
+        return self.batches.pop(0)[:num_messages]
+
+    def poll(self, timeout=None):
+        batch = self.consume(1, timeout)
+        return batch[0] if batch else None
+
+    def commit(self, offsets=None, asynchronous=True):
+        self.commits += 1
+        self.committed.append(sorted((tp.topic, tp.partition, tp.offset) for tp in offsets or []))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self.text = ''
+        self.headers = {}
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeDuckDBServer:
+    """The DuckDB REST server on a local port, answering from a script.
+
+    ``respond(method, path, params, body)`` returns ``(status, payload)``,
+    ``(status, payload, headers)`` or None for ``200 {"status": "success"}``.
+    Every request is recorded as ``(method, path, params, body)``.
+    """
+
+    def __init__(self, respond=None):
+        self.respond = respond or (lambda method, path, params, body: None)
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                url = urlsplit(self.path)
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                params = parse_qs(url.query)
+                fake.requests.append((self.command, url.path, params, body))
+                status, payload, headers = fake._answer(self.command, url.path, params, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def _answer(self, method, path, params, body):
+        answer = self.respond(method, path, params, body)
+        if answer is None:
+            return 200, {'status': 'success'}, {}
+        return answer if len(answer) == 3 else (answer[0], answer[1], {})
+
+    def appends(self):
+        return [r for r in self.requests if r[1].endswith('/append')]
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -31,11 +31,11 @@ def test_db():
 
 def test_dashboard_layout(dash_duo):
     dash_duo.start_server(app)
-    assert dash_duo.find_element("#entry-timeline") is not None
+    assert dash_duo.find_element("#vehicle-entries-graph") is not None
     
 def test_graph_update(dash_duo, test_db):
     dash_duo.start_server(app)
     # Wait for the graph to load
-    dash_duo.wait_for_element("#entry-timeline", timeout=4)
+    dash_duo.wait_for_element("#vehicle-entries-graph", timeout=4)
     # Verify the graph exists and has data
     assert len(dash_duo.find_elements(".js-plotly-plot")) > 0
@@ -0,0 +1,52 @@
+import pytest
+
+from parkflow_dashboard.duckdb_client import CircuitBreaker, CircuitOpen, DuckDBClient
+
+from fakes import FakeDuckDBServer
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast():
+    with FakeDuckDBServer(lambda method, path, params, body: (503, {'detail': 'down'})) as server:
+        client = DuckDBClient(server.url, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        assert [client.get('/health').status_code for _ in range(2)] == [503, 503]
+
+        with pytest.raises(CircuitOpen):
+            client.get('/health')
+
+    assert len(server.requests) == 2
+    assert (client.breaker.state, client.breaker.opened) == ('open', 1)
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+
+    now[0] = 10
+    assert breaker.state == 'half-open'
+    breaker.before_request()
+    # A second request waits for the trial's outcome
+    with pytest.raises(CircuitOpen):
+        breaker.before_request()
+
+    breaker.record_failure()
+    assert (breaker.state, breaker.opened) == ('open', 2)
+    now[0] = 20
+    breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_retry_stops_on_a_definitive_answer_or_when_asked():
+    statuses = iter([502, 429, 404])
+
+    def respond(method, path, params, body):
+        return next(statuses), {}, {'Retry-After': '0'}
+
+    with FakeDuckDBServer(respond) as server:
+        client = DuckDBClient(server.url, backoff_s=0.01)
+        assert client.request_with_retry('GET', '/tables/missing').status_code == 404
+        assert client.retries == 2
+
+    # Nothing listens once the server is gone: give up as soon as stop() is true
+    assert client.request_with_retry('GET', '/health', stop=lambda: True) is None
@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+from dash import Patch, no_update
+
+from parkflow_dashboard import app as dashboard
+
+from fakes import FakeResponse
+
+NOW = datetime.now().replace(second=0, microsecond=0)
+MINUTE = int(NOW.replace(tzinfo=timezone.utc).timestamp())
+
+
+def _entries(version, counts=(), confidence=()):
+    """A /dashboard/entries payload from (bucket, gate, type, entries) and (bucket, bin, entries)."""
+    counts, confidence = list(counts), list(confidence)
+    return {
+        'status': 'success',
+        'version': version,
+        'counts': {
+            'bucket': [c[0] for c in counts], 'gate_id': [c[1] for c in counts],
+            'vehicle_type': [c[2] for c in counts], 'entries': [c[3] for c in counts],
+        },
+        'confidence': {
+            'bucket': [c[0] for c in confidence], 'confidence_bin': [c[1] for c in confidence],
+            'entries': [c[2] for c in confidence],
+        },
+    }
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Answers /dashboard/entries with the queued payloads and records the request params."""
+    payloads, requests_seen = [], []
+
+    def fake_request(session, method, url, params=None, **kwargs):
+        requests_seen.append(params)
+        response = FakeResponse()
+        response.json = lambda: payloads.pop(0)
+        return response
+
+    monkeypatch.setattr(requests.Session, 'request', fake_request)
+    monkeypatch.setattr(dashboard, '_storage', None)
+    return payloads, requests_seen
+
+
+def test_first_tick_builds_full_figure_from_rollups(service):
+    payloads, requests_seen = service
+    payloads.append(_entries(7,
+                             counts=[(MINUTE, 'GATE_A', 'CAR', 3), (MINUTE, 'GATE_B', 'TRUCK', 1)],
+                             confidence=[(MINUTE, 18, 4)]))
+
+    fig, state = dashboard.refresh_dashboard(0, None)
+
+    assert requests_seen[0]['since_version'] == -1
+    assert list(fig.data[0].x) == ['GATE_A', 'GATE_B']
+    assert list(fig.data[2].y) == [4]
+    assert fig.data[3].y[18] == 4
+    assert state['watermark'] == 7
+
+
+def test_later_ticks_replace_touched_buckets_and_patch(service):
+    payloads, requests_seen = service
+    payloads.append(_entries(7, counts=[(MINUTE - 60, 'GATE_A', 'CAR', 2)]))
+    fig, state = dashboard.refresh_dashboard(0, None)
+
+    payloads.append(_entries(7))
+    assert dashboard.refresh_dashboard(1, state) == (no_update, no_update)
+
+    # Bucket totals come back complete, so a touched bucket is replaced, not added to
+    payloads.append(_entries(9, counts=[(MINUTE - 60, 'GATE_A', 'CAR', 3), (MINUTE, 'GATE_C', 'CAR', 1)]))
+    patched, state = dashboard.refresh_dashboard(2, state)
+
+    assert requests_seen[-1]['since_version'] == 7
+    assert isinstance(patched, Patch)
+    assert dashboard.dashboard_totals(state)['gates'] == {'GATE_A': 3, 'GATE_C': 1}
+    operations = patched.to_plotly_json()['operations']
+    assert any(op['operation'] == 'Extend' and op['location'] == ['data', 2, 'y'] for op in operations)
+    assert {'operation': 'Assign', 'location': ['data', 2, 'y', 0], 'params': {'value': 3}} in operations
+
+
+def test_expired_buckets_leave_the_window():
+    state = dashboard.new_dashboard_state(window_minutes=60)
+    now = datetime(2024, 1, 1, 12, 0)
+    old = int(datetime(2024, 1, 1, 10, 0, tzinfo=timezone.utc).timestamp())
+    state['buckets'] = {str(old): {'entries': 3, 'gates': {'GATE_A': 3}, 'types': {'CAR': 3},
+                                   'confidence': {'18': 3}}}
+
+    changed, expired = dashboard.merge_entry_buckets(state, _entries(-1), now=now)
+
+    assert (changed, expired) == (set(), 1)
+    assert state['buckets'] == {}
+
+
+def test_freshness_line_reports_lag_of_the_newest_entry(monkeypatch):
+    newest = datetime.now().replace(microsecond=0)
+    freshness = {'newest_event': newest.isoformat(), 'last_commit': newest.isoformat()}
+    monkeypatch.setattr(dashboard, 'fetch_freshness', lambda: freshness)
+
+    assert dashboard.freshness_lag(freshness, now=newest + timedelta(seconds=10)) == 10.0
+    text, style = dashboard.update_freshness(0)
+    assert text.startswith(f"Newest entry {newest.time().isoformat()}") and style == {}
+
+    monkeypatch.setattr(dashboard, 'fetch_freshness', lambda: {'newest_event': None, 'last_commit': None})
+    assert dashboard.update_freshness(0) == ("No entries yet", {})
+
+
+def test_recent_mode_parses_timestamps_with_and_without_fractions(monkeypatch):
+    data = {'timestamp': ['2024-01-01T08:00:00', '2024-01-01T08:00:00.250000'],
+            'license_plate': ['ABC1', 'ABC2'], 'gate_id': ['GATE_A', 'GATE_B'],
+            'vehicle_type': ['CAR', 'TRUCK'], 'confidence': [0.9, 0.8]}
+    monkeypatch.setattr(dashboard, 'execute_prepared', lambda name, sql, params: {'data': data})
+
+    assert len(dashboard.update_graph(0).data) == 4
@@ -0,0 +1,112 @@
+import json
+import logging
+
+import pyarrow as pa
+import pytest
+import requests
+
+from parkflow_dashboard import avro_mapping
+from parkflow_dashboard.avro_mapping import TableMapping, resolve_schema, snake_case
+from parkflow_dashboard.ingestion import MultiTopicIngestion, build_mappings
+
+from fakes import FakeConsumer, FakeMessage, FakeResponse
+
+PAYMENT_SCHEMA = json.dumps({
+    "type": "record",
+    "name": "PaymentEvent",
+    "fields": [
+        {"name": "eventId", "type": "string"},
+        {"name": "timestamp", "type": "long"},
+        {"name": "amount", "type": "double"},
+        {"name": "paymentMethod", "type": {"type": "enum", "name": "PaymentMethod",
+                                           "symbols": ["CREDIT_CARD", "CASH"]}},
+        {"name": "operatorId", "type": ["null", "string"], "default": None},
+        {"name": "parkingDuration", "type": "long"},
+    ]
+})
+
+
+def test_snake_case():
+    assert snake_case('licensePlate') == 'license_plate'
+    assert snake_case('eventId') == 'event_id'
+    assert snake_case('timestamp') == 'timestamp'
+
+
+def test_mapping_derives_ddl_and_rows_from_avro():
+    mapping = TableMapping('parking.payment.events', 'payments', PAYMENT_SCHEMA)
+
+    ddl = mapping.create_table_sql()
+    assert 'timestamp TIMESTAMP' in ddl
+    assert 'payment_method VARCHAR' in ddl
+    assert 'parking_duration BIGINT' in ddl
+    assert mapping.insert_sql().count('?') == 6
+
+    row = mapping.to_row({'eventId': 'p-1', 'timestamp': 1_700_000_000_000, 'amount': 4.5,
+                          'paymentMethod': 'CASH', 'operatorId': None, 'parkingDuration': 90})
+    table = mapping.to_arrow([row])
+    assert table.schema.field('timestamp').type == pa.timestamp('us')
+    assert table.column('payment_method').to_pylist() == ['CASH']
+
+
+def test_build_mappings_uses_shipped_schemas_and_skips_unknown():
+    mappings = build_mappings([
+        {'topic': 'parking.exit.events', 'table': 'vehicle_exits', 'schema': 'VehicleExitEvent.avsc'},
+        {'topic': 'parking.unknown', 'table': 'unknown', 'schema': 'Missing.avsc'},
+    ])
+    assert [m.table for m in mappings] == ['vehicle_exits']
+    assert 'entry_event_id' in mappings[0].column_names
+
+
+def test_a_missing_schema_file_is_logged_as_an_error(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(avro_mapping, 'AVRO_SCHEMA_DIR', tmp_path)
+
+    with caplog.at_level(logging.ERROR, logger='parkflow_dashboard.avro_mapping'):
+        assert resolve_schema('parking.entry.events', 'VehicleEntryEvent.avsc', fallback='{}') == ('{}', 'default')
+    assert str(tmp_path / 'VehicleEntryEvent.avsc') in caplog.text
+
+
+def test_each_topic_is_ingested_into_its_own_table(monkeypatch):
+    posted = []
+    monkeypatch.setattr(requests.Session, 'request',
+                        lambda session, method, url, **kwargs: posted.append(url) or FakeResponse())
+    mapping = TableMapping('parking.payment.events', 'payments', PAYMENT_SCHEMA)
+    entries = build_mappings([{'topic': 'parking.entry.events', 'table': 'vehicle_entries',
+                               'schema': 'VehicleEntryEvent.avsc'}])[0]
+    payment = {'eventId': 'p-1', 'timestamp': 1, 'amount': 2.0, 'paymentMethod': 'CASH',
+               'operatorId': None, 'parkingDuration': 5}
+    entry = {'eventId': 'e-1', 'timestamp': 1, 'licensePlate': 'ABC', 'gateId': 'GATE_A',
+             'laneId': 'L1', 'confidence': 0.9, 'imageUrl': None, 'vehicleType': 'CAR'}
+    consumers = {
+        'payments': FakeConsumer([[FakeMessage(payment, topic='parking.payment.events')]]),
+        'vehicle_entries': FakeConsumer([[FakeMessage(entry)]]),
+    }
+
+    ingestion = MultiTopicIngestion([mapping, entries],
+                                    consumer_factory=lambda m: consumers[m.table],
+                                    avro_deserializer=lambda value, ctx: value,
+                                    batch_mode=True, batch_linger_ms=0)
+    ingestion.run()
+
+    assert any(url.endswith('/tables/payments/append') for url in posted)
+    assert any(url.endswith('/tables/vehicle_entries/append') for url in posted)
+    assert all(c.commits == 1 for c in consumers.values())
+
+
+def test_workers_share_a_topic_and_report_their_partitions(monkeypatch):
+    monkeypatch.setattr(requests.Session, 'request', lambda session, method, url, **kwargs: FakeResponse())
+    mapping = TableMapping('parking.payment.events', 'payments', PAYMENT_SCHEMA)
+    payment = {'eventId': 'p-1', 'timestamp': 1, 'amount': 2.0, 'paymentMethod': 'CASH',
+               'operatorId': None, 'parkingDuration': 5}
+    consumers = [FakeConsumer([[FakeMessage(payment, offset=3, topic=mapping.topic, partition=p)]])
+                 for p in range(3)]
+
+    ingestion = MultiTopicIngestion([mapping], workers=3,
+                                    consumer_factory=lambda m: consumers.pop(0),
+                                    avro_deserializer=lambda value, ctx: value,
+                                    batch_mode=True, batch_linger_ms=0)
+    ingestion.run()
+
+    assert [t.name for t in ingestion.threads] == ['ingest-payments-0', 'ingest-payments-1', 'ingest-payments-2']
+    committed = sorted(c.consumer.committed[0][0] for c in ingestion.connectors)
+    assert committed == [('parking.payment.events', p, 4) for p in range(3)]
+    assert [m['rows_written'] for m in ingestion.metrics()] == [1, 1, 1]
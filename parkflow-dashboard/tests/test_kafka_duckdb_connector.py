@@ -0,0 +1,181 @@
+import json
+from datetime import datetime
+
+import pyarrow as pa
+import pytest
+import requests
+
+from parkflow_dashboard import kafka_duckdb_connector as connector_module
+from parkflow_dashboard.kafka_duckdb_connector import KafkaToDuckDBConnector
+
+from fakes import FakeConsumer, FakeMessage, FakeResponse
+
+
+def _event(i, plate="ABC123"):
+    return {
+        'eventId': f'evt-{i}',
+        'timestamp': 1_700_000_000_000 + i,
+        'licensePlate': plate,
+        'gateId': 'GATE_A',
+        'laneId': 'LANE_1',
+        'confidence': 0.9,
+        'imageUrl': None,
+        'vehicleType': 'CAR',
+    }
+
+
+def _respond(monkeypatch, respond):
+    """Answer every request of the connector's session with ``respond(url, **kwargs)``."""
+    monkeypatch.setattr(requests.Session, 'request',
+                        lambda session, method, url, **kwargs: respond(url, **kwargs))
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    calls = []
+    _respond(monkeypatch, lambda url, **kwargs: calls.append(dict(kwargs, url=url)) or FakeResponse())
+    return calls
+
+
+def _connector(consumer, **kwargs):
+    return KafkaToDuckDBConnector(consumer=consumer,
+                                  avro_deserializer=lambda value, ctx: value,
+                                  **kwargs)
+
+
+def test_batched_mode_writes_one_request_per_batch(posted):
+    msgs = [FakeMessage(_event(i), offset=i) for i in range(4)]
+    consumer = FakeConsumer([msgs])
+    _connector(consumer, batch_mode=True, batch_size=4).start()
+
+    # One CREATE TABLE plus one Arrow append carrying all four rows
+    assert len(posted) == 2
+    table = pa.ipc.open_stream(posted[1]['data']).read_all()
+    assert table.column('event_id').to_pylist() == [f'evt-{i}' for i in range(4)]
+    assert consumer.commits == 1
+    assert consumer.closed
+
+
+def test_batched_mode_does_not_commit_failed_batch(posted, monkeypatch):
+    consumer = FakeConsumer([[FakeMessage(_event(0))]])
+    connector = _connector(consumer, batch_mode=True, batch_size=10)
+    _respond(monkeypatch, lambda url, **kwargs: FakeResponse(500))
+
+    assert connector._flush([connector._decode(FakeMessage(_event(0)))]) is False
+    assert consumer.commits == 0
+
+
+def test_per_row_mode_inserts_each_message(posted):
+    msgs = [FakeMessage(_event(i, plate="O'NEIL")) for i in range(3)]
+    consumer = FakeConsumer([[m] for m in msgs])
+    _connector(consumer, batch_mode=False, write_method='sql').start()
+
+    # CREATE TABLE, statement registration, then one prepared execution per message
+    assert len(posted) == 5
+    assert posted[1]['url'].endswith('/prepared')
+    batch = json.loads(posted[2]['data'])['batch']
+    assert batch[0][2] == "O'NEIL"
+    assert batch[0][1] == datetime.fromtimestamp(1_700_000_000).isoformat()
+
+
+def test_prepared_insert_is_re_registered_after_server_restart(posted, monkeypatch):
+    connector = _connector(FakeConsumer([]), write_method='sql')
+    statuses = iter([404, 200, 200])
+    _respond(monkeypatch, lambda url, **kwargs: posted.append(url) or FakeResponse(next(statuses)))
+
+    assert connector._insert_rows([connector._decode(FakeMessage(_event(0)))])
+    assert posted[-2].endswith('/prepared')
+
+
+def test_batched_mode_commits_next_offset_per_partition(posted):
+    msgs = [FakeMessage(_event(i), offset=10 + i, partition=i % 2) for i in range(4)]
+    consumer = FakeConsumer([msgs])
+    _connector(consumer, batch_mode=True, batch_size=4).start()
+
+    assert consumer.committed == [[('parking.entry.events', 0, 13), ('parking.entry.events', 1, 14)]]
+
+
+def test_buffered_batch_is_flushed_when_partitions_are_revoked(posted):
+    consumer = FakeConsumer([])
+    connector = _connector(consumer, batch_mode=True, batch_size=100)
+    connector.consumer.subscribe(['parking.entry.events'], on_revoke=connector._on_revoke)
+    connector._rows = connector._decode_batch([FakeMessage(_event(0), offset=7)])
+
+    consumer.on_revoke(consumer, [])
+
+    assert posted[-1]['url'].endswith('/tables/vehicle_entries/append')
+    assert consumer.committed == [[('parking.entry.events', 0, 8)]]
+    assert connector._rows == [] and connector._offsets == {}
+
+
+def test_stats_callback_tracks_lag_of_assigned_partitions(posted):
+    connector = _connector(FakeConsumer([]))
+    connector._on_stats(json.dumps({'topics': {'parking.entry.events': {'partitions': {
+        '0': {'consumer_lag': 42},
+        '1': {'consumer_lag': -1},
+        '-1': {'consumer_lag': 0},
+    }}}}))
+
+    assert connector.metrics()['partition_lag'] == {'parking.entry.events[0]': 42}
+
+
+def test_decode_worker_converts_raw_values(monkeypatch):
+    monkeypatch.setattr(connector_module, 'SchemaRegistryClient', lambda conf: None)
+    monkeypatch.setattr(connector_module, 'AvroDeserializer',
+                        lambda client, schema_str: lambda value, ctx: json.loads(value))
+    connector_module._init_decode_worker('parking.entry.events', 'vehicle_entries',
+                                         connector_module.DEFAULT_ENTRY_SCHEMA, 'http://registry')
+
+    rows, failures = connector_module._decode_values([json.dumps(_event(0)).encode(), b'not json'])
+
+    assert [row['event_id'] for row in rows] == ['evt-0']
+    assert [index for index, _ in failures] == [1]
+    assert rows[0]['timestamp'] == datetime.fromtimestamp(1_700_000_000)
+
+
+def test_exactly_once_sends_offset_ranges_and_dedups_on_event_id(posted, monkeypatch):
+    msgs = [FakeMessage(_event(i), offset=10 + i, partition=i % 2) for i in range(4)]
+    consumer = FakeConsumer([msgs])
+    connector = _connector(consumer, batch_mode=True, batch_size=4, exactly_once=True)
+    _respond(monkeypatch, lambda url, **kwargs: posted.append(
+        dict(kwargs, url=url)) or FakeResponse(payload={'rows': 3, 'duplicates': 1}))
+
+    connector.start()
+
+    params = posted[-1]['params']
+    assert params['offsets'] == ['parking.entry.events:0:10:13', 'parking.entry.events:1:11:14']
+    assert params['dedup_on'] == 'event_id'
+    assert (connector.rows_written, connector.duplicates_skipped) == (3, 1)
+    assert consumer.committed == [[('parking.entry.events', 0, 13), ('parking.entry.events', 1, 14)]]
+
+
+def test_exactly_once_conflict_drops_batch_and_seeks_to_stored_offsets(posted, monkeypatch):
+    consumer = FakeConsumer([])
+    connector = _connector(consumer, batch_mode=True, exactly_once=True)
+    connector._rows = connector._decode_batch(
+        [FakeMessage(_event(0), offset=5, partition=0), FakeMessage(_event(1), offset=9, partition=1)])
+    stored = {'detail': {'offsets': [{'topic': 'parking.entry.events', 'partition': 0, 'offset': 8}]}}
+    _respond(monkeypatch, lambda url, **kwargs: FakeResponse(409, stored))
+
+    # Partition 0 was written past by another consumer; partition 1 is replayed from the batch start
+    assert connector._flush(connector._rows, connector._offsets, connector._starts) is True
+    connector._resume_after_conflict()
+    assert sorted(consumer.seeks) == [('parking.entry.events', 0, 8), ('parking.entry.events', 1, 9)]
+    assert consumer.commits == 0
+
+
+def test_exactly_once_assignment_resumes_from_duckdb_offsets(posted, monkeypatch):
+    from confluent_kafka import TopicPartition
+
+    consumer = FakeConsumer([])
+    connector = _connector(consumer, batch_mode=True, exactly_once=True)
+    _respond(monkeypatch, lambda url, **kwargs: FakeResponse(
+        payload={'offsets': [{'topic': 'parking.entry.events', 'partition': 1, 'offset': 42}]}))
+
+    connector._on_assign(consumer, [TopicPartition('parking.entry.events', 0),
+                                    TopicPartition('parking.entry.events', 1)])
+
+    assert consumer.assigned[1] == ('parking.entry.events', 1, 42)
+    assert consumer.assigned[0][2] < 0
+    with pytest.raises(ValueError):
+        _connector(FakeConsumer([]), exactly_once=True, write_method='sql')
@@ -0,0 +1,70 @@
+import time
+
+from prometheus_client import CollectorRegistry
+
+from parkflow_dashboard.avro_mapping import TableMapping
+from parkflow_dashboard.duckdb_client import DuckDBClient
+from parkflow_dashboard.kafka_duckdb_connector import DEFAULT_ENTRY_SCHEMA, ENTRY_TOPIC, KafkaToDuckDBConnector
+from parkflow_dashboard.metrics import REGISTRY, ConnectorCollector, SessionCollector
+
+from fakes import FakeConsumer, FakeDuckDBServer, FakeMessage
+
+
+def _event(i):
+    return {'eventId': f'evt-{i}', 'timestamp': 1_700_000_000_000 + i, 'licensePlate': 'ABC123',
+            'gateId': 'GATE_A', 'laneId': 'LANE_1', 'confidence': 0.9, 'imageUrl': None,
+            'vehicleType': 'CAR'}
+
+
+def _count(name, table='metrics_entries'):
+    return REGISTRY.get_sample_value(f'parkflow_connector_{name}_seconds_count', {'table': table}) or 0
+
+
+def test_stored_batches_record_stage_times_and_event_lag():
+    # A table of its own keeps the histograms apart from other tests' batches
+    mapping = TableMapping(ENTRY_TOPIC, 'metrics_entries', DEFAULT_ENTRY_SCHEMA)
+    produced_ms = int((time.time() - 2) * 1000)
+    msgs = [FakeMessage(_event(i), offset=i, timestamp_ms=produced_ms + i) for i in range(3)]
+    before = {name: _count(name) for name in ('decode', 'queue', 'write', 'batch', 'event_lag')}
+
+    with FakeDuckDBServer() as server:
+        connector = KafkaToDuckDBConnector(consumer=FakeConsumer([msgs]),
+                                           avro_deserializer=lambda value, ctx: value,
+                                           client=DuckDBClient(server.url), mapping=mapping,
+                                           batch_mode=True, batch_size=3)
+        connector.start()
+
+    assert {name: _count(name) - count for name, count in before.items()} == {
+        'decode': 1, 'queue': 1, 'write': 1, 'batch': 1, 'event_lag': 1}
+    # Lag runs from the oldest message of the batch
+    assert 2 <= connector.last_event_lag < 10
+
+
+def test_collector_exports_connector_counters_per_worker():
+    worker = {'table': 'vehicle_entries', 'worker': 0, 'rows_written': 12, 'duplicates_skipped': 1,
+              'dead_letters': 2, 'http_retries': 3, 'queued_batches': 1, 'paused': True,
+              'circuit': 'half-open', 'event_lag_s': 1.5,
+              'partition_lag': {'parking.entry.events[0]': 42}}
+    registry = CollectorRegistry()
+    registry.register(ConnectorCollector(lambda: [worker]))
+
+    labels = {'table': 'vehicle_entries', 'worker': '0'}
+    assert registry.get_sample_value('parkflow_connector_rows_written_total', labels) == 12
+    assert registry.get_sample_value('parkflow_connector_paused', labels) == 1
+    assert registry.get_sample_value('parkflow_connector_circuit', dict(labels, state='half-open')) == 1
+    assert registry.get_sample_value('parkflow_connector_circuit', dict(labels, state='open')) == 0
+    assert registry.get_sample_value('parkflow_connector_partition_lag',
+                                     dict(labels, partition='parking.entry.events[0]')) == 42
+    assert registry.get_sample_value('parkflow_connector_last_event_lag_seconds', labels) == 1.5
+
+
+def test_session_collector_exports_occupancy_per_gate():
+    metrics = {'entries': 5, 'exits': 2, 'payments': 1, 'duplicates': 0, 'expired': 1, 'unmatched': 0,
+               'undecodable': 0, 'statuses_sent': 9, 'waiting_for_entry': 1, 'inside': 2,
+               'occupancy': {'ENTRY_NORTH': 2}}
+    registry = CollectorRegistry()
+    registry.register(SessionCollector(lambda: metrics))
+
+    assert registry.get_sample_value('parkflow_sessions_entries_total') == 5
+    assert registry.get_sample_value('parkflow_occupancy_inside') == 2
+    assert registry.get_sample_value('parkflow_occupancy_gate', {'gate': 'ENTRY_NORTH'}) == 2
@@ -0,0 +1,124 @@
+import base64
+import json
+import threading
+import time
+
+import pyarrow as pa
+
+from parkflow_dashboard.dead_letters import FileDeadLetters
+from parkflow_dashboard.duckdb_client import DuckDBClient
+from parkflow_dashboard.kafka_duckdb_connector import KafkaToDuckDBConnector
+
+from fakes import FakeConsumer, FakeDuckDBServer, FakeMessage
+
+TOPIC = 'parking.entry.events'
+
+
+def _event(i):
+    return {'eventId': f'evt-{i}', 'timestamp': 1_700_000_000_000 + i, 'licensePlate': 'ABC123',
+            'gateId': 'GATE_A', 'laneId': 'LANE_1', 'confidence': 0.9, 'imageUrl': None,
+            'vehicleType': 'CAR'}
+
+
+def _deserialize(value, ctx):
+    if not isinstance(value, dict):
+        raise ValueError("not an Avro record")
+    return value
+
+
+def _connector(server, consumer, **kwargs):
+    return KafkaToDuckDBConnector(consumer=consumer, avro_deserializer=_deserialize,
+                                  client=DuckDBClient(server.url, backoff_s=0.01),
+                                  batch_mode=True, **kwargs)
+
+
+def _event_ids(body):
+    return pa.ipc.open_stream(body).read_all().column('event_id').to_pylist()
+
+
+def _appended_ids(server):
+    return [event_id for _, _, _, body in server.appends() for event_id in _event_ids(body)]
+
+
+def test_writer_retries_unavailable_server_then_commits():
+    statuses = iter([503])
+
+    def respond(method, path, params, body):
+        if path.endswith('/append'):
+            status = next(statuses, 200)
+            return status, {'detail': 'busy'} if status != 200 else {'rows': 2}, {'Retry-After': '0'}
+
+    with FakeDuckDBServer(respond) as server:
+        consumer = FakeConsumer([[FakeMessage(_event(i), offset=i) for i in range(2)]],
+                                until=lambda: consumer.commits == 1)
+        connector = _connector(server, consumer, batch_size=2)
+        connector.start()
+
+    assert len(server.appends()) == 2
+    assert connector.storage.retries == 1
+    assert consumer.committed == [[(TOPIC, 0, 2)]]
+    assert connector.metrics()['circuit'] == 'closed'
+
+
+def test_consumer_pauses_while_the_writer_is_behind():
+    def respond(method, path, params, body):
+        # Hold appends until the consumer has had to pause
+        deadline = time.monotonic() + 5
+        while path.endswith('/append') and consumer.pauses == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    with FakeDuckDBServer(respond) as server:
+        consumer = FakeConsumer([[FakeMessage(_event(i), offset=i)] for i in range(4)],
+                                until=lambda: consumer.committed[-1:] == [[(TOPIC, 0, 4)]] and not connector.paused)
+        connector = _connector(server, consumer, batch_size=1, queue_batches=1)
+        connector.start()
+
+    assert consumer.pauses >= 1 and consumer.resumes == consumer.pauses
+    assert _appended_ids(server) == [f'evt-{i}' for i in range(4)]
+    assert consumer.committed[-1] == [(TOPIC, 0, 4)]
+
+
+def test_undecodable_and_rejected_messages_go_to_the_dead_letter_file(tmp_path):
+    def respond(method, path, params, body):
+        if path.endswith('/append') and 'evt-1' in _event_ids(body):
+            return 400, {'detail': 'Conversion Error: bad row'}
+
+    dlq = tmp_path / 'dlq.jsonl'
+    msgs = [FakeMessage(_event(0), offset=0), FakeMessage(_event(1), offset=1),
+            FakeMessage(b'garbage', offset=2), FakeMessage(_event(3), offset=3)]
+    with FakeDuckDBServer(respond) as server:
+        consumer = FakeConsumer([msgs], until=lambda: consumer.commits == 1)
+        connector = _connector(server, consumer, batch_size=4, dead_letters=FileDeadLetters(str(dlq)))
+        connector.start()
+
+    letters = [json.loads(line) for line in dlq.read_text().splitlines()]
+    assert (letters[0]['offset'], base64.b64decode(letters[0]['value'])) == (2, b'garbage')
+    assert letters[1]['row']['event_id'] == 'evt-1' and 'bad row' in letters[1]['error']
+    # The rejected batch is bisected: the good rows are written, and all offsets commit
+    assert sorted(set(_appended_ids(server)) - {'evt-1'}) == ['evt-0', 'evt-3']
+    assert consumer.committed == [[(TOPIC, 0, 4)]]
+    assert (connector.rows_written, connector.metrics()['dead_letters']) == (2, 2)
+
+
+def test_exactly_once_conflict_drops_queued_batches_and_seeks_back():
+    def respond(method, path, params, body):
+        if path == '/ingest/offsets':
+            return 200, {'offsets': []}
+        if path.endswith('/append'):
+            # Answer once the second batch is queued behind the first
+            deadline = time.monotonic() + 5
+            while connector._queue.qsize() == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return 409, {'detail': {'offsets': [{'topic': TOPIC, 'partition': 0, 'offset': 1}]}}
+
+    with FakeDuckDBServer(respond) as server:
+        consumer = FakeConsumer([[FakeMessage(_event(i), offset=i) for i in range(2)],
+                                 [FakeMessage(_event(i), offset=i) for i in range(2, 4)]],
+                                until=lambda: bool(consumer.seeks))
+        connector = _connector(server, consumer, batch_size=2, exactly_once=True)
+        connector.start()
+
+    # The second batch is never sent: it would leave a gap after the stored offset
+    assert len(server.appends()) == 1
+    assert consumer.seeks == [(TOPIC, 0, 1)]
+    assert consumer.commits == 0
@@ -0,0 +1,61 @@
+import os
+import sys
+import types
+
+import pytest
+
+from parkflow_dashboard import serve
+
+
+class FakeConfig:
+    def __init__(self):
+        self.settings = {}
+
+    def set(self, key, value):
+        self.settings[key] = value
+
+
+class FakeBaseApplication:
+    """Stands in for gunicorn's BaseApplication: loads the config and records the run."""
+    runs = []
+
+    def __init__(self):
+        self.cfg = FakeConfig()
+        self.load_config()
+
+    def run(self):
+        FakeBaseApplication.runs.append(self)
+
+
+@pytest.fixture
+def gunicorn(monkeypatch):
+    base = types.ModuleType('gunicorn.app.base')
+    base.BaseApplication = FakeBaseApplication
+    monkeypatch.setitem(sys.modules, 'gunicorn', types.ModuleType('gunicorn'))
+    monkeypatch.setitem(sys.modules, 'gunicorn.app', types.ModuleType('gunicorn.app'))
+    monkeypatch.setitem(sys.modules, 'gunicorn.app.base', base)
+    FakeBaseApplication.runs = []
+    return FakeBaseApplication
+
+
+def test_workers_share_the_snapshot_directory(gunicorn, monkeypatch, tmp_path):
+    monkeypatch.delenv('DUCKDB_STORAGE', raising=False)
+    monkeypatch.delenv('DASHBOARD_SNAPSHOT_DIR', raising=False)
+    monkeypatch.setattr(sys, 'argv', ['serve', '--bind', '127.0.0.1:9000', '--workers', '3', '--threads', '2',
+                                      '--snapshot-dir', str(tmp_path)])
+
+    serve.main()
+    assert os.environ['DASHBOARD_SNAPSHOT_DIR'] == str(tmp_path)
+    [application] = gunicorn.runs
+    assert application.cfg.settings == {'bind': '127.0.0.1:9000', 'workers': 3, 'threads': 2,
+                                        'worker_class': 'gthread'}
+
+
+def test_an_embedded_database_is_refused_with_several_workers(gunicorn, monkeypatch, tmp_path):
+    monkeypatch.setenv('DUCKDB_STORAGE', f'embedded:{tmp_path / "parkflow.duckdb"}')
+    monkeypatch.delenv('DASHBOARD_SNAPSHOT_DIR', raising=False)
+    monkeypatch.setattr(sys, 'argv', ['serve', '--workers', '2'])
+
+    with pytest.raises(SystemExit):
+        serve.main()
+    assert gunicorn.runs == [] and 'DASHBOARD_SNAPSHOT_DIR' not in os.environ
@@ -0,0 +1,150 @@
+from confluent_kafka import TopicPartition
+
+from parkflow_dashboard.sessions import (
+    ENTRY_TOPIC,
+    EXIT_TOPIC,
+    PAYMENT_TOPIC,
+    SessionEngine,
+    SessionProcessor,
+)
+
+from fakes import FakeConsumer, FakeMessage
+
+T0 = 1_700_000_000_000
+MINUTE = 60_000
+
+
+def _entry(plate, at, gate='ENTRY_NORTH', event_id=None):
+    return {'eventId': event_id or f'in-{plate}-{at}', 'timestamp': at, 'licensePlate': plate, 'gateId': gate,
+            'laneId': 'LANE-1', 'confidence': 0.9, 'imageUrl': None, 'vehicleType': 'CAR'}
+
+
+def _exit(plate, at):
+    return {'eventId': f'out-{plate}-{at}', 'timestamp': at, 'licensePlate': plate, 'gateId': 'EXIT_NORTH',
+            'laneId': 'LANE-1', 'confidence': 0.9, 'imageUrl': None, 'entryEventId': None}
+
+
+def _payment(plate, at, amount, status='COMPLETED'):
+    return {'eventId': f'pay-{plate}-{at}', 'timestamp': at, 'transactionId': 'TXN-1', 'licensePlate': plate,
+            'amount': amount, 'currency': 'USD', 'paymentMethod': 'CASH', 'status': status, 'parkingDuration': 60}
+
+
+class FakeProducer:
+    def __init__(self):
+        self.sent = []
+        self.flushes = 0
+
+    def produce(self, topic, key=None, value=None):
+        self.sent.append(value)
+
+    def poll(self, timeout=None):
+        return 0
+
+    def flush(self, timeout=None):
+        self.flushes += 1
+
+
+def test_sessions_track_occupancy_and_payment_state():
+    engine = SessionEngine()
+    engine.entry(_entry('AAA111', T0))
+    engine.entry(_entry('BBB222', T0, gate='ENTRY_SOUTH'))
+    engine.entry(_entry('CCC333', T0 + MINUTE))
+    assert (engine.inside(), engine.inside('ENTRY_NORTH'), engine.inside('ENTRY_SOUTH')) == (3, 2, 1)
+
+    # Prepaid for one hour at 2.0 + 3.0 per hour
+    paid = engine.payment(_payment('AAA111', T0 + 5 * MINUTE, 5.0))[0]
+    assert (paid['paymentStatus'], paid['amountDue'], paid['lastPaymentId']) == ('PAID', 0.0, 'pay-AAA111-1700000300000')
+    pending = engine.payment(_payment('BBB222', T0 + 5 * MINUTE, 3.0, status='PENDING'))[0]
+    assert pending['paymentStatus'] == 'IN_PROCESS'
+
+    completed = engine.exit(_exit('AAA111', T0 + 120 * MINUTE))[0]
+    assert (completed['status'], completed['parkingDuration']) == ('COMPLETED', 120)
+    assert (completed['paymentStatus'], completed['amountDue']) == ('OVERDUE', 3.0)
+    assert (engine.inside(), engine.inside('ENTRY_NORTH')) == (2, 1)
+    assert engine.status(engine.sessions['CCC333'], T0 + 61 * MINUTE)['amountDue'] == 5.0
+
+
+def test_out_of_order_and_repeated_events():
+    engine = SessionEngine()
+    # The exit topic was read ahead of the entry topic
+    assert engine.exit(_exit('AAA111', T0 + 10 * MINUTE)) == []
+    assert engine.metrics()['waiting_for_entry'] == 1
+    statuses = engine.entry(_entry('AAA111', T0))
+    assert [s['status'] for s in statuses] == ['ACTIVE', 'COMPLETED']
+    assert engine.inside() == 0
+
+    engine.entry(_entry('BBB222', T0, event_id='in-1'))
+    assert engine.entry(_entry('BBB222', T0, event_id='in-1')) == []
+    # A new entry without an exit closes the old session
+    statuses = engine.entry(_entry('BBB222', T0 + 600 * MINUTE))
+    assert [s['status'] for s in statuses] == ['EXPIRED', 'ACTIVE']
+    assert engine.inside() == 1
+    assert (engine.counts['duplicates'], engine.counts['expired']) == (1, 1)
+
+
+def test_expiry_and_snapshot_restore(tmp_path):
+    engine = SessionEngine(expire_after_s=3600)
+    engine.entry(_entry('OLD1', T0))
+    for i in range(100):
+        engine.entry(_entry(f'NEW{i}', T0 + 90 * MINUTE, gate=f'GATE_{i % 3}'))
+    engine.payment(_payment('NEW7', T0 + 95 * MINUTE, 4.0))
+    engine.exit(_exit('LOST', T0 + 95 * MINUTE))
+    engine.offsets = {(ENTRY_TOPIC, 0): 101, (PAYMENT_TOPIC, 0): 1}
+
+    expired = engine.expire(T0 + 100 * MINUTE)
+    assert [s['licensePlate'] for s in expired] == ['OLD1']
+
+    path = str(tmp_path / 'sessions.arrow')
+    engine.snapshot(path)
+    restored = SessionEngine()
+    assert restored.restore(path)
+    assert restored.inside() == 100
+    assert restored.occupancy == engine.occupancy
+    assert restored.offsets == engine.offsets
+    assert restored.sessions['NEW7'].paid == 4.0
+    assert restored.metrics() == engine.metrics()
+    assert not SessionEngine().restore(str(tmp_path / 'missing.arrow'))
+
+
+def test_sessions_expire_by_entry_time_whatever_order_they_arrived_in():
+    engine = SessionEngine(expire_after_s=3600)
+    engine.entry(_entry('YOUNG', T0 + 90 * MINUTE))
+    # Late, from another partition: stored behind a younger session
+    engine.entry(_entry('LATE', T0))
+    engine.entry(_entry('GONE', T0 + MINUTE))
+    engine.exit(_exit('GONE', T0 + 2 * MINUTE))
+    engine.entry(_entry('GONE', T0 + 80 * MINUTE))
+
+    expired = engine.expire(T0 + 100 * MINUTE)
+    assert [s['licensePlate'] for s in expired] == ['LATE']
+    assert sorted(engine.sessions) == ['GONE', 'YOUNG']
+    assert engine.counts['expired'] == 1 and engine.inside() == 2
+
+
+def test_processor_resumes_from_its_snapshot(tmp_path):
+    path = str(tmp_path / 'sessions.arrow')
+    msgs = [FakeMessage(_entry('AAA111', T0), offset=0), FakeMessage(_entry('BBB222', T0), offset=1),
+            FakeMessage(_exit('AAA111', T0 + MINUTE), topic=EXIT_TOPIC, offset=0),
+            FakeMessage(b'garbage', topic=PAYMENT_TOPIC, offset=4)]
+
+    def deserialize(topic, value):
+        if not isinstance(value, dict):
+            raise ValueError("not an Avro record")
+        return value
+
+    producer = FakeProducer()
+    processor = SessionProcessor(consumer=FakeConsumer([msgs]), producer=producer, deserialize=deserialize,
+                                 serialize=lambda status: status, snapshot_path=path)
+    processor.start()
+    assert [s['status'] for s in producer.sent] == ['ACTIVE', 'ACTIVE', 'COMPLETED']
+    assert processor.metrics()['undecodable'] == 1
+
+    consumer = FakeConsumer([])
+    restarted = SessionProcessor(consumer=consumer, producer=FakeProducer(), deserialize=deserialize,
+                                 serialize=lambda status: status, snapshot_path=path)
+    restarted.start()
+    assert restarted.engine.inside() == 1
+    restarted._on_assign(consumer, [TopicPartition(ENTRY_TOPIC, 0), TopicPartition(PAYMENT_TOPIC, 0),
+                                    TopicPartition(EXIT_TOPIC, 1)])
+    # Partitions missing from the snapshot keep Kafka's starting position
+    assert consumer.assigned == [(ENTRY_TOPIC, 0, 2), (EXIT_TOPIC, 1, -1001), (PAYMENT_TOPIC, 0, 5)]
@@ -0,0 +1,131 @@
+import time
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pytest
+from dash import no_update
+
+from parkflow_dashboard import app as dashboard
+from parkflow_dashboard.snapshot import ArrowFileCache, SnapshotStorage
+from parkflow_dashboard.embedded import EmbeddedStorage
+from parkflow_dashboard.storage import Storage
+from parkflow_dashboard.windows import CREATE_WINDOWS_SQL
+
+ENTRIES_SQL = """
+    CREATE TABLE vehicle_entries (event_id VARCHAR, timestamp TIMESTAMP, license_plate VARCHAR, gate_id VARCHAR,
+                                  vehicle_type VARCHAR, confidence DOUBLE)
+"""
+
+
+class FailingStorage(Storage):
+    """A backing storage that is never reached: every call fails."""
+
+    def _fail(self, *args, **kwargs):
+        raise AssertionError('the backing storage was called')
+
+    execute = prepare = insert_prepared = append = stored_offsets = _fail
+    query_prepared = dashboard_entries = timeseries = freshness = _fail
+
+
+def _append(storage, count, first, minutes_ago):
+    now = datetime.now().replace(microsecond=0)
+    storage.append('vehicle_entries', pa.table({
+        'event_id': [f'evt-{first + i}' for i in range(count)],
+        'timestamp': [now - timedelta(minutes=minutes_ago, seconds=i) for i in range(count)],
+        'license_plate': ['ABC123'] * count,
+        'gate_id': ['GATE_A' if i % 2 else 'GATE_B' for i in range(count)],
+        'vehicle_type': ['CAR'] * count,
+        'confidence': [0.9] * count,
+    }), lambda: False)
+
+
+@pytest.fixture
+def database(tmp_path):
+    storage = EmbeddedStorage(str(tmp_path / 'parkflow.duckdb'))
+    storage.execute(ENTRIES_SQL)
+    storage.execute(CREATE_WINDOWS_SQL)
+    _append(storage, 40, 0, minutes_ago=30)
+    yield storage
+    storage.close()
+
+
+def _sessions(monkeypatch, snapshot):
+    monkeypatch.setattr(dashboard, '_storage', snapshot)
+
+
+def test_sessions_render_from_the_snapshot_without_reading_the_database(database, tmp_path, monkeypatch):
+    directory = str(tmp_path / 'snapshot')
+    writer = SnapshotStorage(ArrowFileCache(directory), EmbeddedStorage(database.path))
+    _sessions(monkeypatch, writer)
+    assert writer.refresh(dashboard.prefetch) == 6
+
+    # Another worker: its backing storage fails every read, so every figure below came from the files
+    reader = SnapshotStorage(ArrowFileCache(directory), FailingStorage())
+    _sessions(monkeypatch, reader)
+    assert reader.as_of is not None
+    fig, state = dashboard.refresh_dashboard(0, None)
+    assert list(fig.data[0].y) == [20, 20]
+    assert dashboard.update_throughput(0, None).data[0].name == 'Entries per minute'
+    assert [len(trace.x) for trace in dashboard.update_confidence(0, None).data] == [20, 20]
+    assert dashboard.update_freshness(0)[0].startswith('Newest entry')
+    assert reader.misses == 0 and reader.hits == 5
+
+    # The next refresh only fetches new rows; a session gets the buckets changed since its version
+    _append(database, 3, 100, minutes_ago=0)
+    _sessions(monkeypatch, writer)
+    writer.refresh(dashboard.prefetch)
+    _sessions(monkeypatch, reader)
+    patched, state = dashboard.refresh_dashboard(1, state)
+    assert patched is not no_update
+    assert sum(sum(bucket['gates'].values()) for bucket in state['buckets'].values()) == 43
+    assert dashboard.refresh_dashboard(2, state)[0] is no_update
+
+    # A zoomed range is not in the snapshot and goes to the backing storage
+    assert 'Error' in dashboard.update_confidence(0, {'xaxis.range[0]': '2024-01-01', 'xaxis.range[1]': '2024-01-02'}
+                                                  ).layout.annotations[0].text
+    assert reader.misses == 1
+    writer.close()
+
+
+def test_storages_must_implement_every_method():
+    class Incomplete(Storage):
+        def execute(self, sql):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    assert not SnapshotStorage.__abstractmethods__
+
+
+def test_a_stale_snapshot_is_not_served(database, tmp_path, monkeypatch):
+    writer = SnapshotStorage(ArrowFileCache(str(tmp_path / 'snapshot')), EmbeddedStorage(database.path))
+    _sessions(monkeypatch, writer)
+    writer.refresh(dashboard.prefetch)
+    reader = SnapshotStorage(ArrowFileCache(str(tmp_path / 'snapshot')), EmbeddedStorage(database.path),
+                             max_age_s=0)
+
+    assert reader.as_of is None
+    assert reader.freshness('vehicle_entries')['newest_event'] is not None
+    assert (reader.hits, reader.misses) == (0, 1)
+    writer.close()
+    reader.close()
+
+
+def test_one_process_at_a_time_refreshes(database, tmp_path):
+    directory = str(tmp_path / 'snapshot')
+    first = SnapshotStorage(ArrowFileCache(directory), EmbeddedStorage(database.path))
+    second = SnapshotStorage(ArrowFileCache(directory), EmbeddedStorage(database.path))
+    read = lambda snapshot: lambda: snapshot.freshness('vehicle_entries')
+
+    first.start(read(first), 0.05)
+    time.sleep(0.2)
+    second.start(read(second), 0.05)
+    time.sleep(0.3)
+    assert first.refreshes > 0 and second.refreshes == 0
+
+    # The lock is released with the first fetcher, and the second takes over
+    first.stop()
+    time.sleep(0.3)
+    assert second.refreshes > 0
+    first.close()
+    second.close()
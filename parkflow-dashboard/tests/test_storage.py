@@ -0,0 +1,205 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+import pytest
+import requests
+
+from parkflow_dashboard import app as dashboard
+from parkflow_dashboard.duckdb_client import DuckDBClient
+from parkflow_dashboard.kafka_duckdb_connector import KafkaToDuckDBConnector
+from parkflow_dashboard.embedded import EmbeddedStorage
+from parkflow_dashboard.storage import (
+    BatchRejected,
+    OffsetConflict,
+    RestStorage,
+    storage_from_spec,
+)
+
+from fakes import FakeConsumer, FakeMessage, FakeResponse
+
+TOPIC = 'parking.entry.events'
+ENTRIES_SQL = """
+    CREATE TABLE vehicle_entries (event_id VARCHAR, timestamp TIMESTAMP, gate_id VARCHAR,
+                                  vehicle_type VARCHAR, confidence DOUBLE)
+"""
+
+
+def _never():
+    return False
+
+
+def _entries(ids, minute=0, gate='GATE_A', confidence=0.93):
+    return pa.table({
+        'event_id': ids,
+        'timestamp': [datetime(2024, 1, 1, 8, minute)] * len(ids),
+        'gate_id': [gate] * len(ids),
+        'vehicle_type': ['CAR'] * len(ids),
+        'confidence': [confidence] * len(ids),
+    })
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = EmbeddedStorage(str(tmp_path / 'parkflow.duckdb'))
+    storage.execute(ENTRIES_SQL)
+    yield storage
+    storage.close()
+
+
+def test_embedded_append_dedups_and_stores_offsets_in_one_transaction(storage):
+    first = storage.append('vehicle_entries', _entries(['a', 'b', 'b']), _never, dedup_on='event_id',
+                           consumer_group='g', offsets={(TOPIC, 0): (0, 3)})
+    assert first == {'rows': 2, 'duplicates': 1}
+
+    # A retry of the same offsets is refused with where to resume, and nothing is written
+    with pytest.raises(OffsetConflict) as conflict:
+        storage.append('vehicle_entries', _entries(['c']), _never, dedup_on='event_id',
+                       consumer_group='g', offsets={(TOPIC, 0): (2, 4), (TOPIC, 1): (0, 1)})
+    assert conflict.value.stored == {(TOPIC, 0): 3}
+
+    second = storage.append('vehicle_entries', _entries(['b', 'c']), _never, dedup_on='event_id',
+                            consumer_group='g', offsets={(TOPIC, 0): (3, 5)})
+    assert second == {'rows': 1, 'duplicates': 1}
+    assert storage.stored_offsets('g', TOPIC) == {(TOPIC, 0): 5}
+    assert storage.query_prepared('ids', 'SELECT event_id FROM vehicle_entries ORDER BY event_id', [])['data'] == {
+        'event_id': ['a', 'b', 'c']}
+
+    with pytest.raises(BatchRejected):
+        storage.append('vehicle_entries', pa.table({'nope': [1]}), _never)
+    assert storage.freshness('vehicle_entries')['newest_event'] == '2024-01-01T08:00:00'
+    assert storage.freshness('vehicle_entries')['last_commit'] is not None
+
+
+def test_read_only_storage_shares_the_writers_instance(storage):
+    storage.append('vehicle_entries', _entries(['a']), _never)
+    reader = EmbeddedStorage(storage.path, read_only=True)
+    try:
+        assert reader.query_prepared('count', 'SELECT count(*) AS n FROM vehicle_entries', [])['data'] == {'n': [1]}
+        with pytest.raises(BatchRejected):
+            reader.append('vehicle_entries', _entries(['b']), _never)
+    finally:
+        reader.close()
+    # The writer keeps the file open after the reader is gone
+    assert storage.append('vehicle_entries', _entries(['b']), _never)['rows'] == 1
+
+
+def test_embedded_dashboard_entries_return_buckets_touched_since_a_version(storage):
+    start = datetime(2024, 1, 1, 8, 0)
+    assert storage.dashboard_entries(start, 60, -1)['version'] == -1
+
+    storage.append('vehicle_entries', _entries(['a', 'b'], minute=0), _never)
+    storage.append('vehicle_entries', _entries(['c'], minute=1, gate='GATE_B', confidence=1.0), _never)
+    data = storage.dashboard_entries(start, 60, -1)
+    assert data['version'] == 2
+    assert data['counts']['gate_id'] == ['GATE_A', 'GATE_B']
+    assert data['counts']['entries'] == [2, 1]
+    # Full confidence lands in the top bin, as in the rollups
+    assert data['confidence']['confidence_bin'] == [18, 19]
+    # Read from the server's rollups, folded after every embedded write
+    folded = storage.query_prepared('folded', 'SELECT sum(entries)::INTEGER AS entries FROM entry_counts_minute', [])
+    assert folded['data']['entries'] == [3]
+
+    assert storage.dashboard_entries(start, 60, 2)['counts']['bucket'] == []
+    storage.append('vehicle_entries', _entries(['d'], minute=1), _never)
+    touched = storage.dashboard_entries(start, 60, 2)
+    # The touched bucket comes back with its complete totals
+    assert touched['counts']['bucket'] == [data['counts']['bucket'][1]] * 2
+    assert sorted(touched['counts']['entries']) == [1, 1]
+
+
+def test_recent_entries_are_read_through_the_range_macro_of_the_window(storage):
+    storage.execute("ALTER TABLE vehicle_entries ADD COLUMN license_plate VARCHAR")
+    storage.append('vehicle_entries', _entries(['a', 'b'], minute=0), _never)
+    storage.append('vehicle_entries', _entries(['c'], minute=50), _never)
+
+    params = dashboard.recent_entries_params(datetime(2024, 1, 1, 9, 10, 30))
+    assert params[:2] == ['2024-01-01T08:10:00', '2024-01-02T09:10:00']
+    data = storage.query_prepared(dashboard.RECENT_ENTRIES_STATEMENT, dashboard.RECENT_ENTRIES_SQL, params)
+    assert data['data']['timestamp'] == [datetime(2024, 1, 1, 8, 50)]
+
+
+def test_timeseries_downsamples_in_the_embedded_database_and_asks_the_server_over_rest(storage, monkeypatch):
+    start = datetime(2024, 1, 1, 8, 0)
+    # A reading a second for an hour per gate, with one misread on GATE_B
+    seconds = list(range(3600))
+    for gate in ('GATE_A', 'GATE_B'):
+        storage.append('vehicle_entries', pa.table({
+            'event_id': [f'{gate}-{i}' for i in seconds],
+            'timestamp': [start + timedelta(seconds=i) for i in seconds],
+            'gate_id': [gate] * len(seconds), 'vehicle_type': ['CAR'] * len(seconds),
+            'confidence': [0.1 if gate == 'GATE_B' and i == 1234 else 0.9 + i % 5 / 100 for i in seconds],
+        }), _never)
+
+    counts = storage.timeseries('vehicle_entries', 'timestamp', start, start + timedelta(hours=1), 4)
+    assert counts['columns'] == {'time': ['2024-01-01T08:00:00', '2024-01-01T08:15:00', '2024-01-01T08:30:00',
+                                          '2024-01-01T08:45:00'], 'count': [1800] * 4}
+    with pytest.raises(KeyError):
+        storage.timeseries('missing', 'timestamp', None, None, 4)
+
+    monkeypatch.setattr(dashboard, '_storage', storage)
+    monkeypatch.setattr(dashboard, 'DASHBOARD_MAX_POINTS', 50)
+    fig = dashboard.build_confidence_figure(start, start + timedelta(hours=1))
+    assert [(trace.name, len(trace.x)) for trace in fig.data] == [('GATE_A', 50), ('GATE_B', 50)]
+    assert min(fig.data[1].y) == 0.1
+    assert dashboard.update_confidence(0, {'xaxis.range[0]': '2024-01-01 08:20', 'xaxis.range[1]': '2024-01-01 08:21'}
+                                       ).data[0].x[0] == datetime(2024, 1, 1, 8, 20)
+
+    seen = []
+
+    def fake_request(session, method, url, params=None, **kwargs):
+        seen.append((url, params))
+        return FakeResponse(payload={'status': 'success', 'columns': {'time': []}})
+
+    monkeypatch.setattr(requests.Session, 'request', fake_request)
+    rest = RestStorage(DuckDBClient('http://duckdb'))
+    rest.timeseries('vehicle_entries', 'timestamp', start, None, 50, group_by=['gate_id'], value='confidence',
+                    mode='lttb')
+    assert seen == [('http://duckdb/timeseries', {
+        'table': 'vehicle_entries', 'time_column': 'timestamp', 'points': 50, 'group_by': ['gate_id'],
+        'aggregates': ['count'], 'mode': 'lttb', 'start': '2024-01-01T08:00:00', 'value': 'confidence'})]
+
+
+def test_connector_writes_exactly_once_into_an_embedded_database(storage):
+    msgs = [FakeMessage({'eventId': f'evt-{i % 3}', 'timestamp': 1_700_000_000_000 + i, 'licensePlate': 'ABC123',
+                         'gateId': 'GATE_A', 'laneId': 'LANE_1', 'confidence': 0.9, 'imageUrl': None,
+                         'vehicleType': 'CAR'}, offset=i) for i in range(4)]
+    consumer = FakeConsumer([msgs])
+    storage.execute("DROP TABLE vehicle_entries")
+    connector = KafkaToDuckDBConnector(consumer=consumer, avro_deserializer=lambda value, ctx: value,
+                                       storage=EmbeddedStorage(storage.path), batch_mode=True, batch_size=4,
+                                       exactly_once=True)
+    connector.start()
+
+    assert (connector.rows_written, connector.duplicates_skipped) == (3, 1)
+    assert storage.stored_offsets('parkflow-duckdb-connector', TOPIC) == {(TOPIC, 0): 4}
+    assert consumer.committed == [[(TOPIC, 0, 4)]]
+
+
+def test_storage_from_spec(tmp_path):
+    assert isinstance(storage_from_spec('rest', lambda: 'client'), RestStorage)
+    embedded = storage_from_spec(f"embedded:{tmp_path / 'db.duckdb'}", None)
+    assert isinstance(embedded, EmbeddedStorage)
+    embedded.close()
+    with pytest.raises(ValueError):
+        storage_from_spec('sqlite', None)
+
+
+def test_the_rest_backend_does_not_need_the_server_modules(tmp_path):
+    # A fresh interpreter, as an installed package without docker/duckdb next to it would run
+    script = """
+import sys
+from parkflow_dashboard import app
+from parkflow_dashboard.storage import storage_from_spec
+assert not {'ingest', 'rollups', 'tiering', 'timeseries'} & set(sys.modules)
+try:
+    storage_from_spec('embedded:db.duckdb', None)
+except ImportError as e:
+    print(e)
+"""
+    env = dict(os.environ, DUCKDB_SERVER_DIR=str(tmp_path), DASHBOARD_SNAPSHOT_DIR='')
+    result = subprocess.run([sys.executable, '-c', script], env=env, cwd=tmp_path, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert 'DUCKDB_SERVER_DIR' in result.stdout
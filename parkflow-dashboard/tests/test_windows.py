@@ -0,0 +1,174 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from confluent_kafka import TopicPartition
+
+from parkflow_dashboard.embedded import EmbeddedStorage
+from parkflow_dashboard.storage import BatchRejected
+from parkflow_dashboard import app as dashboard
+from parkflow_dashboard.windows import (
+    CREATE_WINDOWS_SQL,
+    GROUP_ID,
+    WINDOW_TABLE,
+    WindowEngine,
+    WindowProcessor,
+    WindowSpec,
+    parse_window_specs,
+)
+
+from fakes import FakeConsumer, FakeMessage
+
+TOPIC = 'parking.entry.events'
+# A whole hour in epoch millis, so every window size used here starts on it
+T0 = 1_700_002_800_000
+
+
+def _windows(storage, size):
+    data = storage.query_prepared('test_windows', f"""
+        SELECT window_start, gate_id, entries, late_entries, final FROM {WINDOW_TABLE}
+        WHERE window_seconds = ? ORDER BY window_start, gate_id
+    """, [size])['data']
+    return list(zip(*data.values()))
+
+
+def _entry(offset, ms, gate='GATE_A'):
+    return FakeMessage({'eventId': f'evt-{offset}', 'timestamp': ms, 'gateId': gate, 'vehicleType': 'CAR'},
+                       offset=offset)
+
+
+def test_window_specs_and_the_windows_holding_an_event():
+    assert parse_window_specs('60, 900:60') == [WindowSpec(60, 60), WindowSpec(900, 60)]
+    with pytest.raises(ValueError):
+        parse_window_specs('900:120')
+
+    starts = WindowSpec(900, 60).starts(T0 + 61_000)
+    assert len(starts) == 15
+    assert starts[0] == T0 + 60_000 and starts[-1] == T0 - 780_000
+    assert list(WindowSpec(60, 60).starts(T0 + 59_999)) == [T0]
+
+
+def test_watermark_finalizes_windows_and_late_events_update_them_until_the_lateness_is_over():
+    engine = WindowEngine([WindowSpec(60, 60)], watermark_delay_s=10, allowed_lateness_s=60)
+    engine.add(T0 + 5_000, 'GATE_A', 'CAR')
+    engine.add(T0 + 65_000, 'GATE_A', 'CAR')
+    # Watermark at T0 + 55 s: the first minute is still open
+    assert [row['final'] for row in engine.drain().to_pylist()] == [False, False]
+
+    engine.add(T0 + 75_000, 'GATE_B', 'VAN')
+    rows = engine.drain().to_pylist()
+    # Only what changed: the first minute turned final, the second got a GATE_B window
+    assert [(row['window_start'], row['gate_id'], row['final']) for row in rows] == [
+        (datetime.fromtimestamp(T0 / 1000), 'GATE_A', True),
+        (datetime.fromtimestamp((T0 + 60_000) / 1000), 'GATE_B', False)]
+
+    # Late but within the lateness: the final window is sent again with the event counted
+    assert engine.add(T0 + 30_000, 'GATE_A', 'CAR')
+    rows = engine.drain().to_pylist()
+    assert [(row['entries'], row['late_entries'], row['final']) for row in rows] == [(2, 1, True)]
+
+    engine.add(T0 + 200_000, 'GATE_A', 'CAR')
+    engine.drain()
+    # The first minute is past its lateness and forgotten; its events are dropped
+    assert not engine.add(T0 + 1_000, 'GATE_A', 'CAR')
+    assert engine.drain().num_rows == 0
+    assert engine.metrics()['dropped'] == 1
+    assert engine.metrics()['late_updates'] == 1
+
+
+def test_processor_upserts_windows_with_offsets_and_resumes_after_a_restart(tmp_path):
+    storage = EmbeddedStorage(str(tmp_path / 'parkflow.duckdb'))
+    specs = [WindowSpec(60, 60), WindowSpec(120, 60)]
+
+    def processor(batches):
+        engine = WindowEngine(specs, watermark_delay_s=0, allowed_lateness_s=120)
+        return WindowProcessor(consumer=FakeConsumer(batches), storage=EmbeddedStorage(storage.path),
+                               deserialize=lambda value: value, engine=engine, flush_interval_s=0)
+
+    first = processor([[_entry(0, T0 + 1_000), _entry(1, T0 + 2_000, 'GATE_B')],
+                       [_entry(2, T0 + 61_000)]])
+    first.start()
+    assert storage.stored_offsets(GROUP_ID, TOPIC) == {(TOPIC, 0): 3}
+    assert [row[2:] for row in _windows(storage, 60)] == [(1, 0, True), (1, 0, True), (1, 0, False)]
+
+    # A late event for the first minute, then one that closes the second
+    second = processor([[_entry(3, T0 + 3_000), _entry(4, T0 + 125_000)]])
+    assert second.restore() == 8
+    second._on_assign(second.consumer, [TopicPartition(TOPIC, 0)])
+    assert second.consumer.assigned == [(TOPIC, 0, 3)]
+    second.start()
+
+    # Counts continue from the stored windows instead of starting over
+    assert [row[1:] for row in _windows(storage, 60)] == [
+        ('GATE_A', 2, 1, True), ('GATE_B', 1, 0, True), ('GATE_A', 1, 0, True), ('GATE_A', 1, 0, False)]
+    sliding = _windows(storage, 120)
+    assert [row[2] for row in sliding if row[1] == 'GATE_A'] == [2, 3, 2, 1]
+    assert storage.stored_offsets(GROUP_ID, TOPIC) == {(TOPIC, 0): 5}
+    assert second.consumer.committed == [[(TOPIC, 0, 5)]]
+    storage.close()
+
+
+def test_a_failed_flush_keeps_the_windows_for_the_next_one(tmp_path):
+    class FlakyStorage(EmbeddedStorage):
+        failures = ['rejected', 'stopped']
+
+        def append(self, *args, **kwargs):
+            failure = self.failures.pop(0) if self.failures else None
+            if failure == 'rejected':
+                raise BatchRejected('disk full')
+            if failure == 'stopped':
+                return None
+            return super().append(*args, **kwargs)
+
+    storage = FlakyStorage(str(tmp_path / 'parkflow.duckdb'))
+    storage.execute(CREATE_WINDOWS_SQL)
+    engine = WindowEngine([WindowSpec(60, 60)], watermark_delay_s=0, allowed_lateness_s=0)
+    processor = WindowProcessor(consumer=FakeConsumer([]), storage=storage, deserialize=lambda value: value,
+                                engine=engine, flush_interval_s=0)
+
+    # The second event closes the first minute and, with no lateness, evicts it once stored
+    processor.process([_entry(0, T0 + 1_000), _entry(1, T0 + 61_000)])
+    with pytest.raises(BatchRejected):
+        processor.flush()
+    assert processor.flush() is False
+    processor.process([_entry(2, T0 + 62_000)])
+    assert processor.flush() is True
+
+    assert [row[2:] for row in _windows(storage, 60)] == [(1, 0, True), (2, 0, False)]
+    assert storage.stored_offsets(GROUP_ID, TOPIC) == {(TOPIC, 0): 3}
+    assert processor.windows_written == 2 and len(engine.windows) == 1
+    storage.close()
+
+
+def test_dashboard_charts_read_the_finest_window_that_fits_the_range(tmp_path, monkeypatch):
+    specs = [WindowSpec(60, 60), WindowSpec(3600, 3600), WindowSpec(300, 60)]
+    engine = WindowEngine(specs, watermark_delay_s=0)
+    # Two entries a minute for an hour, alternating gates
+    for i in range(120):
+        engine.add(T0 + i * 30_000, 'GATE_A' if i % 2 else 'GATE_B', 'CAR')
+    storage = EmbeddedStorage(str(tmp_path / 'parkflow.duckdb'))
+    storage.execute(CREATE_WINDOWS_SQL)
+    storage.append(WINDOW_TABLE, engine.drain(), lambda: False, replace=True)
+    monkeypatch.setattr(dashboard, '_storage', storage)
+    monkeypatch.setattr(dashboard, 'WINDOW_SPECS', '60,3600,300:60')
+
+    assert dashboard.timeline_window(3600, specs) == WindowSpec(60, 60)
+    assert dashboard.timeline_window(30 * 86400, specs) == WindowSpec(3600, 3600)
+    assert dashboard.throughput_window(specs) == WindowSpec(300, 60)
+
+    start = datetime.fromtimestamp(T0 / 1000)
+    fig = dashboard.build_throughput_figure(start, start + timedelta(hours=1), specs)
+    assert [(bar.name, len(bar.x), sum(bar.y)) for bar in fig.data[:2]] == [('GATE_A', 60, 60), ('GATE_B', 60, 60)]
+    # Full five-minute windows hold ten entries: two a minute
+    assert max(fig.data[2].y) == 2.0
+
+    zoomed = dashboard.zoom_range({'xaxis2.range[0]': '2023-11-15 00:10:00', 'xaxis2.range[1]': '2023-11-15 00:20'})
+    assert zoomed == (datetime(2023, 11, 15, 0, 10), datetime(2023, 11, 15, 0, 20))
+    assert dashboard.zoom_range({'xaxis.autorange': True}, now=start) == (start - timedelta(minutes=60), start)
+
+    # The recent-entries timeline counts from the windows, not the rows it happens to show
+    shown = pd.DataFrame({'timestamp': pd.to_datetime([start + timedelta(seconds=30), start + timedelta(seconds=70)])})
+    assert dashboard.entry_timeline(shown).tolist() == [2, 2]
+    storage.execute(f"DROP TABLE {WINDOW_TABLE}")
+    assert dashboard.entry_timeline(shown).tolist() == [1, 1]
+    storage.close()
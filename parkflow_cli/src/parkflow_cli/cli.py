@@ -1,4 +1,5 @@
 """ParkFlow CLI implementation."""
+import os
 import subprocess
 import sys
 import time
@@ -11,6 +12,8 @@ from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.table import Table
 
+from parkflow_cli.load import CURVES, LoadConfig, load_schemas, register_schemas, run_load
+
 console = Console()
 
 def run_command(cmd, cwd=None):
@@ -67,6 +70,62 @@ def simulate(events, delay):
             console.print(f"[red]❌ Failed to start simulation: {str(e)}[/red]")
             sys.exit(1)
 
+@cli.command()
+@click.option('--rate', '-r', default=100.0,
+              help='Target vehicle arrivals per second (the peak with rush-hour)')
+@click.option('--duration', '-t', default=60.0, help='Seconds to produce for')
+@click.option('--processes', '-p', default=os.cpu_count() or 1, help='Producer processes')
+@click.option('--curve', type=click.Choice(CURVES), default='poisson', help='Arrival curve')
+@click.option('--time-scale', default=60.0,
+              help='Simulated seconds per second for stays and payments')
+@click.option('--day-length', default=240.0,
+              help='Seconds per simulated day with --curve rush-hour')
+@click.option('--bootstrap-servers',
+              default=os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:29092'))
+@click.option('--schema-registry',
+              default=os.getenv('SCHEMA_REGISTRY_URL', 'http://localhost:8081'))
+@click.option('--acks', type=click.Choice(['0', '1', 'all']), default='all')
+@click.option('--seed', type=int, default=None, help='Seed for reproducible sessions')
+def load(rate, duration, processes, curve, time_scale, day_length, bootstrap_servers,
+         schema_registry, acks, seed):
+    """🏋️ Produce entry, payment and exit events straight to Kafka"""
+    config = LoadConfig(rate=rate, duration_s=duration, processes=processes, curve=curve,
+                        time_scale=time_scale, day_length_s=day_length,
+                        bootstrap_servers=bootstrap_servers, schema_registry_url=schema_registry,
+                        acks=acks, seed=seed)
+    try:
+        schema_ids = register_schemas(schema_registry, load_schemas())
+    except Exception as e:
+        console.print(f"[red]❌ Failed to register schemas: {str(e)}[/red]")
+        sys.exit(1)
+
+    producing = f"[bold blue]🏋️ Producing {rate:g} arrivals/s with {processes} processes..."
+    with console.status(producing) as status:
+        def on_progress(elapsed, produced, errors):
+            status.update(f"[bold blue]🏋️ {elapsed:.0f}s: {sum(produced.values()):,} events "
+                          f"({sum(produced.values()) / elapsed:,.0f}/s), {errors} errors")
+
+        report = run_load(config, schema_ids=schema_ids, on_progress=on_progress)
+
+    table = Table(title=f"Load: {curve} arrivals for {report.elapsed_s:.1f}s")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", style="green", justify="right")
+    table.add_row("Target arrivals/s", f"{rate:,.0f}")
+    table.add_row("Achieved arrivals/s", f"{report.produced['entry'] / report.elapsed_s:,.0f}")
+    for kind, count in report.produced.items():
+        table.add_row(f"{kind.capitalize()} events", f"{count:,}")
+    table.add_row("Events/s", f"{report.total / report.elapsed_s:,.0f}")
+    table.add_row("Delivery errors", str(report.errors))
+    table.add_row("Sessions still open", f"{report.open_sessions:,}")
+    for p in (50, 95, 99):
+        latency = report.latency.percentile(p)
+        table.add_row(f"Produce latency p{p}",
+                      f"{latency * 1000:.1f} ms" if latency is not None else "-")
+    table.add_row("Produce latency max", f"{report.latency.max * 1000:.1f} ms")
+    console.print(table)
+    if report.errors:
+        sys.exit(1)
+
 @cli.command()
 def start():
     """🚀 Start all services"""
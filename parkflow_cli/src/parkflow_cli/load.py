@@ -0,0 +1,427 @@
+"""High-rate load generator producing Avro ParkFlow events straight to Kafka."""
+import heapq
+import io
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import string
+import struct
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from confluent_kafka import Producer
+from fastavro import parse_schema, schemaless_writer
+
+AVRO_SCHEMA_DIR = Path(os.getenv(
+    'AVRO_SCHEMA_DIR',
+    Path(__file__).resolve().parents[3] / 'parkflow-common' / 'src' / 'main' / 'avro'
+))
+
+# kind -> (topic, schema file)
+EVENT_TYPES = {
+    'entry': ('parking.entry.events', 'VehicleEntryEvent.avsc'),
+    'payment': ('parking.payment.events', 'PaymentEvent.avsc'),
+    'exit': ('parking.exit.events', 'VehicleExitEvent.avsc'),
+}
+CURVES = ('constant', 'poisson', 'rush-hour')
+
+# Session lifecycle, as in the entry service's ParkingEventGenerator (minutes)
+STAYS = [(0.1, 5, 15), (0.6, 60, 180), (0.3, 480, 600)]
+PAYMENT_AFTER_MIN = 5
+PAYING_SHARE = 0.85
+PAYMENT_METHODS = [('CREDIT_CARD', 0.70), ('DEBIT_CARD', 0.25), ('CASH', 0.05)]
+VEHICLE_TYPES = [('CAR', 0.85), ('MOTORCYCLE', 0.10), ('TRUCK', 0.05)]
+REGULAR_PLATES = 50
+REGULAR_SHARE = 0.3
+
+REPORT_INTERVAL_S = 1.0
+# Most arrivals produced before the clock is checked again
+MAX_BURST = 1000
+# Messages still undelivered this long after the run count as errors
+FLUSH_TIMEOUT_S = 30.0
+# Magic byte and schema id of the Schema Registry wire format
+_WIRE_HEADER = struct.Struct('>bI')
+
+
+@dataclass
+class LoadConfig:
+    rate: float
+    duration_s: float
+    processes: int = 1
+    curve: str = 'poisson'
+    # Simulated seconds per wall-clock second for stays and payments
+    time_scale: float = 60.0
+    # Wall-clock seconds per simulated day with the rush-hour curve
+    day_length_s: float = 240.0
+    start_hour: float = 7.0
+    bootstrap_servers: str = 'localhost:29092'
+    schema_registry_url: str = 'http://localhost:8081'
+    acks: str = 'all'
+    seed: Optional[int] = None
+
+
+def rush_hour_factor(hour: float) -> float:
+    """Arrival rate relative to the peak: the entry service's 80/30/10% entry chances."""
+    if 8 <= hour < 10 or 16 <= hour < 18:
+        return 1.0
+    if hour >= 23 or hour < 6:
+        return 0.125
+    return 0.375
+
+
+class ArrivalProcess:
+    """Arrival times in seconds from the start for a target rate per second.
+
+    ``constant`` spaces arrivals evenly, ``poisson`` draws exponential gaps,
+    and ``rush-hour`` thins a Poisson process at the peak ``rate`` with
+    :func:`rush_hour_factor`, compressing one day into ``day_length_s``.
+    """
+
+    def __init__(self, curve: str, rate: float, rng: random.Random,
+                 day_length_s: float = 240.0, start_hour: float = 7.0):
+        if curve not in CURVES:
+            raise ValueError(f"Unknown arrival curve '{curve}', "
+                             f"expected one of {', '.join(CURVES)}")
+        self.curve = curve
+        self.rate = rate
+        self.rng = rng
+        self.day_length_s = day_length_s
+        self.start_hour = start_hour
+        self.t = 0.0
+
+    def hour(self, t: float) -> float:
+        return (self.start_hour + t / self.day_length_s * 24) % 24
+
+    def next(self) -> float:
+        if self.curve == 'constant':
+            self.t += 1 / self.rate
+        elif self.curve == 'poisson':
+            self.t += self.rng.expovariate(self.rate)
+        else:
+            while True:
+                self.t += self.rng.expovariate(self.rate)
+                if self.rng.random() < rush_hour_factor(self.hour(self.t)):
+                    break
+        return self.t
+
+
+class LatencyHistogram:
+    """Latencies in buckets 1% wide, so percentiles stay within 1% at any volume."""
+
+    GROWTH = 1.01
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        micros = max(seconds * 1e6, 1.0)
+        index = int(math.log(micros, self.GROWTH))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound in seconds of the bucket holding the p-th percentile."""
+        if not self.count:
+            return None
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self.GROWTH ** (index + 1) / 1e6, self.max)
+        return self.max
+
+
+def _weighted(rng: random.Random, choices: List[Tuple[str, float]]) -> str:
+    return rng.choices([value for value, _ in choices], [weight for _, weight in choices])[0]
+
+
+def _plate(rng: random.Random) -> str:
+    """XX-NNXX or XX-XXNN, like the entry service."""
+    def letters(n: int) -> str:
+        return ''.join(rng.choices(string.ascii_uppercase, k=n))
+
+    digits = ''.join(rng.choices(string.digits, k=2))
+    return f"{letters(2)}-{digits + letters(2) if rng.random() < 0.5 else letters(2) + digits}"
+
+
+@dataclass(order=True)
+class _Due:
+    at: float
+    seq: int
+    kind: str = field(compare=False)
+    session: Dict = field(compare=False)
+
+
+class SessionSimulator:
+    """Entry -> payment -> exit lifecycles, with stays compressed by ``time_scale``.
+
+    ``arrive`` produces the entry record and schedules the rest of the
+    session; ``due`` returns the payments and exits whose time has come.
+    """
+
+    def __init__(self, rng: random.Random, time_scale: float):
+        self.rng = rng
+        self.time_scale = time_scale
+        self.regulars = [_plate(rng) for _ in range(REGULAR_PLATES)]
+        self._pending: List[_Due] = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _schedule(self, at: float, kind: str, session: Dict) -> None:
+        self._seq += 1
+        heapq.heappush(self._pending, _Due(at, self._seq, kind, session))
+
+    def next_due(self) -> Optional[float]:
+        return self._pending[0].at if self._pending else None
+
+    def arrive(self, now: float) -> Dict:
+        rng = self.rng
+        share = rng.random()
+        for weight, low, high in STAYS:
+            if share < weight:
+                break
+            share -= weight
+        stay_min = rng.randint(low, high)
+        plate = rng.choice(self.regulars) if rng.random() < REGULAR_SHARE else _plate(rng)
+        entry = {
+            'eventId': str(uuid.uuid4()),
+            'timestamp': int(time.time() * 1000),
+            'licensePlate': plate,
+            'gateId': 'ENTRY_NORTH' if rng.random() < 0.6 else 'ENTRY_SOUTH',
+            'laneId': f"LANE-{rng.randint(1, 2)}",
+            'confidence': round(rng.uniform(0.85, 0.99), 3),
+            'imageUrl': None,
+            'vehicleType': _weighted(rng, VEHICLE_TYPES),
+        }
+        session = {'entry': entry, 'stay_min': stay_min}
+        if rng.random() < PAYING_SHARE:
+            self._schedule(now + PAYMENT_AFTER_MIN * 60 / self.time_scale, 'payment', session)
+        self._schedule(now + stay_min * 60 / self.time_scale, 'exit', session)
+        return entry
+
+    def due(self, now: float) -> List[Tuple[str, Dict]]:
+        events = []
+        while self._pending and self._pending[0].at <= now:
+            item = heapq.heappop(self._pending)
+            events.append((item.kind, self._record(item.kind, item.session)))
+        return events
+
+    def _record(self, kind: str, session: Dict) -> Dict:
+        rng, entry = self.rng, session['entry']
+        if kind == 'payment':
+            return {
+                'eventId': str(uuid.uuid4()),
+                'timestamp': int(time.time() * 1000),
+                'transactionId': f"TXN-{uuid.uuid4()}",
+                'licensePlate': entry['licensePlate'],
+                'amount': min(max(2.0 + session['stay_min'] / 60 * 3.0, 2.0), 25.0),
+                'currency': 'USD',
+                'paymentMethod': _weighted(rng, PAYMENT_METHODS),
+                'status': 'COMPLETED',
+                'parkingDuration': session['stay_min'],
+            }
+        return {
+            'eventId': str(uuid.uuid4()),
+            'timestamp': int(time.time() * 1000),
+            'licensePlate': entry['licensePlate'],
+            'gateId': 'EXIT_NORTH' if rng.random() < 0.6 else 'EXIT_SOUTH',
+            'laneId': entry['laneId'],
+            'confidence': round(rng.uniform(0.85, 0.99), 3),
+            'imageUrl': None,
+            'entryEventId': entry['eventId'],
+        }
+
+
+def load_schemas(schema_dir: Path = AVRO_SCHEMA_DIR) -> Dict[str, str]:
+    return {kind: (schema_dir / schema_file).read_text()
+            for kind, (_, schema_file) in EVENT_TYPES.items()}
+
+
+def register_schemas(registry_url: str, schemas: Dict[str, str]) -> Dict[str, int]:
+    """Register each schema under ``<topic>-value`` and return the schema ids."""
+    ids = {}
+    for kind, schema_str in schemas.items():
+        topic = EVENT_TYPES[kind][0]
+        response = httpx.post(f"{registry_url}/subjects/{topic}-value/versions",
+                              json={'schema': schema_str},
+                              headers={'Content-Type': 'application/vnd.schemaregistry.v1+json'})
+        response.raise_for_status()
+        ids[kind] = response.json()['id']
+    return ids
+
+
+def avro_encoder(schema_str: str, schema_id: int) -> Callable[[Dict], bytes]:
+    """Encode records in the Schema Registry wire format, as KafkaAvroDeserializer expects."""
+    parsed = parse_schema(json.loads(schema_str))
+    header = _WIRE_HEADER.pack(0, schema_id)
+
+    def encode(record: Dict) -> bytes:
+        buffer = io.BytesIO()
+        buffer.write(header)
+        schemaless_writer(buffer, parsed, record)
+        return buffer.getvalue()
+
+    return encode
+
+
+def _produce(producer: Producer, topic: str, key: str, value: bytes, on_delivery) -> None:
+    while True:
+        try:
+            producer.produce(topic, key=key, value=value, on_delivery=on_delivery)
+            return
+        except BufferError:
+            # Local queue full: the brokers are the bottleneck, wait for deliveries
+            producer.poll(0.05)
+
+
+def _worker(index: int, config: LoadConfig, schemas: Dict[str, str],
+            schema_ids: Dict[str, int], reports: multiprocessing.Queue) -> None:
+    """One producer process generating ``config.rate / config.processes`` sessions per second."""
+    seed = None if config.seed is None else config.seed + index
+    rng = random.Random(seed)
+    rate = config.rate / config.processes
+    arrivals = ArrivalProcess(config.curve, rate, rng, config.day_length_s, config.start_hour)
+    sessions = SessionSimulator(rng, config.time_scale)
+    encoders = {kind: avro_encoder(schemas[kind], schema_ids[kind]) for kind in EVENT_TYPES}
+    topics = {kind: topic for kind, (topic, _) in EVENT_TYPES.items()}
+    producer = Producer({
+        'bootstrap.servers': config.bootstrap_servers,
+        'acks': config.acks,
+        'linger.ms': 5,
+        'compression.type': 'lz4',
+        'queue.buffering.max.messages': 500000,
+    })
+
+    histogram = LatencyHistogram()
+    produced = {kind: 0 for kind in EVENT_TYPES}
+    errors = [0]
+
+    def on_delivery(err, msg):
+        if err is not None:
+            errors[0] += 1
+            return
+        latency = msg.latency()
+        if latency is not None:
+            histogram.record(latency)
+
+    def send(kind: str, record: Dict) -> None:
+        _produce(producer, topics[kind], record['licensePlate'], encoders[kind](record),
+                 on_delivery)
+        produced[kind] += 1
+
+    start = time.monotonic()
+    next_arrival = arrivals.next()
+    next_report = REPORT_INTERVAL_S
+    while True:
+        elapsed = time.monotonic() - start
+        if elapsed >= config.duration_s:
+            break
+        # Bounded, so a process that cannot keep up still stops on time and reports
+        # what it achieved
+        for _ in range(MAX_BURST):
+            if next_arrival > elapsed:
+                break
+            send('entry', sessions.arrive(next_arrival))
+            next_arrival = arrivals.next()
+        for kind, record in sessions.due(elapsed):
+            send(kind, record)
+        if elapsed >= next_report:
+            reports.put(('progress', index, dict(produced), errors[0]))
+            next_report += REPORT_INTERVAL_S
+        wake = min(next_arrival, next_report, config.duration_s)
+        if sessions.next_due() is not None:
+            wake = min(wake, sessions.next_due())
+        # poll() serves delivery callbacks while waiting for the next event
+        producer.poll(max(0.0, min(wake - (time.monotonic() - start), 0.1)))
+
+    errors[0] += producer.flush(FLUSH_TIMEOUT_S)
+    reports.put(('done', index, dict(produced), errors[0], histogram, len(sessions),
+                 time.monotonic() - start))
+
+
+@dataclass
+class LoadReport:
+    elapsed_s: float
+    produced: Dict[str, int]
+    errors: int
+    latency: LatencyHistogram
+    # Payments and exits still scheduled when the run ended
+    open_sessions: int
+
+    @property
+    def total(self) -> int:
+        return sum(self.produced.values())
+
+
+def run_load(config: LoadConfig, schema_ids: Optional[Dict[str, int]] = None,
+             on_progress: Optional[Callable[[float, Dict[str, int], int], None]] = None
+             ) -> LoadReport:
+    """Run ``config.processes`` producer processes for ``config.duration_s`` seconds.
+
+    Throughput is measured over the slowest process's run, from its first
+    produce to the end of its final flush.
+    """
+    schemas = load_schemas()
+    if schema_ids is None:
+        schema_ids = register_schemas(config.schema_registry_url, schemas)
+    # spawn: librdkafka threads do not survive fork
+    context = multiprocessing.get_context('spawn')
+    reports = context.Queue()
+    workers = [context.Process(target=_worker, args=(i, config, schemas, schema_ids, reports),
+                               daemon=True)
+               for i in range(config.processes)]
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+
+    progress: Dict[int, Tuple[Dict[str, int], int]] = {}
+    histogram = LatencyHistogram()
+    open_sessions = 0
+    elapsed = 0.0
+    done = 0
+    while done < len(workers):
+        try:
+            report = reports.get(timeout=1.0)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                raise RuntimeError(
+                    f"{len(workers) - done} producer processes exited without reporting")
+            continue
+        kind, index, produced, errors = report[:4]
+        progress[index] = (produced, errors)
+        if kind == 'done':
+            done += 1
+            histogram.merge(report[4])
+            open_sessions += report[5]
+            elapsed = max(elapsed, report[6])
+        elif on_progress is not None:
+            on_progress(time.monotonic() - start, _sum_produced(progress),
+                        sum(e for _, e in progress.values()))
+    for worker in workers:
+        worker.join()
+    return LoadReport(elapsed, _sum_produced(progress), sum(e for _, e in progress.values()),
+                      histogram, open_sessions)
+
+
+def _sum_produced(progress: Dict[int, Tuple[Dict[str, int], int]]) -> Dict[str, int]:
+    return {kind: sum(produced.get(kind, 0) for produced, _ in progress.values())
+            for kind in EVENT_TYPES}
@@ -0,0 +1,213 @@
+import importlib
+import io
+import json
+import math
+import queue
+import random
+import time
+
+import pytest
+from click.testing import CliRunner
+from fastavro import parse_schema, schemaless_reader
+
+from parkflow_cli import load
+from parkflow_cli.load import (
+    EVENT_TYPES,
+    ArrivalProcess,
+    LatencyHistogram,
+    LoadConfig,
+    SessionSimulator,
+    avro_encoder,
+    load_schemas,
+    run_load,
+)
+
+
+def _arrivals(curve, rate, until, **kwargs):
+    process = ArrivalProcess(curve, rate, random.Random(7), **kwargs)
+    times = []
+    while True:
+        t = process.next()
+        if t >= until:
+            return times
+        times.append(t)
+
+
+def test_constant_and_poisson_arrivals_keep_the_target_rate():
+    constant = _arrivals('constant', 50, 10)
+    assert len(constant) == pytest.approx(500, abs=1)
+    assert {round(b - a, 9) for a, b in zip(constant, constant[1:])} == {0.02}
+
+    poisson = _arrivals('poisson', 1000, 10)
+    assert len(poisson) == pytest.approx(10_000, rel=0.03)
+    gaps = [b - a for a, b in zip(poisson, poisson[1:])]
+    # Exponential gaps: the standard deviation equals the mean
+    mean = sum(gaps) / len(gaps)
+    deviation = math.sqrt(sum((gap - mean) ** 2 for gap in gaps) / len(gaps))
+    assert deviation == pytest.approx(mean, rel=0.05)
+
+    with pytest.raises(ValueError):
+        ArrivalProcess('sine', 10, random.Random())
+
+
+def test_rush_hour_arrivals_follow_the_daily_curve():
+    # One simulated hour per second, starting at midnight, for two days
+    times = _arrivals('rush-hour', 2000, 48, day_length_s=24, start_hour=0)
+    per_hour = [0] * 24
+    for t in times:
+        per_hour[int(t) % 24] += 1
+
+    assert per_hour[8] / 2 == pytest.approx(2000, rel=0.1)
+    assert per_hour[17] / 2 == pytest.approx(2000, rel=0.1)
+    assert per_hour[12] / 2 == pytest.approx(2000 * 0.375, rel=0.1)
+    assert per_hour[3] / 2 == pytest.approx(2000 * 0.125, rel=0.1)
+
+
+def test_latency_percentiles_are_within_one_bucket():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+
+    assert histogram.count == 1000 and histogram.max == 1.0
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.01)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.01)
+    # A percentile is the upper bound of its bucket, never beyond the largest latency seen
+    assert histogram.percentile(50) >= 0.5
+    assert histogram.percentile(100) == 1.0
+
+    slow = LatencyHistogram()
+    for _ in range(1000):
+        slow.record(2.0)
+    histogram.merge(slow)
+    assert histogram.count == 2000 and histogram.max == 2.0
+    assert histogram.percentile(25) == pytest.approx(0.5, rel=0.01)
+    assert histogram.percentile(75) == 2.0
+
+
+def test_every_exit_and_payment_follows_its_entry():
+    sessions = SessionSimulator(random.Random(3), time_scale=600)
+    events = []
+    for second in range(200):
+        events.append(('entry', sessions.arrive(second)))
+        events.extend(sessions.due(second))
+    events.extend(sessions.due(math.inf))
+    assert len(sessions) == 0
+
+    entries = {}
+    exited = set()
+    paid = set()
+    for kind, record in events:
+        if kind == 'entry':
+            entries[record['eventId']] = record
+        elif kind == 'exit':
+            entry = entries[record['entryEventId']]
+            assert record['licensePlate'] == entry['licensePlate']
+            assert record['entryEventId'] not in exited
+            exited.add(record['entryEventId'])
+        else:
+            # Payments carry no entry id: the plate must have an entry that has not left
+            open_plates = {entries[i]['licensePlate'] for i in entries.keys() - exited}
+            assert record['licensePlate'] in open_plates
+            paid.add(record['transactionId'])
+    assert exited == entries.keys()
+    assert 0.75 < len(paid) / len(entries) < 0.95
+
+
+def test_encoded_records_round_trip_through_their_schema():
+    schemas = load_schemas()
+    sessions = SessionSimulator(random.Random(5), time_scale=60)
+    records = {'entry': sessions.arrive(0)}
+    records.update(sessions.due(math.inf))
+    assert records.keys() == EVENT_TYPES.keys()
+
+    for kind, record in records.items():
+        encoded = avro_encoder(schemas[kind], 42)(record)
+        # Schema Registry wire format: magic byte 0, then the schema id
+        assert encoded[:5] == b'\x00\x00\x00\x00\x2a'
+        schema = parse_schema(json.loads(schemas[kind]))
+        assert schemaless_reader(io.BytesIO(encoded[5:]), schema) == record
+
+
+class FakeMessage:
+    def latency(self):
+        return 0.002
+
+
+class FakeProducer:
+    def __init__(self, config):
+        self.pending = []
+
+    def produce(self, topic, key=None, value=None, on_delivery=None):
+        assert topic in {topic for topic, _ in EVENT_TYPES.values()} and value[:1] == b'\x00'
+        self.pending.append(on_delivery)
+
+    def poll(self, timeout=None):
+        delivered, self.pending = self.pending, []
+        for on_delivery in delivered:
+            on_delivery(None, FakeMessage())
+        time.sleep(min(timeout or 0, 0.01))
+        return len(delivered)
+
+    def flush(self, timeout=None):
+        self.poll()
+        return 0
+
+
+class InlineProcess:
+    """Runs the producer process's target in this process when started."""
+
+    def __init__(self, target, args, daemon):
+        self.target, self.args = target, args
+
+    def start(self):
+        self.target(*self.args)
+
+    def is_alive(self):
+        return False
+
+    def join(self):
+        pass
+
+
+class InlineContext:
+    Queue = queue.Queue
+    Process = InlineProcess
+
+
+def test_run_load_adds_up_the_producer_processes(monkeypatch):
+    monkeypatch.setattr(load, 'Producer', FakeProducer)
+    monkeypatch.setattr(load.multiprocessing, 'get_context', lambda method: InlineContext)
+    config = LoadConfig(rate=400, duration_s=0.5, processes=2, curve='constant', time_scale=1e6,
+                        seed=1)
+
+    report = run_load(config, schema_ids={kind: 1 for kind in EVENT_TYPES})
+    assert report.produced['entry'] == pytest.approx(200, abs=4)
+    assert report.produced['exit'] + report.open_sessions >= report.produced['entry']
+    assert report.produced['payment'] > 0
+    assert report.errors == 0
+    assert report.latency.count == report.total
+    assert report.elapsed_s >= 0.5
+
+
+def test_load_command_reports_the_run(monkeypatch):
+    configs = []
+    latency = LatencyHistogram()
+    latency.record(0.004)
+
+    def fake_run_load(config, schema_ids, on_progress):
+        configs.append(config)
+        assert schema_ids == {'entry': 1}
+        return load.LoadReport(2.0, {'entry': 200, 'payment': 150, 'exit': 180}, 0, latency, 20)
+
+    # The package exports the click group under the module's name
+    cli = importlib.import_module('parkflow_cli.cli')
+    monkeypatch.setattr(cli, 'register_schemas', lambda url, schemas: {'entry': 1})
+    monkeypatch.setattr(cli, 'run_load', fake_run_load)
+    result = CliRunner().invoke(cli.cli, ['load', '--rate', '100', '--duration', '2', '-p', '3',
+                                          '--curve', 'rush-hour', '--seed', '9'])
+
+    assert result.exit_code == 0, result.output
+    assert (configs[0].rate, configs[0].processes, configs[0].curve, configs[0].seed) == (
+        100, 3, 'rush-hour', 9)
+    assert 'Achieved arrivals/s' in result.output and '265' in result.output